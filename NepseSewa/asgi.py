@@ -3,6 +3,9 @@ ASGI config for NepseSewa project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run under an ASGI server (e.g. ``uvicorn NepseSewa.asgi:application``) so the
+``/api/stream/`` SSE push endpoint can hold idle connections on the event loop.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
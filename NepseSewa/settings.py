@@ -191,14 +191,85 @@ KHALTI_LOOKUP_URL = "https://a.khalti.com/api/v2/epayment/lookup/"
 KHALTI_RETURN_URL = f"{BASE_URL}/payment/khalti/success/"
 
 # ========== CELERY SETTINGS ==========
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
-# For development: Set this to True to run tasks synchronously without Redis
-# Set to False once Redis and Celery worker are running locally
-CELERY_TASK_ALWAYS_EAGER = True 
+# For development: leave this True to run tasks synchronously without Redis
+# Set CELERY_TASK_ALWAYS_EAGER=0 once Redis and Celery worker are running locally
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', '1').lower() in ('1', 'true', 'yes')
+
+# ========== CACHE SETTINGS ==========
+# Shared by every web, ASGI and worker process: the retained push snapshots,
+# the published market depth and its version counters must be the same in all
+# of them (a per-process LocMemCache would serve each process its own copy).
+# CACHE_BACKEND / CACHE_LOCATION select it; with neither set, an eager setup
+# has no Redis and everything runs in one process, so LocMemCache is enough.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+if os.environ.get('CACHE_BACKEND'):
+    CACHE_BACKEND = os.environ['CACHE_BACKEND']
+elif CACHE_LOCATION or not CELERY_TASK_ALWAYS_EAGER:
+    CACHE_BACKEND = 'django.core.cache.backends.redis.RedisCache'
+    CACHE_LOCATION = CACHE_LOCATION or 'redis://localhost:6379/2'
+else:
+    CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    }
+}
 
+# ========== MATCHING SETTINGS ==========
+# Symbols are hashed onto this many 'matching.<n>' queues; run exactly one
+# single-threaded worker per queue (python manage.py run_matching_workers).
+MATCHING_SHARDS = 4
+# Seconds an order request waits for its shard's reply before answering "pending"
+MATCHING_REPLY_TIMEOUT = 5
+# Most place/cancel instructions one /api/trade/batch/ request may carry
+TRADE_BATCH_MAX = 50
+# Order validation context (session state + circuit bands) is rebuilt on every
+# published tick and at the latest after this many seconds; limit prices must
+# be a multiple of the tick size (Rs)
+VALIDATION_CONTEXT_TTL = 5
+ORDER_TICK_SIZE = '0.01'
+# Price levels per side kept in the published market depth (/api/orderbook/),
+# and the seconds a depth aggregated from the database (before the symbol's
+# shard has published) is served from cache
+ORDERBOOK_DEPTH_LEVELS = 5
+ORDERBOOK_FALLBACK_TTL = 1
+# Playback liquidity simulator: the share of each replayed tick's traded volume
+# demo orders may take, plus an optional slippage model in basis points
+# (a fixed half-spread and extra impact when an order takes the whole tick).
+PLAYBACK_LIQUIDITY_SHARE = 1.0
+PLAYBACK_SPREAD_BPS = 0
+PLAYBACK_IMPACT_BPS = 0
+
+# ========== VALUATION SETTINGS ==========
+# Rows per statement when the per-tick valuation pass writes portfolio values
+# and snapshots, and how long PortfolioSnapshots are kept
+VALUATION_BATCH = 1000
+PORTFOLIO_SNAPSHOT_RETENTION_DAYS = 30
+
+# ========== TRADE EMAIL SETTINGS ==========
+# Outbox rows the mail worker sends per batch (over one SMTP connection),
+# how often a failing email is retried before it is marked FAILED, and the
+# seconds after which a batch claimed by a worker that never finished is
+# claimed again
+TRADE_EMAIL_BATCH = 200
+TRADE_EMAIL_MAX_ATTEMPTS = 5
+TRADE_EMAIL_CLAIM_TIMEOUT = 300
+
+# ========== PUSH (SSE) SETTINGS ==========
+# 'redis' fans ticks out to every ASGI process through Redis pub/sub.
+# 'inprocess' keeps publish + subscribe inside one process (tests / runserver only).
+# PUSH_BROKER / PUSH_REDIS_URL select it; like the cache, an eager setup with
+# neither set has no Redis and stays in-process.
+PUSH_REDIS_URL = os.environ.get('PUSH_REDIS_URL', '')
+PUSH_BROKER = os.environ.get(
+    'PUSH_BROKER', 'redis' if PUSH_REDIS_URL or not CELERY_TASK_ALWAYS_EAGER else 'inprocess'
+)
+PUSH_REDIS_URL = PUSH_REDIS_URL or 'redis://localhost:6379/1'
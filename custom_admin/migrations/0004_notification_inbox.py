@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fan_out_global_notifications(apps, schema_editor):
+    """Give every user their own copy of the old global (user=NULL) notices."""
+    Notification = apps.get_model('custom_admin', 'Notification')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    # Per-fill "Match Found" broadcasts are replaced by each trader's own fill notices
+    Notification.objects.filter(user__isnull=True, type='system', title__startswith='Match Found:').delete()
+    notices = list(Notification.objects.filter(user__isnull=True))
+    user_ids = list(User.objects.values_list('id', flat=True))
+    for notice in notices:
+        for i in range(0, len(user_ids), 1000):
+            copies = Notification.objects.bulk_create([
+                Notification(user_id=user_id, title=notice.title, message=notice.message, type=notice.type,
+                             is_read=notice.is_read)
+                for user_id in user_ids[i:i + 1000]
+            ])
+            # auto_now_add stamped the copies with now
+            Notification.objects.filter(id__in=[c.id for c in copies]).update(created_at=notice.created_at)
+    Notification.objects.filter(id__in=[n.id for n in notices]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('custom_admin', '0003_remove_notification_category_notification_type_and_more'),
+        ('myapp', '0047_trade_email_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='custom_admi_user_id_f30760_idx'),
+        ),
+        migrations.RunPython(fan_out_global_notifications, migrations.RunPython.noop),
+    ]
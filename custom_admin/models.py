@@ -9,7 +9,8 @@ class Notification(models.Model):
         ('system', 'System'),
     )
     
-    # Restored null=True, blank=True to prevent migration errors and allow global notifications
+    # Every row is one user's inbox entry: global notices are fanned out to every user
+    # (myapp/services/notifications.py). null=True is kept to prevent migration errors.
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications', null=True, blank=True, help_text="Leave blank to send to all users")
     title = models.CharField(max_length=200)
     message = models.TextField()
@@ -19,11 +20,22 @@ class Notification(models.Model):
 
     class Meta:
         ordering =['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
 
     def __str__(self):
         username = self.user.username if self.user else "GLOBAL"
         return f"{username} - {self.type} - {self.title}"
 
+class UnreadCounter(models.Model):
+    """Running count of a user's unread notifications (seeded from the table when missing)"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
 class ActivityLog(models.Model):
     """System activity logs for tracking user and admin actions"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
@@ -17,6 +17,7 @@ from django.core.paginator import Paginator
 from django.contrib import messages
 from django.db.models import Q
 from .models import ActivityLog, SystemSetting, Notification
+from myapp.services import symbol_index
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.views import PasswordChangeView
@@ -112,7 +113,7 @@ def admin_dashboard_view(request):
         trend_data.append(idx.index_value if idx else 0)
 
     # Recent lists for widgets
-    recent_trades = TradeExecution.objects.select_related('buy_order__user').order_by('-executed_at')[:5]
+    recent_trades = TradeExecution.objects.select_related('buyer').order_by('-executed_at')[:5]
     recent_users = CustomUser.objects.order_by('-date_joined')[:5]
     recent_payments = PaymentTransaction.objects.select_related('user', 'plan').order_by('-created_at')[:5]
 
@@ -290,6 +291,19 @@ def generic_list_view(request, app_name, model_name):
     return render(request, 'custom_admin/generic_list.html', context)
 
 
+def send_notification(request, form):
+    """Deliver an admin-written notice through the inbox service: a blank user means every user"""
+    from myapp.services import notifications as inbox
+
+    notice = form.save(commit=False)
+    if notice.user_id is None:
+        sent = inbox.broadcast(notice.type, notice.title, notice.message)
+        messages.success(request, f"Notification sent to {sent} users.")
+    else:
+        inbox.deliver([notice])
+        messages.success(request, "Notification created successfully.")
+
+
 @staff_member_required(login_url='custom_admin:admin_login')
 def generic_create_view(request, app_name, model_name):
     model = get_model_or_404(app_name, model_name)
@@ -298,8 +312,11 @@ def generic_create_view(request, app_name, model_name):
     if request.method == 'POST':
         form = ModelFormClass(request.POST, request.FILES)
         if form.is_valid():
-            form.save()
-            messages.success(request, f"{model._meta.verbose_name.title()} created successfully.")
+            if model is Notification:
+                send_notification(request, form)
+            else:
+                form.save()
+                messages.success(request, f"{model._meta.verbose_name.title()} created successfully.")
             return redirect('custom_admin:generic_list', app_name=app_name, model_name=model_name)
     else:
         form = ModelFormClass()
@@ -320,9 +337,16 @@ def generic_edit_view(request, app_name, model_name, obj_id):
     ModelFormClass = modelform_factory(model, exclude=['created_at', 'updated_at', 'date_joined'])
     
     if request.method == 'POST':
+        # A notification's owner and read state feed the cached unread counters
+        owner = obj.user_id if model is Notification else None
         form = ModelFormClass(request.POST, request.FILES, instance=obj)
+        if model is Notification and form.is_valid() and form.cleaned_data['user'] is None:
+            form.add_error('user', "A sent notification belongs to one user; create a new one to send to all users.")
         if form.is_valid():
             form.save()
+            if model is Notification and ('user' in form.changed_data or 'is_read' in form.changed_data):
+                from myapp.services import notifications as inbox
+                inbox.resync({owner, obj.user_id})
             messages.success(request, f"{model._meta.verbose_name.title()} updated successfully.")
             return redirect('custom_admin:generic_list', app_name=app_name, model_name=model_name)
     else:
@@ -342,7 +366,11 @@ def generic_delete_view(request, app_name, model_name, obj_id):
     model = get_model_or_404(app_name, model_name)
     obj = get_object_or_404(model, pk=obj_id)
     
-    obj.delete()
+    if model is Notification:
+        from myapp.services import notifications as inbox
+        inbox.remove(obj)
+    else:
+        obj.delete()
     messages.success(request, f"{model._meta.verbose_name.title()} deleted successfully.")
     return redirect('custom_admin:generic_list', app_name=app_name, model_name=model_name)
 
@@ -375,24 +403,20 @@ def admin_logout_view(request):
 
 def api_get_notifications(request):
     """Fetch latest notifications for polling"""
+    from myapp.services import notifications as inbox
+
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'Unauthorized'}, status=401)
         
-    # Fetch notifications specifically for the user OR global notifications (user is NULL)
-    notifications = Notification.objects.filter(
-        Q(user=request.user) | Q(user__isnull=True)
-    ).order_by('-created_at')[:10]
-    
-    unread_count = Notification.objects.filter(
-        Q(user=request.user) | Q(user__isnull=True), 
-        is_read=False
-    ).count()
+    # The user's own inbox (global notices are fanned out to every user) and the cached unread counter
+    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:10]
+    unread_count = inbox.unread_count(request.user)
     
     data =[{
         'id': n.id,
         'title': n.title,
         'message': n.message,
-        'type': n.type, # Make sure 'type' was added to your Notification model!
+        'type': n.type,
         'is_read': n.is_read,
         'time': n.created_at.strftime('%b %d, %H:%M')
     } for n in notifications]
@@ -402,15 +426,11 @@ def api_get_notifications(request):
 
 @require_POST
 def api_mark_notification_read(request, notif_id):
-    """Mark a specific notification as read (Handles User and Global)"""
+    """Mark one of the user's notifications as read"""
+    from myapp.services import notifications as inbox
+
     if request.user.is_authenticated:
-        # Filter by ID AND (User is current user OR notification is global)
-        Notification.objects.filter(
-            id=notif_id
-        ).filter(
-            Q(user=request.user) | Q(user__isnull=True)
-        ).update(is_read=True)
-        
+        inbox.mark_read(request.user, notif_id)
         return JsonResponse({'success': True})
     return JsonResponse({'error': 'Unauthorized'}, status=401)
 
@@ -423,15 +443,13 @@ def api_live_search(request):
         
     results =[]
     
-    # 1. Search Stocks
-    stocks = Stock.objects.filter(
-        Q(symbol__icontains=query) | Q(company_name__icontains=query)
-    ).order_by('symbol')[:4]
+    # 1. Search Stocks (in-memory symbol index)
+    stocks = symbol_index.search(query, limit=4)
     
     for s in stocks:
         results.append({
-            'title': s.symbol,
-            'subtitle': s.company_name,
+            'title': s['symbol'],
+            'subtitle': s['company_name'],
             'icon': 'bx-buildings' # Building icon for stocks
         })
     
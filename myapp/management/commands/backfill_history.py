@@ -7,6 +7,7 @@ from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
 from django.utils import timezone
 from myapp.models import NEPSEPrice, MarketIndex
+from myapp.services import history_cache, symbol_stats
 
 class Command(BaseCommand):
     help = 'Scrape REAL historical closing prices and Indices from Merolagani archives'
@@ -43,6 +44,9 @@ class Command(BaseCommand):
             self.scrape_prices(driver, target_date, date_str)
 
         driver.quit()
+        # Backfilled days were cached as final; drop them so the new rows show
+        history_cache.invalidate()
+        symbol_stats.rebuild(since=timezone.localdate() - datetime.timedelta(days=days_to_pull))
         self.stdout.write(self.style.SUCCESS("\n✨ Done! Database is now populated with REAL history."))
 
     def scrape_indices(self, driver, target_date, date_str):
@@ -0,0 +1,32 @@
+import json
+from django.core.management.base import BaseCommand
+from myapp.services.matching_bench import run_benchmark
+
+class Command(BaseCommand):
+    help = 'Benchmark the matching engine with seeded synthetic order flow (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help='Number of order events to generate')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--symbols', type=int, default=5)
+        parser.add_argument('--traders', type=int, default=50)
+        parser.add_argument('--rate', type=float, default=200.0, help='Mean arrivals per second (Poisson)')
+        parser.add_argument('--buy-ratio', type=float, default=0.5)
+        parser.add_argument('--cancel-rate', type=float, default=0.1)
+        parser.add_argument('--price-sigma', type=float, default=0.02, help='Limit price stdev as a fraction of the reference')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--keep', action='store_true', help='Commit the generated orders instead of rolling back')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"🚀 Running matching benchmark ({options['orders']} events, seed {options['seed']})...")
+        report = run_benchmark(
+            orders=options['orders'], seed=options['seed'], symbols=options['symbols'],
+            traders=options['traders'], rate=options['rate'], buy_ratio=options['buy_ratio'],
+            cancel_rate=options['cancel_rate'], price_sigma=options['price_sigma'], keep=options['keep'],
+        )
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"✓ Report written to {options['output']}"))
+        self.stdout.write(output)
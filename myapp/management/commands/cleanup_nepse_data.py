@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from myapp.models import NEPSEPrice, NEPSEIndex, MarketIndex, MarketSummary
+from myapp.services import history_cache
 
 class Command(BaseCommand):
     help = 'Cleanup historical data older than 3 months'
@@ -47,5 +48,6 @@ class Command(BaseCommand):
         NEPSEIndex.objects.filter(timestamp__lt=cutoff_date).delete()
         MarketIndex.objects.filter(timestamp__lt=cutoff_date).delete()
         MarketSummary.objects.filter(timestamp__lt=cutoff_date).delete()
+        history_cache.invalidate()
         
         self.stdout.write(self.style.SUCCESS(f"✓ Successfully deleted {total_count} historical records."))
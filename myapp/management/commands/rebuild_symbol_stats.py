@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from myapp.services import symbol_stats
+
+class Command(BaseCommand):
+    help = 'Rebuild DailyBars and SymbolStats from the stored NEPSEPrice history'
+
+    def handle(self, *args, **options):
+        self.stdout.write("🚀 Rebuilding daily bars and symbol stats...")
+        count = symbol_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"✓ Symbol stats refreshed for {count} symbols"))
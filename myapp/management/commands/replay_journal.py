@@ -0,0 +1,41 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from myapp.services import order_journal
+
+class Command(BaseCommand):
+    help = 'Rebuild order book, balances and holdings from the order journal (optionally verify against the live tables)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until-event', type=int, help='Replay up to and including this journal id')
+        parser.add_argument('--at', help='Replay up to this ISO timestamp')
+        parser.add_argument('--snapshot', action='store_true', help='Take a snapshot of the current state first')
+        parser.add_argument('--verify', action='store_true', help='Compare the replayed head state with the live tables')
+
+    def handle(self, *args, **options):
+        if options['snapshot']:
+            snap = order_journal.take_snapshot()
+            self.stdout.write(self.style.SUCCESS(f"✓ Snapshot taken at journal #{snap.last_event_id}"))
+
+        until_time = None
+        if options['at']:
+            try:
+                until_time = datetime.fromisoformat(options['at'])
+            except ValueError:
+                raise CommandError(f"Invalid --at timestamp: {options['at']}")
+            if timezone.is_naive(until_time):
+                until_time = timezone.make_aware(until_time)
+
+        state = order_journal.replay(until_event_id=options['until_event'], until_time=until_time)
+        self.stdout.write(f"🔁 Replayed to journal #{state.last_event_id}: "
+                          f"{len(state.book)} open orders, {len(state.holdings)} holdings, {len(state.balances)} balances")
+
+        if options['verify']:
+            diff = order_journal.verify(state)
+            if any(diff.values()):
+                self.stdout.write(self.style.ERROR(f"✗ Mismatches: {len(diff['orders'])} orders, {len(diff['holdings'])} holdings"))
+                for kind, keys in diff.items():
+                    for key in keys[:20]:
+                        self.stdout.write(f"  • {kind}: {key}")
+            else:
+                self.stdout.write(self.style.SUCCESS("✓ Replayed state matches the database"))
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    help = 'Start one single-threaded Celery worker per matching shard (matching.<n> queues)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', type=int, action='append',
+                            help='Only start these shard numbers (repeatable; default: all)')
+        parser.add_argument('--loglevel', default='info')
+
+    def handle(self, *args, **options):
+        shards = options['shard'] or range(settings.MATCHING_SHARDS)
+        procs = []
+        for shard in shards:
+            # --pool solo: one writer per shard, so each symbol's book has a single owner
+            cmd = [
+                sys.executable, '-m', 'celery', '-A', 'NepseSewa', 'worker',
+                '-Q', f'matching.{shard}', '--pool', 'solo',
+                '-n', f'matching{shard}@%h', '--loglevel', options['loglevel'],
+            ]
+            # The shard number lets the worker warm-start its books from the journal
+            procs.append(subprocess.Popen(cmd, env={**os.environ, 'MATCHING_SHARD': str(shard)}))
+            self.stdout.write(f"🚀 Matching shard {shard} started (pid {procs[-1].pid})")
+
+        try:
+            for proc in procs:
+                proc.wait()
+        except KeyboardInterrupt:
+            for proc in procs:
+                proc.terminate()
+            self.stdout.write(self.style.SUCCESS("✓ Matching workers stopped"))
@@ -116,6 +116,55 @@ class Command(BaseCommand):
         finally:
             driver.quit()
 
+        # 3. Aggregate breadth/sectors for the tick once, so views read a single row
+        self.record_breadth()
+
+        # 4. Push the new tick to connected clients (one fan-out instead of N polls)
+        self.publish_tick()
+
+        # 5. Fire stop-loss / take-profit orders the new prices crossed
+        self.fire_conditional_orders()
+
+        # 6. Mark every portfolio to the new tick (dashboards read the snapshots)
+        self.revalue_portfolios()
+
+    def record_breadth(self):
+        """Store advance/decline, leaders and sector aggregates for the new tick"""
+        try:
+            from myapp.services.market_breadth import record_breadth
+            breadth = record_breadth()
+            if breadth:
+                self.stdout.write(f"  📊 Breadth: +{breadth.advances} / -{breadth.declines} / ={breadth.unchanged}")
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Breadth aggregation failed: {str(e)}"))
+
+    def publish_tick(self):
+        """Publish changed quotes and the index bar to SSE subscribers"""
+        try:
+            from myapp.services.market_feed import publish_tick
+            changed = publish_tick()
+            self.stdout.write(f"  📡 Pushed {changed} changed quotes")
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Push publish failed: {str(e)}"))
+
+    def fire_conditional_orders(self):
+        """Evaluate pending conditional orders against the new tick"""
+        try:
+            from myapp.services import trigger_engine
+            placed = trigger_engine.on_tick()
+            if placed:
+                self.stdout.write(f"  🎯 Triggered {len(placed)} conditional orders")
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Conditional order evaluation failed: {str(e)}"))
+
+    def revalue_portfolios(self):
+        """Queue the vectorized valuation of all portfolios at the new tick"""
+        try:
+            from myapp.tasks import revalue_portfolios
+            revalue_portfolios.delay()
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Portfolio valuation failed: {str(e)}"))
+
     def scrape_market_summary(self, driver):
         """Scrape NEPSE Index and market overview with robust session handling"""
         try:
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_buyer_seller(apps, schema_editor):
+    TradeExecution = apps.get_model('myapp', 'TradeExecution')
+    Order = apps.get_model('myapp', 'Order')
+    TradeExecution.objects.update(
+        buyer_id=Subquery(Order.objects.filter(id=OuterRef('buy_order_id')).values('user_id')[:1]),
+        seller_id=Subquery(Order.objects.filter(id=OuterRef('sell_order_id')).values('user_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0039_alter_customuser_portfolio_value_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeexecution',
+            name='buyer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='buy_fills', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='tradeexecution',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sell_fills', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_buyer_seller, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='trades_user_id_205a58_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeexecution',
+            index=models.Index(fields=['buyer', '-executed_at', '-id'], name='trade_execu_buyer_i_8d7adf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeexecution',
+            index=models.Index(fields=['seller', '-executed_at', '-id'], name='trade_execu_seller__bb039b_idx'),
+        ),
+    ]
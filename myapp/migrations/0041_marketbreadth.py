@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0040_tradeexecution_buyer_seller'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketBreadth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True, unique=True)),
+                ('advances', models.PositiveIntegerField(default=0)),
+                ('declines', models.PositiveIntegerField(default=0)),
+                ('unchanged', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('total_turnover', models.FloatField(default=0)),
+                ('total_volume', models.FloatField(default=0)),
+                ('top_gainers', models.JSONField(default=list)),
+                ('top_losers', models.JSONField(default=list)),
+                ('top_turnover', models.JSONField(default=list)),
+                ('volume_leaders', models.JSONField(default=list)),
+                ('sectors', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'market_breadth',
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0041_marketbreadth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymbolStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=50, unique=True)),
+                ('as_of', models.DateField()),
+                ('last_close', models.FloatField(default=0)),
+                ('prev_close', models.FloatField(default=0)),
+                ('high_52', models.FloatField(default=0)),
+                ('low_52', models.FloatField(default=0)),
+                ('all_time_high', models.FloatField(default=0)),
+                ('all_time_low', models.FloatField(default=0)),
+                ('sma_20', models.FloatField(blank=True, null=True)),
+                ('sma_50', models.FloatField(blank=True, null=True)),
+                ('sma_200', models.FloatField(blank=True, null=True)),
+                ('avg_volume_20', models.FloatField(default=0)),
+                ('ref_close_1w', models.FloatField(blank=True, null=True)),
+                ('ref_close_1m', models.FloatField(blank=True, null=True)),
+                ('ref_close_1y', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Symbol stats',
+                'db_table': 'symbol_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyBar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('open', models.FloatField(default=0)),
+                ('high', models.FloatField(default=0)),
+                ('low', models.FloatField(default=0)),
+                ('close', models.FloatField(default=0)),
+                ('volume', models.FloatField(default=0)),
+                ('turnover', models.FloatField(default=0)),
+            ],
+            options={
+                'db_table': 'daily_bars',
+                'ordering': ['symbol', '-date'],
+                'indexes': [models.Index(fields=['date'], name='daily_bars_date_865d57_idx')],
+                'unique_together': {('symbol', 'date')},
+            },
+        ),
+    ]
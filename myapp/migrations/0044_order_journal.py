@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0043_platformcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField(db_index=True)),
+                ('book', models.JSONField(default=dict)),
+                ('balances', models.JSONField(default=dict)),
+                ('holdings', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'journal_snapshots',
+                'ordering': ['-last_event_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('PLACED', 'PLACED'), ('MATCHED', 'MATCHED'), ('SETTLED', 'SETTLED'), ('CANCELLED', 'CANCELLED')], max_length=10)),
+                ('symbol', models.CharField(max_length=50)),
+                ('order_id', models.BigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'order_events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['symbol', 'id'], name='order_event_symbol_a8c268_idx'), models.Index(fields=['order_id'], name='order_event_order_i_f3f7d4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0044_order_journal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tradeexecution',
+            name='buy_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='buy_executions', to='myapp.order'),
+        ),
+        migrations.AlterField(
+            model_name='tradeexecution',
+            name='sell_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sell_executions', to='myapp.order'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-19 07:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0045_simulated_fills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConditionalOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=50)),
+                ('side', models.CharField(choices=[('BUY', 'BUY'), ('SELL', 'SELL')], max_length=4)),
+                ('kind', models.CharField(choices=[('STOP_LOSS', 'Stop Loss'), ('TAKE_PROFIT', 'Take Profit')], max_length=12)),
+                ('direction', models.CharField(choices=[('ABOVE', 'ABOVE'), ('BELOW', 'BELOW')], max_length=5)),
+                ('qty', models.PositiveIntegerField()),
+                ('trigger_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('limit_price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('oco_group', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('TRIGGERED', 'TRIGGERED'), ('CANCELLED', 'CANCELLED'), ('REJECTED', 'REJECTED')], default='PENDING', max_length=10)),
+                ('reject_reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='myapp.order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conditional_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'conditional_orders',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'symbol'], name='conditional_status_843fc8_idx'), models.Index(fields=['user', 'status', '-created_at'], name='conditional_user_id_cfb5f1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0047_trade_email_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('market_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cost_basis', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('prev_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('holdings_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'portfolio_snapshots',
+                'indexes': [models.Index(fields=['user', '-timestamp'], name='portfolio_s_user_id_354a04_idx'), models.Index(fields=['timestamp'], name='portfolio_s_timesta_e0db8c_idx')],
+                'unique_together': {('user', 'timestamp')},
+            },
+        ),
+    ]
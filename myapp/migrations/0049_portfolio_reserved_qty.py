@@ -0,0 +1,35 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:26
+
+from django.db import migrations, models
+
+
+def reserve_open_sells(apps, schema_editor):
+    """Reserve the unfilled shares of SELL orders already resting when reservations start."""
+    Order = apps.get_model('myapp', 'Order')
+    Portfolio = apps.get_model('myapp', 'Portfolio')
+    open_sells = {}
+    for user_id, symbol, qty, filled in Order.objects.filter(side='SELL', status__in=['OPEN', 'PARTIAL']).values_list(
+        'user_id', 'symbol', 'qty', 'filled_qty'
+    ):
+        open_sells[(user_id, symbol)] = open_sells.get((user_id, symbol), 0) + qty - filled
+    holdings = Portfolio.objects.filter(user_id__in={u for u, _ in open_sells}, symbol__in={s for _, s in open_sells})
+    for p in holdings:
+        if (p.user_id, p.symbol) in open_sells:
+            p.reserved_qty = min(open_sells[(p.user_id, p.symbol)], p.quantity)
+            p.save(update_fields=['reserved_qty'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0048_portfolio_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='reserved_qty',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(reserve_open_sells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0049_portfolio_reserved_qty'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradeemail',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='tradeemail',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'PENDING'), ('SENDING', 'SENDING'), ('SENT', 'SENT'), ('SKIPPED', 'SKIPPED'), ('FAILED', 'FAILED')], default='PENDING', max_length=10),
+        ),
+    ]
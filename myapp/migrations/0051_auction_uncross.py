@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-19 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0050_tradeemail_claim'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuctionUncross',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_date', models.DateField()),
+                ('symbol', models.CharField(max_length=50)),
+                ('uncrossed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'auction_uncrosses',
+                'unique_together': {('session_date', 'symbol')},
+            },
+        ),
+    ]
@@ -275,6 +275,197 @@ class Order(models.Model):
         return self.filled_qty >= self.qty
 
 
+# ============= PLATFORM & MARKET STATISTICS (PRECOMPUTED AGGREGATES) =============
+class PlatformCounter(models.Model):
+    """Running platform totals for the landing page, kept current by signals (see services/platform_stats.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'platform_counters'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class DailyBar(models.Model):
+    """End-of-day OHLCV per symbol, rolled up from NEPSEPrice ticks at session close"""
+    symbol = models.CharField(max_length=50)
+    date = models.DateField()
+    open = models.FloatField(default=0)
+    high = models.FloatField(default=0)
+    low = models.FloatField(default=0)
+    close = models.FloatField(default=0)
+    volume = models.FloatField(default=0)
+    turnover = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'daily_bars'
+        ordering = ['symbol', '-date']
+        unique_together = ('symbol', 'date')
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.date} C:{self.close}"
+
+
+class SymbolStats(models.Model):
+    """Rolling per-symbol statistics as of the last closed session (see services/symbol_stats.py)"""
+    symbol = models.CharField(max_length=50, unique=True)
+    as_of = models.DateField()
+    last_close = models.FloatField(default=0)
+    prev_close = models.FloatField(default=0)
+    high_52 = models.FloatField(default=0)
+    low_52 = models.FloatField(default=0)
+    all_time_high = models.FloatField(default=0)
+    all_time_low = models.FloatField(default=0)
+    sma_20 = models.FloatField(null=True, blank=True)
+    sma_50 = models.FloatField(null=True, blank=True)
+    sma_200 = models.FloatField(null=True, blank=True)
+    avg_volume_20 = models.FloatField(default=0)
+    # Closes the 1w/1m/1y returns are measured against
+    ref_close_1w = models.FloatField(null=True, blank=True)
+    ref_close_1m = models.FloatField(null=True, blank=True)
+    ref_close_1y = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'symbol_stats'
+        verbose_name_plural = "Symbol stats"
+
+    def __str__(self):
+        return f"{self.symbol} stats as of {self.as_of}"
+
+
+class MarketBreadth(models.Model):
+    """Per-tick breadth, leaders and sector aggregates (see services/market_breadth.py)"""
+    timestamp = models.DateTimeField(db_index=True, unique=True)
+    advances = models.PositiveIntegerField(default=0)
+    declines = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    total_turnover = models.FloatField(default=0)
+    total_volume = models.FloatField(default=0)
+    top_gainers = models.JSONField(default=list)
+    top_losers = models.JSONField(default=list)
+    top_turnover = models.JSONField(default=list)
+    volume_leaders = models.JSONField(default=list)
+    sectors = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'market_breadth'
+        ordering = ['-timestamp']
+
+    def __str__(self):
+        return f"Breadth {self.timestamp} +{self.advances}/-{self.declines}"
+
+
+# ============= CONDITIONAL ORDERS (STOP-LOSS / TAKE-PROFIT / OCO) =============
+class ConditionalOrder(models.Model):
+    """A LIMIT order held back until the LTP crosses its trigger price"""
+    KIND_CHOICES = [
+        ('STOP_LOSS', 'Stop Loss'),       # SELL: LTP falls to trigger; BUY: LTP rises to trigger
+        ('TAKE_PROFIT', 'Take Profit'),   # SELL: LTP rises to trigger; BUY: LTP falls to trigger
+    ]
+
+    DIRECTION_CHOICES = [
+        ('ABOVE', 'ABOVE'),   # fires when LTP >= trigger
+        ('BELOW', 'BELOW'),   # fires when LTP <= trigger
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'PENDING'),
+        ('TRIGGERED', 'TRIGGERED'),   # Order placed
+        ('CANCELLED', 'CANCELLED'),   # By the user, or its OCO partner triggered
+        ('REJECTED', 'REJECTED'),     # Funds/holdings missing when it triggered
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conditional_orders'
+    )
+    symbol = models.CharField(max_length=50)
+    side = models.CharField(max_length=4, choices=Order.SIDE_CHOICES)
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    direction = models.CharField(max_length=5, choices=DIRECTION_CHOICES)
+    qty = models.PositiveIntegerField()
+    trigger_price = models.DecimalField(max_digits=12, decimal_places=2)
+    limit_price = models.DecimalField(max_digits=12, decimal_places=2)
+    # Legs of one-cancels-other pairs share a group
+    oco_group = models.UUIDField(null=True, blank=True, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reject_reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'conditional_orders'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'symbol']),
+            models.Index(fields=['user', 'status', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.side} {self.symbol} {self.qty} @ {self.trigger_price} ({self.status})"
+
+    @staticmethod
+    def direction_for(kind, side):
+        """A SELL stop and a BUY take-profit fire on the way down; the other two on the way up."""
+        return 'BELOW' if (kind == 'STOP_LOSS') == (side == 'SELL') else 'ABOVE'
+
+
+# ============= ORDER JOURNAL (EVENT SOURCING) =============
+class OrderEvent(models.Model):
+    """Append-only journal of order lifecycle events; the id is the journal sequence number"""
+    KIND_CHOICES = [
+        ('PLACED', 'PLACED'),
+        ('MATCHED', 'MATCHED'),
+        ('SETTLED', 'SETTLED'),
+        ('CANCELLED', 'CANCELLED'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    symbol = models.CharField(max_length=50)
+    # Plain ids (not FKs) so the journal outlives deleted orders/users
+    order_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'order_events'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['symbol', 'id']),
+            models.Index(fields=['order_id']),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} {self.symbol} order={self.order_id}"
+
+
+class JournalSnapshot(models.Model):
+    """Compact state (open book, balances, holdings) as of a journal sequence number"""
+    last_event_id = models.BigIntegerField(db_index=True)
+    book = models.JSONField(default=dict)
+    balances = models.JSONField(default=dict)
+    holdings = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'journal_snapshots'
+        ordering = ['-last_event_id']
+
+    def __str__(self):
+        return f"Snapshot @#{self.last_event_id} ({self.created_at})"
+
+
 # ============= PORTFOLIO MODEL (USER HOLDINGS) =============
 class Portfolio(models.Model):
     """Track user's stock holdings"""
@@ -285,6 +476,8 @@ class Portfolio(models.Model):
     )
     symbol = models.CharField(max_length=50, db_index=True)
     quantity = models.PositiveIntegerField(default=0)
+    # Shares held for the user's open SELL orders (available = quantity - reserved_qty)
+    reserved_qty = models.PositiveIntegerField(default=0)
     avg_price = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -299,18 +492,57 @@ class Portfolio(models.Model):
         return f"{self.user.email} - {self.symbol}: {self.quantity} @ {self.avg_price}"
 
 
+# ============= PORTFOLIO SNAPSHOT (MARK-TO-MARKET PER TICK) =============
+class PortfolioSnapshot(models.Model):
+    """A user's holdings valued at one tick; written for every holder by the valuation pass"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='portfolio_snapshots')
+    timestamp = models.DateTimeField()
+    market_value = models.DecimalField(max_digits=14, decimal_places=2)
+    cost_basis = models.DecimalField(max_digits=14, decimal_places=2)
+    prev_value = models.DecimalField(max_digits=14, decimal_places=2)   # Same holdings at the previous session's close
+    holdings_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'portfolio_snapshots'
+        unique_together = [['user', 'timestamp']]
+        indexes = [
+            models.Index(fields=['user', '-timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.timestamp}: {self.market_value}"
+
+
 # ============= TRADE EXECUTION MODEL (COMPLETED TRADES) =============
 class TradeExecution(models.Model):
     """Log of executed trades (matches between buy and sell orders)"""
+    # A NULL side is the playback liquidity simulator (no counterparty order)
     buy_order = models.ForeignKey(
         'Order',
         on_delete=models.CASCADE,
-        related_name='buy_executions'
+        related_name='buy_executions',
+        null=True, blank=True
     )
     sell_order = models.ForeignKey(
         'Order',
         on_delete=models.CASCADE,
-        related_name='sell_executions'
+        related_name='sell_executions',
+        null=True, blank=True
+    )
+    # Denormalized order owners so per-user history is an index range scan
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='buy_fills',
+        null=True, blank=True
+    )
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='sell_fills',
+        null=True, blank=True
     )
     symbol = models.CharField(max_length=50, db_index=True)
     executed_qty = models.PositiveIntegerField()
@@ -323,17 +555,59 @@ class TradeExecution(models.Model):
         indexes = [
             models.Index(fields=['symbol', '-executed_at']),
             models.Index(fields=['-executed_at']),
+            models.Index(fields=['buyer', '-executed_at', '-id']),
+            models.Index(fields=['seller', '-executed_at', '-id']),
         ]
 
+    def save(self, *args, **kwargs):
+        if self.buyer_id is None and self.buy_order_id:
+            self.buyer_id = self.buy_order.user_id
+        if self.seller_id is None and self.sell_order_id:
+            self.seller_id = self.sell_order.user_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.symbol} {self.executed_qty} @ {self.executed_price} on {self.executed_at}"
 
 
+# ============= TRADE EMAIL OUTBOX =============
+class TradeEmail(models.Model):
+    """Fills of one order to confirm by email; written with the fills, sent by the mail worker"""
+    STATUS_CHOICES = [
+        ('PENDING', 'PENDING'),
+        ('SENDING', 'SENDING'),   # Claimed by a mail worker at claimed_at
+        ('SENT', 'SENT'),
+        ('SKIPPED', 'SKIPPED'),   # The user turned buy/sell notifications off
+        ('FAILED', 'FAILED'),     # Gave up after TRADE_EMAIL_MAX_ATTEMPTS
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='+')
+    symbol = models.CharField(max_length=50)
+    side = models.CharField(max_length=4, choices=Order.SIDE_CHOICES)
+    qty = models.PositiveIntegerField()
+    value = models.DecimalField(max_digits=14, decimal_places=2)   # Sum of qty x price over the fills
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'trade_email_outbox'
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.side} {self.qty} {self.symbol} for order {self.order_id} ({self.status})"
+
+
 # ============= MARKET SESSION MODEL =============
 class MarketSession(models.Model):
     """Manage market trading sessions and hours"""
     SESSION_STATUS_CHOICES = [
-        ('PRE_OPEN', 'PRE_OPEN'),       # Future: 9:00-11:00
+        ('PRE_OPEN', 'PRE_OPEN'),       # 10:30-11:00 call auction
         ('CONTINUOUS', 'CONTINUOUS'),   # 11:00-15:00
         ('CLOSED', 'CLOSED'),           # Outside trading hours
         ('PAUSED', 'PAUSED'),           # Admin paused
@@ -356,6 +630,20 @@ class MarketSession(models.Model):
         return f"{self.session_date} - {self.status}"
 
 
+class AuctionUncross(models.Model):
+    """A symbol's pre-open auction has run for the session (seen by every shard process)"""
+    session_date = models.DateField()
+    symbol = models.CharField(max_length=50)
+    uncrossed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'auction_uncrosses'
+        unique_together = ('session_date', 'symbol')
+
+    def __str__(self):
+        return f"{self.session_date} {self.symbol} uncrossed"
+
+
 # ============= LEGACY TRADE MODEL (KEPT FOR BACKWARD COMPATIBILITY) =============
 class Trade(models.Model):
     """Legacy model - kept for backward compatibility with existing data"""
@@ -393,6 +681,7 @@ class Trade(models.Model):
         indexes = [
             models.Index(fields=['user', 'symbol', '-created_at']),
             models.Index(fields=['symbol', '-created_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
         ]
 
 
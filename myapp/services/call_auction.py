@@ -0,0 +1,212 @@
+"""
+Pre-Open Call Auction
+While the session is PRE_OPEN, orders are accepted (funds reserved, PLACED
+journalled) but not matched. At the uncross each symbol gets a single
+equilibrium price: the price level that maximises executable volume, computed
+with cumulative sums over the price levels (NumPy). Every order that crosses
+that price is filled at it, in one settlement batch per symbol, and what is
+left opens the continuous book uncrossed.
+
+Tie-breaks between levels with the same volume: smallest imbalance between
+demand and supply, then closest to the reference price (last close), then the
+lower price.
+Uncrosses run on the symbol's matching shard like any other book change.
+Which symbols have been uncrossed for the session is recorded in
+AuctionUncross, so a restarted shard or an eager web process does not run
+the auction again. A missed auction (manual resume) runs on the first
+continuous order over the orders placed before the open only, so that
+order still matches at the resting prices.
+"""
+import logging
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Max, Min, When
+from django.utils import timezone
+
+from myapp.models import AuctionUncross, MarketSession, Order
+from myapp.services import order_book, order_depth, order_journal, settlement, symbol_stats
+
+logger = logging.getLogger(__name__)
+
+PRICE_STEP = Decimal('0.01')
+
+# (session date, symbol) pairs this process has seen marked in AuctionUncross
+_uncrossed = set()
+
+
+def collecting():
+    """True while the pre-open auction is accepting orders."""
+    return MarketSession.objects.filter(is_active=True, status='PRE_OPEN').exists()
+
+
+def _paisa(prices):
+    return np.array([int(p * 100) for p in prices], dtype=np.int64)
+
+
+def equilibrium(bid_prices, bid_qtys, ask_prices, ask_qtys, ref_price=None):
+    """
+    (price, volume) that clears the most quantity, or None if nothing crosses.
+    Prices are Decimals; they are compared as integer paisa.
+    """
+    if not len(bid_prices) or not len(ask_prices):
+        return None
+    bid_px, ask_px = _paisa(bid_prices), _paisa(ask_prices)
+    levels = np.unique(np.concatenate([bid_px, ask_px]))
+
+    # Quantity at each level, then cumulative: bids willing to pay >= level, asks willing to take <= level
+    bid_at = np.bincount(np.searchsorted(levels, bid_px), weights=bid_qtys, minlength=len(levels)).astype(np.int64)
+    ask_at = np.bincount(np.searchsorted(levels, ask_px), weights=ask_qtys, minlength=len(levels)).astype(np.int64)
+    demand = np.cumsum(bid_at[::-1])[::-1]
+    supply = np.cumsum(ask_at)
+    volume = np.minimum(demand, supply)
+
+    best = int(volume.max())
+    if best <= 0:
+        return None
+    candidates = np.flatnonzero(volume == best)
+    imbalance = np.abs(demand[candidates] - supply[candidates])
+    candidates = candidates[imbalance == imbalance.min()]
+    if len(candidates) > 1 and ref_price:
+        distance = np.abs(levels[candidates] - int(Decimal(str(ref_price)) * 100))
+        candidates = candidates[distance == distance.min()]
+    return (Decimal(int(levels[candidates[0]])) / 100).quantize(PRICE_STEP), best
+
+
+def _allocate(orders, price):
+    """Pair crossing orders at `price`, best price first and FIFO within a price."""
+    bids = sorted((o for o in orders if o.side == 'BUY' and o.price >= price), key=lambda o: (-o.price, o.created_at, o.id))
+    asks = sorted((o for o in orders if o.side == 'SELL' and o.price <= price), key=lambda o: (o.price, o.created_at, o.id))
+    left = {o.id: o.remaining_qty for o in bids + asks}
+
+    trades, i, j = [], 0, 0
+    while i < len(bids) and j < len(asks):
+        buy, sell = bids[i], asks[j]
+        qty = min(left[buy.id], left[sell.id])
+        trades.append((buy, sell, qty, price))
+        left[buy.id] -= qty
+        left[sell.id] -= qty
+        if not left[buy.id]:
+            i += 1
+        if not left[sell.id]:
+            j += 1
+    return trades
+
+
+def uncross(symbol, ref_price=None, placed_before=None):
+    """
+    Run the auction for one symbol (over the orders placed before
+    `placed_before`, if given). Returns (price, executions); price is None
+    when the book does not cross.
+    """
+    from myapp.services.market_feed import publish_order_update
+
+    symbol = symbol.upper()
+    if ref_price is None:
+        stats = symbol_stats.get_stats(symbol)
+        ref_price = stats['last_close'] if stats else None
+
+    book = order_book.get_book(symbol)
+    with book.lock:
+        with transaction.atomic():
+            # 1. Lock the symbol's open orders and find the equilibrium over them
+            orders = Order.objects.select_for_update().filter(symbol=symbol, status__in=order_book.OPEN_STATUSES)
+            if placed_before is not None:
+                orders = orders.filter(created_at__lt=placed_before)
+            orders = list(orders.order_by('created_at', 'id'))
+            bids = [o for o in orders if o.side == 'BUY']
+            asks = [o for o in orders if o.side == 'SELL']
+            result = equilibrium(
+                [o.price for o in bids], [o.remaining_qty for o in bids],
+                [o.price for o in asks], [o.remaining_qty for o in asks],
+                ref_price,
+            )
+            if result is None:
+                return None, []
+            price, volume = result
+
+            # 2. Fill everything that crosses at the one price, as one batch
+            trades = _allocate(orders, price)
+            executions = settlement.settle(trades)
+            order_journal.record([order_journal.matched(e) for e in executions]
+                                 + [order_journal.settled(symbol, trades)])
+
+        # 3. The continuous book reloads the uncrossed remainder, and publishes its depth
+        book.loaded = False
+        order_depth.refresh(symbol)
+
+    logger.info(f"Auction {symbol}: {volume} @ {price} in {len(executions)} fills")
+    for o in {o.id: o for trade in trades for o in trade[:2]}.values():
+        publish_order_update(o)
+    return price, executions
+
+
+def crossed_symbols(symbols=None, placed_before=None):
+    """Symbols whose open orders cross (best bid >= best ask), from one aggregate query."""
+    qs = Order.objects.filter(status__in=order_book.OPEN_STATUSES)
+    if symbols is not None:
+        qs = qs.filter(symbol__in=symbols)
+    if placed_before is not None:
+        qs = qs.filter(created_at__lt=placed_before)
+    rows = qs.values('symbol').annotate(
+        best_bid=Max(Case(When(side='BUY', then='price'))),
+        best_ask=Min(Case(When(side='SELL', then='price'))),
+    )
+    return sorted(
+        r['symbol'] for r in rows
+        if r['best_bid'] is not None and r['best_ask'] is not None and r['best_bid'] >= r['best_ask']
+    )
+
+
+def uncross_shard(shard):
+    """Uncross every crossed symbol owned by a matching shard. Returns {symbol: (price, volume)}."""
+    from myapp.services.matching_service import shard_for
+
+    today = timezone.localdate()
+    results = {}
+    for symbol in crossed_symbols():
+        if shard_for(symbol) != shard:
+            continue
+        price, executions = uncross(symbol)
+        _mark(today, symbol)
+        if price is not None:
+            results[symbol] = (str(price), sum(e.executed_qty for e in executions))
+    return results
+
+
+def schedule_uncross():
+    """Queue the uncross on every matching shard (ahead of the first continuous orders)."""
+    from myapp.tasks import auction_uncross_task
+
+    for shard in range(settings.MATCHING_SHARDS):
+        auction_uncross_task.apply_async(args=(shard,), queue=f'matching.{shard}')
+
+
+def _mark(session_date, symbol):
+    AuctionUncross.objects.get_or_create(session_date=session_date, symbol=symbol)
+    _uncrossed.add((session_date, symbol))
+
+
+def ensure_uncrossed(order):
+    """
+    Guard for the first continuous match of a symbol each session: if the
+    session turned CONTINUOUS without the scheduled uncross (manual resume,
+    scraper), the auction runs here over the orders placed before the open
+    (or before `order`) ahead of any continuous fill. Returns whether it ran
+    an uncross (the caller's order instances may be stale then).
+    """
+    key = (timezone.localdate(), order.symbol.upper())
+    if key in _uncrossed:
+        return False
+    if AuctionUncross.objects.filter(session_date=key[0], symbol=key[1]).exists():
+        _uncrossed.add(key)
+        return False
+    opened_at = MarketSession.objects.filter(session_date=key[0]).values_list('opened_at', flat=True).first()
+    placed_before = opened_at or order.created_at
+    ran = bool(crossed_symbols([key[1]], placed_before))
+    if ran:
+        uncross(key[1], placed_before=placed_before)
+    _mark(*key)
+    return ran
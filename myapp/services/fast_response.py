@@ -0,0 +1,104 @@
+"""
+Fast JSON Responses
+Pre-encoded market payloads: orjson when installed (falls back to the stdlib
+encoder), an optional columnar shape (one array per field instead of one dict
+per row) and gzip/brotli negotiated from Accept-Encoding.
+"""
+import gzip
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+# Below this the compression header costs more than it saves
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+COLUMNS_SHAPE = 'columns'
+
+
+def _default(obj):
+    # Same as DjangoJSONEncoder: Decimals go out as strings
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(data):
+    """Encode `data` to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(
+            data, default=_default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def wants_columns(request):
+    """?shape=columns asks for the columnar layout."""
+    return request.GET.get('shape') == COLUMNS_SHAPE
+
+
+def to_columns(rows, fields):
+    """[{a: 1, b: 2}, ...] -> {a: [1, ...], b: [2, ...]} for the given field order."""
+    return {f: [row.get(f) for row in rows] for f in fields}
+
+
+def negotiate_encoding(request):
+    """Best content-coding we can produce that the client accepts (or None)."""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    JsonResponse replacement for large market payloads.
+    Pass `request` to enable compression negotiation.
+    """
+    def __init__(self, data, request=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        body = dumps(data)
+        encoding = None
+        if request is not None and len(body) >= MIN_COMPRESS_BYTES:
+            encoding = negotiate_encoding(request)
+            if encoding:
+                body = compress(body, encoding)
+        super().__init__(content=body, **kwargs)
+        if request is not None:
+            patch_vary_headers(self, ('Accept-Encoding',))
+        if encoding:
+            self['Content-Encoding'] = encoding
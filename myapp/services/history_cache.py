@@ -0,0 +1,120 @@
+"""
+Historical Response Cache
+Closed trading days never change, so their results are cached with a long TTL.
+Entries are pre-warmed when the session closes (see market_session) and
+dropped only by backfill/cleanup jobs via invalidate(), which bumps a
+generation number instead of hunting for keys.
+"""
+import logging
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from myapp.models import NEPSEPrice, NEPSEIndex, MarketSession
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'hist_cache_generation'
+HISTORY_TTL = 60 * 60 * 24 * 30
+
+DAY_FIELDS = ('symbol', 'open', 'high', 'low', 'close', 'ltp', 'change_pct', 'volume', 'turnover', 'timestamp')
+
+
+def _key(*parts):
+    generation = cache.get(GENERATION_KEY, 0)
+    return ':'.join(['hist', f'g{generation}', *map(str, parts)])
+
+
+def is_closed_day(day):
+    """Past days are final; today only once its session has closed."""
+    today = timezone.localdate()
+    if day < today:
+        return True
+    if day > today:
+        return False
+    return MarketSession.objects.filter(
+        session_date=day, status='CLOSED', closed_at__isnull=False
+    ).exists()
+
+
+def _cached(key, immutable, builder):
+    if immutable:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+    value = builder()
+    if immutable:
+        cache.set(key, value, HISTORY_TTL)
+    return value
+
+
+def market_day_rows(day):
+    """Final quote of every symbol on `day` (DAY_FIELDS dicts, by symbol)."""
+    def build():
+        latest_ids = NEPSEPrice.objects.filter(
+            timestamp__date=day
+        ).values('symbol').annotate(max_id=Max('id')).values_list('max_id', flat=True)
+        return list(NEPSEPrice.objects.filter(id__in=latest_ids).values(*DAY_FIELDS).order_by('symbol'))
+
+    return _cached(_key('day', day.isoformat()), is_closed_day(day), build)
+
+
+def date_range_summary(start_day, end_day):
+    """Trading days and NEPSE index change between two dates (inclusive)."""
+    def build():
+        dates_with_data = NEPSEPrice.objects.filter(
+            timestamp__date__gte=start_day,
+            timestamp__date__lte=end_day
+        ).dates('timestamp', 'day')
+
+        nepse_indices = NEPSEIndex.objects.filter(
+            timestamp__date__gte=start_day,
+            timestamp__date__lte=end_day
+        ).order_by('timestamp')
+        first_index = nepse_indices.first()
+        last_index = nepse_indices.last()
+
+        index_summary = None
+        if first_index and last_index:
+            change = float(last_index.index_value - first_index.index_value)
+            index_summary = {
+                'first_value': float(first_index.index_value),
+                'last_value': float(last_index.index_value),
+                'change': change,
+                'change_pct': (change / first_index.index_value) * 100,
+            }
+        return {
+            'dates': [d.strftime('%Y-%m-%d') for d in dates_with_data],
+            'nepse_index_summary': index_summary,
+        }
+
+    return _cached(_key('range', start_day.isoformat(), end_day.isoformat()), is_closed_day(end_day), build)
+
+
+def available_dates():
+    """Days with price data, newest first. Only today's entry is looked up live."""
+    today = timezone.localdate()
+
+    def build_closed():
+        dates = NEPSEPrice.objects.filter(timestamp__date__lt=today).dates('timestamp', 'day', order='DESC')
+        return [d.strftime('%Y-%m-%d') for d in dates]
+
+    closed = _cached(_key('dates', today.isoformat()), True, build_closed)
+    if NEPSEPrice.objects.filter(timestamp__date=today).exists():
+        return [today.strftime('%Y-%m-%d'), *closed]
+    return closed
+
+
+def warm_day(day):
+    """Fill the cache for a day that just closed."""
+    market_day_rows(day)
+    available_dates()
+    logger.info(f"History cache warmed for {day}")
+
+
+def invalidate():
+    """Orphan every cached historical response (backfill / cleanup jobs)."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
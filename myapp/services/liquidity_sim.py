@@ -0,0 +1,179 @@
+"""
+Playback Liquidity Simulator
+In playback mode there is no real counterparty, so demo orders fill against
+the replayed tick stream instead: a BUY fills when the tick's LTP is at or
+below its limit, a SELL when it is at or above. Fills are capped by the
+volume traded in that tick (PLAYBACK_LIQUIDITY_SHARE of it, shared by every
+order on the shard) and priced at the LTP plus an optional slippage model,
+never beyond the order's limit.
+
+The simulated side has no order or user: its TradeExecution side is NULL and
+settlement skips it, so no bot account, bot orders or bot holdings are written.
+Each symbol's ticks for the playback day are loaded once per process into
+NumPy arrays; a lookup is a binary search. Resting orders are swept once per
+tick by each matching shard and settled as one batch.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from myapp.models import NEPSEPrice, Order
+from myapp.services import order_book, order_depth, order_journal, settlement
+
+logger = logging.getLogger(__name__)
+
+PRICE_STEP = Decimal('0.01')
+
+
+class TickStream:
+    """One playback day's ticks, loaded lazily per symbol."""
+
+    def __init__(self, day):
+        self.day = day
+        self.symbols = {}                # symbol -> (epoch seconds, ltp, tick volume or None)
+        self.used = defaultdict(int)     # (symbol, tick index) -> qty already filled
+
+    def _load(self, symbol):
+        rows = list(NEPSEPrice.objects.filter(
+            symbol=symbol, timestamp__date=self.day, ltp__isnull=False
+        ).order_by('timestamp').values_list('timestamp', 'ltp', 'volume'))
+        times = np.array([ts.timestamp() for ts, _, _ in rows])
+        ltps = np.array([ltp for _, ltp, _ in rows], dtype=np.float64)
+        volumes = np.array([np.nan if v is None else v for _, _, v in rows], dtype=np.float64)
+        if len(rows) and not np.isnan(volumes).all():
+            # The feed's volume is the day's running total; a tick traded the increase since the last one
+            cumulative = np.fmax.accumulate(np.nan_to_num(volumes))
+            volumes = np.diff(cumulative, prepend=0).astype(np.int64)
+        else:
+            volumes = None   # no volume data: uncapped
+        self.symbols[symbol] = (times, ltps, volumes)
+
+    def tick(self, symbol, timestamp):
+        """(tick index, ltp, remaining capacity or None) at or before `timestamp`, or None."""
+        if symbol not in self.symbols:
+            self._load(symbol)
+        times, ltps, volumes = self.symbols[symbol]
+        i = int(np.searchsorted(times, timestamp.timestamp(), side='right')) - 1
+        if i < 0:
+            return None
+        capacity = None
+        if volumes is not None:
+            capacity = int(volumes[i] * settings.PLAYBACK_LIQUIDITY_SHARE) - self.used[(symbol, i)]
+        return i, Decimal(str(ltps[i])), capacity
+
+    def take(self, symbol, i, qty):
+        self.used[(symbol, i)] += qty
+
+
+_stream = None
+
+
+def get_stream(timestamp):
+    """The process's tick stream for the playback day of `timestamp` (one day kept)."""
+    global _stream
+    day = timezone.localtime(timestamp).date()
+    if _stream is None or _stream.day != day:
+        _stream = TickStream(day)
+    return _stream
+
+
+def reset():
+    global _stream
+    _stream = None
+
+
+def fill_price(ltp, side, qty, capacity):
+    """
+    LTP moved against the order by the half-spread plus size impact: the full
+    impact when the order takes all of the tick's remaining volume (basis points).
+    """
+    bps = Decimal(str(settings.PLAYBACK_SPREAD_BPS))
+    if settings.PLAYBACK_IMPACT_BPS and capacity:
+        bps += Decimal(str(settings.PLAYBACK_IMPACT_BPS)) * qty / capacity
+    slip = ltp * bps / 10000
+    return (ltp + slip if side == 'BUY' else ltp - slip).quantize(PRICE_STEP)
+
+
+def plan(orders, timestamp):
+    """[(buy_order, sell_order, qty, price)] with None on the simulated side, reserving tick capacity."""
+    stream = get_stream(timestamp)
+    trades = []
+    for order in orders:
+        tick = stream.tick(order.symbol, timestamp)
+        if tick is None:
+            continue
+        i, ltp, capacity = tick
+        crosses = ltp <= order.price if order.side == 'BUY' else ltp >= order.price
+        qty = order.remaining_qty if capacity is None else min(order.remaining_qty, capacity)
+        if not crosses or qty <= 0:
+            continue
+        stream.take(order.symbol, i, qty)
+
+        price = fill_price(ltp, order.side, qty, capacity)
+        price = min(price, order.price) if order.side == 'BUY' else max(price, order.price)
+        trades.append((order, None, qty, price) if order.side == 'BUY' else (None, order, qty, price))
+    return trades
+
+
+@transaction.atomic
+def _settle(trades):
+    executions = settlement.settle(trades)
+    events = [order_journal.matched(e) for e in executions]
+    by_symbol = defaultdict(list)
+    for trade in trades:
+        by_symbol[(trade[0] or trade[1]).symbol].append(trade)
+    events += [order_journal.settled(symbol, batch) for symbol, batch in by_symbol.items()]
+    order_journal.record(events)
+    return executions
+
+
+def _apply_to_books(trades):
+    for buy_order, sell_order, qty, price in trades:
+        order = buy_order or sell_order
+        book = order_book.get_book(order.symbol)
+        with book.lock:
+            entry = book.orders.get(order.id)
+            if entry:
+                book.apply([(entry, qty, price)])
+                order_depth.publish(book)
+
+
+def fill(orders, timestamp):
+    """Fill `orders` (FIFO) against the tick at `timestamp` as one settlement batch. Returns the executions."""
+    trades = plan(orders, timestamp)
+    if not trades:
+        return []
+    executions = _settle(trades)
+    _apply_to_books(trades)
+    return executions
+
+
+def sweep(shard, timestamp):
+    """Fill the resting orders of a shard's symbols that cross the current tick."""
+    from myapp.services.market_feed import publish_order_update
+    from myapp.services.matching_service import shard_for
+
+    open_orders = Order.objects.filter(status__in=order_book.OPEN_STATUSES)
+    symbols = [s for s in open_orders.order_by().values_list('symbol', flat=True).distinct() if shard_for(s) == shard]
+    if not symbols:
+        return []
+    orders = list(open_orders.filter(symbol__in=symbols).order_by('created_at', 'id'))
+    executions = fill(orders, timestamp)
+    for o in {(e.buy_order or e.sell_order).id: (e.buy_order or e.sell_order) for e in executions}.values():
+        publish_order_update(o)
+    if executions:
+        logger.info(f"Playback sweep shard {shard} @ {timestamp}: {len(executions)} fills")
+    return executions
+
+
+def schedule_sweep(timestamp):
+    """Queue a sweep of the new playback tick on every matching shard."""
+    from myapp.tasks import playback_sweep_task
+
+    for shard in range(settings.MATCHING_SHARDS):
+        playback_sweep_task.apply_async(args=(shard, timestamp.isoformat()), queue=f'matching.{shard}')
@@ -0,0 +1,123 @@
+"""
+Market Breadth Engine
+One NumPy pass over a tick computes advance/decline/unchanged, turnover and
+volume leaders and equal-weighted per-sector aggregates, stored as a single
+MarketBreadth row. Breadth, leaderboards and the sector heatmap then read
+that one row instead of running count()/order_by() queries per request.
+"""
+import logging
+import numpy as np
+from django.db.models import Max
+
+from myapp.models import NEPSEPrice, MarketBreadth
+from myapp.services import symbol_index
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 10
+
+
+def _leaders(order, symbols, ltp, change, volume, turnover):
+    return [
+        {
+            'symbol': symbols[i],
+            'ltp': float(ltp[i]),
+            'change_pct': float(change[i]),
+            'volume': float(volume[i]),
+            'turnover': float(turnover[i]),
+        }
+        for i in order[:TOP_N]
+    ]
+
+
+def compute_breadth(timestamp):
+    """Aggregate the tick at `timestamp` (returns a dict of MarketBreadth fields, or None)."""
+    rows = list(NEPSEPrice.objects.filter(timestamp=timestamp, ltp__gt=0).values_list(
+        'symbol', 'ltp', 'change_pct', 'volume', 'turnover'
+    ))
+    if not rows:
+        return None
+
+    symbols = [r[0] for r in rows]
+    ltp, change, volume, turnover = (
+        np.array([r[i] or 0 for r in rows], dtype=float) for i in range(1, 5)
+    )
+
+    # 1. Breadth
+    sign = np.sign(change)
+    total_turnover = float(turnover.sum())
+
+    # 2. Leaders (stable sort keeps symbol order on ties)
+    by_change = np.argsort(-change, kind='stable')
+
+    # 3. Sector aggregates: bincount over a sector code per symbol
+    index = symbol_index.get_index()
+    sector_keys = {}
+    codes = np.empty(len(symbols), dtype=int)
+    for i, sym in enumerate(symbols):
+        pos = index.by_symbol.get(sym.upper())
+        entry = index.entries[pos] if pos is not None else None
+        key = (entry['sector_id'], entry['sector_name']) if entry else (None, 'Others')
+        codes[i] = sector_keys.setdefault(key, len(sector_keys))
+
+    n = len(sector_keys)
+    count = np.bincount(codes, minlength=n)
+    adv = np.bincount(codes, weights=sign > 0, minlength=n)
+    dec = np.bincount(codes, weights=sign < 0, minlength=n)
+    sec_turnover = np.bincount(codes, weights=turnover, minlength=n)
+    sec_volume = np.bincount(codes, weights=volume, minlength=n)
+    sec_return = np.bincount(codes, weights=change, minlength=n) / count
+
+    sectors = []
+    for (sector_id, name), c in sector_keys.items():
+        sectors.append({
+            'sector_id': sector_id,
+            'name': name,
+            'count': int(count[c]),
+            'advances': int(adv[c]),
+            'declines': int(dec[c]),
+            'unchanged': int(count[c] - adv[c] - dec[c]),
+            'turnover': float(sec_turnover[c]),
+            'turnover_share': round(float(sec_turnover[c]) / total_turnover * 100, 2) if total_turnover else 0.0,
+            'volume': float(sec_volume[c]),
+            'return_pct': round(float(sec_return[c]), 2),
+        })
+    sectors.sort(key=lambda s: -s['turnover'])
+
+    leaders = lambda order: _leaders(order, symbols, ltp, change, volume, turnover)
+    return {
+        'advances': int((sign > 0).sum()),
+        'declines': int((sign < 0).sum()),
+        'unchanged': int((sign == 0).sum()),
+        'total': len(symbols),
+        'total_turnover': total_turnover,
+        'total_volume': float(volume.sum()),
+        'top_gainers': leaders(by_change),
+        'top_losers': leaders(by_change[::-1]),
+        'top_turnover': [r for r in leaders(np.argsort(-turnover, kind='stable')) if r['turnover'] > 0],
+        'volume_leaders': [r for r in leaders(np.argsort(-volume, kind='stable')) if r['volume'] > 0],
+        'sectors': sectors,
+    }
+
+
+def record_breadth(timestamp=None):
+    """Compute and store breadth for a tick (latest by default). Call once per ingestion cycle."""
+    if timestamp is None:
+        timestamp = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
+    if not timestamp:
+        return None
+    values = compute_breadth(timestamp)
+    if values is None:
+        return None
+    breadth, _ = MarketBreadth.objects.update_or_create(timestamp=timestamp, defaults=values)
+    return breadth
+
+
+def get_breadth(timestamp):
+    """Stored breadth for a tick; computed on first read (e.g. playback of old days)."""
+    if not timestamp:
+        return None
+    breadth = MarketBreadth.objects.filter(timestamp=timestamp).first()
+    if breadth is None:
+        breadth = record_breadth(timestamp)
+    return breadth
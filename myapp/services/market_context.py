@@ -0,0 +1,58 @@
+"""
+Shared Market Context
+Resolves playback state, reference tick and session status ONCE per request so
+batch endpoints (ticker bar, dashboard bundle) don't repeat it per section.
+"""
+from django.db.models import Max
+from myapp.models import NEPSEPrice
+from myapp.services.playback_engine import get_playback_state
+from myapp.services.market_session import get_market_status
+
+
+def get_market_context(state=None):
+    """
+    Returns:
+        is_playback  - replaying a historical day (scraper off)
+        ref_time     - tick the UI should show (playback minute or latest scrape)
+        latest_time  - newest scraped timestamp, regardless of playback
+        session      - get_market_status() dict
+    """
+    if state is None:
+        state = get_playback_state()
+    latest_time = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
+    if state['is_playback'] and state['timestamp']:
+        ref_time = state['timestamp']
+    else:
+        ref_time = latest_time
+
+    return {
+        'is_playback': state['is_playback'],
+        'ref_time': ref_time,
+        'latest_time': latest_time,
+        'session': get_market_status(),
+    }
+
+
+def parse_field_selection(params, sections):
+    """
+    Per-section field selection from ?fields.<section>=a,b,c
+    Returns {section: set(fields)} for the sections that asked for it.
+    """
+    selection = {}
+    for section in sections:
+        raw = params.get(f'fields.{section}', '')
+        fields = {f.strip() for f in raw.split(',') if f.strip()}
+        if fields:
+            selection[section] = fields
+    return selection
+
+
+def select_fields(data, fields):
+    """Project a dict or a list of dicts down to `fields` (no-op if fields is empty)."""
+    if not fields:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, fields) for item in data]
+    if isinstance(data, dict):
+        return {k: v for k, v in data.items() if k in fields}
+    return data
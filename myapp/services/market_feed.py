@@ -0,0 +1,181 @@
+"""
+Market Feed Publisher
+Turns ingested ticks and order changes into push messages (see services/pubsub.py).
+Only changed quotes are published; the last full snapshot is retained in cache
+so a freshly connected client can render before the first diff arrives.
+"""
+import logging
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from myapp.models import NEPSEPrice, NEPSEIndex, MarketIndex, MarketSummary
+from myapp.services import order_depth
+from myapp.services.pubsub import (
+    publish, quote_topic, orders_topic, TOPIC_MARKET, TOPIC_INDEX
+)
+
+logger = logging.getLogger(__name__)
+
+MARKET_SNAPSHOT_KEY = 'push_snapshot_market'
+INDEX_SNAPSHOT_KEY = 'push_snapshot_index'
+SNAPSHOT_TTL = 60 * 60 * 24
+# A snapshot built on a cold cache instead of by publish_tick lives one tick at most
+FALLBACK_SNAPSHOT_TTL = 60
+
+QUOTE_FIELDS = ('symbol', 'ltp', 'change_pct', 'open', 'high', 'low', 'volume', 'turnover')
+
+# Same name pairs api_sector_indices resolves (scraper vs DB naming)
+INDEX_BAR_TARGETS = [
+    {'search': ['Sensitive Index', 'Sensitive'], 'display': 'SENSITIVE'},
+    {'search': ['Float Index', 'Float'], 'display': 'FLOAT'},
+]
+
+
+def build_market_snapshot(timestamp):
+    """{symbol: quote_dict} for every symbol in the tick at `timestamp`."""
+    rows = NEPSEPrice.objects.filter(timestamp=timestamp).values(*QUOTE_FIELDS)
+    return {r['symbol']: r for r in rows}
+
+
+def diff_snapshot(previous, current):
+    """Quotes that are new or changed since `previous` (both {symbol: quote})."""
+    return [row for sym, row in sorted(current.items()) if previous.get(sym) != row]
+
+
+def build_index_bar(ref_time):
+    """NEPSE index, SENSITIVE/FLOAT and turnover summary as of `ref_time`."""
+    data = {'nepse': None, 'indices': [], 'summary': None}
+
+    idx = NEPSEIndex.objects.filter(timestamp__lte=ref_time).order_by('-timestamp').first()
+    if idx:
+        data['nepse'] = {
+            'value': idx.index_value,
+            'change_pct': idx.percentage_change,
+            'timestamp': idx.timestamp.isoformat(),
+        }
+
+    for target in INDEX_BAR_TARGETS:
+        curr = MarketIndex.objects.filter(
+            index_name__in=target['search'], timestamp__lte=ref_time
+        ).order_by('-timestamp').first()
+        if not curr:
+            continue
+        val = float(curr.value)
+        pct = float(curr.change_pct or 0.0)
+        if pct == 0.0:
+            prev = MarketIndex.objects.filter(
+                index_name__in=target['search'],
+                timestamp__date__lt=curr.timestamp.date()
+            ).order_by('-timestamp').first()
+            if prev and float(prev.value) > 0:
+                pct = ((val - float(prev.value)) / float(prev.value)) * 100
+        data['indices'].append({'name': target['display'], 'value': val, 'change_pct': round(pct, 2)})
+
+    summary = MarketSummary.objects.filter(timestamp__lte=ref_time).order_by('-timestamp').first()
+    if summary:
+        data['summary'] = {
+            'total_turnover': float(summary.total_turnover or 0),
+            'total_traded_shares': float(summary.total_traded_shares or 0),
+            'timestamp': summary.timestamp.isoformat(),
+        }
+    return data
+
+
+def publish_tick(timestamp=None):
+    """
+    Publish one tick: a diff on 'market', one message per changed 'quote:<SYM>',
+    and the full index bar on 'index'. Call once after each ingestion cycle.
+    Returns the number of changed quotes.
+    """
+    if timestamp is None:
+        timestamp = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
+    if not timestamp:
+        return 0
+
+    snapshot = build_market_snapshot(timestamp)
+    previous = cache.get(MARKET_SNAPSHOT_KEY) or {}
+    changed = diff_snapshot(previous.get('quotes', {}), snapshot)
+    ts_iso = timestamp.isoformat()
+
+    cache.set(MARKET_SNAPSHOT_KEY, {'timestamp': ts_iso, 'quotes': snapshot}, SNAPSHOT_TTL)
+
+    if changed:
+        publish(TOPIC_MARKET, {'type': 'diff', 'timestamp': ts_iso, 'quotes': changed})
+        for row in changed:
+            publish(quote_topic(row['symbol']), {'timestamp': ts_iso, **row})
+
+    index_bar = build_index_bar(timestamp)
+    cache.set(INDEX_SNAPSHOT_KEY, index_bar, SNAPSHOT_TTL)
+    publish(TOPIC_INDEX, index_bar)
+
+    logger.info(f"Published tick {ts_iso}: {len(changed)} changed quotes")
+    return len(changed)
+
+
+def _latest_snapshot():
+    """
+    The retained market snapshot. On a cold cache the latest tick is loaded
+    and retained for one tick, so lookups stay off the DB without outliving
+    a publisher that has stopped.
+    """
+    snap = cache.get(MARKET_SNAPSHOT_KEY)
+    if snap:
+        return snap
+    timestamp = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
+    if not timestamp:
+        return None
+    snap = {'timestamp': timestamp.isoformat(), 'quotes': build_market_snapshot(timestamp)}
+    cache.add(MARKET_SNAPSHOT_KEY, snap, FALLBACK_SNAPSHOT_TTL)
+    return snap
+
+
+def latest_quotes():
+    """{symbol: quote} from the retained snapshot (see _latest_snapshot)."""
+    snap = _latest_snapshot()
+    return snap['quotes'] if snap else {}
+
+
+def latest_quote(symbol):
+    """One symbol's quote with the snapshot 'timestamp' it was taken at, or None."""
+    snap = _latest_snapshot()
+    row = snap['quotes'].get(symbol.upper()) if snap else None
+    return {'timestamp': snap['timestamp'], **row} if row else None
+
+
+def retained_snapshot(topic):
+    """Last full payload for a topic, sent to clients on connect (None if unknown)."""
+    if topic == TOPIC_MARKET:
+        snap = cache.get(MARKET_SNAPSHOT_KEY)
+        if snap:
+            return {'type': 'snapshot', 'timestamp': snap['timestamp'], 'quotes': list(snap['quotes'].values())}
+        return None
+    if topic == TOPIC_INDEX:
+        return cache.get(INDEX_SNAPSHOT_KEY)
+    if topic.startswith('quote:'):
+        snap = cache.get(MARKET_SNAPSHOT_KEY)
+        row = snap['quotes'].get(topic.split(':', 1)[1]) if snap else None
+        if row:
+            return {'timestamp': snap['timestamp'], **row}
+    if topic.startswith('depth:'):
+        return cache.get(order_depth.depth_key(topic.split(':', 1)[1]))
+    return None
+
+
+def order_payload(order):
+    return {
+        'id': order.id,
+        'symbol': order.symbol,
+        'side': order.side,
+        'qty': order.qty,
+        'filled_qty': order.filled_qty,
+        'remaining_qty': order.qty - order.filled_qty,
+        'price': float(order.price),
+        'status': order.status,
+        'updated_at': timezone.now().isoformat(),
+    }
+
+
+def publish_order_update(order):
+    """Push the current state of `order` to its owner's 'orders:<user_id>' topic."""
+    return publish(orders_topic(order.user_id), order_payload(order))
@@ -12,6 +12,7 @@ from myapp.models import MarketSession
 NEPAL_TZ = pytz.timezone('Asia/Kathmandu')
 
 # Market hours (Nepal time)
+PRE_OPEN_START = time(10, 30)   # 10:30 AM - call auction order entry
 CONTINUOUS_START = time(11, 0)  # 11:00 AM
 CONTINUOUS_END = time(15, 0)    # 3:00 PM
 
@@ -56,29 +57,49 @@ def update_session_status(session, nepal_now=None):
     # --- THE NEW SCHEDULE (Monday to Friday, 11 AM - 3 PM) ---
     is_trading_day = current_day in [0, 1, 2, 3, 4] # Mon(0) through Fri(4)
     is_trading_hours = CONTINUOUS_START <= current_time < CONTINUOUS_END
+    is_pre_open = PRE_OPEN_START <= current_time < CONTINUOUS_START
     
     if is_trading_day and is_trading_hours:
         if session.status != 'CONTINUOUS':
+            was_pre_open = session.status == 'PRE_OPEN'
             session.status = 'CONTINUOUS'
             session.is_active = True
             if not session.opened_at:
                 session.opened_at = nepal_now
             session.save()
+            if was_pre_open:
+                # Uncross the pre-open auction on every shard before continuous orders arrive
+                from myapp.services import call_auction
+                call_auction.schedule_uncross()
+    elif is_trading_day and is_pre_open:
+        if session.status != 'PRE_OPEN':
+            session.status = 'PRE_OPEN'
+            session.is_active = True
+            session.save()
     else:
         if session.status != 'CLOSED':
             session.status = 'CLOSED'
             session.is_active = False
-            if session.opened_at and not session.closed_at:
+            just_closed = bool(session.opened_at and not session.closed_at)
+            if just_closed:
                 session.closed_at = nepal_now
             session.save()
+            if just_closed:
+                # The day is final now: pre-warm its historical responses
+                # and roll it into the per-symbol stats; expire the day's open
+                # orders (which then snapshots the order journal)
+                from myapp.tasks import warm_history_cache, update_symbol_stats, expire_day_orders
+                warm_history_cache.delay(session.session_date.isoformat())
+                update_symbol_stats.delay(session.session_date.isoformat())
+                expire_day_orders.delay()
     
     return session
 
 
 def is_market_open():
-    """Check if market is currently open for trading"""
+    """Check if market is currently open for trading (orders are accepted in pre-open too)"""
     session = get_current_session()
-    return session.is_active and session.status == 'CONTINUOUS'
+    return session.is_active and session.status in ('CONTINUOUS', 'PRE_OPEN')
 
 
 def get_market_status():
@@ -0,0 +1,167 @@
+"""
+Matching Engine Benchmark
+Drives validate_order -> fund reservation -> match_order (which settles the
+fills) and cancels with synthetic flow from order_flow.OrderFlowGenerator.
+It runs against whatever database is configured and reports throughput,
+latency percentiles and queries per operation as a JSON-serialisable dict.
+Everything runs in one transaction that is rolled back at the end unless
+keep=True, so it is safe to point at a development database.
+"""
+import logging
+import platform
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from myapp.models import CustomUser, NEPSEPrice, Order, Portfolio, TradeExecution
+from myapp.services import matching_service, order_book, order_validation
+from myapp.services.matching_engine import MatchingEngine
+from myapp.services.order_flow import OrderFlowGenerator
+
+logger = logging.getLogger(__name__)
+
+TRADER_BALANCE = Decimal('50000000')
+TRADER_SHARES = 100000
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def _count_queries():
+    counter = {'n': 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter['n'] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def _setup(n_symbols, n_traders, seed):
+    rng = np.random.default_rng(seed)
+    ref_prices = {
+        f'BENCH{i}': Decimal(str(round(float(rng.uniform(100, 1000)), 1)))
+        for i in range(n_symbols)
+    }
+    now = timezone.now()
+    prices = []
+    for symbol, ref in ref_prices.items():
+        # Yesterday's close is the circuit reference; today's tick keeps the engine "live"
+        prices.append(NEPSEPrice(symbol=symbol, timestamp=now - timedelta(days=1), ltp=float(ref), close=float(ref)))
+        prices.append(NEPSEPrice(symbol=symbol, timestamp=now, ltp=float(ref), open=float(ref), change_pct=0))
+    NEPSEPrice.objects.bulk_create(prices)
+
+    traders = [
+        CustomUser.objects.create_user(
+            username=f'bench_trader_{i}', email=f'bench_trader_{i}@bench.local',
+            password=None, virtual_balance=TRADER_BALANCE
+        )
+        for i in range(n_traders)
+    ]
+    Portfolio.objects.bulk_create([
+        Portfolio(user=t, symbol=symbol, quantity=TRADER_SHARES, avg_price=ref)
+        for t in traders for symbol, ref in ref_prices.items()
+    ])
+    return ref_prices, traders
+
+
+def _place(trader, event):
+    """The same steps api_place_order performs, minus HTTP and the shard hop."""
+    order = Order(user=trader, symbol=event.symbol, side=event.side, qty=event.qty, price=event.price, status='OPEN')
+    if order_validation.get_context().check_price(order.symbol, order.price):
+        return None, []
+    with transaction.atomic():
+        if order_validation.reserve(order):
+            return None, []
+        order.save()
+    return order, MatchingEngine.match_order(order)
+
+
+def _percentiles(samples):
+    if not samples:
+        return {}
+    ms = np.array(samples) * 1000
+    return {
+        'p50': round(float(np.percentile(ms, 50)), 3),
+        'p90': round(float(np.percentile(ms, 90)), 3),
+        'p99': round(float(np.percentile(ms, 99)), 3),
+        'max': round(float(ms.max()), 3),
+    }
+
+
+def run_benchmark(orders=1000, seed=42, symbols=5, traders=50, rate=200.0,
+                  buy_ratio=0.5, cancel_rate=0.1, price_sigma=0.02, keep=False):
+    config = {
+        'orders': orders, 'seed': seed, 'symbols': symbols, 'traders': traders, 'rate': rate,
+        'buy_ratio': buy_ratio, 'cancel_rate': cancel_rate, 'price_sigma': price_sigma,
+    }
+    order_book.reset()
+    report = {}
+    try:
+        with transaction.atomic():
+            ref_prices, trader_rows = _setup(symbols, traders, seed)
+            flow = OrderFlowGenerator(ref_prices, seed=seed, rate=rate, buy_ratio=buy_ratio,
+                                      price_sigma=price_sigma, cancel_rate=cancel_rate)
+            # Build the validation context with every bench symbol's band so the first timed order doesn't pay for it
+            order_validation.invalidate()
+            order_validation.get_context().load_bands(ref_prices)
+
+            placed, latencies, queries = {}, {'place': [], 'cancel': []}, {'place': [], 'cancel': []}
+            rejected = fills = 0
+            started = time.perf_counter()
+            for event in flow.events(orders):
+                t0 = time.perf_counter()
+                with _count_queries() as counted:
+                    if event.kind == 'place':
+                        order, executions = _place(trader_rows[event.seq % len(trader_rows)], event)
+                        if order is None:
+                            rejected += 1
+                        else:
+                            placed[event.seq] = order.id
+                            fills += len(executions)
+                    elif event.seq in placed:
+                        matching_service.run_cancel(placed.pop(event.seq))
+                latencies[event.kind].append(time.perf_counter() - t0)
+                queries[event.kind].append(counted['n'])
+            elapsed = time.perf_counter() - started
+
+            ops = sum(len(v) for v in latencies.values())
+            report = {
+                'config': config,
+                'environment': {
+                    'db_vendor': connection.vendor,
+                    'python': platform.python_version(),
+                    'timestamp': timezone.now().isoformat(),
+                },
+                'totals': {
+                    'operations': ops,
+                    'placed': len(latencies['place']) - rejected,
+                    'rejected': rejected,
+                    'cancels': len(latencies['cancel']),
+                    'fills': fills,
+                    'executions': TradeExecution.objects.filter(symbol__in=ref_prices).count(),
+                    'elapsed_s': round(elapsed, 4),
+                },
+                'throughput_ops': round(ops / elapsed, 1) if elapsed else None,
+                'latency_ms': {kind: _percentiles(v) for kind, v in latencies.items()},
+                'queries_per_op': {
+                    kind: round(float(np.mean(v)), 2) if v else None for kind, v in queries.items()
+                },
+            }
+            if not keep:
+                raise _Rollback()
+    except _Rollback:
+        pass
+    finally:
+        # Books may hold orders that were just rolled back, the context bands of rolled-back symbols
+        order_book.reset()
+        order_validation.invalidate()
+    return report
@@ -259,126 +259,93 @@ from django.db import transaction
 from django.db.models import F
 from decimal import Decimal
 from myapp.models import Order, Portfolio, TradeExecution, CustomUser, Stock, MarketSession, NEPSEPrice
+from myapp.services import order_book, order_depth, order_journal, settlement
+from myapp.services.order_book import StaleBook, RestingOrder
+
+# Attempts before giving up when other processes keep changing the book
+MATCH_RETRIES = 3
 
 class MatchingEngine:
     @staticmethod
-    @transaction.atomic
     def match_order(order):
-        """Looks for a counter-party. If found, executes trade. If not, stays OPEN."""
-        executions = []
-        counter_side = 'SELL' if order.side == 'BUY' else 'BUY'
-        
-        # Look for orders at the EXACT same price (Price-Time Priority)
-        candidates = Order.objects.filter(
-            symbol=order.symbol,
-            side=counter_side,
-            status__in=['OPEN', 'PARTIAL'],
-            price=order.price 
-        ).order_by('created_at').select_for_update()
-
-        for match in candidates:
-            if order.filled_qty >= order.qty: break
-            
-            exec_qty = min(order.qty - order.filled_qty, match.qty - match.filled_qty)
-            
-            # This is the ONLY place where stock/cash moves
-            execution = MatchingEngine.execute_trade(
-                buy_order=order if order.side == 'BUY' else match,
-                sell_order=match if order.side == 'BUY' else order,
-                qty=exec_qty,
-                price=order.price
-            )
-            executions.append(execution)
-        return executions
+        """
+        Crosses a saved order against the in-memory book (best price first, FIFO
+        within a price). Fills are written in one transaction, then applied to
+        the book; whatever is left rests in the book, and the depth is published
+        if it changed. Returns the executions.
+        """
+        book = order_book.get_book(order.symbol)
+        with book.lock:
+            for attempt in range(MATCH_RETRIES):
+                book.sync(exclude_id=order.id)
+                fills = book.plan(order.side, order.price, order.qty - order.filled_qty)
+                try:
+                    executions = MatchingEngine.persist_fills(order, fills)
+                except StaleBook:
+                    book.loaded = False
+                    order.refresh_from_db()
+                    if order.status not in order_book.OPEN_STATUSES:
+                        return []   # cancelled or filled elsewhere meanwhile
+                    continue
+                book.apply(fills)
+                book.add(RestingOrder.from_order(order))
+                order_depth.publish(book)
+                return executions
+        raise StaleBook(f"Order book for {order.symbol} kept changing; try again.")
 
     @staticmethod
-    def execute_trade(buy_order, sell_order, qty, price):
-        qty_dec = Decimal(str(qty))
-        trade_value = qty_dec * price
-
-        # 1. Update Order Statuses
-        for o in [buy_order, sell_order]:
-            o.filled_qty = F('filled_qty') + qty
-            o.save()
-            o.refresh_from_db()
-            o.status = 'FILLED' if o.filled_qty >= o.qty else 'PARTIAL'
-            o.save()
-
-        # 2. SELLER: Receives Cash
-        seller = CustomUser.objects.select_for_update().get(id=sell_order.user_id)
-        seller.virtual_balance = F('virtual_balance') + trade_value
-        seller.save()
+    @transaction.atomic
+    def persist_fills(order, fills):
+        """
+        Write one match batch and its journal events. Raises StaleBook if the
+        taker or a resting order changed underneath the book.
+        """
+        # 1. Lock the taker and exactly the resting orders we plan to trade with, and check them
+        locked = Order.objects.select_for_update().select_related('user').in_bulk([order.id] + [e.id for e, _, _ in fills])
+        taker = locked.get(order.id)
+        if taker is None or taker.status not in order_book.OPEN_STATUSES or taker.filled_qty != order.filled_qty:
+            raise StaleBook(f"Order {order.id} changed")
+        for entry, qty, _ in fills:
+            maker = locked.get(entry.id)
+            if maker is None or maker.status not in order_book.OPEN_STATUSES or maker.filled_qty != entry.filled_qty:
+                raise StaleBook(f"Order {entry.id} changed")
+        trades = [
+            (order, locked[entry.id], qty, price) if order.side == 'BUY' else (locked[entry.id], order, qty, price)
+            for entry, qty, price in fills
+        ]
 
-        # 3. BUYER: Receives Stock (and update Avg Price)
-        buyer_portfolio, _ = Portfolio.objects.get_or_create(
-            user_id=buy_order.user_id, symbol=buy_order.symbol,
-            defaults={'quantity': 0, 'avg_price': 0}
-        )
-        old_val = Decimal(str(buyer_portfolio.quantity)) * buyer_portfolio.avg_price
-        new_qty = buyer_portfolio.quantity + qty
-        buyer_portfolio.avg_price = (old_val + trade_value) / Decimal(str(new_qty))
-        buyer_portfolio.quantity = new_qty
-        buyer_portfolio.save()
+        # 2. Journal the placement as it was before any fills
+        placed_event = order_journal.placed(order)
 
-        # 4. SELLER: Loses Stock
-        s_port = Portfolio.objects.get(user_id=sell_order.user_id, symbol=sell_order.symbol)
-        s_port.quantity -= qty
-        s_port.delete() if s_port.quantity <= 0 else s_port.save()
+        # 3. Settle every fill at the resting order's price, set-based
+        executions = settlement.settle(trades)
+        order_journal.record([placed_event] + [order_journal.matched(e) for e in executions]
+                             + ([order_journal.settled(order.symbol, trades)] if trades else []))
+        return executions
 
-        return TradeExecution.objects.create(
-            buy_order=buy_order, sell_order=sell_order,
-            symbol=buy_order.symbol, executed_qty=qty, executed_price=price
-        )
+    @staticmethod
+    @transaction.atomic
+    def execute_trade(buy_order, sell_order, qty, price):
+        """Settle and journal a single fill."""
+        trades = [(buy_order, sell_order, qty, price)]
+        executions = settlement.settle(trades)
+        order_journal.record([order_journal.matched(e) for e in executions]
+                             + [order_journal.settled(buy_order.symbol, trades)])
+        return executions[0]
 
     @staticmethod
     def validate_order(order):
-        """Checks balance and ±10% circuit limits."""
-        from myapp.models import MarketSession, NEPSEPrice, Stock, Portfolio
-        from myapp.services.playback_engine import get_playback_state
+        """Checks session, ±10% circuit limits and balance/holdings (reserves nothing; see order_validation.reserve)."""
+        from myapp.models import Portfolio
+        from myapp.services import order_validation
         from decimal import Decimal
 
-        # 1. Market Session Check (Allows Playback Mode)
-        state = get_playback_state()
-        active = MarketSession.objects.filter(is_active=True, status='CONTINUOUS').exists()
-        
-        if not active and not state['is_playback']: 
-            return False, "Market is currently CLOSED."
+        # 1. Session and circuit limits from the per-tick context (no queries once warm)
+        error = order_validation.get_context().check_price(order.symbol, order.price)
+        if error:
+            return False, error
 
-        # 2. Reference Price Logic
-        try:
-            # Use playback timestamp if available, else standard fallback
-            if state['is_playback']:
-                latest = NEPSEPrice.objects.filter(symbol=order.symbol, timestamp__lte=state['timestamp']).order_by('-timestamp').first()
-            else:
-                latest = NEPSEPrice.objects.filter(symbol=order.symbol).order_by('-timestamp').first()
-                
-            prev = None
-            if latest:
-                prev = NEPSEPrice.objects.filter(symbol=order.symbol, timestamp__date__lt=latest.timestamp.date()).order_by('-timestamp').first()
-            
-            # Mathematical Fallback for ref_price
-            if prev and prev.close:
-                ref_price = Decimal(str(prev.close))
-            elif latest and latest.ltp:
-                change_factor = 1 + (float(latest.change_pct or 0) / 100)
-                ref_price = Decimal(str(float(latest.ltp) / change_factor))
-            else:
-                stock_obj = Stock.objects.get(symbol=order.symbol)
-                ref_price = Decimal(str(stock_obj.last_price or 0))
-
-            if ref_price <= 0:
-                return False, "Circuit limits unavailable for this stock yet."
-
-            up = (ref_price * Decimal('1.10')).quantize(Decimal('0.01'))
-            low = (ref_price * Decimal('0.90')).quantize(Decimal('0.01'))
-
-            if order.price > up or order.price < low:
-                return False, f"Price outside circuit (Rs {low} - Rs {up})"
-
-        except Exception as e:
-            return False, f"Validation error: {str(e)}"
-
-        # 3. Balance/Holdings Check
+        # 2. Balance/Holdings Check
         if order.side == 'BUY':
             if order.user.virtual_balance < (Decimal(str(order.qty)) * order.price):
                 return False, "Insufficient balance."
@@ -387,4 +354,52 @@ class MatchingEngine:
             if not p or p.quantity < order.qty: 
                 return False, "You do not have enough shares to sell."
         
-        return True, None
\ No newline at end of file
+        return True, None
+
+    @staticmethod
+    def circuit_bands(symbols, as_of=None):
+        """
+        {symbol: (low, up)} ±10% circuit limits for many symbols with a fixed
+        number of queries. The reference is the previous day's close, else the
+        latest LTP backed out of its change %, else Stock.last_price.
+        Symbols without a usable reference price are left out.
+        """
+        from django.db.models import Max, Q
+
+        symbols = set(symbols)
+        ticks = NEPSEPrice.objects.filter(symbol__in=symbols)
+        if as_of is not None:
+            ticks = ticks.filter(timestamp__lte=as_of)
+
+        def rows_at(latest_ts):
+            if not latest_ts:
+                return {}
+            match = Q()
+            for symbol, ts in latest_ts.items():
+                match |= Q(symbol=symbol, timestamp=ts)
+            return {r['symbol']: r for r in NEPSEPrice.objects.filter(match).values('symbol', 'timestamp', 'ltp', 'close', 'change_pct')}
+
+        # 1. Latest tick per symbol, then the last tick of an earlier day (the previous close)
+        latest = rows_at(dict(ticks.values('symbol').annotate(ts=Max('timestamp')).values_list('symbol', 'ts')))
+        earlier = Q()
+        for symbol, row in latest.items():
+            earlier |= Q(symbol=symbol, timestamp__date__lt=row['timestamp'].date())
+        prev = rows_at(dict(
+            NEPSEPrice.objects.filter(earlier).values('symbol').annotate(ts=Max('timestamp')).values_list('symbol', 'ts')
+        )) if latest else {}
+        stock_prices = dict(Stock.objects.filter(symbol__in=symbols - {s for s in prev if prev[s]['close']}).values_list('symbol', 'last_price'))
+
+        # 2. Reference price fallbacks
+        bands = {}
+        for symbol in symbols:
+            p, l = prev.get(symbol), latest.get(symbol)
+            if p and p['close']:
+                ref_price = Decimal(str(p['close']))
+            elif l and l['ltp']:
+                ref_price = Decimal(str(l['ltp'] / (1 + (l['change_pct'] or 0) / 100)))
+            else:
+                ref_price = Decimal(str(stock_prices.get(symbol) or 0))
+            if ref_price > 0:
+                bands[symbol] = ((ref_price * Decimal('0.90')).quantize(Decimal('0.01')),
+                                 (ref_price * Decimal('1.10')).quantize(Decimal('0.01')))
+        return bands
@@ -0,0 +1,177 @@
+"""
+Sharded Matching Service
+Symbols are hashed onto MATCHING_SHARDS Celery queues ('matching.<n>'). Each
+queue is consumed by exactly one single-threaded worker (see the
+run_matching_workers command), so one process owns a symbol's order book and
+applies matches and cancels to it in order. No two writers ever contend for
+the same book rows.
+The web tier reserves funds, saves the order, enqueues it on its shard and
+waits for the reply (the task result) up to MATCHING_REPLY_TIMEOUT seconds.
+During PRE_OPEN the shard only journals orders; call_auction uncrosses them.
+"""
+import logging
+import time
+import zlib
+from decimal import Decimal
+
+from celery.exceptions import TimeoutError as ReplyTimeout
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from myapp.models import Order, TradeExecution, CustomUser
+from myapp.services import (
+    call_auction, liquidity_sim, order_book, order_depth, order_journal, order_validation, settlement
+)
+from myapp.services.matching_engine import MatchingEngine
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(symbol):
+    """Stable shard number for a symbol (same on every process)."""
+    return zlib.crc32(symbol.upper().encode()) % settings.MATCHING_SHARDS
+
+
+def queue_for(symbol):
+    return f'matching.{shard_for(symbol)}'
+
+
+# --- Web tier: enqueue and await ---
+
+def _dispatch(task, symbol, *args):
+    result = task.apply_async(args=args, queue=queue_for(symbol))
+    try:
+        return result.get(timeout=settings.MATCHING_REPLY_TIMEOUT)
+    except ReplyTimeout:
+        logger.warning(f"Matching shard {queue_for(symbol)} did not reply in time for {task.name}{args}")
+        return None
+
+
+def submit_order(order, playback_timestamp=None):
+    """
+    Hand a saved order to its shard. Returns the executions (maker/taker orders
+    and users preloaded), or None if the shard has not replied yet.
+    """
+    from myapp.tasks import match_order_task
+
+    reply = _dispatch(match_order_task, order.symbol, order.id,
+                      playback_timestamp.isoformat() if playback_timestamp else None)
+    if reply is None:
+        return None
+    order.refresh_from_db()
+    return list(
+        TradeExecution.objects.filter(id__in=reply['execution_ids'])
+        .select_related('buy_order__user', 'sell_order__user')
+        .order_by('id')
+    )
+
+
+def submit_batch(orders, playback_timestamp=None):
+    """Enqueue saved orders: one task per shard, matched in order. Returns the task results."""
+    from myapp.tasks import match_orders_task
+
+    by_queue = {}
+    for order in orders:
+        by_queue.setdefault(queue_for(order.symbol), []).append(order.id)
+    ts = playback_timestamp.isoformat() if playback_timestamp else None
+    return [match_orders_task.apply_async(args=(order_ids, ts), queue=queue) for queue, order_ids in by_queue.items()]
+
+
+def await_batch(results):
+    """
+    {order_id: run_match reply} for submit_batch results, waiting at most
+    MATCHING_REPLY_TIMEOUT in total; shards that have not replied are left out.
+    """
+    deadline = time.monotonic() + settings.MATCHING_REPLY_TIMEOUT
+    replies = {}
+    for result in results:
+        try:
+            for reply in result.get(timeout=max(deadline - time.monotonic(), 0.01)):
+                replies[reply['order_id']] = reply
+        except ReplyTimeout:
+            logger.warning(f"Matching shard did not reply in time for batch {result.id}")
+    return replies
+
+
+def submit_cancel(order):
+    """Cancel through the owning shard. Returns (success, message)."""
+    from myapp.tasks import cancel_order_task
+
+    reply = _dispatch(cancel_order_task, order.symbol, order.id)
+    if reply is None:
+        return False, 'Cancel is still being processed. Please refresh shortly.'
+    return reply['success'], reply['message']
+
+
+def submit_depth_refresh(symbols):
+    """Ask the owning shards to republish the depth of symbols whose orders changed elsewhere (no reply)."""
+    from myapp.tasks import refresh_depth_task
+
+    by_queue = {}
+    for symbol in symbols:
+        by_queue.setdefault(queue_for(symbol), set()).add(symbol.upper())
+    for queue, batch in by_queue.items():
+        refresh_depth_task.apply_async(args=(sorted(batch),), queue=queue)
+
+
+# --- Shard worker: the single writer for its symbols ---
+
+def run_match(order_id, playback_timestamp=None):
+    order = Order.objects.select_related('user').get(id=order_id)
+    executions = []
+    if order.status in order_book.OPEN_STATUSES and not playback_timestamp and call_auction.collecting():
+        # Pre-open: the order waits for the auction uncross
+        order_journal.record([order_journal.placed(order)])
+    elif order.status in order_book.OPEN_STATUSES:
+        if not playback_timestamp and call_auction.ensure_uncrossed(order):
+            order.refresh_from_db()   # a pre-open order may have been filled by the auction
+        if order.status in order_book.OPEN_STATUSES:
+            executions = _match_covered(order)
+        if playback_timestamp and order.remaining_qty > 0:
+            # Playback demo liquidity: the rest fills against the replayed tick
+            executions += liquidity_sim.fill([order], playback_timestamp)
+    return {
+        'order_id': order.id,
+        'status': order.status,
+        'filled_qty': order.filled_qty,
+        'execution_ids': [e.id for e in executions],
+    }
+
+
+def _match_covered(order):
+    """Match an order, cancelling any SELL in the way whose seller no longer holds the shares."""
+    while True:
+        try:
+            return MatchingEngine.match_order(order)
+        except settlement.InsufficientHoldings as e:
+            logger.warning(str(e))
+            for order_id in e.order_ids:
+                run_cancel(order_id)
+            if order.id in e.order_ids:
+                order.refresh_from_db()
+                return []
+
+
+def run_match_batch(order_ids, playback_timestamp=None):
+    return [run_match(order_id, playback_timestamp) for order_id in order_ids]
+
+
+def run_cancel(order_id):
+    """Cancel an open order: refund the reserved funds of a BUY, release the shares of a SELL."""
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(id=order_id)
+        if order.status not in order_book.OPEN_STATUSES:
+            return {'success': False, 'message': 'Order already filled or cancelled.'}
+        refund = Decimal('0')
+        if order.side == 'BUY':
+            refund = Decimal(str(order.remaining_qty)) * order.price
+            CustomUser.objects.filter(id=order.user_id).update(virtual_balance=F('virtual_balance') + refund)
+        else:
+            order_validation.adjust_reserved_shares({(order.user_id, order.symbol): -order.remaining_qty})
+        order.status = 'CANCELLED'
+        order.save()
+        order_journal.record([order_journal.cancelled(order, refund)])
+    order_book.discard(order)
+    order_depth.refresh(order.symbol)
+    return {'success': True, 'message': 'Order successfully cancelled.'}
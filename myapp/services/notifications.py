@@ -0,0 +1,128 @@
+"""
+Notification Inbox
+Every Notification row belongs to one user: global notices are fanned out
+to every user with chunked bulk_create, so reading an inbox is one index
+range scan on (user, -created_at) and each user's is_read is their own.
+Unread counts live in UnreadCounter and are bumped set-based as rows are
+delivered; a user without a counter row is seeded from the table on first
+read (which already includes everything delivered so far), like
+platform_stats. Fill notices are built per match cycle in settlement and
+delivered after the matching transaction commits, in one bulk_create.
+Notices written, edited or deleted from the admin panel go through here
+too, so the counters stay right.
+"""
+import logging
+from collections import Counter
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from custom_admin.models import Notification, UnreadCounter
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CHUNK = 1000
+
+
+def _bump(user_counts):
+    """Add {user_id: n} to the unread counters that exist (missing ones are seeded on read)."""
+    if user_counts:
+        UnreadCounter.objects.filter(user_id__in=user_counts).update(unread=F('unread') + Case(
+            *[When(user_id=user_id, then=Value(n)) for user_id, n in user_counts.items()],
+            output_field=IntegerField(),
+        ))
+
+
+def deliver(notifications):
+    """Store unsaved Notification rows (each with a user) and bump their owners' counters."""
+    if not notifications:
+        return []
+    rows = Notification.objects.bulk_create(notifications)
+    _bump(Counter(n.user_id for n in rows if not n.is_read))
+    return rows
+
+
+def notify(user, type, title, message):
+    return deliver([Notification(user=user, type=type, title=title, message=message)])[0]
+
+
+def broadcast(type, title, message):
+    """One copy of a notice for every user. Returns the number delivered."""
+    from myapp.models import CustomUser
+
+    user_ids = list(CustomUser.objects.values_list('id', flat=True))
+    with transaction.atomic():
+        for i in range(0, len(user_ids), FANOUT_CHUNK):
+            Notification.objects.bulk_create([
+                Notification(user_id=user_id, type=type, title=title, message=message)
+                for user_id in user_ids[i:i + FANOUT_CHUNK]
+            ])
+        UnreadCounter.objects.update(unread=F('unread') + 1)
+    return len(user_ids)
+
+
+def remove(notification):
+    """Delete one notification, taking it off its owner's unread count."""
+    with transaction.atomic():
+        notification.delete()
+        if notification.user_id and not notification.is_read:
+            UnreadCounter.objects.filter(user_id=notification.user_id, unread__gt=0).update(unread=F('unread') - 1)
+
+
+def resync(user_ids):
+    """Drop the unread counters of `user_ids` after an arbitrary edit; they are reseeded on next read."""
+    UnreadCounter.objects.filter(user_id__in=[u for u in user_ids if u]).delete()
+
+
+def fill_notices(trades):
+    """Unsaved Notifications for settled trades [(buy_order, sell_order, qty, price)]: one per order filled."""
+    fills = {}
+    for buy_order, sell_order, qty, price in trades:
+        for o in (buy_order, sell_order):
+            if o is not None:
+                order, filled, value = fills.get(o.id, (o, 0, 0))
+                fills[o.id] = (order, filled + qty, value + qty * price)
+    return [
+        Notification(
+            user_id=order.user_id,
+            type='buy' if order.side == 'BUY' else 'sell',
+            title=f"{order.side.title()} Order Filled: {order.symbol}",
+            message=f"{filled} units of {order.symbol} {'bought' if order.side == 'BUY' else 'sold'} "
+                    f"at Rs.{value / filled:.2f} (order #{order.id}, {order.status.lower()}).",
+        )
+        for order, filled, value in fills.values()
+    ]
+
+
+def notify_fills_on_commit(trades):
+    """Deliver the fill notices of a match cycle once the matching transaction commits."""
+    notices = fill_notices(trades)
+    if notices:
+        transaction.on_commit(partial(_deliver_safely, notices))
+
+
+def _deliver_safely(notices):
+    try:
+        deliver(notices)
+    except Exception as e:
+        # The fills are committed; a lost notice must not fail the match
+        logger.error(f"Could not deliver {len(notices)} fill notifications: {e}")
+
+
+def unread_count(user):
+    """The user's unread count: one primary-key read (a count only the first time)."""
+    unread = UnreadCounter.objects.filter(user=user).values_list('unread', flat=True).first()
+    if unread is None:
+        unread = Notification.objects.filter(user=user, is_read=False).count()
+        UnreadCounter.objects.update_or_create(user=user, defaults={'unread': unread})
+    return unread
+
+
+def mark_read(user, notif_id):
+    """Mark one of the user's notifications read. Returns whether it was unread."""
+    with transaction.atomic():
+        changed = Notification.objects.filter(id=notif_id, user=user, is_read=False).update(is_read=True)
+        if changed:
+            UnreadCounter.objects.filter(user=user, unread__gt=0).update(unread=F('unread') - 1)
+    return bool(changed)
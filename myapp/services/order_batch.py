@@ -0,0 +1,207 @@
+"""
+Batch Order Instructions
+Validates a list of place/cancel instructions against ONE snapshot taken
+under the user's row lock: balance, holdings of the symbols involved and the
+circuit bands of every symbol (from the per-tick order_validation context,
+loaded together for the symbols it has not seen yet). Running totals
+carry over between items, so a cancel frees funds for a later place and two
+sells can't spend the same shares.
+Atomic batches apply all or nothing; otherwise every valid item applies and
+the others report why not. Everything is written in one transaction: new
+orders bulk-created with one balance update and one update of the reserved
+shares, cancels with one status update, one refund update and their
+journal events. The new orders then go to their
+matching shards as one task per shard.
+Cancels are applied here rather than on the shard; a shard that planned a
+fill against one re-checks it under lock in persist_fills and retries.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from myapp.models import CustomUser, Order, Portfolio
+from myapp.services import matching_service, order_book, order_journal, order_validation
+
+logger = logging.getLogger(__name__)
+
+
+class BatchError(Exception):
+    """The request as a whole is unusable (nothing was applied)."""
+
+
+def _parse_place(raw):
+    symbol = (raw.get('symbol') or '').strip().upper()
+    side = (raw.get('side') or '').strip().upper()
+    order_type = (raw.get('order_type') or 'LIMIT').strip().upper()
+    try:
+        qty = int(raw.get('qty', 0))
+        price = Decimal(str(raw.get('price', 0)))
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValueError('Invalid quantity or price format.')
+    if not symbol or side not in ['BUY', 'SELL'] or order_type not in ['LIMIT', 'MARKET'] or qty <= 0 or price <= 0:
+        raise ValueError('Invalid trade details provided.')
+    return {'op': 'place', 'symbol': symbol, 'side': side, 'order_type': order_type, 'qty': qty, 'price': price}
+
+
+def _parse(instructions):
+    """[(item or None, parse error or None)]"""
+    if not isinstance(instructions, list) or not instructions:
+        raise BatchError('instructions must be a non-empty list.')
+    if len(instructions) > settings.TRADE_BATCH_MAX:
+        raise BatchError(f'At most {settings.TRADE_BATCH_MAX} instructions per batch.')
+
+    parsed = []
+    for raw in instructions:
+        try:
+            op = (raw.get('op') or '').strip().lower()
+            if op == 'place':
+                parsed.append((_parse_place(raw), None))
+            elif op == 'cancel':
+                parsed.append(({'op': 'cancel', 'order_id': int(raw.get('order_id'))}, None))
+            else:
+                parsed.append((None, "op must be 'place' or 'cancel'."))
+        except (ValueError, TypeError, AttributeError) as e:
+            parsed.append((None, str(e) if isinstance(e, ValueError) and 'Invalid' in str(e) else 'Invalid instruction.'))
+    return parsed
+
+
+class _Snapshot:
+    """Balance, unreserved holdings and circuit bands for one batch, with running totals."""
+
+    def __init__(self, user, symbols, context):
+        self.context = context
+        self.balance = user.virtual_balance
+        self.holdings = {
+            symbol: quantity - reserved
+            for symbol, quantity, reserved in Portfolio.objects.select_for_update().filter(
+                user=user, symbol__in=symbols
+            ).values_list('symbol', 'quantity', 'reserved_qty')
+        }
+        self.shares = defaultdict(int)   # symbol -> net change of the reserved shares
+        context.load_bands(symbols)
+
+    def check_place(self, item):
+        error = self.context.check_price(item['symbol'], item['price'])
+        if error:
+            return error
+        if item['side'] == 'BUY':
+            if self.balance < Decimal(str(item['qty'])) * item['price']:
+                return 'Insufficient balance.'
+        elif self.holdings.get(item['symbol'], 0) < item['qty']:
+            return 'You do not have enough shares to sell.'
+        return None
+
+    def take_place(self, item):
+        if item['side'] == 'BUY':
+            self.balance -= Decimal(str(item['qty'])) * item['price']
+        else:
+            self.holdings[item['symbol']] -= item['qty']
+            self.shares[item['symbol']] += item['qty']
+
+    def release(self, order):
+        """A cancelled SELL's remaining shares are available to later items."""
+        if order.symbol in self.holdings:
+            self.holdings[order.symbol] += order.remaining_qty
+        self.shares[order.symbol] -= order.remaining_qty
+
+
+def execute(user, instructions, atomic=False):
+    """
+    Apply a batch for `user`. Returns (applied, results) where results has one
+    dict per instruction, in order. Raises BatchError for request-level problems.
+    """
+    from myapp.services.market_feed import publish_order_update
+
+    parsed = _parse(instructions)
+    context = order_validation.get_context()
+    if not context.market_open:
+        raise BatchError('Market is currently CLOSED.')
+    playback_ts = context.playback_timestamp
+    results = [{'index': i, 'op': item['op'] if item else None, 'success': False, 'message': error}
+               for i, (item, error) in enumerate(parsed)]
+
+    with transaction.atomic():
+        # 1. One snapshot under the user's row lock
+        user = CustomUser.objects.select_for_update().get(pk=user.pk)
+        items = [(i, item) for i, (item, _) in enumerate(parsed) if item]
+        snapshot = _Snapshot(user, {item['symbol'] for _, item in items if item['op'] == 'place'}, context)
+        cancellable = Order.objects.select_for_update().filter(
+            user=user, id__in=[item['order_id'] for _, item in items if item['op'] == 'cancel']
+        ).in_bulk()
+
+        # 2. Validate in order against running totals
+        to_place, to_cancel, refunds = [], {}, Decimal('0')
+        for i, item in items:
+            if item['op'] == 'place':
+                error = snapshot.check_place(item)
+                if error is None:
+                    snapshot.take_place(item)
+                    to_place.append((i, Order(
+                        user=user, symbol=item['symbol'], side=item['side'], order_type=item['order_type'],
+                        qty=item['qty'], price=item['price'], status='OPEN',
+                    )))
+            else:
+                order = cancellable.get(item['order_id'])
+                if order is None:
+                    error = 'Order not found.'
+                elif order.status not in order_book.OPEN_STATUSES or order.id in to_cancel:
+                    error = 'Order already filled or cancelled.'
+                else:
+                    error = None
+                    refund = Decimal(str(order.remaining_qty)) * order.price if order.side == 'BUY' else Decimal('0')
+                    to_cancel[order.id] = (i, order, refund)
+                    refunds += refund
+                    snapshot.balance += refund
+                    if order.side == 'SELL':
+                        snapshot.release(order)
+            results[i]['message'] = error
+            results[i]['success'] = error is None
+
+        failed = [r for r in results if not r['success']]
+        if atomic and failed:
+            for r in results:
+                if r['success']:
+                    r['success'], r['message'] = False, 'Not applied: another instruction in this atomic batch failed.'
+            return False, results
+
+        # 3. Apply everything set-based
+        Order.objects.bulk_create([order for _, order in to_place])
+        reserved = sum((Decimal(str(o.qty)) * o.price for _, o in to_place if o.side == 'BUY'), Decimal('0'))
+        if reserved != refunds:
+            CustomUser.objects.filter(id=user.id).update(virtual_balance=F('virtual_balance') - reserved + refunds)
+        order_validation.adjust_reserved_shares({(user.id, symbol): n for symbol, n in snapshot.shares.items()})
+        if to_cancel:
+            Order.objects.filter(id__in=to_cancel).update(status='CANCELLED', updated_at=timezone.now())
+            order_journal.record([order_journal.cancelled(order, refund) for _, order, refund in to_cancel.values()])
+
+    # 4. After commit: drop cancels from books, hand new orders to their shards
+    for i, order, _ in to_cancel.values():
+        order.status = 'CANCELLED'
+        order_book.discard(order)
+        publish_order_update(order)
+        results[i].update(order_id=order.id, message='Order successfully cancelled.')
+    if to_cancel:
+        symbols = {order.symbol for _, order, _ in to_cancel.values()}
+        transaction.on_commit(lambda: matching_service.submit_depth_refresh(symbols))
+
+    placed = [order for _, order in to_place]
+    replies = matching_service.await_batch(matching_service.submit_batch(placed, playback_ts)) if placed else {}
+    for i, order in to_place:
+        reply = replies.get(order.id)
+        results[i].update(
+            order_id=order.id,
+            status=reply['status'] if reply else order.status,
+            filled_qty=reply['filled_qty'] if reply else 0,
+            message='Order placed.' if reply else 'Order accepted. Matching is in progress.',
+        )
+        if reply:
+            order.status, order.filled_qty = reply['status'], reply['filled_qty']
+        publish_order_update(order)
+
+    logger.info(f"Batch for user {user.id}: {len(to_place)} placed, {len(to_cancel)} cancelled, {len(failed)} rejected")
+    return not failed, results
@@ -0,0 +1,227 @@
+"""
+In-Memory Limit Order Book
+One book per symbol: price levels kept sorted with bisect, each level a FIFO
+queue of resting orders, so the best bid/ask is O(1) and inserting a new
+level is O(log levels). Each side also keeps the remaining quantity per
+price level as a running total, so market depth is read without walking the
+queues. Matching walks the opposite side from the best price
+(price-time priority) and returns a plan; the MatchingEngine persists the
+plan in one transaction and only then applies it to the book.
+
+The database stays authoritative. Before matching, the book compares a cheap
+fingerprint of the symbol's open orders (count, max id, total filled) with its
+own and reloads on any difference. Changes made by other processes
+(placements, cancels, fills) are therefore picked up with one aggregate
+query instead of a locking scan.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from itertools import islice
+
+from django.db.models import Count, Max, Sum
+
+from myapp.models import Order
+
+OPEN_STATUSES = ('OPEN', 'PARTIAL')
+
+
+class StaleBook(Exception):
+    """The book no longer matches the database; reload and retry."""
+
+
+class RestingOrder:
+    __slots__ = ('id', 'user_id', 'side', 'price', 'qty', 'filled_qty')
+
+    def __init__(self, id, user_id, side, price, qty, filled_qty=0):
+        self.id = id
+        self.user_id = user_id
+        self.side = side
+        self.price = price
+        self.qty = qty
+        self.filled_qty = filled_qty
+
+    @classmethod
+    def from_order(cls, order):
+        return cls(order.id, order.user_id, order.side, order.price, order.qty, order.filled_qty)
+
+    @property
+    def remaining_qty(self):
+        return self.qty - self.filled_qty
+
+
+class BookSide:
+    """Price levels for one side. Bids are best-first by highest price, asks by lowest."""
+
+    def __init__(self, descending):
+        self.descending = descending
+        self.prices = []   # ascending sort keys (negated for bids)
+        self.levels = {}   # price -> deque[RestingOrder]
+        self.totals = {}   # price -> remaining qty resting at that price
+
+    def _key(self, price):
+        return -price if self.descending else price
+
+    def add(self, entry):
+        level = self.levels.get(entry.price)
+        if level is None:
+            level = self.levels[entry.price] = deque()
+            insort(self.prices, self._key(entry.price))
+            self.totals[entry.price] = 0
+        level.append(entry)
+        self.totals[entry.price] += entry.remaining_qty
+
+    def remove(self, entry):
+        level = self.levels.get(entry.price)
+        if level is None:
+            return
+        try:
+            level.remove(entry)
+        except ValueError:
+            return
+        self.totals[entry.price] -= entry.remaining_qty
+        if not level:
+            self._drop_level(entry.price)
+
+    def _drop_level(self, price):
+        del self.levels[price]
+        del self.totals[price]
+        key = self._key(price)
+        self.prices.pop(bisect_left(self.prices, key))
+
+    def best_price(self):
+        if not self.prices:
+            return None
+        key = self.prices[0]
+        return -key if self.descending else key
+
+    def iter_levels(self):
+        """(price, queue) best-first."""
+        for key in self.prices:
+            price = -key if self.descending else key
+            yield price, self.levels[price]
+
+    def fill(self, entry, qty):
+        """Record `qty` of a resting entry as filled (the caller drops it once exhausted)."""
+        entry.filled_qty += qty
+        self.totals[entry.price] -= qty
+
+    def depth(self, n):
+        """[(price, remaining qty)] of the best `n` levels, from the running level totals."""
+        return [(price, self.totals[price]) for price, _ in islice(self.iter_levels(), n)]
+
+
+class OrderBook:
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.lock = threading.RLock()
+        self.orders = {}
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.loaded = False
+        self.published_depth = None   # last depth payload published for this book (see order_depth)
+
+    def side(self, side):
+        return self.bids if side == 'BUY' else self.asks
+
+    # --- Loading / consistency ---
+
+    def _open_orders(self, exclude_id=None):
+        qs = Order.objects.filter(symbol=self.symbol, status__in=OPEN_STATUSES)
+        return qs.exclude(id=exclude_id) if exclude_id else qs
+
+    def reload(self, exclude_id=None):
+        self.orders.clear()
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        rows = self._open_orders(exclude_id).order_by('created_at', 'id').values_list(
+            'id', 'user_id', 'side', 'price', 'qty', 'filled_qty'
+        )
+        for row in rows:
+            self.add(RestingOrder(*row))
+        self.loaded = True
+
+    def fingerprint(self):
+        if not self.orders:
+            return (0, None, 0)
+        return (len(self.orders), max(self.orders), sum(e.filled_qty for e in self.orders.values()))
+
+    def sync(self, exclude_id=None):
+        """Reload if the open orders in the DB differ from the book (one aggregate query)."""
+        if self.loaded:
+            db = self._open_orders(exclude_id).aggregate(n=Count('id'), max_id=Max('id'), filled=Sum('filled_qty'))
+            if (db['n'], db['max_id'], db['filled'] or 0) == self.fingerprint():
+                return
+        self.reload(exclude_id)
+
+    # --- Mutation ---
+
+    def add(self, entry):
+        if entry.remaining_qty <= 0:
+            return
+        self.orders[entry.id] = entry
+        self.side(entry.side).add(entry)
+
+    def discard(self, order_id):
+        entry = self.orders.pop(order_id, None)
+        if entry:
+            self.side(entry.side).remove(entry)
+
+    # --- Matching ---
+
+    def plan(self, side, price, qty):
+        """
+        Fills for an incoming order without touching the book:
+        [(resting entry, qty, price)] walking the opposite side best-first
+        while prices cross. Trades happen at the resting order's price.
+        """
+        fills = []
+        opposite = self.asks if side == 'BUY' else self.bids
+        for level_price, queue in opposite.iter_levels():
+            crosses = level_price <= price if side == 'BUY' else level_price >= price
+            if qty <= 0 or not crosses:
+                break
+            for entry in queue:
+                if qty <= 0:
+                    break
+                take = min(qty, entry.remaining_qty)
+                fills.append((entry, take, level_price))
+                qty -= take
+        return fills
+
+    def apply(self, fills):
+        """Commit a persisted plan to the book."""
+        for entry, qty, _ in fills:
+            self.side(entry.side).fill(entry, qty)
+            if entry.remaining_qty <= 0:
+                self.discard(entry.id)
+
+    def depth(self, n=5):
+        return {'bids': self.bids.depth(n), 'asks': self.asks.depth(n)}
+
+
+_books = {}
+_registry_lock = threading.Lock()
+
+
+def get_book(symbol):
+    symbol = symbol.upper()
+    with _registry_lock:
+        book = _books.get(symbol)
+        if book is None:
+            book = _books[symbol] = OrderBook(symbol)
+        return book
+
+
+def discard(order):
+    """Drop a cancelled/expired order from this process's book, if loaded."""
+    book = _books.get(order.symbol.upper())
+    if book:
+        with book.lock:
+            book.discard(order.id)
+
+
+def reset():
+    """Forget every book (they reload from the DB on next use)."""
+    with _registry_lock:
+        _books.clear()
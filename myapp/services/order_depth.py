@@ -0,0 +1,111 @@
+"""
+Market Depth Feed
+The shard that owns a symbol's in-memory book publishes its top
+ORDERBOOK_DEPTH_LEVELS price levels whenever a placement, fill or cancel
+changes them: the levels are read from the book's running level totals,
+compared with the last published depth, and only a change bumps the version,
+replaces the cached snapshot and is pushed to 'depth:<SYMBOL>' subscribers.
+/api/orderbook/ is then a cache read, and the version doubles as its ETag.
+Versions come from a counter in the shared cache (cache.incr), so they keep
+increasing when a symbol's shard moves to another process or restarts.
+
+Cancels applied outside the shard (batch API, session-close expiry) ask the
+shard to refresh, which resyncs the book from the database first.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from myapp.models import Order
+from myapp.services import order_book
+from myapp.services.pubsub import publish as push, depth_topic
+
+logger = logging.getLogger(__name__)
+
+DEPTH_SNAPSHOT_TTL = 60 * 60 * 24
+
+
+def depth_key(symbol):
+    return f'push_snapshot_depth_{symbol.upper()}'
+
+
+def version_key(symbol):
+    return f'depth_version_{symbol.upper()}'
+
+
+def _next_version(symbol):
+    key = version_key(symbol)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def _levels(levels):
+    return [{'price': float(price), 'qty': int(qty)} for price, qty in levels]
+
+
+def _payload(symbol, version, bids, asks):
+    from myapp.services.market_session import get_nepal_time
+
+    return {
+        'symbol': symbol,
+        'version': version,
+        'bids': bids,
+        'asks': asks,
+        'last_updated': get_nepal_time().isoformat(),
+    }
+
+
+def publish(book):
+    """
+    Publish the depth of a current book if it changed since the last publish
+    (the caller holds book.lock). Returns the new payload, or None.
+    """
+    n = settings.ORDERBOOK_DEPTH_LEVELS
+    bids, asks = _levels(book.bids.depth(n)), _levels(book.asks.depth(n))
+    last = book.published_depth or cache.get(depth_key(book.symbol))
+    if last and last['bids'] == bids and last['asks'] == asks:
+        book.published_depth = last
+        return None
+    payload = _payload(book.symbol, _next_version(book.symbol), bids, asks)
+    cache.set(depth_key(book.symbol), payload, DEPTH_SNAPSHOT_TTL)
+    push(depth_topic(book.symbol), payload)
+    book.published_depth = payload
+    return payload
+
+
+def refresh(symbol):
+    """Resync this process's book of `symbol` with the database and publish its depth if it changed."""
+    book = order_book.get_book(symbol)
+    with book.lock:
+        book.sync()
+        return publish(book)
+
+
+def snapshot(symbol):
+    """
+    The published depth of `symbol`. Only before its shard has published
+    anything is it aggregated from the open orders, under the current version
+    and cached for ORDERBOOK_FALLBACK_TTL seconds only.
+    """
+    symbol = symbol.upper()
+    payload = cache.get(depth_key(symbol))
+    if payload is None:
+        n = settings.ORDERBOOK_DEPTH_LEVELS
+        open_orders = Order.objects.filter(symbol=symbol, status__in=order_book.OPEN_STATUSES)
+
+        def side(name, ordering):
+            rows = open_orders.filter(side=name).values('price').annotate(
+                total_qty=Sum(F('qty') - F('filled_qty'))
+            ).order_by(ordering)[:n]
+            return [(r['price'], r['total_qty']) for r in rows]
+
+        version = cache.get(version_key(symbol), 0)
+        payload = _payload(symbol, version, _levels(side('BUY', '-price')), _levels(side('SELL', 'price')))
+        if not cache.add(depth_key(symbol), payload, settings.ORDERBOOK_FALLBACK_TTL):
+            payload = cache.get(depth_key(symbol)) or payload
+    return payload
@@ -0,0 +1,83 @@
+"""
+End-of-Day Order Expiry
+Every order is a day order: whatever is still OPEN/PARTIAL when the session
+closes is cancelled, the cash reserved by BUY orders is refunded and the
+shares reserved by SELL orders are released. The sweep is set-based whatever
+the number of open orders: one locking read of the expiring rows (needed for
+their journal events), one grouped refund UPDATE of the users table, one
+grouped release UPDATE of the portfolio table, one status UPDATE and one
+journal insert.
+Only rows still open are touched, so running it twice (or after a crash)
+is harmless. The expiring rows are locked first, so a matching shard that
+is mid-fill waits and then sees them CANCELLED (persist_fills re-checks and
+its book fingerprint reloads).
+"""
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from myapp.models import CustomUser, Order, Portfolio
+from myapp.services import matching_service, order_book, order_journal
+
+logger = logging.getLogger(__name__)
+
+
+def expire_orders(before=None):
+    """
+    Cancel every open order placed before `before` (default: now), refund BUY
+    reservations and release SELL ones. Returns the count.
+    """
+    if before is None:
+        before = timezone.now()
+    expiring = Order.objects.filter(status__in=order_book.OPEN_STATUSES, created_at__lt=before)
+
+    with transaction.atomic():
+        # 1. Lock the expiring rows
+        rows = list(expiring.select_for_update().order_by('id').values_list(
+            'id', 'user_id', 'symbol', 'side', 'qty', 'filled_qty', 'price'
+        ))
+        if not rows:
+            return 0
+        ids = [row[0] for row in rows]
+
+        # 2. One grouped refund: balance += SUM((qty - filled_qty) * price) of each user's expiring BUYs
+        refunds = Order.objects.filter(id__in=ids, side='BUY', user=OuterRef('pk')).values('user').annotate(
+            total=Sum(ExpressionWrapper((F('qty') - F('filled_qty')) * F('price'),
+                                        output_field=DecimalField(max_digits=14, decimal_places=2)))
+        ).values('total')
+        buyers = {user_id for _, user_id, _, side, _, _, _ in rows if side == 'BUY'}
+        if buyers:
+            CustomUser.objects.filter(id__in=buyers).update(virtual_balance=F('virtual_balance') + Subquery(refunds))
+
+        # 3. One grouped release: reserved_qty -= SUM(qty - filled_qty) of the holding's expiring SELLs
+        released = Order.objects.filter(
+            id__in=ids, side='SELL', user=OuterRef('user'), symbol=OuterRef('symbol')
+        ).values('user', 'symbol').annotate(total=Sum(F('qty') - F('filled_qty'))).values('total')
+        sells = {(user_id, symbol) for _, user_id, symbol, side, _, _, _ in rows if side == 'SELL'}
+        if sells:
+            Portfolio.objects.filter(user_id__in={u for u, _ in sells}, symbol__in={s for _, s in sells}).update(
+                reserved_qty=Greatest(F('reserved_qty') - Coalesce(Subquery(released), Value(0)), Value(0),
+                                      output_field=IntegerField())
+            )
+
+        # 4. One status update, then the journal
+        Order.objects.filter(id__in=ids).update(status='CANCELLED', updated_at=timezone.now())
+        order_journal.record([
+            order_journal.cancelled(
+                Order(id=order_id, user_id=user_id, symbol=symbol),
+                Decimal(str(qty - filled)) * price if side == 'BUY' else Decimal('0'),
+            )
+            for order_id, user_id, symbol, side, qty, filled, price in rows
+        ])
+
+    # The books of this process are stale now; shards notice via their fingerprint
+    # and republish the depth of every symbol that lost orders once this commits
+    order_book.reset()
+    symbols = {symbol for _, _, symbol, _, _, _, _ in rows}
+    transaction.on_commit(lambda: matching_service.submit_depth_refresh(symbols))
+    logger.info(f"Expired {len(rows)} open orders placed before {before}")
+    return len(rows)
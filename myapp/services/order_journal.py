@@ -0,0 +1,236 @@
+"""
+Order Journal (Event Sourcing)
+Every state change the matching shards make is appended to OrderEvent in the
+same transaction as the change itself, one bulk insert per match cycle:
+PLACED (with the cash reserved), MATCHED per fill, SETTLED with the netted
+cash/holding deltas, and CANCELLED (with the refund).
+JournalSnapshot periodically stores the open book, balances and holdings as
+of a journal sequence number, read in one consistent view with journal
+inserts held back (see _freeze_journal). replay() starts from the nearest snapshot and
+applies the events after it to rebuild the state at any sequence number or
+time; warm_start() loads the in-memory books from that state.
+Balances only reflect engine activity between snapshots (payments and admin
+edits are not journalled); without a snapshot they are deltas from zero.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from myapp.models import OrderEvent, JournalSnapshot, Order, CustomUser, Portfolio
+from myapp.services import order_book
+from myapp.services.order_book import RestingOrder
+from myapp.services.settlement import cash_deltas, holding_deltas, apply_holding
+
+logger = logging.getLogger(__name__)
+
+
+# --- Writing ---
+
+def placed(order, reserved=None):
+    """reserved: cash taken at placement (defaults to qty x price for a BUY, as the order views do)."""
+    if reserved is None:
+        reserved = Decimal(str(order.qty)) * order.price if order.side == 'BUY' else Decimal('0')
+    return OrderEvent(kind='PLACED', symbol=order.symbol, order_id=order.id, data={
+        'user_id': order.user_id,
+        'side': order.side,
+        'order_type': order.order_type,
+        'price': str(order.price),
+        'qty': order.qty,
+        'filled_qty': order.filled_qty,
+        'reserved': str(reserved),
+    })
+
+
+def matched(execution):
+    return OrderEvent(kind='MATCHED', symbol=execution.symbol, data={
+        'execution_id': execution.id,
+        'buy_order_id': execution.buy_order_id,
+        'sell_order_id': execution.sell_order_id,
+        'qty': execution.executed_qty,
+        'price': str(execution.executed_price),
+    })
+
+
+def settled(symbol, trades):
+    return OrderEvent(kind='SETTLED', symbol=symbol, data={
+        'cash': {str(user_id): str(d) for user_id, d in cash_deltas(trades).items()},
+        'holdings': [
+            [user_id, sym, buy_qty, str(buy_value), sold_qty]
+            for (user_id, sym), (buy_qty, buy_value, sold_qty) in holding_deltas(trades).items()
+        ],
+    })
+
+
+def cancelled(order, refund):
+    return OrderEvent(kind='CANCELLED', symbol=order.symbol, order_id=order.id, data={
+        'user_id': order.user_id,
+        'refund': str(refund),
+    })
+
+
+def record(events):
+    """Append a batch of events (call inside the transaction that made the change)."""
+    return OrderEvent.objects.bulk_create(events)
+
+
+# --- State ---
+
+class JournalState:
+    def __init__(self, book=None, balances=None, holdings=None, last_event_id=0):
+        self.book = book or {}            # order_id -> {symbol, side, price, qty, filled_qty, user_id}
+        self.balances = balances or {}    # user_id -> Decimal
+        self.holdings = holdings or {}    # (user_id, symbol) -> [qty, avg_price]
+        self.last_event_id = last_event_id
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        book = {}
+        for row in snap.book:
+            book[row['id']] = {**row, 'price': Decimal(row['price'])}
+        return cls(
+            book=book,
+            balances={int(u): Decimal(b) for u, b in snap.balances.items()},
+            holdings={
+                (int(key.split(':', 1)[0]), key.split(':', 1)[1]): [qty, Decimal(avg)]
+                for key, (qty, avg) in snap.holdings.items()
+            },
+            last_event_id=snap.last_event_id,
+        )
+
+    def _cash(self, user_id, delta):
+        self.balances[user_id] = self.balances.get(user_id, Decimal('0')) + delta
+
+    def _fill(self, order_id, qty):
+        row = self.book.get(order_id)
+        if row:
+            row['filled_qty'] += qty
+            if row['filled_qty'] >= row['qty']:
+                del self.book[order_id]
+
+    def apply(self, event):
+        d = event.data
+        if event.kind == 'PLACED':
+            # An order saved before a snapshot but matched after it is already in the book
+            if event.order_id not in self.book:
+                self.book[event.order_id] = {
+                    'id': event.order_id, 'symbol': event.symbol, 'side': d['side'],
+                    'price': Decimal(d['price']), 'qty': d['qty'], 'filled_qty': d['filled_qty'],
+                    'user_id': d['user_id'],
+                }
+                self._cash(d['user_id'], -Decimal(d['reserved']))
+        elif event.kind == 'MATCHED':
+            self._fill(d['buy_order_id'], d['qty'])
+            self._fill(d['sell_order_id'], d['qty'])
+        elif event.kind == 'SETTLED':
+            for user_id, delta in d['cash'].items():
+                self._cash(int(user_id), Decimal(delta))
+            for user_id, symbol, buy_qty, buy_value, sold_qty in d['holdings']:
+                qty, avg = self.holdings.get((user_id, symbol), [0, Decimal('0')])
+                qty, avg = apply_holding(qty, avg, buy_qty, Decimal(buy_value), sold_qty)
+                if qty > 0:
+                    self.holdings[(user_id, symbol)] = [qty, avg]
+                else:
+                    self.holdings.pop((user_id, symbol), None)
+        elif event.kind == 'CANCELLED':
+            if self.book.pop(event.order_id, None) is not None:
+                self._cash(d['user_id'], Decimal(d['refund']))
+        self.last_event_id = event.id
+
+
+def _freeze_journal(outermost):
+    """
+    Make the snapshot's reads consistent with its journal sequence (PostgreSQL;
+    call first thing in the snapshot's transaction). SHARE mode waits for
+    in-flight journal inserts and holds new ones back, so no event with a
+    lower id can commit after last_event_id is read, and REPEATABLE READ (when
+    the transaction is ours to set) has every read see that same moment.
+    SQLite's single writer already gives the atomic block a consistent view.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        if outermost:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        cursor.execute(f'LOCK TABLE {connection.ops.quote_name(OrderEvent._meta.db_table)} IN SHARE MODE')
+
+
+def take_snapshot():
+    """Store the current open book, balances and holdings against the latest journal sequence."""
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        _freeze_journal(outermost)
+        last_event_id = OrderEvent.objects.aggregate(m=Max('id'))['m'] or 0
+        book = [
+            {**row, 'price': str(row['price'])}
+            for row in Order.objects.filter(status__in=order_book.OPEN_STATUSES).order_by('created_at', 'id').values(
+                'id', 'symbol', 'side', 'price', 'qty', 'filled_qty', 'user_id'
+            )
+        ]
+        balances = {str(u): str(b) for u, b in CustomUser.objects.values_list('id', 'virtual_balance')}
+        holdings = {
+            f'{u}:{s}': [q, str(a)]
+            for u, s, q, a in Portfolio.objects.filter(quantity__gt=0).values_list('user_id', 'symbol', 'quantity', 'avg_price')
+        }
+        snap = JournalSnapshot.objects.create(last_event_id=last_event_id, book=book, balances=balances, holdings=holdings)
+    logger.info(f"Journal snapshot @#{last_event_id}: {len(book)} open orders, {len(holdings)} holdings")
+    return snap
+
+
+def replay(until_event_id=None, until_time=None):
+    """JournalState as of an event id or a timestamp (latest by default)."""
+    if until_time is not None:
+        until_event_id = OrderEvent.objects.filter(created_at__lte=until_time).aggregate(m=Max('id'))['m'] or 0
+
+    snapshots = JournalSnapshot.objects.all()
+    if until_event_id is not None:
+        snapshots = snapshots.filter(last_event_id__lte=until_event_id)
+    snap = snapshots.order_by('-last_event_id').first()
+    state = JournalState.from_snapshot(snap) if snap else JournalState()
+
+    events = OrderEvent.objects.filter(id__gt=state.last_event_id)
+    if until_event_id is not None:
+        events = events.filter(id__lte=until_event_id)
+    for event in events.order_by('id').iterator(chunk_size=5000):
+        state.apply(event)
+    return state
+
+
+def warm_start(state, shard=None):
+    """
+    Load the in-memory order books from a replayed state instead of querying
+    the orders table (only the symbols owned by `shard`, if given).
+    """
+    from myapp.services.matching_service import shard_for
+
+    order_book.reset()
+    count = 0
+    for row in state.book.values():
+        if shard is not None and shard_for(row['symbol']) != shard:
+            continue
+        book = order_book.get_book(row['symbol'])
+        book.add(RestingOrder(row['id'], row['user_id'], row['side'], row['price'], row['qty'], row['filled_qty']))
+        book.loaded = True
+        count += 1
+    return count
+
+
+def verify(state):
+    """Differences between a replayed state (at the head of the journal) and the live tables."""
+    db_book = {
+        oid: (qty - filled)
+        for oid, qty, filled in Order.objects.filter(status__in=order_book.OPEN_STATUSES).values_list('id', 'qty', 'filled_qty')
+    }
+    replay_book = {oid: row['qty'] - row['filled_qty'] for oid, row in state.book.items()}
+    db_holdings = {
+        (u, s): q for u, s, q in Portfolio.objects.filter(quantity__gt=0).values_list('user_id', 'symbol', 'quantity')
+    }
+    replay_holdings = {key: qty for key, (qty, _) in state.holdings.items()}
+    return {
+        'orders': sorted(oid for oid in set(db_book) | set(replay_book) if db_book.get(oid) != replay_book.get(oid)),
+        'holdings': sorted(
+            f'{u}:{s}' for (u, s) in set(db_holdings) | set(replay_holdings)
+            if db_holdings.get((u, s)) != replay_holdings.get((u, s))
+        ),
+    }
@@ -0,0 +1,143 @@
+"""
+Order Validation Context
+validate_order used to pay for the playback/session state, a session query,
+one to three NEPSEPrice lookups and a Stock fallback on every order. The
+ValidationContext holds all of that for one tick: whether orders are
+accepted, the playback timestamp, and each symbol's circuit band (loaded on
+first use with MatchingEngine.circuit_bands) and tick size. It is rebuilt
+when a tick is published in this process, and at the latest every
+VALIDATION_CONTEXT_TTL seconds, so checking an order against it touches no
+database.
+
+Funds are then reserved with one conditional statement
+(UPDATE users SET virtual_balance = virtual_balance - cost
+ WHERE id = ... AND virtual_balance >= cost): the row count says whether
+the reservation happened, so no row lock or read-modify-write is needed.
+A SELL reserves its shares the same way (UPDATE portfolio SET
+reserved_qty = reserved_qty + qty WHERE ... AND quantity >= reserved_qty + qty),
+so two SELLs can't both be covered by the same shares. Settlement, cancels
+and expiry release what they fill or cancel.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+
+from myapp.models import CustomUser, MarketSession, Portfolio
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationContext:
+    def __init__(self, market_open, playback_timestamp, tick_size):
+        self.market_open = market_open
+        self.playback_timestamp = playback_timestamp
+        self.tick_size = tick_size
+        self.bands = {}      # symbol -> (low, up) or None when there is no reference price
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def build(cls):
+        from myapp.services.playback_engine import get_playback_state
+
+        state = get_playback_state()
+        active = MarketSession.objects.filter(is_active=True, status__in=['CONTINUOUS', 'PRE_OPEN']).exists()
+        return cls(
+            market_open=active or state['is_playback'],
+            playback_timestamp=state['timestamp'] if state['is_playback'] else None,
+            tick_size=Decimal(str(settings.ORDER_TICK_SIZE)),
+        )
+
+    def expired(self):
+        return time.monotonic() - self.built_at >= settings.VALIDATION_CONTEXT_TTL
+
+    def load_bands(self, symbols):
+        """Circuit bands of `symbols`, loading the ones not cached yet in one go."""
+        from myapp.services.matching_engine import MatchingEngine
+
+        missing = {s for s in symbols if s not in self.bands}
+        if missing:
+            loaded = MatchingEngine.circuit_bands(missing, as_of=self.playback_timestamp)
+            with self.lock:
+                for symbol in missing:
+                    self.bands[symbol] = loaded.get(symbol)
+        return {s: self.bands[s] for s in symbols if self.bands[s] is not None}
+
+    def check_price(self, symbol, price):
+        """Session, circuit and tick checks for a limit price: an error message or None."""
+        if not self.market_open:
+            return "Market is currently CLOSED."
+        band = self.load_bands([symbol]).get(symbol)
+        if band is None:
+            return "Circuit limits unavailable for this stock yet."
+        low, up = band
+        if price > up or price < low:
+            return f"Price outside circuit (Rs {low} - Rs {up})"
+        if price % self.tick_size:
+            return f"Price must be a multiple of Rs {self.tick_size}."
+        return None
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def get_context():
+    """This process's context for the current tick."""
+    global _context
+    context = _context
+    if context is None or context.expired():
+        with _context_lock:
+            if _context is None or _context.expired():
+                _context = ValidationContext.build()
+            context = _context
+    return context
+
+
+def invalidate():
+    """Forget the context (a new tick was published, or the session changed)."""
+    global _context
+    _context = None
+
+
+def reserve(order):
+    """
+    Reserve what `order` needs with one conditional UPDATE: BUY funds, or
+    SELL shares. Returns an error message or None.
+    """
+    if order.side == 'BUY':
+        cost = Decimal(str(order.qty)) * order.price
+        reserved = CustomUser.objects.filter(id=order.user_id, virtual_balance__gte=cost).update(
+            virtual_balance=F('virtual_balance') - cost
+        )
+        if not reserved:
+            return "Insufficient balance."
+        order.user.virtual_balance -= cost
+    elif not Portfolio.objects.filter(
+        user_id=order.user_id, symbol=order.symbol, quantity__gte=F('reserved_qty') + order.qty
+    ).update(reserved_qty=F('reserved_qty') + order.qty):
+        return "You do not have enough shares to sell."
+    return None
+
+
+def adjust_reserved_shares(deltas):
+    """
+    Add {(user_id, symbol): qty} to those holdings' reserved shares in one
+    UPDATE; negative amounts release (never below zero). The caller has
+    checked availability for positive amounts under the rows' lock.
+    """
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+    match = Q()
+    for user_id, symbol in deltas:
+        match |= Q(user_id=user_id, symbol=symbol)
+    Portfolio.objects.filter(match).update(reserved_qty=Greatest(F('reserved_qty') + Case(
+        *[When(user_id=user_id, symbol=symbol, then=Value(n)) for (user_id, symbol), n in deltas.items()],
+        default=Value(0), output_field=IntegerField(),
+    ), Value(0)))
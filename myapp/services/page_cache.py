@@ -0,0 +1,46 @@
+"""
+Tick-Versioned Page Cache
+Public pages only change when a new tick is published, so cache keys carry
+the tick timestamp from the retained market snapshot (see market_feed).
+A new tick makes old entries unreachable; nothing has to be purged.
+Anonymous visitors get whole rendered pages; logged-in pages share the
+cached market-widget context.
+"""
+from django.core.cache import cache
+
+from myapp.services.market_feed import MARKET_SNAPSHOT_KEY
+
+# Upper bound on staleness if ticks stop being published (scraper and beat both down)
+PAGE_TTL = 120
+
+
+def tick_version():
+    """Timestamp of the last published tick, or None when no snapshot is retained."""
+    snap = cache.get(MARKET_SNAPSHOT_KEY)
+    return snap['timestamp'] if snap else None
+
+
+def _key(kind, name, version):
+    return f'page_cache:{kind}:{name}:{version}'
+
+
+def cached_fragment(name, builder, cacheable=lambda value: True):
+    """builder() result cached for the current tick (uncached when there is no tick version)."""
+    version = tick_version()
+    if version is None:
+        return builder()
+    key = _key('fragment', name, version)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        if cacheable(value):
+            cache.set(key, value, PAGE_TTL)
+    return value
+
+
+def get_page(name, version):
+    return cache.get(_key('page', name, version))
+
+
+def set_page(name, version, content):
+    cache.set(_key('page', name, version), content, PAGE_TTL)
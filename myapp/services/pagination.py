@@ -0,0 +1,102 @@
+"""
+Keyset Pagination
+Opaque cursors on (timestamp, id) instead of OFFSET/page numbers, so every
+page is one index range scan with a LIMIT no matter how long the history is.
+merged_page() pages several sources (e.g. buy fills, sell fills, legacy
+trades) through a single DB-side UNION ordered by (ts, kind, id).
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import IntegerField, Q, Value
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(ts, pk, kind=0):
+    raw = json.dumps([ts.isoformat(), pk, kind], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(timestamp, id, kind) from a cursor token, or None for the first page."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        ts, pk, kind = json.loads(raw)
+        return datetime.fromisoformat(ts), int(pk), int(kind)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def parse_page_params(request, default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+    """?cursor=...&limit=N -> (decoded cursor or None, limit). Raises InvalidCursor."""
+    try:
+        limit = int(request.GET.get('limit', default_limit))
+    except (TypeError, ValueError):
+        limit = default_limit
+    limit = max(1, min(limit, max_limit))
+    return decode_cursor(request.GET.get('cursor')), limit
+
+
+def after_cursor(qs, cursor, ts_field, kind=0):
+    """Rows strictly after `cursor` in (ts DESC, kind DESC, id DESC) order."""
+    if cursor is None:
+        return qs
+    ts, pk, cursor_kind = cursor
+    if kind < cursor_kind:
+        return qs.filter(**{f'{ts_field}__lte': ts})
+    if kind > cursor_kind:
+        return qs.filter(**{f'{ts_field}__lt': ts})
+    return qs.filter(Q(**{f'{ts_field}__lt': ts}) | Q(**{ts_field: ts, 'id__lt': pk}))
+
+
+def _page(rows, limit, ts_of, pk_of, kind_of):
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(ts_of(last), pk_of(last), kind_of(last))
+    return rows, next_cursor
+
+
+def keyset_page(qs, cursor, limit, ts_field):
+    """One page of model instances, newest first. Returns (rows, next_cursor)."""
+    rows = list(after_cursor(qs, cursor, ts_field).order_by(f'-{ts_field}', '-id')[:limit + 1])
+    return _page(rows, limit, lambda r: getattr(r, ts_field), lambda r: r.pk, lambda r: 0)
+
+
+def merged_page(sources, cursor, limit, columns):
+    """
+    One page across several querysets merged in SQL (UNION ALL + ORDER BY + LIMIT).
+    sources: [(kind, qs)] where each qs is annotated with `ts` and `columns`.
+    Returns (list of dicts with ts, kind, id and columns, next_cursor).
+    """
+    fields = ('ts', 'kind', 'id', *columns)
+    parts = [
+        after_cursor(qs, cursor, 'ts', kind)
+        .annotate(kind=Value(kind, output_field=IntegerField()))
+        .order_by()
+        .values_list(*fields)
+        for kind, qs in sources
+    ]
+    union = parts[0].union(*parts[1:], all=True).order_by('-ts', '-kind', '-id')
+    rows = [dict(zip(fields, row)) for row in union[:limit + 1]]
+    return _page(rows, limit, lambda r: r['ts'], lambda r: r['id'], lambda r: r['kind'])
+
+
+def page_info(cursor, next_cursor, limit):
+    return {
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None,
+        'has_prev': cursor is not None,
+    }
@@ -0,0 +1,61 @@
+"""
+Platform Counters
+Trader count, total virtual trade volume and listed stocks are kept as
+running totals in PlatformCounter, bumped by signals (see myapp/signals.py)
+as users, executions and stocks come and go. The landing page reads three
+small rows instead of counting users and summing every TradeExecution.
+"""
+import logging
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from myapp.models import PlatformCounter
+
+logger = logging.getLogger(__name__)
+
+TRADERS = 'traders'
+TRADE_VOLUME = 'trade_volume'
+LISTED_STOCKS = 'listed_stocks'
+
+
+def _aggregate(name):
+    """Exact value from the source tables (seeding / repair only)."""
+    from myapp.models import CustomUser, TradeExecution, Stock
+
+    if name == TRADERS:
+        return CustomUser.objects.count()
+    if name == TRADE_VOLUME:
+        return TradeExecution.objects.aggregate(
+            total=Sum(F('executed_qty') * F('executed_price'))
+        )['total'] or 0
+    if name == LISTED_STOCKS:
+        return Stock.objects.count()
+    raise ValueError(f"Unknown platform counter: {name}")
+
+
+def recount(*names):
+    """Reset counters (all by default) from the source tables."""
+    values = {}
+    for name in names or (TRADERS, TRADE_VOLUME, LISTED_STOCKS):
+        value = Decimal(str(_aggregate(name)))
+        PlatformCounter.objects.update_or_create(name=name, defaults={'value': value})
+        values[name] = value
+    return values
+
+
+def add(name, delta):
+    """Atomically add `delta` to a counter; a counter seen for the first time is seeded instead."""
+    updated = PlatformCounter.objects.filter(name=name).update(value=F('value') + Decimal(str(delta)))
+    if not updated:
+        # Seeding reads the source tables, which already include this change
+        recount(name)
+
+
+def get_counters():
+    """{name: Decimal} for every counter, seeding any that are missing."""
+    values = dict(PlatformCounter.objects.values_list('name', 'value'))
+    missing = [n for n in (TRADERS, TRADE_VOLUME, LISTED_STOCKS) if n not in values]
+    if missing:
+        values.update(recount(*missing))
+    return values
@@ -12,6 +12,10 @@ def get_playback_state():
     """
     from myapp.services.market_session import get_current_session
     session = get_current_session()
+
+    # Pre-open is a live phase with no ticks yet; don't let playback take over
+    if session.status == 'PRE_OPEN':
+        return {'is_playback': False, 'timestamp': None}
     
     # 1. --- AUTO DETECT LIVE SCRAPER ---
     # Find the absolute newest record in the database
@@ -0,0 +1,233 @@
+"""
+Market Push Pub/Sub
+Topic based fan-out for price ticks, the index bar and per-user order updates.
+
+Publishers (scraper ingestion, matching engine) are synchronous Django code and
+call `publish()`. Subscribers are SSE streams running on the ASGI event loop.
+Every process keeps ONE upstream subscription and fans messages out locally, so
+a tick costs one publish no matter how many dashboards are connected.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Topic names
+TOPIC_MARKET = 'market'
+TOPIC_INDEX = 'index'
+
+# Redis channel prefix so we never collide with Celery keys
+CHANNEL_PREFIX = 'nepse:push:'
+
+# Per-subscriber buffer. A client that falls this far behind just misses
+# diffs; the next full snapshot on reconnect resyncs it.
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+def quote_topic(symbol):
+    return f"quote:{symbol.strip().upper()}"
+
+
+def depth_topic(symbol):
+    return f"depth:{symbol.strip().upper()}"
+
+
+def orders_topic(user_id):
+    return f"orders:{user_id}"
+
+
+class Subscription:
+    """Async iterator of (topic, data) tuples for one connected client."""
+
+    def __init__(self, broker, topics):
+        self.broker = broker
+        self.topics = set(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, message):
+        """Called from any thread. Drops the message if the client is too slow."""
+        def _put():
+            try:
+                self.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                pass
+        try:
+            if asyncio.get_running_loop() is self.loop:
+                _put()
+                return
+        except RuntimeError:
+            pass
+        try:
+            self.loop.call_soon_threadsafe(_put)
+        except RuntimeError:
+            # Loop already closed (client gone)
+            pass
+
+    async def get(self, timeout=None):
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+
+class InProcessBroker:
+    """
+    Local fan-out hub. Used directly in tests / single process dev servers and
+    as the local dispatcher behind RedisBroker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # topic -> set(Subscription)
+
+    def subscribe(self, topics):
+        sub = Subscription(self, topics)
+        with self._lock:
+            for topic in sub.topics:
+                self._subscribers.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            for topic in sub.topics:
+                subs = self._subscribers.get(topic)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[topic]
+
+    def subscriber_count(self, topic=None):
+        with self._lock:
+            if topic:
+                return len(self._subscribers.get(topic, ()))
+            return len({s for subs in self._subscribers.values() for s in subs})
+
+    def dispatch(self, topic, data):
+        """Deliver an already-encoded message to every local subscriber of `topic`."""
+        with self._lock:
+            subs = list(self._subscribers.get(topic, ()))
+        for sub in subs:
+            sub.offer((topic, data))
+        return len(subs)
+
+    def publish(self, topic, payload):
+        return self.dispatch(topic, encode(payload))
+
+
+class RedisBroker:
+    """
+    Cross-process broker. Publishes go through Redis pub/sub; each ASGI process
+    runs a single listener task that feeds its local InProcessBroker.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.local = InProcessBroker()
+        self._client = None
+        self._listener = None
+        self._listener_loop = None
+
+    def _sync_client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, topic, payload):
+        return self._sync_client().publish(CHANNEL_PREFIX + topic, encode(payload))
+
+    def subscribe(self, topics):
+        sub = self.local.subscribe(topics)
+        self._ensure_listener()
+        return sub
+
+    def unsubscribe(self, sub):
+        self.local.unsubscribe(sub)
+
+    def subscriber_count(self, topic=None):
+        return self.local.subscriber_count(topic)
+
+    def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._listener and not self._listener.done() and self._listener_loop is loop:
+            return
+        self._listener_loop = loop
+        self._listener = loop.create_task(self._listen())
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.psubscribe(CHANNEL_PREFIX + '*')
+        try:
+            async for message in pubsub.listen():
+                if message.get('type') != 'pmessage':
+                    continue
+                channel = message['channel']
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                data = message['data']
+                if isinstance(data, bytes):
+                    data = data.decode()
+                self.local.dispatch(channel[len(CHANNEL_PREFIX):], data)
+        except Exception as e:
+            logger.error(f"Push listener stopped: {e}")
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+def encode(payload):
+    """Encode once per publish, not once per subscriber."""
+    if isinstance(payload, str):
+        return payload
+    return json.dumps(payload, default=str, separators=(',', ':'))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Process-wide broker selected by settings.PUSH_BROKER ('redis' or 'inprocess')."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                kind = getattr(settings, 'PUSH_BROKER', 'inprocess')
+                if kind == 'redis':
+                    _broker = RedisBroker(getattr(settings, 'PUSH_REDIS_URL', 'redis://localhost:6379/1'))
+                else:
+                    _broker = InProcessBroker()
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the broker (tests)."""
+    global _broker
+    _broker = broker
+
+
+def publish(topic, payload):
+    """
+    Fire-and-forget publish for sync callers. Push is best effort and must never
+    break ingestion or order placement, so errors are only logged.
+    """
+    try:
+        return get_broker().publish(topic, payload)
+    except Exception as e:
+        logger.warning(f"Push publish to '{topic}' failed: {e}")
+        return 0
@@ -0,0 +1,174 @@
+"""
+Set-Based Trade Settlement
+Settles every fill from one match cycle together: order fills, cash, holdings
+and execution records are netted per row in Python and written with a fixed
+number of bulk statements (bulk_update / a single CASE update / bulk_create),
+so a sweep that fills 50 resting orders costs the same round trips as one fill.
+Must run inside the caller's transaction; the resting orders involved should
+already be row-locked (see MatchingEngine.persist_fills).
+Confirmation emails are queued in the outbox (services/trade_mail.py); the
+traders' inbox notices are delivered and their portfolios revalued once the
+transaction commits.
+Either order of a trade may be None for a fill against the playback liquidity
+simulator; that side has no order, cash or holding to update.
+A seller must hold every share they sell: otherwise InsufficientHoldings is
+raised and the caller's transaction rolls the whole batch back.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from myapp.models import CustomUser, Order, Portfolio, TradeExecution
+from myapp.services import notifications, platform_stats, trade_mail, valuation
+
+PRICE_STEP = Decimal('0.01')
+
+
+class InsufficientHoldings(Exception):
+    """A SELL in the batch sells shares its user does not hold; `order_ids` are the offending orders."""
+
+    def __init__(self, order_ids):
+        super().__init__(f"Sellers do not hold the shares sold by orders {sorted(order_ids)}")
+        self.order_ids = order_ids
+
+
+def _sides(buy_order, sell_order):
+    return [o for o in (buy_order, sell_order) if o is not None]
+
+
+def _settle_orders(trades, now):
+    orders = {}
+    for buy_order, sell_order, qty, _ in trades:
+        for o in _sides(buy_order, sell_order):
+            orders.setdefault(o.id, o)
+            orders[o.id].filled_qty += qty
+
+    for o in orders.values():
+        o.status = 'FILLED' if o.filled_qty >= o.qty else 'PARTIAL'
+        o.updated_at = now
+    Order.objects.bulk_update(orders.values(), ['filled_qty', 'status', 'updated_at'])
+
+    # Fills may have been recorded on a different instance of the same order
+    for buy_order, sell_order, _, _ in trades:
+        for o in _sides(buy_order, sell_order):
+            o.filled_qty, o.status = orders[o.id].filled_qty, orders[o.id].status
+
+
+def cash_deltas(trades):
+    """{user_id: Decimal}: sellers receive the trade value; buyers get back any price improvement on their reserve."""
+    deltas = defaultdict(Decimal)
+    for buy_order, sell_order, qty, price in trades:
+        qty_dec = Decimal(str(qty))
+        if sell_order is not None:
+            deltas[sell_order.user_id] += qty_dec * price
+        refund = (buy_order.price - price) * qty_dec if buy_order is not None else 0
+        if refund > 0:
+            deltas[buy_order.user_id] += refund
+    return {user_id: d for user_id, d in deltas.items() if d}
+
+
+def holding_deltas(trades):
+    """{(user_id, symbol): [bought qty, bought value, sold qty]}"""
+    deltas = defaultdict(lambda: [0, Decimal('0'), 0])
+    for buy_order, sell_order, qty, price in trades:
+        if buy_order is not None:
+            bought = deltas[(buy_order.user_id, buy_order.symbol)]
+            bought[0] += qty
+            bought[1] += Decimal(str(qty)) * price
+        if sell_order is not None:
+            deltas[(sell_order.user_id, sell_order.symbol)][2] += qty
+    return dict(deltas)
+
+
+def apply_holding(old_qty, old_avg, buy_qty, buy_value, sold_qty):
+    """(new qty, new avg price); weighted average cost moves only on buys."""
+    new_qty = old_qty + buy_qty - sold_qty
+    if buy_qty:
+        old_avg = (Decimal(str(old_qty)) * old_avg + buy_value) / Decimal(str(old_qty + buy_qty))
+    return new_qty, old_avg.quantize(PRICE_STEP)
+
+
+def _settle_cash(trades):
+    deltas = cash_deltas(trades)
+    if deltas:
+        CustomUser.objects.filter(id__in=deltas).update(virtual_balance=F('virtual_balance') + Case(
+            *[When(id=user_id, then=Value(d)) for user_id, d in deltas.items()],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+
+
+def _settle_holdings(trades, now):
+    deltas = holding_deltas(trades)
+    users = {user_id for user_id, _ in deltas}
+    symbols = {symbol for _, symbol in deltas}
+    existing = {
+        (p.user_id, p.symbol): p
+        for p in Portfolio.objects.select_for_update().filter(user_id__in=users, symbol__in=symbols)
+        if (p.user_id, p.symbol) in deltas
+    }
+
+    # Every seller must hold what they sold, checked on the locked rows
+    short = {key for key, (_, _, sold_qty) in deltas.items()
+             if sold_qty and (existing.get(key) is None or sold_qty > existing[key].quantity)}
+    if short:
+        raise InsufficientHoldings({
+            sell_order.id for _, sell_order, _, _ in trades
+            if sell_order is not None and (sell_order.user_id, sell_order.symbol) in short
+        })
+
+    to_create, to_update, to_delete = [], [], []
+    for key, (buy_qty, buy_value, sold_qty) in deltas.items():
+        p = existing.get(key)
+        new_qty, avg = apply_holding(p.quantity if p else 0, p.avg_price if p else Decimal('0'),
+                                     buy_qty, buy_value, sold_qty)
+        if new_qty == 0:
+            to_delete.append(p.id)
+        elif p:
+            # Sold shares leave the SELL reservation too (orders rested before reservations hold none)
+            p.quantity, p.avg_price, p.updated_at = new_qty, avg, now
+            p.reserved_qty = max(p.reserved_qty - sold_qty, 0)
+            to_update.append(p)
+        else:
+            to_create.append(Portfolio(user_id=key[0], symbol=key[1], quantity=new_qty, avg_price=avg))
+
+    if to_update:
+        Portfolio.objects.bulk_update(to_update, ['quantity', 'reserved_qty', 'avg_price', 'updated_at'])
+    if to_create:
+        Portfolio.objects.bulk_create(to_create)
+    if to_delete:
+        Portfolio.objects.filter(id__in=to_delete).delete()
+
+
+def settle(trades):
+    """
+    trades: [(buy_order, sell_order, qty, price)] from one match cycle.
+    Updates the Order instances in place and returns the TradeExecutions (in trade order).
+    """
+    if not trades:
+        return []
+    now = timezone.now()
+
+    # Holdings first: a short seller aborts the batch before any order is touched
+    _settle_holdings(trades, now)
+    _settle_orders(trades, now)
+    _settle_cash(trades)
+
+    executions = TradeExecution.objects.bulk_create([
+        TradeExecution(
+            buy_order=buy_order, sell_order=sell_order,
+            buyer_id=buy_order.user_id if buy_order else None,
+            seller_id=sell_order.user_id if sell_order else None,
+            symbol=(buy_order or sell_order).symbol, executed_qty=qty, executed_price=price,
+        )
+        for buy_order, sell_order, qty, price in trades
+    ])
+    # bulk_create skips post_save, so the platform volume counter is bumped here
+    platform_stats.add(platform_stats.TRADE_VOLUME, sum(Decimal(str(q)) * p for _, _, q, p in trades))
+    # Confirmation emails go through the outbox, committed with the fills;
+    # inbox notices and the traders' portfolio values are written after the commit
+    trade_mail.enqueue(trades)
+    notifications.notify_fills_on_commit(trades)
+    valuation.revalue_on_commit(trades)
+    return executions
@@ -0,0 +1,193 @@
+"""
+Symbol Search Index
+Per-process typeahead over Stock: a prefix trie on symbols and company-name
+words plus trigram postings for substring and fuzzy matches.
+Built once from the DB, swapped atomically and rebuilt only when a Stock's
+searchable fields (or a Sector name) change - see myapp/signals.py.
+"""
+import threading
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from myapp.models import Stock
+
+VERSION_KEY = 'symbol_index_version'
+FUZZY_THRESHOLD = 0.3
+
+# Match tiers, best first
+EXACT, SYMBOL_PREFIX, NAME_PREFIX, SUBSTRING, FUZZY = range(5)
+
+
+class _Node:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+def trigrams(text, pad=False):
+    if pad:
+        text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SymbolIndex:
+    """
+    entries: list of dicts with symbol, company_name, sector_id, sector_name.
+    search() never touches the DB.
+    """
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.entries = entries
+        self.by_symbol = {e['symbol']: i for i, e in enumerate(entries)}
+        self.root = _Node()
+        self.grams = defaultdict(set)        # substring postings (unpadded)
+        self.fuzzy_grams = defaultdict(set)  # similarity postings (padded keys)
+        self.fuzzy_keys = []                 # (entry id, trigram count) per key
+        self._haystack = []
+
+        for i, e in enumerate(entries):
+            sym = e['symbol']
+            name = (e['company_name'] or '').upper()
+            self._insert(sym, i)
+            for word in name.split():
+                self._insert(word, i)
+            self._haystack.append((sym, name))
+
+            for tg in trigrams(sym) | trigrams(name):
+                self.grams[tg].add(i)
+            for key in {sym, *name.split()}:
+                key_grams = trigrams(key, pad=True)
+                key_id = len(self.fuzzy_keys)
+                self.fuzzy_keys.append((i, len(key_grams)))
+                for tg in key_grams:
+                    self.fuzzy_grams[tg].add(key_id)
+
+    def _insert(self, word, entry_id):
+        node = self.root
+        for ch in word:
+            node = node.children.setdefault(ch, _Node())
+            node.ids.add(entry_id)
+
+    def _prefix(self, query):
+        node = self.root
+        for ch in query:
+            node = node.children.get(ch)
+            if node is None:
+                return set()
+        return node.ids
+
+    def _substring(self, query):
+        if len(query) >= 3:
+            postings = [self.grams.get(tg, set()) for tg in trigrams(query)]
+            candidates = set.intersection(*postings) if postings else set()
+        else:
+            candidates = range(len(self.entries))
+        return {i for i in candidates if query in self._haystack[i][0] or query in self._haystack[i][1]}
+
+    def _fuzzy(self, query):
+        q_grams = trigrams(query, pad=True)
+        shared = defaultdict(int)
+        for tg in q_grams:
+            for key_id in self.fuzzy_grams.get(tg, ()):
+                shared[key_id] += 1
+
+        best = {}
+        for key_id, common in shared.items():
+            entry_id, key_len = self.fuzzy_keys[key_id]
+            score = common / (len(q_grams) + key_len - common)
+            if score >= FUZZY_THRESHOLD and score > best.get(entry_id, 0):
+                best[entry_id] = score
+        return best
+
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Ranked entries for `query`: exact symbol, symbol prefix, company-word
+        prefix, substring (same hits as icontains), then fuzzy if room is left.
+        limit=None returns every match.
+        """
+        query = (query or '').strip().upper()
+        if not query:
+            return []
+
+        ranked = {}
+        exact = self.by_symbol.get(query)
+        if exact is not None:
+            ranked[exact] = (EXACT, 0)
+        for i in self._prefix(query):
+            tier = SYMBOL_PREFIX if self.entries[i]['symbol'].startswith(query) else NAME_PREFIX
+            ranked.setdefault(i, (tier, 0))
+        for i in self._substring(query):
+            ranked.setdefault(i, (SUBSTRING, 0))
+
+        if fuzzy and (limit is None or len(ranked) < limit):
+            for i, score in self._fuzzy(query).items():
+                ranked.setdefault(i, (FUZZY, -score))
+
+        order = sorted(ranked, key=lambda i: (*ranked[i], self.entries[i]['symbol']))
+        if limit is not None:
+            order = order[:limit]
+        return [self.entries[i] for i in order]
+
+
+def build_index(version=None):
+    rows = Stock.objects.order_by('symbol').values_list('symbol', 'company_name', 'sector_id', 'sector__name')
+    entries = [
+        {
+            'symbol': sym.upper(),
+            'company_name': name or sym,
+            'sector_id': sector_id,
+            'sector_name': sector_name or 'Others',
+        }
+        for sym, name, sector_id, sector_name in rows
+    ]
+    return SymbolIndex(entries, version=version)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """This process's index, rebuilt when another process bumped the version."""
+    global _index
+    version = cache.get(VERSION_KEY, 0)
+    current = _index
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = build_index(version)
+        return _index
+
+
+def invalidate():
+    """Mark every process's index stale (next search rebuilds it)."""
+    global _index
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+    _index = None
+
+
+def search(query, limit=10, fuzzy=True):
+    return get_index().search(query, limit=limit, fuzzy=fuzzy)
+
+
+def search_with_quotes(query, limit=10, fuzzy=True):
+    """search() joined with the retained latest-quote snapshot (ltp, change_pct)."""
+    from myapp.services.market_feed import latest_quotes
+
+    quotes = latest_quotes()
+    results = []
+    for entry in search(query, limit=limit, fuzzy=fuzzy):
+        quote = quotes.get(entry['symbol'])
+        results.append({
+            **entry,
+            'ltp': quote['ltp'] if quote else None,
+            'change_pct': quote['change_pct'] if quote else None,
+        })
+    return results
@@ -0,0 +1,240 @@
+"""
+Symbol Statistics Store
+Each closed session is rolled up into one DailyBar per symbol, and the
+rolling figures a quote page shows (52-week range, all-time range, moving
+averages, average volume, return reference closes) are recomputed from those
+bars once per close. The current day is folded in at read time from the live
+tick, so a quote is a cache lookup instead of year-long scans of NEPSEPrice.
+DailyBars outlive the tick retention window (cleanup_nepse_data), so the
+52-week range stays complete.
+"""
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from myapp.models import NEPSEPrice, DailyBar, SymbolStats
+from myapp.services import history_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'symbol_stats:'
+STATS_TTL = 60 * 60 * 24 * 7
+
+# Calendar-day lookback for the bars the rolling stats need (200 sessions ~ 290 days)
+WINDOW_DAYS = 400
+RETURN_PERIODS = {'1w': 7, '1m': 30, '1y': 365}
+
+STAT_FIELDS = (
+    'symbol', 'as_of', 'last_close', 'prev_close', 'high_52', 'low_52',
+    'all_time_high', 'all_time_low', 'sma_20', 'sma_50', 'sma_200', 'avg_volume_20',
+    'ref_close_1w', 'ref_close_1m', 'ref_close_1y',
+)
+
+
+def _cache_key(symbol):
+    return f'{CACHE_PREFIX}{symbol.upper()}'
+
+
+def record_daily_bars(day):
+    """Upsert one DailyBar per symbol from the final tick of `day`. Returns the row count."""
+    bars = [
+        DailyBar(
+            symbol=row['symbol'],
+            date=day,
+            open=row['open'] or 0,
+            high=row['high'] or 0,
+            low=row['low'] or 0,
+            close=row['close'] or row['ltp'] or 0,
+            volume=row['volume'] or 0,
+            turnover=row['turnover'] or 0,
+        )
+        for row in history_cache.market_day_rows(day)
+        if row['close'] or row['ltp']
+    ]
+    DailyBar.objects.bulk_create(
+        bars,
+        update_conflicts=True,
+        unique_fields=['symbol', 'date'],
+        update_fields=['open', 'high', 'low', 'close', 'volume', 'turnover'],
+    )
+    return len(bars)
+
+
+def _mean_tail(values, n):
+    return float(values[-n:].mean()) if len(values) >= n else None
+
+
+def _ref_close(ordinals, closes, target):
+    """Close of the last bar on or before the `target` date ordinal."""
+    pos = np.searchsorted(ordinals, target, side='right') - 1
+    return float(closes[pos]) if pos >= 0 else None
+
+
+def compute_stats(symbol, dates, highs, lows, closes, volumes, all_time):
+    """SymbolStats fields for one symbol from its bars (NumPy arrays, oldest first)."""
+    ordinals = np.array([d.toordinal() for d in dates])
+    last = ordinals[-1]
+
+    # 1. 52-week range (zero lows are missing data, not prices)
+    year = ordinals > last - 365
+    year_lows = lows[year & (lows > 0)]
+
+    # 2. All-time range also covers bars older than the window
+    ath, atl = all_time.get(symbol, (None, None))
+
+    return {
+        'symbol': symbol,
+        'as_of': dates[-1],
+        'last_close': float(closes[-1]),
+        'prev_close': float(closes[-2]) if len(closes) > 1 else float(closes[-1]),
+        'high_52': float(highs[year].max()),
+        'low_52': float(year_lows.min()) if len(year_lows) else 0.0,
+        'all_time_high': float(ath or highs.max()),
+        'all_time_low': float(atl or (year_lows.min() if len(year_lows) else 0)),
+        # 3. Moving averages over sessions, not calendar days
+        'sma_20': _mean_tail(closes, 20),
+        'sma_50': _mean_tail(closes, 50),
+        'sma_200': _mean_tail(closes, 200),
+        'avg_volume_20': float(volumes[-20:].mean()),
+        # 4. Return reference closes
+        **{
+            f'ref_close_{period}': _ref_close(ordinals, closes, last - days)
+            for period, days in RETURN_PERIODS.items()
+        },
+    }
+
+
+def refresh_stats(as_of=None):
+    """Recompute SymbolStats for every symbol from DailyBars up to `as_of` (latest bar by default)."""
+    if as_of is None:
+        as_of = DailyBar.objects.aggregate(Max('date'))['date__max']
+    if not as_of:
+        return 0
+
+    # 1. All-time extremes in one grouped query
+    all_time = {
+        r['symbol']: (r['ath'], r['atl'])
+        for r in DailyBar.objects.filter(date__lte=as_of).values('symbol').annotate(
+            ath=Max('high'), atl=Min('low', filter=Q(low__gt=0))
+        )
+    }
+
+    # 2. Window bars for every symbol in one query, grouped in Python
+    rows = DailyBar.objects.filter(
+        date__gt=as_of - timedelta(days=WINDOW_DAYS), date__lte=as_of
+    ).order_by('symbol', 'date').values_list('symbol', 'date', 'high', 'low', 'close', 'volume')
+
+    grouped = {}
+    for symbol, *bar in rows:
+        grouped.setdefault(symbol, []).append(bar)
+
+    stats = []
+    for symbol, bars in grouped.items():
+        dates = [b[0] for b in bars]
+        highs, lows, closes, volumes = (np.array([b[i] for b in bars], dtype=float) for i in range(1, 5))
+        stats.append(compute_stats(symbol, dates, highs, lows, closes, volumes, all_time))
+
+    # 3. Upsert and refresh the per-symbol cache entries
+    update_fields = [f for f in STAT_FIELDS if f != 'symbol'] + ['updated_at']
+    SymbolStats.objects.bulk_create(
+        [SymbolStats(**s) for s in stats],
+        update_conflicts=True,
+        unique_fields=['symbol'],
+        update_fields=update_fields,
+    )
+    cache.set_many({_cache_key(s['symbol']): s for s in stats}, STATS_TTL)
+    logger.info(f"Symbol stats refreshed for {len(stats)} symbols as of {as_of}")
+    return len(stats)
+
+
+def close_day(day):
+    """Session-close hook: roll the day into bars, then refresh the stats."""
+    record_daily_bars(day)
+    return refresh_stats(day)
+
+
+def rebuild(since=None):
+    """Re-derive DailyBars for every day with ticks (on/after `since`) and refresh stats."""
+    days = NEPSEPrice.objects.all()
+    if since:
+        days = days.filter(timestamp__date__gte=since)
+    for day in days.dates('timestamp', 'day'):
+        if history_cache.is_closed_day(day):
+            record_daily_bars(day)
+    return refresh_stats()
+
+
+def get_stats(symbol):
+    """Stats dict for a symbol (cache first, then the stored row), or None."""
+    key = _cache_key(symbol)
+    stats = cache.get(key)
+    if stats is None:
+        stats = SymbolStats.objects.filter(symbol=symbol.upper()).values(*STAT_FIELDS).first()
+        if stats is None:
+            return None
+        cache.set(key, stats, STATS_TTL)
+    return stats
+
+
+def _pct(value, base):
+    return round((value - base) / base * 100, 2) if base else None
+
+
+def _trading_date(quote):
+    """Session date of the tick a quote was taken from (today if it carries no timestamp)."""
+    timestamp = parse_datetime(quote['timestamp']) if quote.get('timestamp') else None
+    return timezone.localdate(timestamp) if timestamp else timezone.localdate()
+
+
+def quote_payload(quote, stats):
+    """
+    Quote-page data for a live tick. Stats are frozen at the last closed
+    session; until the tick's session is rolled in, its high/low extend the
+    ranges and returns are measured from the live price. The session is the
+    quote's own trading date, so a closed session still quotes correctly on
+    the weekend, a holiday or before the next open.
+    """
+    trading_date = _trading_date(quote)
+    ltp = float(quote.get('ltp') or 0)
+    high = float(quote.get('high') or 0)
+    low = float(quote.get('low') or 0)
+
+    high_52, low_52 = stats['high_52'], stats['low_52']
+    ath, atl = stats['all_time_high'], stats['all_time_low']
+    if stats['as_of'] >= trading_date:
+        prev_close = stats['prev_close']
+    else:
+        prev_close = stats['last_close']
+        high_52, ath = max(high_52, high), max(ath, high)
+        if low > 0:
+            low_52 = min(low_52, low) if low_52 else low
+            atl = min(atl, low) if atl else low
+
+    return {
+        'symbol': quote['symbol'],
+        'ltp': ltp,
+        'change_pct': float(quote.get('change_pct') or 0),
+        'open': float(quote.get('open') or 0),
+        'high': high,
+        'low': low,
+        'prev_close': float(prev_close or 0),
+        'volume': float(quote.get('volume') or 0),
+        'high_52': float(high_52 or high),
+        'low_52': float(low_52 or low),
+        'all_time_high': float(ath or high),
+        'all_time_low': float(atl or low),
+        'sma_20': stats['sma_20'],
+        'sma_50': stats['sma_50'],
+        'sma_200': stats['sma_200'],
+        'avg_volume': stats['avg_volume_20'],
+        'returns': {
+            '1d': _pct(ltp, prev_close),
+            **{period: _pct(ltp, stats[f'ref_close_{period}']) for period in RETURN_PERIODS},
+        },
+        'stats_as_of': stats['as_of'].isoformat(),
+    }
@@ -0,0 +1,158 @@
+"""
+Trade Confirmation Emails (Transactional Outbox)
+Settlement writes one TradeEmail row per order filled in a match cycle in
+the same transaction as the fills, so a confirmation exists exactly when the trade
+does and no SMTP work happens inside the order request. The mail worker
+drains the outbox in batches: rows are claimed in a short transaction (SKIP
+LOCKED, then flipped to SENDING), fills are coalesced per user per order (one
+email for a 10-fill sweep, at the average price), users with buy/sell
+notifications off are skipped, and every email of the batch goes over one
+SMTP connection, outside any transaction. The outcome is recorded in a
+second short transaction. A failed email goes back to PENDING and is retried
+by the next drain, up to TRADE_EMAIL_MAX_ATTEMPTS; a batch whose worker died
+mid-send is claimed again after TRADE_EMAIL_CLAIM_TIMEOUT.
+"""
+from datetime import timedelta
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from myapp.models import CustomUser, Portfolio, TradeEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(trades):
+    """
+    One outbox row per order in settled trades [(buy_order, sell_order, qty, price)]
+    (call inside the settlement transaction).
+    """
+    rows = {}
+    for buy_order, sell_order, qty, price in trades:
+        for o in (buy_order, sell_order):
+            if o is None:
+                continue
+            row = rows.get(o.id)
+            if row is None:
+                row = rows[o.id] = TradeEmail(user_id=o.user_id, order_id=o.id, symbol=o.symbol, side=o.side,
+                                              qty=0, value=Decimal('0'))
+            row.qty += qty
+            row.value += Decimal(str(qty)) * price
+    rows = list(rows.values())
+    if rows:
+        TradeEmail.objects.bulk_create(rows)
+        transaction.on_commit(schedule_drain)
+    return rows
+
+
+def schedule_drain():
+    from myapp.tasks import send_trade_emails
+
+    try:
+        send_trade_emails.delay()
+    except Exception as e:
+        # The rows are safe in the outbox; the next drain picks them up
+        logger.warning(f"Could not queue the trade email drain: {e}")
+
+
+def _messages(rows):
+    """[(outbox rows, EmailMessage or None when skipped)], one per (user, order)."""
+    from myapp.utils import trade_confirmation_email
+
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row.user_id, row.order_id)].append(row)
+    users = CustomUser.objects.in_bulk({user_id for user_id, _ in groups})
+    holdings = dict(((u, s), q) for u, s, q in Portfolio.objects.filter(
+        user_id__in=users, symbol__in={row.symbol for row in rows}
+    ).values_list('user_id', 'symbol', 'quantity'))
+
+    out = []
+    for (user_id, order_id), group in groups.items():
+        user = users.get(user_id)
+        if user is None or not user.buy_sell_notifications or not user.email:
+            out.append((group, None))
+            continue
+        qty = sum(row.qty for row in group)
+        avg_price = sum(row.value for row in group) / qty
+        symbol = group[0].symbol
+        out.append((group, trade_confirmation_email(
+            user, symbol, group[0].side, qty, avg_price, order_id, holdings.get((user_id, symbol), 0)
+        )))
+    return out
+
+
+def _retry_or_fail(row):
+    row.attempts += 1
+    row.status = 'FAILED' if row.attempts >= settings.TRADE_EMAIL_MAX_ATTEMPTS else 'PENDING'
+
+
+def _claim(limit, now):
+    """Flip a batch of PENDING rows (and stale SENDING claims) to SENDING; returns them."""
+    stale = now - timedelta(seconds=settings.TRADE_EMAIL_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        # Concurrent drains skip each other's rows
+        rows = list(TradeEmail.objects.select_for_update(skip_locked=True).filter(
+            Q(status='PENDING') | Q(status='SENDING', claimed_at__lt=stale)
+        ).order_by('id')[:limit])
+        if rows:
+            TradeEmail.objects.filter(id__in=[row.id for row in rows]).update(status='SENDING', claimed_at=now)
+    for row in rows:
+        row.status, row.claimed_at = 'SENDING', now
+    return rows
+
+
+def drain(limit=None):
+    """Send one batch from the outbox. Returns the number of outbox rows it handled."""
+    limit = limit or settings.TRADE_EMAIL_BATCH
+    now = timezone.now()
+
+    # 1. Claim a batch
+    rows = _claim(limit, now)
+    if not rows:
+        return 0
+
+    # 2. Build the emails, then send them over one connection (no transaction open)
+    batch = _messages(rows)
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for group, message in batch:
+            if message is None:
+                for row in group:
+                    row.status = 'SKIPPED'
+                continue
+            try:
+                connection.send_messages([message])
+                sent += 1
+                for row in group:
+                    row.status, row.sent_at = 'SENT', now
+            except Exception as e:
+                logger.error(f"Trade email to user {group[0].user_id} failed: {e}")
+                for row in group:
+                    _retry_or_fail(row)
+    except Exception as e:
+        # No connection at all: the batch goes back to PENDING for the next drain
+        logger.error(f"Trade email connection failed: {e}")
+        for row in rows:
+            if row.status == 'SENDING':
+                _retry_or_fail(row)
+    finally:
+        connection.close()
+
+    # 3. Record the outcome of the rows still ours (not reclaimed after a timeout)
+    with transaction.atomic():
+        owned = set(TradeEmail.objects.select_for_update().filter(
+            id__in=[row.id for row in rows], status='SENDING', claimed_at=now
+        ).values_list('id', flat=True))
+        TradeEmail.objects.bulk_update([row for row in rows if row.id in owned], ['status', 'attempts', 'sent_at'])
+
+    logger.info(f"Trade emails: {sent} sent for {len(rows)} fills")
+    return len(rows)
@@ -0,0 +1,234 @@
+"""
+Conditional Order Trigger Engine
+Pending stop-loss / take-profit orders are indexed per symbol in two sorted
+lists of (trigger price, id): ABOVE triggers fire when the LTP rises to them
+(a prefix of the list), BELOW triggers when it falls to them (a suffix). A
+tick finds every fired trigger with one bisect per side, so evaluation costs
+O(log n + fired) per symbol with pending conditions, however many are pending.
+
+Fired conditions become ordinary LIMIT orders in one batch: OCO partners are
+cancelled, limit prices are checked against the session, circuit and tick
+size like any order (order_validation), funds/holdings are checked for the
+batch with two queries, orders
+are bulk-created (BUY funds and SELL shares reserved with one update each)
+and handed to their matching shards, one task per shard.
+Like the order books, the index is per process and re-syncs from the
+database with one aggregate query whenever the pending set changed elsewhere.
+"""
+import logging
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Value, When
+from django.utils import timezone
+
+from myapp.models import ConditionalOrder, CustomUser, Order, Portfolio
+from myapp.services import order_validation
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerBook:
+    """Pending triggers of one symbol."""
+
+    def __init__(self):
+        self.above = []   # sorted (trigger, id); fire when ltp >= trigger
+        self.below = []   # sorted (trigger, id); fire when ltp <= trigger
+
+    def _side(self, direction):
+        return self.above if direction == 'ABOVE' else self.below
+
+    def add(self, cond_id, direction, trigger):
+        insort(self._side(direction), (trigger, cond_id))
+
+    def remove(self, cond_id, direction, trigger):
+        side = self._side(direction)
+        i = bisect_left(side, (trigger, cond_id))
+        if i < len(side) and side[i] == (trigger, cond_id):
+            del side[i]
+
+    def pop_triggered(self, ltp):
+        """Ids of every trigger `ltp` crosses, removed from the book."""
+        n = bisect_right(self.above, (ltp, math.inf))
+        m = bisect_left(self.below, (ltp, -math.inf))
+        fired = [cond_id for _, cond_id in self.above[:n]] + [cond_id for _, cond_id in self.below[m:]]
+        del self.above[:n]
+        del self.below[m:]
+        return fired
+
+    def __len__(self):
+        return len(self.above) + len(self.below)
+
+
+class TriggerIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.books = {}      # symbol -> TriggerBook
+        self.pending = {}    # id -> (symbol, direction, trigger)
+        self.loaded = False
+
+    def _pending(self):
+        return ConditionalOrder.objects.filter(status='PENDING')
+
+    def reload(self):
+        self.books.clear()
+        self.pending.clear()
+        for row in self._pending().values_list('id', 'symbol', 'direction', 'trigger_price'):
+            self.add(*row)
+        self.loaded = True
+
+    def fingerprint(self):
+        return (len(self.pending), max(self.pending) if self.pending else None)
+
+    def sync(self):
+        """Reload if the pending conditions in the DB differ from the index (one aggregate query)."""
+        if self.loaded:
+            db = self._pending().aggregate(n=Count('id'), max_id=Max('id'))
+            if (db['n'], db['max_id']) == self.fingerprint():
+                return
+        self.reload()
+
+    def add(self, cond_id, symbol, direction, trigger):
+        self.pending[cond_id] = (symbol, direction, trigger)
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = TriggerBook()
+        book.add(cond_id, direction, trigger)
+
+    def discard(self, cond_id):
+        entry = self.pending.pop(cond_id, None)
+        if entry:
+            symbol, direction, trigger = entry
+            self.books[symbol].remove(cond_id, direction, trigger)
+
+    def evaluate(self, ltps):
+        """Pop the ids fired by {symbol: ltp}; only symbols with pending conditions are looked at."""
+        fired = []
+        for symbol in [s for s in self.books if s in ltps]:
+            ids = self.books[symbol].pop_triggered(ltps[symbol])
+            for cond_id in ids:
+                del self.pending[cond_id]
+            if not self.books[symbol]:
+                del self.books[symbol]
+            fired += ids
+        return fired
+
+
+_index = TriggerIndex()
+
+
+def reset():
+    """Forget the index (it reloads from the DB on the next tick)."""
+    global _index
+    _index = TriggerIndex()
+
+
+def _reject(cond, reason):
+    cond.status = 'REJECTED'
+    cond.reject_reason = reason
+
+
+@transaction.atomic
+def fire(cond_ids):
+    """Turn fired conditions into orders (one batch). Returns the Orders created."""
+    now = timezone.now()
+
+    # 1. Lock the fired conditions; one leg per OCO group fires, its partners are cancelled
+    conds = list(ConditionalOrder.objects.select_for_update().filter(id__in=cond_ids, status='PENDING').order_by('id'))
+    firing, groups = [], set()
+    for cond in conds:
+        if cond.oco_group and cond.oco_group in groups:
+            cond.status = 'CANCELLED'
+            continue
+        groups.add(cond.oco_group)
+        firing.append(cond)
+    groups.discard(None)
+    partners = list(ConditionalOrder.objects.filter(oco_group__in=groups, status='PENDING')
+                    .exclude(id__in=[c.id for c in conds]).values_list('id', flat=True))
+    if partners:
+        ConditionalOrder.objects.filter(id__in=partners).update(status='CANCELLED')
+        with _index.lock:
+            for cond_id in partners:
+                _index.discard(cond_id)
+
+    # 2. Funds and holdings for the whole batch
+    buyers = {c.user_id for c in firing if c.side == 'BUY'}
+    balances = dict(CustomUser.objects.select_for_update().filter(id__in=buyers).values_list('id', 'virtual_balance'))
+    holdings = defaultdict(int, {
+        (u, s): q - r for u, s, q, r in Portfolio.objects.select_for_update().filter(
+            user_id__in={c.user_id for c in firing if c.side == 'SELL'},
+            symbol__in={c.symbol for c in firing},
+        ).values_list('user_id', 'symbol', 'quantity', 'reserved_qty')
+    })
+
+    context = order_validation.get_context()
+    context.load_bands({c.symbol for c in firing})
+    orders, reserve, shares = [], defaultdict(Decimal), defaultdict(int)
+    for cond in firing:
+        error = context.check_price(cond.symbol, cond.limit_price)
+        if error:
+            _reject(cond, error)
+            continue
+        if cond.side == 'BUY':
+            cost = Decimal(str(cond.qty)) * cond.limit_price
+            if balances.get(cond.user_id, 0) - reserve[cond.user_id] < cost:
+                _reject(cond, 'Insufficient balance.')
+                continue
+            reserve[cond.user_id] += cost
+        else:
+            if holdings[(cond.user_id, cond.symbol)] < cond.qty:
+                _reject(cond, 'You do not have enough shares to sell.')
+                continue
+            holdings[(cond.user_id, cond.symbol)] -= cond.qty
+            shares[(cond.user_id, cond.symbol)] += cond.qty
+        cond.order = Order(
+            user_id=cond.user_id, symbol=cond.symbol, side=cond.side,
+            order_type='STOP_LOSS' if cond.kind == 'STOP_LOSS' else 'LIMIT',
+            qty=cond.qty, price=cond.limit_price, status='OPEN',
+        )
+        cond.status = 'TRIGGERED'
+        cond.triggered_at = now
+        orders.append(cond.order)
+
+    # 3. Place the orders, reserve BUY funds and SELL shares, record the outcome, set-based
+    Order.objects.bulk_create(orders)
+    if reserve:
+        CustomUser.objects.filter(id__in=reserve).update(virtual_balance=F('virtual_balance') - Case(
+            *[When(id=user_id, then=Value(amount)) for user_id, amount in reserve.items()],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+    order_validation.adjust_reserved_shares(shares)
+    for cond in conds:
+        cond.order_id = cond.order.id if cond.order else None
+    ConditionalOrder.objects.bulk_update(conds, ['status', 'order', 'triggered_at', 'reject_reason'])
+    return orders
+
+
+def on_tick(quotes=None):
+    """
+    Evaluate a tick ({symbol: quote dict}, default: the retained market
+    snapshot) and hand the triggered orders to the matching shards.
+    Returns the Orders placed.
+    """
+    from myapp.services import matching_service
+    from myapp.services.market_feed import latest_quotes
+
+    if quotes is None:
+        quotes = latest_quotes()
+    ltps = {symbol: Decimal(str(q['ltp'])) for symbol, q in quotes.items() if q.get('ltp')}
+
+    with _index.lock:
+        _index.sync()
+        fired = _index.evaluate(ltps)
+    if not fired:
+        return []
+
+    orders = fire(fired)
+    if orders:
+        matching_service.submit_batch(orders)
+    logger.info(f"Conditional orders: {len(fired)} triggered, {len(orders)} placed")
+    return orders
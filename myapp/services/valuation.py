@@ -0,0 +1,176 @@
+"""
+Portfolio Mark-to-Market
+After each ingested tick every holding is valued in one vectorized pass: all
+positions are loaded as arrays (user index, symbol index, quantity, average
+price), priced by indexing the tick's price vector, and summed per user with
+np.bincount. The result is written with one bulk_update of
+CustomUser.portfolio_value and one PortfolioSnapshot per user, so the
+dashboard and analytics endpoints only read.
+
+As the dashboards did, a holding without a price in the tick is valued at
+its average price, and one without a previous close has no day change.
+Users who sold out since the last pass are written down to zero.
+
+Trades move holdings between passes, so settlement also revalues just the
+traders once the fills commit. Both value at the tick the UI shows: the
+playback minute when replaying, else the latest scrape.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from myapp.models import CustomUser, NEPSEPrice, Portfolio, PortfolioSnapshot
+from myapp.services.playback_engine import get_playback_state
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ['market_value', 'cost_basis', 'prev_value', 'holdings_count']
+
+
+def _money(x):
+    return Decimal(f'{x:.2f}')
+
+
+def reference_time():
+    """The tick the UI shows: the playback minute when replaying, else the latest scrape."""
+    state = get_playback_state()
+    if state['is_playback'] and state['timestamp']:
+        return state['timestamp']
+    return NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
+
+
+def tick_prices(timestamp):
+    """{symbol: ltp} of the tick at `timestamp`."""
+    return dict(NEPSEPrice.objects.filter(timestamp=timestamp, ltp__gt=0).values_list('symbol', 'ltp'))
+
+
+def previous_closes(timestamp):
+    """{symbol: close} at the last tick of the session before `timestamp`'s day."""
+    prev_time = NEPSEPrice.objects.filter(timestamp__date__lt=timestamp.date()).aggregate(Max('timestamp'))['timestamp__max']
+    if not prev_time:
+        return {}
+    return {
+        symbol: close or ltp
+        for symbol, close, ltp in NEPSEPrice.objects.filter(timestamp=prev_time).values_list('symbol', 'close', 'ltp')
+        if close or ltp
+    }
+
+
+def value(positions, prices, prev_closes):
+    """
+    Value positions [(user_id, symbol, qty, avg_price)] in one pass.
+    Returns (user_ids, {field: per-user array}) for the fields of PortfolioSnapshot.
+    """
+    if not positions:
+        return np.zeros(0, dtype=np.int64), {f: np.zeros(0) for f in SNAPSHOT_FIELDS}
+    user_ids, symbols, qty, avg = zip(*positions)
+    users, user_idx = np.unique(np.array(user_ids), return_inverse=True)
+    names, symbol_idx = np.unique(np.array(symbols), return_inverse=True)
+    qty = np.array(qty, dtype=float)
+    avg = np.array(avg, dtype=float)
+
+    # Price vectors over the symbol universe, gathered per position
+    ltp = np.array([prices.get(s, np.nan) for s in names], dtype=float)[symbol_idx]
+    ltp = np.where(np.isnan(ltp), avg, ltp)
+    prev = np.array([prev_closes.get(s, np.nan) for s in names], dtype=float)[symbol_idx]
+    prev = np.where(np.isnan(prev), ltp, prev)
+
+    n = len(users)
+    return users, {
+        'market_value': np.bincount(user_idx, weights=qty * ltp, minlength=n),
+        'cost_basis': np.bincount(user_idx, weights=qty * avg, minlength=n),
+        'prev_value': np.bincount(user_idx, weights=qty * prev, minlength=n),
+        'holdings_count': np.bincount(user_idx, minlength=n),
+    }
+
+
+def snapshots(positions, timestamp):
+    """Unsaved PortfolioSnapshots of `positions` at the tick `timestamp`."""
+    users, totals = value(positions, tick_prices(timestamp), previous_closes(timestamp))
+    return [
+        PortfolioSnapshot(
+            user_id=int(user_id), timestamp=timestamp,
+            market_value=_money(totals['market_value'][i]),
+            cost_basis=_money(totals['cost_basis'][i]),
+            prev_value=_money(totals['prev_value'][i]),
+            holdings_count=int(totals['holdings_count'][i]),
+        )
+        for i, user_id in enumerate(users)
+    ]
+
+
+def revalue(timestamp=None, user_ids=None):
+    """
+    Mark every portfolio, or only those of `user_ids`, to the tick at
+    `timestamp` (default: the reference tick). Returns the users written.
+    """
+    if timestamp is None:
+        timestamp = reference_time()
+    if not timestamp:
+        return 0
+
+    # 1. All positions and both price vectors, then one vectorized pass
+    held = Portfolio.objects.filter(quantity__gt=0)
+    valued = CustomUser.objects.filter(portfolio_value__gt=0)
+    if user_ids is not None:
+        held = held.filter(user_id__in=user_ids)
+        valued = valued.filter(id__in=user_ids)
+    rows = snapshots(list(held.values_list('user_id', 'symbol', 'quantity', 'avg_price')), timestamp)
+    emptied = list(valued.exclude(id__in=held.values('user_id')).values_list('id', flat=True))
+    rows += [
+        PortfolioSnapshot(user_id=user_id, timestamp=timestamp, market_value=0, cost_basis=0, prev_value=0)
+        for user_id in emptied
+    ]
+
+    # 2. Bulk-write the values and the snapshots
+    batch = settings.VALUATION_BATCH
+    with transaction.atomic():
+        CustomUser.objects.bulk_update(
+            [CustomUser(id=s.user_id, portfolio_value=s.market_value) for s in rows], ['portfolio_value'],
+            batch_size=batch,
+        )
+        PortfolioSnapshot.objects.bulk_create(
+            rows, batch_size=batch,
+            update_conflicts=True, unique_fields=['user', 'timestamp'], update_fields=SNAPSHOT_FIELDS,
+        )
+    if user_ids is not None:
+        return len(rows)
+
+    # 3. Drop snapshots past the retention window
+    PortfolioSnapshot.objects.filter(
+        timestamp__lt=timestamp - timedelta(days=settings.PORTFOLIO_SNAPSHOT_RETENTION_DAYS)
+    ).delete()
+    logger.info(f"Valued {len(rows)} portfolios at {timestamp}")
+    return len(rows)
+
+
+def revalue_on_commit(trades):
+    """Queue a revaluation of the traders of `trades` once the matching transaction commits."""
+    from myapp.tasks import revalue_portfolios
+
+    user_ids = sorted({o.user_id for trade in trades for o in trade[:2] if o is not None})
+    if user_ids:
+        transaction.on_commit(lambda: revalue_portfolios.delay(user_ids=user_ids))
+
+
+def latest(user, timestamp=None):
+    """
+    The user's last PortfolioSnapshot up to the tick at `timestamp` (default:
+    the reference tick). Before a pass has covered the user it is valued on
+    the spot (not saved). None if there is no tick yet.
+    """
+    if timestamp is None:
+        timestamp = reference_time()
+    if not timestamp:
+        return None
+    snapshot = PortfolioSnapshot.objects.filter(user=user, timestamp__lte=timestamp).order_by('-timestamp').first()
+    if snapshot is not None:
+        return snapshot
+    positions = list(Portfolio.objects.filter(user=user, quantity__gt=0).values_list('user_id', 'symbol', 'quantity', 'avg_price'))
+    rows = snapshots(positions, timestamp)
+    return rows[0] if rows else PortfolioSnapshot(user=user, timestamp=timestamp, market_value=0, cost_basis=0, prev_value=0)
@@ -0,0 +1,60 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from myapp.models import Stock, Sector, CustomUser, TradeExecution
+from myapp.services import symbol_index, platform_stats
+
+
+def _search_fields(stock):
+    return (stock.symbol, stock.company_name, stock.sector_id)
+
+
+# 1. SYMBOL SEARCH INDEX
+# The scraper re-saves every Stock each minute for prices; only rebuild the
+# index when something searchable actually changed.
+@receiver(post_init, sender=Stock)
+def remember_stock_search_fields(sender, instance, **kwargs):
+    instance._search_fields = _search_fields(instance)
+
+
+@receiver(post_save, sender=Stock)
+def refresh_index_on_stock_save(sender, instance, created, **kwargs):
+    current = _search_fields(instance)
+    if created or current != getattr(instance, '_search_fields', None):
+        symbol_index.invalidate()
+    instance._search_fields = current
+
+
+@receiver(post_delete, sender=Stock)
+@receiver(post_save, sender=Sector)
+@receiver(post_delete, sender=Sector)
+def refresh_index_on_change(sender, instance, **kwargs):
+    symbol_index.invalidate()
+
+
+# 2. PLATFORM COUNTERS
+# Running totals for the landing page instead of table-wide aggregates.
+_COUNTER_FOR = {CustomUser: platform_stats.TRADERS, Stock: platform_stats.LISTED_STOCKS}
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Stock)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        platform_stats.add(_COUNTER_FOR[sender], 1)
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Stock)
+def count_deleted(sender, instance, **kwargs):
+    platform_stats.add(_COUNTER_FOR[sender], -1)
+
+
+@receiver(post_save, sender=TradeExecution)
+def add_trade_volume(sender, instance, created, **kwargs):
+    if created:
+        platform_stats.add(platform_stats.TRADE_VOLUME, instance.executed_qty * instance.executed_price)
+
+
+@receiver(post_delete, sender=TradeExecution)
+def remove_trade_volume(sender, instance, **kwargs):
+    platform_stats.add(platform_stats.TRADE_VOLUME, -(instance.executed_qty * instance.executed_price))
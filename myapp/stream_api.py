@@ -0,0 +1,83 @@
+"""
+Server-Sent Events Push Endpoint
+Replaces client polling with a single long-lived stream per page.
+Serve through ASGI (NepseSewa/asgi.py) so idle streams don't hold a worker thread.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from myapp.services.pubsub import (
+    get_broker, encode, quote_topic, depth_topic, orders_topic, TOPIC_MARKET, TOPIC_INDEX
+)
+from myapp.services.market_feed import retained_snapshot
+
+HEARTBEAT_SECONDS = 15
+MAX_QUOTE_TOPICS = 20
+
+
+def parse_topics(raw, user):
+    """
+    ?topics=market,index,quote:NABIL,depth:NABIL,orders
+    'orders' is mapped to the caller's private topic and needs a login.
+    Quote and depth topics share the MAX_QUOTE_TOPICS budget.
+    """
+    topics = []
+    quotes = 0
+    for name in (raw or '').split(','):
+        name = name.strip()
+        if name in (TOPIC_MARKET, TOPIC_INDEX):
+            topics.append(name)
+        elif name == 'orders':
+            if user.is_authenticated:
+                topics.append(orders_topic(user.id))
+        elif name.lower().startswith(('quote:', 'depth:')) and quotes < MAX_QUOTE_TOPICS:
+            kind, symbol = name.split(':', 1)
+            symbol = symbol.strip().upper()
+            if symbol:
+                topics.append(quote_topic(symbol) if kind.lower() == 'quote' else depth_topic(symbol))
+                quotes += 1
+    return list(dict.fromkeys(topics))
+
+
+def format_event(topic, data):
+    """SSE frame. Event name is the topic kind ('quote', 'orders', ...)."""
+    return f"event: {topic.split(':', 1)[0]}\ndata: {data}\n\n"
+
+
+async def event_stream(topics):
+    sub = get_broker().subscribe(topics)
+    try:
+        yield "retry: 5000\n\n"
+        for topic in topics:
+            snap = await sync_to_async(retained_snapshot)(topic)
+            if snap is not None:
+                yield format_event(topic, encode(snap))
+        while True:
+            try:
+                topic, data = await sub.get(timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield format_event(topic, data)
+    finally:
+        sub.close()
+
+
+@require_GET
+async def api_stream(request):
+    """
+    GET /api/stream/?topics=market,index,quote:NABIL,orders
+    text/event-stream of market snapshot diffs, index bar, symbol quotes and own orders.
+    """
+    user = await request.auser()
+    topics = parse_topics(request.GET.get('topics'), user)
+    if not topics:
+        return JsonResponse({'success': False, 'error': 'No valid topics requested'}, status=400)
+
+    response = StreamingHttpResponse(event_stream(topics), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,4 +1,5 @@
 from celery import shared_task
+from celery.signals import worker_ready
 from django.core.management import call_command
 from custom_admin.models import SystemSetting
 import logging
@@ -59,3 +60,211 @@ def generate_watchlist_recommendations():
         logger.info("Watchlist recommendation task completed successfully")
     except Exception as e:
         logger.error(f"Error in watchlist recommendation task: {str(e)}")
+
+@shared_task
+def publish_market_tick():
+    """
+    Task to push the current reference tick to SSE subscribers.
+    Runs every minute so playback mode (no scraper) still streams.
+    """
+    from myapp.services.market_feed import publish_tick
+    from myapp.services.playback_engine import get_playback_state
+
+    try:
+        state = get_playback_state()
+        publish_tick(state['timestamp'] if state['is_playback'] else None)
+        # Orders in this process validate against the new tick
+        from myapp.services import order_validation
+        order_validation.invalidate()
+        # Conditional orders fire off the tick just retained by publish_tick
+        from myapp.services import trigger_engine
+        trigger_engine.on_tick()
+        if state['is_playback']:
+            # Resting demo orders fill against the new tick, one batch per shard
+            from myapp.services import liquidity_sim
+            liquidity_sim.schedule_sweep(state['timestamp'])
+            # No scraper in playback: value the portfolios here
+            revalue_portfolios.delay(state['timestamp'].isoformat())
+    except Exception as e:
+        logger.error(f"Error in market tick publish task: {str(e)}")
+
+@shared_task
+def revalue_portfolios(timestamp=None, user_ids=None):
+    """
+    Task to mark every portfolio (or only those of `user_ids`) to the tick at
+    `timestamp` (default: the one the UI shows) in one vectorized pass.
+    Queued after each tick, and for the traders after each match batch.
+    """
+    from datetime import datetime
+    from myapp.services import valuation
+
+    try:
+        return valuation.revalue(datetime.fromisoformat(timestamp) if timestamp else None, user_ids)
+    except Exception as e:
+        logger.error(f"Error in portfolio valuation task: {str(e)}")
+
+@shared_task
+def warm_history_cache(day=None):
+    """
+    Task to pre-warm the historical response cache for a closed trading day.
+    Queued by the market session when it closes.
+    """
+    from datetime import date
+    from django.utils import timezone
+    from myapp.services import history_cache
+
+    try:
+        history_cache.warm_day(date.fromisoformat(day) if day else timezone.localdate())
+    except Exception as e:
+        logger.error(f"Error in history cache warm task: {str(e)}")
+
+@shared_task
+def update_symbol_stats(day=None):
+    """
+    Task to roll a closed trading day into DailyBars and refresh SymbolStats.
+    Queued by the market session when it closes.
+    """
+    from datetime import date
+    from django.utils import timezone
+    from myapp.services import symbol_stats
+
+    try:
+        symbol_stats.close_day(date.fromisoformat(day) if day else timezone.localdate())
+    except Exception as e:
+        logger.error(f"Error in symbol stats task: {str(e)}")
+
+@shared_task
+def match_order_task(order_id, playback_timestamp=None):
+    """
+    Task to match one order on its symbol's shard queue (matching.<n>).
+    The result is the reply the placing request waits for.
+    """
+    from datetime import datetime
+    from myapp.services import matching_service
+
+    return matching_service.run_match(
+        order_id, datetime.fromisoformat(playback_timestamp) if playback_timestamp else None
+    )
+
+@shared_task
+def match_orders_task(order_ids, playback_timestamp=None):
+    """
+    Task to match a batch of saved orders (triggered conditional orders, batch
+    API placements) on their shard, in order.
+    """
+    from datetime import datetime
+    from myapp.services import matching_service
+
+    return matching_service.run_match_batch(
+        order_ids, datetime.fromisoformat(playback_timestamp) if playback_timestamp else None
+    )
+
+@shared_task
+def cancel_order_task(order_id):
+    """
+    Task to cancel an order on its symbol's shard queue, so cancels and
+    matches for a symbol are applied by the same single writer.
+    """
+    from myapp.services import matching_service
+
+    return matching_service.run_cancel(order_id)
+
+@shared_task
+def refresh_depth_task(symbols):
+    """
+    Task to resync the books of `symbols` on their shard and publish any
+    depth change (after cancels applied outside the shard).
+    """
+    from myapp.services import order_depth
+
+    for symbol in symbols:
+        try:
+            order_depth.refresh(symbol)
+        except Exception as e:
+            logger.error(f"Error refreshing depth of {symbol}: {str(e)}")
+
+@shared_task
+def auction_uncross_task(shard):
+    """
+    Task to uncross the pre-open call auction for one shard's symbols. Queued
+    on that shard, so it runs before any continuous order behind it.
+    """
+    from myapp.services import call_auction
+
+    results = call_auction.uncross_shard(shard)
+    logger.info(f"Pre-open auction uncrossed on shard {shard}: {results}")
+    return results
+
+@shared_task
+def playback_sweep_task(shard, timestamp):
+    """
+    Task to fill one shard's resting orders against the current playback tick.
+    Queued on that shard by publish_market_tick.
+    """
+    from datetime import datetime
+    from myapp.services import liquidity_sim
+
+    try:
+        return len(liquidity_sim.sweep(shard, datetime.fromisoformat(timestamp)))
+    except Exception as e:
+        logger.error(f"Error in playback sweep task (shard {shard}): {str(e)}")
+
+@shared_task
+def expire_day_orders():
+    """
+    Task to cancel the orders still open at the session close, refunding BUY
+    reservations, then snapshot the order journal over the emptied book.
+    """
+    from myapp.services import order_expiry
+
+    try:
+        order_expiry.expire_orders()
+    except Exception as e:
+        logger.error(f"Error in order expiry task: {str(e)}")
+    snapshot_order_journal.delay()
+
+@shared_task
+def send_trade_emails():
+    """
+    Task to drain the trade confirmation outbox, one SMTP connection per
+    batch; re-queues itself while full batches keep coming.
+    """
+    from django.conf import settings
+    from myapp.services import trade_mail
+
+    try:
+        if trade_mail.drain() >= settings.TRADE_EMAIL_BATCH:
+            send_trade_emails.delay()
+    except Exception as e:
+        logger.error(f"Error in trade email task: {str(e)}")
+
+@shared_task
+def snapshot_order_journal():
+    """
+    Task to store a compact snapshot of the open book, balances and holdings,
+    so journal replays start close to the target instead of from the beginning.
+    """
+    from myapp.services import order_journal
+
+    try:
+        order_journal.take_snapshot()
+    except Exception as e:
+        logger.error(f"Error in journal snapshot task: {str(e)}")
+
+@worker_ready.connect
+def warm_start_matching_shard(sender=None, **kwargs):
+    """
+    Matching shard workers (started by run_matching_workers) rebuild their
+    in-memory books from the journal on boot instead of re-querying orders.
+    """
+    import os
+    from myapp.services import order_journal
+
+    shard = os.environ.get('MATCHING_SHARD')
+    if shard is None:
+        return
+    try:
+        count = order_journal.warm_start(order_journal.replay(), shard=int(shard))
+        logger.info(f"Matching shard {shard} warm-started with {count} resting orders")
+    except Exception as e:
+        logger.error(f"Error warm-starting matching shard {shard}: {str(e)}")
@@ -0,0 +1,19 @@
+from decimal import Decimal
+
+from myapp.models import Order
+from myapp.services import matching_service, order_validation
+
+
+def place(user, side, qty, price, symbol='NABIL', at=None):
+    """
+    Place a LIMIT order the way the order views do: reserve its funds (BUY)
+    or shares (SELL), then hand it to matching (`at`: a playback tick).
+    Returns the order as matching left it.
+    """
+    order = Order.objects.create(user=user, symbol=symbol, side=side, qty=qty, price=Decimal(price))
+    error = order_validation.reserve(order)
+    if error:
+        raise AssertionError(f"Could not reserve {side} {qty} {symbol} @ {price}: {error}")
+    matching_service.run_match(order.id, at)
+    order.refresh_from_db()
+    return order
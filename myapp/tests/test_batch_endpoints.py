@@ -0,0 +1,46 @@
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from decimal import Decimal
+from myapp.models import CustomUser, NEPSEPrice, NEPSEIndex, Watchlist
+from myapp.services.market_context import parse_field_selection, select_fields
+
+
+class FieldSelectionTestCase(SimpleTestCase):
+    def test_select_fields_on_rows_and_dicts(self):
+        rows = [{'symbol': 'NABIL', 'ltp': 500, 'volume': 10}]
+        self.assertEqual(select_fields(rows, {'symbol', 'ltp'}), [{'symbol': 'NABIL', 'ltp': 500}])
+        self.assertEqual(select_fields({'rank': 1, 'total_users': 9}, {'rank'}), {'rank': 1})
+        # No selection -> untouched
+        self.assertIs(select_fields(rows, set()), rows)
+
+    def test_parse_field_selection(self):
+        params = {'fields.latest': 'symbol, ltp', 'fields.summary': ''}
+        self.assertEqual(parse_field_selection(params, ['latest', 'summary']), {'latest': {'symbol', 'ltp'}})
+
+
+class DashboardBundleTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='trader', email='trader@test.com', password='password123',
+            virtual_balance=Decimal('100000.00'), portfolio_value=Decimal('0.00')
+        )
+        now = timezone.now()
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=now, ltp=500, change_pct=1.5, turnover=1000)
+        NEPSEIndex.objects.create(timestamp=now, index_value=2100.0, percentage_change=0.5)
+        Watchlist.objects.create(user=self.user, symbol='NABIL')
+        self.client.login(email='trader@test.com', password='password123')
+
+    def test_bundle_returns_requested_sections(self):
+        res = self.client.get('/api/dashboard/bundle/?sections=latest,watchlist&fields.latest=symbol,ltp')
+        body = res.json()
+        self.assertTrue(body['success'])
+        self.assertEqual(set(body['sections']), {'latest', 'watchlist'})
+        self.assertEqual(body['sections']['latest']['data'], [{'symbol': 'NABIL', 'ltp': 500.0}])
+        self.assertEqual(body['sections']['watchlist']['data'][0]['price'], 500.0)
+
+    def test_ticker_bar(self):
+        res = self.client.get('/api/ticker-bar/')
+        body = res.json()
+        self.assertTrue(body['success'])
+        self.assertEqual(body['data']['nepse']['value'], 2100.0)
+        self.assertIn('session', body['data'])
@@ -0,0 +1,137 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytz
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from myapp.models import CustomUser, MarketSession, Order, Portfolio, TradeExecution
+from myapp.services import call_auction, matching_service, order_book, order_journal, platform_stats
+from myapp.services.market_session import update_session_status
+from myapp.tests.helpers import place
+
+
+def D(values):
+    return [Decimal(str(v)) for v in values]
+
+
+class EquilibriumTestCase(TestCase):
+    def test_volume_maximising_price(self):
+        # demand 60/60/30/10 vs supply 15/35/60/60 over 99..102 -> 35 clears at 100
+        result = call_auction.equilibrium(D([102, 101, 100]), [10, 20, 30], D([99, 100, 101]), [15, 20, 25])
+        self.assertEqual(result, (Decimal('100.00'), 35))
+
+    def test_ties_go_to_the_reference_price_then_the_lower_price(self):
+        bids, asks = (D([101]), [10]), (D([99]), [10])
+        self.assertEqual(call_auction.equilibrium(*bids, *asks, ref_price=Decimal('100.5'))[0], Decimal('101.00'))
+        self.assertEqual(call_auction.equilibrium(*bids, *asks, ref_price=Decimal('99.2'))[0], Decimal('99.00'))
+        self.assertEqual(call_auction.equilibrium(*bids, *asks)[0], Decimal('99.00'))
+
+    def test_no_cross(self):
+        self.assertIsNone(call_auction.equilibrium(D([99]), [10], D([100]), [10]))
+        self.assertIsNone(call_auction.equilibrium([], [], D([100]), [10]))
+
+
+class CallAuctionTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        call_auction._uncrossed.clear()
+        platform_stats.recount()
+        MarketSession.objects.create(session_date=date.today(), status='PRE_OPEN', is_active=True)
+        self.buyers = [
+            CustomUser.objects.create_user(username=f'b{i}', email=f'b{i}@test.com', password='pw',
+                                           virtual_balance=Decimal('100000'))
+            for i in range(3)
+        ]
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=1000, avg_price=Decimal('400'))
+
+    def test_pre_open_orders_wait_and_uncross_at_one_price(self):
+        b1 = place(self.buyers[0], 'BUY', 10, '102')
+        b2 = place(self.buyers[1], 'BUY', 20, '101')
+        b3 = place(self.buyers[2], 'BUY', 30, '100')
+        place(self.seller, 'SELL', 15, '99')
+        place(self.seller, 'SELL', 20, '100')
+        a3 = place(self.seller, 'SELL', 25, '101')
+        self.assertFalse(TradeExecution.objects.exists())
+
+        MarketSession.objects.update(status='CONTINUOUS')
+        results = call_auction.uncross_shard(matching_service.shard_for('NABIL'))
+
+        self.assertEqual(results, {'NABIL': ('100.00', 35)})
+        self.assertEqual(set(TradeExecution.objects.values_list('executed_price', flat=True)), {Decimal('100.00')})
+        for order in (b1, b2, b3, a3):
+            order.refresh_from_db()
+        self.assertEqual((b1.status, b2.status, b3.status, a3.status), ('FILLED', 'FILLED', 'PARTIAL', 'OPEN'))
+        self.assertEqual(b3.filled_qty, 5)
+
+        # Buyers paid the auction price, not their limits
+        self.buyers[0].refresh_from_db()
+        self.assertEqual(self.buyers[0].virtual_balance, Decimal('99000'))
+
+        # The remainder opens the continuous book uncrossed
+        book = order_book.get_book('NABIL')
+        book.sync()
+        self.assertEqual(book.depth(), {'bids': [(Decimal('100'), 25)], 'asks': [(Decimal('101'), 25)]})
+        self.assertEqual(call_auction.crossed_symbols(), [])
+        self.assertEqual(order_journal.verify(order_journal.replay())['orders'], [])
+
+    def test_uncross_is_one_batch_whatever_the_fill_count(self):
+        def run(n):
+            Order.objects.filter(symbol='NABIL').delete()
+            for i in range(n):
+                place(self.buyers[i % 3], 'BUY', 1, '101')
+            place(self.seller, 'SELL', n, '100')
+            with CaptureQueriesContext(connection) as queries:
+                call_auction.uncross('NABIL', ref_price=Decimal('100'))
+            return len(queries)
+
+        self.assertEqual(run(2), run(30))
+
+    def test_first_continuous_order_uncrosses_a_missed_auction(self):
+        place(self.buyers[0], 'BUY', 10, '102')
+        place(self.seller, 'SELL', 10, '99')
+        MarketSession.objects.update(status='CONTINUOUS')
+
+        order = Order.objects.create(user=self.seller, symbol='NABIL', side='SELL', qty=5, price=Decimal('105'))
+        matching_service.run_match(order.id)
+        self.assertEqual(list(TradeExecution.objects.values_list('executed_qty', 'executed_price')),
+                         [(10, Decimal('99.00'))])
+
+    def test_restarted_worker_does_not_run_the_auction_again(self):
+        place(self.buyers[0], 'BUY', 10, '102')
+        place(self.seller, 'SELL', 10, '99')
+        MarketSession.objects.update(status='CONTINUOUS')
+        call_auction.uncross_shard(matching_service.shard_for('NABIL'))
+        place(self.buyers[1], 'BUY', 10, '103')
+
+        call_auction._uncrossed.clear()   # a fresh process
+        sell = place(self.seller, 'SELL', 10, '101')
+        self.assertEqual(sell.status, 'FILLED')
+        self.assertEqual(TradeExecution.objects.latest('id').executed_price, Decimal('103.00'))   # the maker's price
+
+    def test_missed_auction_leaves_the_incoming_order_to_continuous_matching(self):
+        place(self.buyers[0], 'BUY', 10, '102')
+        MarketSession.objects.update(status='CONTINUOUS')
+
+        sell = place(self.seller, 'SELL', 10, '99')
+        self.assertEqual((sell.status, sell.filled_qty), ('FILLED', 10))
+        self.assertEqual(list(TradeExecution.objects.values_list('executed_qty', 'executed_price')),
+                         [(10, Decimal('102.00'))])
+
+
+class PreOpenScheduleTestCase(TestCase):
+    def at(self, hour, minute):
+        return pytz.timezone('Asia/Kathmandu').localize(datetime(2025, 1, 1, hour, minute))  # a Wednesday
+
+    def test_session_enters_pre_open_and_uncrosses_at_the_open(self):
+        session = MarketSession.objects.create(session_date=date(2025, 1, 1), status='CLOSED')
+        update_session_status(session, self.at(10, 45))
+        self.assertEqual((session.status, session.is_active), ('PRE_OPEN', True))
+
+        with patch.object(call_auction, 'schedule_uncross') as schedule:
+            update_session_status(session, self.at(11, 0))
+        self.assertEqual(session.status, 'CONTINUOUS')
+        schedule.assert_called_once_with()
@@ -0,0 +1,66 @@
+import numpy as np
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from myapp.models import NEPSEPrice, CustomUser, Portfolio
+from myapp.services.downsample import lttb_indices
+
+
+class LTTBTestCase(SimpleTestCase):
+    def test_keeps_endpoints_and_spike(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50.0)
+        y[437] = 25  # a single-tick spike a [::step] sample would miss
+        keep = lttb_indices(x, y, 50)
+        self.assertEqual(len(keep), 50)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertIn(437, keep)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+
+    def test_small_series_untouched(self):
+        self.assertEqual(list(lttb_indices([1, 2, 3], [1, 2, 3], 10)), [0, 1, 2])
+
+
+class StockHistoryDownsampleTestCase(TestCase):
+    def setUp(self):
+        start = timezone.now() - timedelta(days=3)
+        NEPSEPrice.objects.bulk_create([
+            NEPSEPrice(
+                symbol='NABIL', timestamp=start + timedelta(minutes=i),
+                open=500, high=500 + (50 if i == 1234 else i % 7), low=490 - (i % 5),
+                close=500, ltp=500 + i % 7, volume=i, turnover=i * 10, change_pct=0.1
+            )
+            for i in range(2000)
+        ])
+
+    def test_max_points_caps_payload_and_keeps_extremes(self):
+        body = self.client.get('/api/stock-history/NABIL/?days=5&max_points=100').json()
+        self.assertTrue(body['downsampled'])
+        self.assertEqual(body['raw_points'], 2000)
+        self.assertLessEqual(body['data_points'], 100)
+        self.assertGreater(body['data_points'], 50)
+        self.assertEqual(max(h['high'] for h in body['history']), 550)
+        self.assertEqual(min(h['low'] for h in body['history']), 486)
+        # Last bucket ends on the last tick
+        self.assertEqual(body['history'][-1]['volume'], 1999)
+
+    def test_max_points_zero_returns_every_tick(self):
+        body = self.client.get('/api/stock-history/NABIL/?days=5&max_points=0').json()
+        self.assertFalse(body['downsampled'])
+        self.assertEqual(body['data_points'], 2000)
+
+
+class PortfolioPerformanceTestCase(TestCase):
+    def test_net_worth_series_forward_fills_missing_prices(self):
+        user = CustomUser.objects.create_user(
+            username='p', email='p@test.com', password='pw', virtual_balance=Decimal('1000.00')
+        )
+        Portfolio.objects.create(user=user, symbol='NABIL', quantity=10, avg_price=Decimal('500'))
+        now = timezone.now()
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=now - timedelta(minutes=2), ltp=500)
+        NEPSEPrice.objects.create(symbol='NICA', timestamp=now - timedelta(minutes=1), ltp=300)  # no NABIL tick
+        self.client.login(email='p@test.com', password='pw')
+
+        data = self.client.get('/api/portfolio/performance/?range=1D').json()['data']
+        self.assertEqual(data['values'][:2], [6000.0, 6000.0])
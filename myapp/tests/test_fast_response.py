@@ -0,0 +1,48 @@
+import gzip
+import json
+from datetime import timedelta
+from django.test import TestCase, SimpleTestCase, RequestFactory
+from django.utils import timezone
+from myapp.models import NEPSEPrice
+from myapp.services.fast_response import FastJsonResponse, negotiate_encoding, to_columns
+
+
+class FastJsonResponseTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_gzip_only_when_accepted_and_large(self):
+        rows = [{'symbol': f'S{i}', 'ltp': i * 1.5} for i in range(200)]
+        req = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        res = FastJsonResponse({'data': rows}, request=req)
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(res.content)), {'data': rows})
+
+        # Tiny payloads and clients without gzip get plain JSON
+        self.assertFalse(FastJsonResponse({'ok': True}, request=req).has_header('Content-Encoding'))
+        plain = FastJsonResponse({'data': rows}, request=self.factory.get('/'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    def test_negotiate_respects_q_zero(self):
+        req = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertIsNone(negotiate_encoding(req))
+
+    def test_to_columns(self):
+        rows = [{'symbol': 'A', 'ltp': 1}, {'symbol': 'B', 'ltp': 2}]
+        self.assertEqual(to_columns(rows, ('symbol', 'ltp')), {'symbol': ['A', 'B'], 'ltp': [1, 2]})
+
+
+class ColumnarHistoryTestCase(TestCase):
+    def test_history_row_and_column_shapes_match(self):
+        now = timezone.now()
+        for i in range(3):
+            NEPSEPrice.objects.create(symbol='NABIL', timestamp=now - timedelta(days=i), ltp=500 + i, close=None)
+
+        rows = self.client.get('/api/stock-history/NABIL/?days=5').json()
+        cols = self.client.get('/api/stock-history/NABIL/?days=5&shape=columns').json()
+
+        self.assertEqual(cols['shape'], 'columns')
+        self.assertEqual(rows['data_points'], 3)
+        self.assertEqual([h['ltp'] for h in rows['history']], cols['history']['ltp'])
+        self.assertEqual([h['timestamp'] for h in rows['history']], cols['history']['timestamp'])
+        self.assertEqual(cols['history']['close'], [0, 0, 0])
@@ -0,0 +1,47 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from myapp.models import NEPSEPrice, MarketSession, CustomUser
+from myapp.services import history_cache
+
+
+class HistoryCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        self.yesterday = self.now - timedelta(days=1)
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=self.yesterday - timedelta(minutes=5), ltp=490)
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=self.yesterday, ltp=500)
+
+    def test_closed_day_is_served_from_cache(self):
+        day = timezone.localdate(self.yesterday)
+        rows = history_cache.market_day_rows(day)
+        self.assertEqual([r['ltp'] for r in rows], [500])
+
+        NEPSEPrice.objects.filter(symbol='NABIL').update(ltp=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(history_cache.market_day_rows(day)[0]['ltp'], 500)
+
+        # Backfill / cleanup jobs invalidate
+        history_cache.invalidate()
+        self.assertEqual(history_cache.market_day_rows(day)[0]['ltp'], 1)
+
+    def test_today_cached_only_after_session_close(self):
+        today = timezone.localdate()
+        self.assertFalse(history_cache.is_closed_day(today))
+        MarketSession.objects.create(session_date=today, status='CLOSED', closed_at=self.now)
+        self.assertTrue(history_cache.is_closed_day(today))
+
+    def test_available_dates_adds_today_live(self):
+        self.assertEqual(history_cache.available_dates(), [timezone.localdate(self.yesterday).isoformat()])
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=self.now, ltp=510)
+        self.assertEqual(history_cache.available_dates()[0], timezone.localdate().isoformat())
+
+    def test_market_data_by_date_view(self):
+        CustomUser.objects.create_user(username='u', email='u@test.com', password='pw', virtual_balance=Decimal('0'))
+        self.client.login(email='u@test.com', password='pw')
+        day = timezone.localdate(self.yesterday).isoformat()
+        body = self.client.get(f'/api/market-data/?date={day}&search=NAB').json()
+        self.assertEqual([(s['symbol'], s['ltp'], s['sector']) for s in body['stocks']], [('NABIL', 500.0, 'Others')])
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytz
+from django.test import TestCase, override_settings
+
+from myapp.models import CustomUser, NEPSEPrice, Order, Portfolio, TradeExecution
+from myapp.services import liquidity_sim, matching_service, order_book, order_journal
+from myapp.tests.helpers import place
+
+
+class LiquiditySimTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        liquidity_sim.reset()
+        self.t0 = pytz.timezone('Asia/Kathmandu').localize(datetime(2025, 1, 1, 11, 0))
+        # Cumulative day volume 100 -> 130 -> 200 -> 300: the ticks traded 100, 30, 70, 100
+        for minutes, ltp, volume in [(0, 500, 100), (1, 495, 130), (2, 505, 200), (3, 498, 300)]:
+            NEPSEPrice.objects.create(symbol='NABIL', timestamp=self.tick(minutes), ltp=ltp, volume=volume)
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('100000'))
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=100, avg_price=Decimal('400'))
+
+    def tick(self, minutes):
+        return self.t0 + timedelta(minutes=minutes)
+
+    def test_fills_at_the_tick_price_capped_by_tick_volume_without_bot_rows(self):
+        order = place(self.buyer, 'BUY', 50, '500', at=self.tick(1))
+
+        self.assertEqual((order.status, order.filled_qty), ('PARTIAL', 30))
+        execution = TradeExecution.objects.get()
+        self.assertEqual((execution.executed_qty, execution.executed_price), (30, Decimal('495.00')))
+        self.assertIsNone(execution.sell_order_id)
+        self.assertIsNone(execution.seller_id)
+        self.assertFalse(CustomUser.objects.filter(username='marketbot').exists())
+        self.assertEqual(Order.objects.count(), 1)
+
+        # Reserved 50 x 500; 30 filled at 495 refunds 150
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.virtual_balance, Decimal('75150'))
+        self.assertEqual(Portfolio.objects.get(user=self.buyer).quantity, 30)
+
+        # The tick's volume is used up for everyone else
+        other = place(self.buyer, 'BUY', 5, '500', at=self.tick(1))
+        self.assertEqual(other.filled_qty, 0)
+
+    def test_sweep_fills_resting_orders_in_one_batch(self):
+        order_journal.take_snapshot()
+        buy = place(self.buyer, 'BUY', 50, '499', at=self.tick(0))      # 500 > 499: rests
+        sell = place(self.seller, 'SELL', 40, '500', at=self.tick(0))   # fills 40 of tick 0's 100 at 500
+        self.assertEqual(sell.status, 'FILLED')
+
+        self.assertEqual(liquidity_sim.sweep(matching_service.shard_for('NABIL'), self.tick(2)), [])   # 505
+        executions = liquidity_sim.sweep(matching_service.shard_for('NABIL'), self.tick(3))            # 498
+        self.assertEqual([(e.executed_qty, e.executed_price) for e in executions], [(50, Decimal('498.00'))])
+        buy.refresh_from_db()
+        self.assertEqual(buy.status, 'FILLED')
+        self.assertEqual(order_book.get_book('NABIL').depth(), {'bids': [], 'asks': []})
+
+        state = order_journal.replay()
+        self.assertEqual(order_journal.verify(state), {'orders': [], 'holdings': []})
+
+    @override_settings(PLAYBACK_SPREAD_BPS=10, PLAYBACK_IMPACT_BPS=20)
+    def test_slippage_moves_the_price_against_the_order_within_its_limit(self):
+        # 10bps spread + 20bps x (15 of the 30 available) = 20bps over 495
+        place(self.buyer, 'BUY', 15, '500', at=self.tick(1))
+        self.assertEqual(TradeExecution.objects.get().executed_price, Decimal('495.99'))
+
+        # 505 less 12.86bps is 504.35, below this seller's limit: the fill is capped at the limit
+        place(self.seller, 'SELL', 10, '504.90', at=self.tick(2))
+        self.assertEqual(TradeExecution.objects.latest('id').executed_price, Decimal('504.90'))
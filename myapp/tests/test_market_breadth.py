@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from myapp.models import NEPSEPrice, Sector, Stock, MarketBreadth
+from myapp.services import symbol_index
+from myapp.services.market_breadth import record_breadth, get_breadth
+
+
+class MarketBreadthTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        symbol_index.invalidate()
+        banks = Sector.objects.create(name='Commercial Banks')
+        hydro = Sector.objects.create(name='Hydropower')
+        for sym, sector in [('NABIL', banks), ('NICA', banks), ('UPPER', hydro)]:
+            Stock.objects.create(symbol=sym, company_name=sym, sector=sector)
+
+        self.ts = timezone.now()
+        for sym, ltp, pct, vol, turnover in [
+            ('NABIL', 500, 2.0, 100, 50000),
+            ('NICA', 300, -1.0, 300, 90000),
+            ('UPPER', 200, 0.0, 50, 10000),
+            ('XYZ', 100, 4.0, 10, 0),  # no Stock row -> 'Others'
+        ]:
+            NEPSEPrice.objects.create(symbol=sym, timestamp=self.ts, ltp=ltp, change_pct=pct,
+                                      volume=vol, turnover=turnover)
+
+    def test_breadth_and_sectors(self):
+        b = record_breadth()
+        self.assertEqual((b.advances, b.declines, b.unchanged, b.total), (2, 1, 1, 4))
+        self.assertEqual([r['symbol'] for r in b.top_gainers], ['XYZ', 'NABIL', 'UPPER', 'NICA'])
+        self.assertEqual(b.top_losers[0]['symbol'], 'NICA')
+        self.assertEqual([r['symbol'] for r in b.top_turnover], ['NICA', 'NABIL', 'UPPER'])
+
+        sectors = {s['name']: s for s in b.sectors}
+        self.assertEqual(sectors['Commercial Banks']['return_pct'], 0.5)
+        self.assertEqual(sectors['Commercial Banks']['turnover_share'], 93.33)
+        self.assertEqual((sectors['Others']['count'], sectors['Others']['advances']), (1, 1))
+
+    def test_views_read_the_stored_row(self):
+        get_breadth(self.ts)  # computed once on first read
+        self.assertEqual(MarketBreadth.objects.count(), 1)
+        stats = self.client.get('/api/stats/').json()
+        self.assertEqual((stats['gainers'], stats['losers'], stats['unchanged']), (2, 1, 1))
+        gainers = self.client.get('/api/gainers/').json()['data']
+        self.assertEqual(gainers[0], {'symbol': 'XYZ', 'ltp': 100.0, 'change_pct': 4.0, 'volume': 10.0})
+        self.assertEqual(len(self.client.get('/api/market/breadth/').json()['data']['sectors']), 3)
@@ -0,0 +1,33 @@
+from decimal import Decimal
+from django.test import TestCase, SimpleTestCase
+from myapp.models import CustomUser, Order
+from myapp.services.order_flow import OrderFlowGenerator
+from myapp.services.matching_bench import run_benchmark
+
+
+class OrderFlowTestCase(SimpleTestCase):
+    def test_seeded_flow_is_reproducible_and_in_band(self):
+        refs = {'NABIL': Decimal('500'), 'NICA': Decimal('300')}
+        a = list(OrderFlowGenerator(refs, seed=7, cancel_rate=0.2).events(500))
+        b = list(OrderFlowGenerator(refs, seed=7, cancel_rate=0.2).events(500))
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, list(OrderFlowGenerator(refs, seed=8).events(500)))
+
+        places = [e for e in a if e.kind == 'place']
+        self.assertTrue(all(refs[e.symbol] * Decimal('0.9') <= e.price <= refs[e.symbol] * Decimal('1.1') for e in places))
+        self.assertTrue(all(x.t < y.t for x, y in zip(a, a[1:])))
+        self.assertAlmostEqual(sum(e.kind == 'cancel' for e in a) / len(a), 0.2, delta=0.05)
+
+        skewed = list(OrderFlowGenerator(refs, seed=7, buy_ratio=0.9, cancel_rate=0).events(500))
+        self.assertGreater(sum(e.side == 'BUY' for e in skewed), 400)
+
+
+class MatchingBenchmarkTestCase(TestCase):
+    def test_small_run_reports_and_rolls_back(self):
+        report = run_benchmark(orders=80, symbols=2, traders=6, seed=3)
+        self.assertEqual(report['totals']['operations'], 80)
+        self.assertGreater(report['totals']['fills'], 0)
+        self.assertEqual(set(report['latency_ms']['place']), {'p50', 'p90', 'p99', 'max'})
+        self.assertGreater(report['queries_per_op']['place'], 0)
+        self.assertFalse(CustomUser.objects.filter(username__startswith='bench_').exists())
+        self.assertFalse(Order.objects.exists())
@@ -2,10 +2,12 @@ from django.test import TestCase
 from django.utils import timezone
 from decimal import Decimal
 from myapp.models import CustomUser, Order, TradeExecution, Portfolio
+from myapp.services import order_validation
 from myapp.services.matching_engine import MatchingEngine
 
 class MatchingEngineTestCase(TestCase):
     def setUp(self):
+        order_validation.invalidate()
         # Create users
         self.buyer = CustomUser.objects.create_user(
             username='buyer', email='buyer@test.com', password='password123',
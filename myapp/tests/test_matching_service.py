@@ -0,0 +1,41 @@
+from decimal import Decimal
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from myapp.models import CustomUser, Order, Portfolio
+from myapp.services import matching_service, order_book
+from myapp.tasks import match_order_task
+
+
+@override_settings(MATCHING_SHARDS=4)
+class MatchingServiceTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('5000'))
+        seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=seller, symbol='NABIL', quantity=10, avg_price=Decimal('400'))
+        self.ask = Order.objects.create(user=seller, symbol='NABIL', side='SELL', qty=10, price=Decimal('495'))
+
+    def test_shards_are_stable(self):
+        shards = {matching_service.shard_for(s) for s in ('NABIL', 'NICA', 'UPPER', 'HIDCL', 'NTC', 'SHL')}
+        self.assertTrue(shards <= {0, 1, 2, 3})
+        self.assertEqual(matching_service.queue_for('nabil'), matching_service.queue_for('NABIL'))
+
+    def test_order_is_routed_to_its_shard_and_reply_carries_fills(self):
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=4, price=Decimal('500'))
+        with patch.object(match_order_task, 'apply_async', wraps=match_order_task.apply_async) as dispatch:
+            executions = matching_service.submit_order(order)
+        self.assertEqual(dispatch.call_args.kwargs['queue'], matching_service.queue_for('NABIL'))
+        self.assertEqual([(e.executed_qty, e.executed_price) for e in executions], [(4, Decimal('495'))])
+        self.assertEqual(order.status, 'FILLED')
+
+    def test_cancel_refunds_through_the_shard(self):
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=4, price=Decimal('400'))
+        matching_service.submit_order(order)
+        self.assertEqual(order_book.get_book('NABIL').depth()['bids'], [(Decimal('400'), 4)])
+
+        self.assertEqual(matching_service.submit_cancel(order), (True, 'Order successfully cancelled.'))
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.virtual_balance, Decimal('6600'))
+        self.assertEqual(order_book.get_book('NABIL').depth()['bids'], [])
+        self.assertFalse(matching_service.submit_cancel(order)[0])
@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from custom_admin.models import Notification
+from myapp.models import CustomUser, Portfolio
+from myapp.services import notifications, order_book
+from myapp.tests.helpers import place
+
+
+class NotificationInboxTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('10000'))
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=100, avg_price=Decimal('90'))
+
+    def sweep(self):
+        place(self.seller, 'SELL', 10, '100')
+        place(self.seller, 'SELL', 10, '102')
+        return place(self.buyer, 'BUY', 20, '102')
+
+    def poll(self, user):
+        self.client.force_login(user)
+        return self.client.get('/panel/api/notifications/').json()
+
+    def test_fill_notices_are_written_per_order_after_the_match_commits(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            buy = self.sweep()
+            self.assertEqual(Notification.objects.count(), 0)   # nothing inside the matching transaction
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(Notification.objects.filter(user__isnull=True).count(), 0)
+        mine = Notification.objects.get(user=self.buyer)
+        self.assertEqual((mine.type, mine.title), ('buy', 'Buy Order Filled: NABIL'))
+        self.assertIn(f'20 units of NABIL bought at Rs.101.00 (order #{buy.id}, filled)', mine.message)
+        self.assertEqual(Notification.objects.filter(user=self.seller, type='sell').count(), 2)
+        self.assertEqual(self.poll(self.seller)['unread_count'], 2)
+
+    def test_global_notices_are_fanned_out_and_read_per_user(self):
+        self.assertEqual(self.poll(self.buyer)['unread_count'], 0)   # seeds the buyer's counter
+        self.assertEqual(notifications.broadcast('system', 'Maintenance', 'Back at 11:00.'), 2)
+
+        body = self.poll(self.buyer)
+        self.assertEqual((body['unread_count'], body['notifications'][0]['title']), (1, 'Maintenance'))
+        self.client.post(f"/panel/api/notifications/read/{body['notifications'][0]['id']}/")
+        self.assertEqual(self.poll(self.buyer)['unread_count'], 0)
+        # Reading it didn't mark the seller's copy
+        self.assertEqual(self.poll(self.seller)['unread_count'], 1)
+
+    def test_polling_cost_does_not_grow_with_the_inbox(self):
+        def queries():
+            self.poll(self.buyer)
+            with CaptureQueriesContext(connection) as ctx:
+                body = self.poll(self.buyer)
+            return len(ctx.captured_queries), body['unread_count']
+
+        notifications.deliver([Notification(user=self.buyer, title='n', message='m') for _ in range(3)])
+        few = queries()
+        notifications.deliver([Notification(user=self.buyer, title='n', message='m') for _ in range(300)])
+        many = queries()
+
+        self.assertEqual((few[1], many[1]), (3, 303))
+        self.assertEqual(few[0], many[0])
+
+    def test_admin_panel_keeps_the_unread_counters_right(self):
+        staff = CustomUser.objects.create_user(username='a', email='a@test.com', password='pw', is_staff=True)
+        for user in (self.buyer, self.seller):
+            self.poll(user)   # seeds the counters
+        self.client.force_login(staff)
+        notice = {'title': 'Maintenance', 'message': 'Back at 11:00.', 'type': 'system'}
+
+        self.client.post('/panel/custom_admin/notification/add/', {**notice, 'user': ''})   # blank: everyone
+        self.client.post('/panel/custom_admin/notification/add/', {**notice, 'user': self.buyer.id})
+        self.assertEqual(Notification.objects.filter(user__isnull=True).count(), 0)
+        self.assertEqual(self.poll(self.buyer)['unread_count'], 2)
+
+        mine = Notification.objects.filter(user=self.buyer).first()
+        self.client.force_login(staff)
+        self.client.post(f'/panel/custom_admin/notification/{mine.id}/edit/',
+                         {**notice, 'user': self.buyer.id, 'is_read': 'on'})
+        self.assertEqual(self.poll(self.buyer)['unread_count'], 1)
+
+        theirs = Notification.objects.get(user=self.seller)
+        self.client.force_login(staff)
+        self.client.get(f'/panel/custom_admin/notification/{theirs.id}/delete/')
+        self.assertEqual(self.poll(self.seller)['unread_count'], 0)
+        self.assertEqual(self.poll(staff)['unread_count'], 1)
@@ -0,0 +1,108 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from myapp.models import CustomUser, MarketSession, NEPSEPrice, Order, Portfolio, Stock, TradeExecution
+from myapp.services import call_auction, order_book, order_journal, order_validation
+from myapp.services.market_session import get_nepal_time
+from myapp.tests.helpers import place
+
+
+class OrderBatchApiTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        order_validation.invalidate()
+        call_auction._uncrossed.clear()
+        MarketSession.objects.create(session_date=get_nepal_time().date(), status='CONTINUOUS', is_active=True, is_manual=True)
+        NEPSEPrice.objects.create(symbol='HIDCL', timestamp=timezone.now(), ltp=200)   # the live feed is running
+        Stock.objects.create(symbol='NABIL', last_price=100)   # circuit 90 - 110
+        Stock.objects.create(symbol='NICA', last_price=500)
+
+        self.user = CustomUser.objects.create_user(username='u', email='u@test.com', password='pw',
+                                                   virtual_balance=Decimal('5000'))
+        Portfolio.objects.create(user=self.user, symbol='NABIL', quantity=10, avg_price=Decimal('95'))
+        self.resting = place(self.user, 'BUY', 5, '480', symbol='NICA')   # reserves 2400
+
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=100, avg_price=Decimal('90'))
+        place(self.seller, 'SELL', 20, '104')
+
+        order_journal.take_snapshot()
+        self.client.force_login(self.user)
+
+    def batch(self, instructions, atomic=False):
+        return self.client.post('/api/trade/batch/', json.dumps({'instructions': instructions, 'atomic': atomic}),
+                                content_type='application/json')
+
+    def rebalance(self):
+        return [
+            {'op': 'cancel', 'order_id': self.resting.id},                              # frees 2400
+            {'op': 'place', 'symbol': 'NABIL', 'side': 'BUY', 'qty': 40, 'price': 105},   # 4200: needs the refund
+            {'op': 'place', 'symbol': 'NABIL', 'side': 'SELL', 'qty': 10, 'price': 110},
+            {'op': 'place', 'symbol': 'NABIL', 'side': 'SELL', 'qty': 1, 'price': 110},   # holdings already used
+            {'op': 'place', 'symbol': 'NABIL', 'side': 'BUY', 'qty': 1, 'price': 200},    # outside circuit
+            {'op': 'cancel', 'order_id': self.resting.id},                              # already cancelled
+        ]
+
+    def test_per_item_batch_applies_the_valid_instructions(self):
+        body = self.batch(self.rebalance()).json()
+
+        self.assertFalse(body['success'])
+        self.assertEqual([r['success'] for r in body['results']], [True, True, True, False, False, False])
+        self.assertEqual([r['message'] for r in body['results'][3:]], [
+            'You do not have enough shares to sell.',
+            'Price outside circuit (Rs 90.00 - Rs 110.00)',
+            'Order already filled or cancelled.',
+        ])
+        buy = body['results'][1]
+        self.assertEqual((buy['status'], buy['filled_qty']), ('PARTIAL', 20))
+
+        self.resting.refresh_from_db()
+        self.assertEqual(self.resting.status, 'CANCELLED')
+        # 5000 - 4200 reserved, 20 filled at 104 instead of 105 refunds 20
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.virtual_balance, Decimal('820'))
+        self.assertEqual(list(TradeExecution.objects.values_list('executed_qty', 'executed_price')), [(20, Decimal('104.00'))])
+
+        self.assertEqual(order_journal.verify(order_journal.replay()), {'orders': [], 'holdings': []})
+
+    def test_atomic_batch_applies_nothing_when_one_instruction_fails(self):
+        orders_before = Order.objects.count()
+        body = self.batch(self.rebalance(), atomic=True).json()
+
+        self.assertFalse(body['success'])
+        self.assertFalse(any(r['success'] for r in body['results']))
+        self.assertEqual(Order.objects.count(), orders_before)
+        self.resting.refresh_from_db()
+        self.assertEqual(self.resting.status, 'OPEN')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.virtual_balance, Decimal('2600'))
+
+    def test_atomic_batch_applies_everything_when_valid(self):
+        body = self.batch(self.rebalance()[:3], atomic=True).json()
+
+        self.assertTrue(body['success'], body)
+        self.assertEqual(Order.objects.filter(user=self.user, status__in=['OPEN', 'PARTIAL']).count(), 2)
+
+    def test_sells_reserve_shares_across_batches(self):
+        def sell(qty):
+            return {'op': 'place', 'symbol': 'NABIL', 'side': 'SELL', 'qty': qty, 'price': 110}
+
+        first = self.batch([sell(6)]).json()['results'][0]
+        self.assertEqual(self.batch([sell(6)]).json()['results'][0]['message'], 'You do not have enough shares to sell.')
+        body = self.batch([{'op': 'cancel', 'order_id': first['order_id']}, sell(6)]).json()
+
+        self.assertEqual([r['success'] for r in body['results']], [True, True])
+        self.assertEqual(Portfolio.objects.get(user=self.user, symbol='NABIL').reserved_qty, 6)
+
+    @override_settings(TRADE_BATCH_MAX=2)
+    def test_request_level_errors(self):
+        self.assertEqual(self.batch(self.rebalance()).status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+
+        NEPSEPrice.objects.all().delete()
+        order_validation.invalidate()   # the next tick
+        response = self.batch(self.rebalance()[:1])
+        self.assertEqual((response.status_code, response.json()['message']), (400, 'Market is currently CLOSED.'))
@@ -0,0 +1,78 @@
+from decimal import Decimal
+from django.test import TestCase, SimpleTestCase
+from myapp.models import CustomUser, Order, Portfolio, TradeExecution
+from myapp.services import order_book
+from myapp.services.order_book import OrderBook, RestingOrder
+from myapp.services.matching_engine import MatchingEngine
+
+
+class OrderBookTestCase(SimpleTestCase):
+    def test_plan_walks_best_price_then_fifo(self):
+        book = OrderBook('NABIL')
+        book.add(RestingOrder(1, 1, 'SELL', Decimal('508'), 10))
+        book.add(RestingOrder(2, 1, 'SELL', Decimal('505'), 5))
+        book.add(RestingOrder(3, 2, 'SELL', Decimal('505'), 5))
+        book.add(RestingOrder(4, 2, 'SELL', Decimal('520'), 5))
+        book.add(RestingOrder(5, 3, 'BUY', Decimal('500'), 5))
+
+        fills = book.plan('BUY', Decimal('510'), 14)
+        self.assertEqual([(e.id, q, p) for e, q, p in fills],
+                         [(2, 5, Decimal('505')), (3, 5, Decimal('505')), (1, 4, Decimal('508'))])
+        self.assertEqual(book.asks.best_price(), Decimal('505'))  # planning does not mutate
+
+        book.apply(fills)
+        self.assertEqual(book.depth(), {
+            'bids': [(Decimal('500'), 5)],
+            'asks': [(Decimal('508'), 6), (Decimal('520'), 5)],
+        })
+        self.assertEqual(book.plan('SELL', Decimal('501'), 5), [])
+
+
+class CrossingMatchTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('100000'))
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw',
+                                                     virtual_balance=Decimal('0'))
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=100, avg_price=Decimal('400'))
+        self.asks = [
+            Order.objects.create(user=self.seller, symbol='NABIL', side='SELL', qty=10, price=Decimal(p))
+            for p in ('508', '505')
+        ]
+
+    def buy(self, qty, price):
+        # The views reserve funds at the limit price before matching
+        self.buyer.virtual_balance -= qty * Decimal(price)
+        self.buyer.save()
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=qty, price=Decimal(price))
+        return order, MatchingEngine.match_order(order)
+
+    def test_sweep_crosses_at_resting_prices_and_refunds(self):
+        order, executions = self.buy(15, '510')
+        self.assertEqual([(e.executed_qty, e.executed_price) for e in executions],
+                         [(10, Decimal('505')), (5, Decimal('508'))])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'FILLED')
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.virtual_balance, Decimal('100000') - 10 * 505 - 5 * 508)
+
+    def test_remainder_rests_and_book_follows_other_processes(self):
+        order, executions = self.buy(25, '506')
+        self.assertEqual(sum(e.executed_qty for e in executions), 10)
+        book = order_book.get_book('NABIL')
+        self.assertEqual(book.depth()['bids'], [(Decimal('506'), 15)])
+
+        # Cancelled elsewhere: the fingerprint check reloads instead of trading against it
+        Order.objects.filter(id=self.asks[0].id).update(status='CANCELLED')
+        _, executions = self.buy(5, '510')
+        self.assertEqual(executions, [])
+        self.assertEqual(TradeExecution.objects.count(), 1)
+
+    def test_taker_cancelled_before_matching_neither_trades_nor_rests(self):
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=5, price=Decimal('510'))
+        Order.objects.filter(id=order.id).update(status='CANCELLED')   # cancelled while queued
+
+        self.assertEqual(MatchingEngine.match_order(order), [])
+        self.assertEqual(TradeExecution.objects.count(), 0)
+        self.assertEqual(order_book.get_book('NABIL').depth()['bids'], [])
@@ -0,0 +1,91 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+
+from myapp.models import CustomUser, Order, Portfolio
+from myapp.services import matching_service, order_book, order_depth, order_expiry
+from myapp.stream_api import parse_topics
+from myapp.tests.helpers import place
+
+
+class OrderDepthTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        cache.clear()
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('100000'))
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=100, avg_price=Decimal('90'))
+        pushed = mock.patch('myapp.services.order_depth.push')
+        self.push = pushed.start()
+        self.addCleanup(pushed.stop)
+
+    def depth(self):
+        d = cache.get(order_depth.depth_key('NABIL'))
+        return d['version'], [(l['price'], l['qty']) for l in d['bids']], [(l['price'], l['qty']) for l in d['asks']]
+
+    def test_place_fill_and_cancel_update_the_level_totals(self):
+        place(self.seller, 'SELL', 10, '101')
+        ask = place(self.seller, 'SELL', 5, '101')
+        place(self.buyer, 'BUY', 8, '99')
+        self.assertEqual(self.depth(), (3, [(99.0, 8)], [(101.0, 15)]))
+
+        place(self.buyer, 'BUY', 12, '101')   # takes the first ask and 2 of the second
+        self.assertEqual(self.depth(), (4, [(99.0, 8)], [(101.0, 3)]))
+
+        matching_service.run_cancel(ask.id)
+        self.assertEqual(self.depth(), (5, [(99.0, 8)], []))
+        self.assertEqual(self.push.call_count, 5)
+        self.assertEqual(self.push.call_args[0][0], 'depth:NABIL')
+
+    def test_unchanged_depth_is_not_republished(self):
+        for price in ('90', '89', '88', '87', '86'):
+            place(self.buyer, 'BUY', 5, price)
+        place(self.buyer, 'BUY', 5, '70')       # outside the top five levels
+        self.assertEqual(self.push.call_count, 5)
+        self.assertIsNone(order_depth.refresh('NABIL'))
+        self.assertEqual(self.depth()[:2], (5, [(90.0, 5), (89.0, 5), (88.0, 5), (87.0, 5), (86.0, 5)]))
+
+    def test_endpoint_is_a_cache_read_with_conditional_gets(self):
+        place(self.seller, 'SELL', 10, '101')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/orderbook/nabil/')
+        body = response.json()
+        self.assertEqual((body['version'], body['asks'], body['bids']), (1, [{'price': 101.0, 'qty': 10}], []))
+        self.assertEqual(response['ETag'], '"1"')
+
+        self.assertEqual(self.client.get('/api/orderbook/NABIL/', HTTP_IF_NONE_MATCH='"1"').status_code, 304)
+        place(self.seller, 'SELL', 10, '102')
+        self.assertEqual(self.client.get('/api/orderbook/NABIL/', HTTP_IF_NONE_MATCH='"1"').status_code, 200)
+
+    def test_cold_cache_is_built_once_from_the_open_orders(self):
+        Order.objects.create(user=self.seller, symbol='NICA', side='SELL', qty=10, filled_qty=4, price=Decimal('300'))
+        body = self.client.get('/api/orderbook/NICA/').json()
+        self.assertEqual((body['version'], body['asks']), (0, [{'price': 300.0, 'qty': 6}]))
+        with self.assertNumQueries(0):
+            self.client.get('/api/orderbook/NICA/')
+
+    def test_cold_fallback_is_short_lived(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            order_depth.snapshot('NICA')
+        self.assertEqual(add.call_args[0][2], settings.ORDERBOOK_FALLBACK_TTL)
+
+    def test_versions_survive_a_shard_restart(self):
+        place(self.seller, 'SELL', 10, '101')
+        place(self.seller, 'SELL', 10, '102')
+        order_book.reset()                               # a new process owns the shard
+        cache.delete(order_depth.depth_key('NABIL'))     # and the snapshot has expired
+        place(self.seller, 'SELL', 10, '103')
+        self.assertEqual(self.depth()[0], 3)
+
+    def test_expiry_republishes_the_emptied_book(self):
+        place(self.seller, 'SELL', 10, '101')
+        with self.captureOnCommitCallbacks(execute=True):
+            order_expiry.expire_orders()
+        self.assertEqual(self.depth(), (2, [], []))
+
+    def test_depth_topics_share_the_quote_budget(self):
+        self.assertEqual(parse_topics('depth:nabil,quote:nabil,depth:', self.buyer), ['depth:NABIL', 'quote:NABIL'])
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from myapp.models import CustomUser, Order, Portfolio
+from myapp.services import order_book, order_expiry, order_journal
+from myapp.tests.helpers import place
+
+
+class OrderExpiryTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        self.buyers = [
+            CustomUser.objects.create_user(username=f'b{i}', email=f'b{i}@test.com', password='pw',
+                                           virtual_balance=Decimal('10000'))
+            for i in range(2)
+        ]
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=100, avg_price=Decimal('90'))
+        order_journal.take_snapshot()
+
+    def balances(self):
+        return [CustomUser.objects.get(id=u.id).virtual_balance for u in self.buyers]
+
+    def test_expires_open_orders_and_refunds_the_unfilled_reservations(self):
+        partial = place(self.buyers[0], 'BUY', 30, '100')       # 3000 reserved
+        place(self.buyers[1], 'BUY', 10, '105', symbol='NICA')   # 1050
+        place(self.buyers[1], 'BUY', 5, '101')                   # 505
+        filled = place(self.seller, 'SELL', 20, '100')           # fills 5 @ 101, 15 @ 100
+        resting_sell = place(self.seller, 'SELL', 10, '110')
+        self.assertEqual((partial.status, filled.status), ('OPEN', 'FILLED'))
+
+        self.assertEqual(Portfolio.objects.get(user=self.seller).reserved_qty, 10)
+        with self.assertNumQueries(7):
+            self.assertEqual(order_expiry.expire_orders(), 3)
+
+        self.assertEqual(set(Order.objects.filter(id__in=[partial.id, resting_sell.id]).values_list('status', flat=True)),
+                         {'CANCELLED'})
+        self.assertEqual(Order.objects.filter(status__in=order_book.OPEN_STATUSES).count(), 0)
+        self.assertEqual(Order.objects.get(id=filled.id).status, 'FILLED')
+        # b0 bought 15 @ 100 of 30: 15 x 100 back; b1 gets NICA's 1050 back
+        self.assertEqual(self.balances(), [Decimal('8500'), Decimal('9495')])
+        self.assertEqual(Portfolio.objects.get(user=self.seller).reserved_qty, 0)
+        self.assertEqual(order_journal.verify(order_journal.replay()), {'orders': [], 'holdings': []})
+
+        # Idempotent
+        self.assertEqual(order_expiry.expire_orders(), 0)
+        self.assertEqual(self.balances(), [Decimal('8500'), Decimal('9495')])
+
+    def test_orders_placed_after_the_cutoff_stay_open(self):
+        early = place(self.buyers[0], 'BUY', 10, '100')
+        late = place(self.buyers[1], 'BUY', 10, '100')
+
+        self.assertEqual(order_expiry.expire_orders(before=late.created_at), 1)
+
+        self.assertEqual(Order.objects.get(id=early.id).status, 'CANCELLED')
+        self.assertEqual(Order.objects.get(id=late.id).status, 'OPEN')
+        self.assertEqual(self.balances(), [Decimal('10000'), Decimal('9000')])
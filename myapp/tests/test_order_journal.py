@@ -0,0 +1,51 @@
+from decimal import Decimal
+from django.test import TestCase
+from myapp.models import CustomUser, OrderEvent, Portfolio
+from myapp.services import matching_service, order_book, order_journal
+from myapp.tests.helpers import place
+
+
+class OrderJournalTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('20000'))
+        self.seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw',
+                                                     virtual_balance=Decimal('0'))
+        Portfolio.objects.create(user=self.seller, symbol='NABIL', quantity=50, avg_price=Decimal('400'))
+
+    def test_events_replay_to_the_live_state(self):
+        order_journal.take_snapshot()
+        place(self.seller, 'SELL', 10, '500')
+        place(self.seller, 'SELL', 10, '505')
+        buy = place(self.buyer, 'BUY', 15, '506')
+        mid = OrderEvent.objects.latest('id').id
+        resting = place(self.buyer, 'BUY', 5, '490')
+        matching_service.run_cancel(resting.id)
+
+        self.assertEqual([e.kind for e in OrderEvent.objects.all()],
+                         ['PLACED', 'PLACED', 'PLACED', 'MATCHED', 'MATCHED', 'SETTLED', 'PLACED', 'CANCELLED'])
+
+        head = order_journal.replay()
+        self.assertEqual(order_journal.verify(head), {'orders': [], 'holdings': []})
+        self.buyer.refresh_from_db()
+        self.seller.refresh_from_db()
+        self.assertEqual(head.balances[self.buyer.id], self.buyer.virtual_balance)
+        self.assertEqual(head.balances[self.seller.id], self.seller.virtual_balance)
+        self.assertEqual(head.holdings[(self.buyer.id, 'NABIL')], [15, Decimal('501.67')])
+
+        # Point-in-time: the 490 bid was still resting before its cancel
+        before_cancel = order_journal.replay(until_event_id=mid + 1)
+        self.assertIn(resting.id, before_cancel.book)
+        self.assertNotIn(buy.id, before_cancel.book)
+
+    def test_warm_start_loads_books_from_a_snapshot(self):
+        place(self.seller, 'SELL', 10, '500')
+        order_journal.take_snapshot()
+        place(self.seller, 'SELL', 5, '510')
+
+        self.assertEqual(order_journal.warm_start(order_journal.replay()), 2)
+        book = order_book.get_book('NABIL')
+        self.assertEqual(book.depth()['asks'], [(Decimal('500'), 10), (Decimal('510'), 5)])
+        with self.assertNumQueries(1):  # fingerprint check only, no reload
+            book.sync()
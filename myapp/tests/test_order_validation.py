@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from myapp.models import CustomUser, MarketSession, NEPSEPrice, Order, Portfolio, Stock
+from myapp.services import matching_service, order_book, order_validation
+from myapp.services.market_session import get_nepal_time
+
+
+class OrderValidationTestCase(TestCase):
+    def setUp(self):
+        order_validation.invalidate()
+        order_book.reset()
+        MarketSession.objects.create(session_date=get_nepal_time().date(), status='CONTINUOUS', is_active=True, is_manual=True)
+        NEPSEPrice.objects.create(symbol='HIDCL', timestamp=timezone.now(), ltp=200)   # the live feed is running
+        Stock.objects.create(symbol='NABIL', last_price=100)
+        self.user = CustomUser.objects.create_user(username='u', email='u@test.com', password='pw',
+                                                   virtual_balance=Decimal('1000'))
+        Portfolio.objects.create(user=self.user, symbol='NABIL', quantity=10, avg_price=Decimal('95'))
+
+    def order(self, side, qty, price):
+        return Order(user=self.user, symbol='NABIL', side=side, qty=qty, price=Decimal(price))
+
+    def test_checks_cost_no_queries_once_the_tick_is_loaded(self):
+        context = order_validation.get_context()
+        self.assertIsNone(context.check_price('NABIL', Decimal('105')))
+
+        with self.assertNumQueries(0):
+            self.assertIs(order_validation.get_context(), context)
+            self.assertIsNone(context.check_price('NABIL', Decimal('95.50')))
+            self.assertEqual(context.check_price('NABIL', Decimal('111')), 'Price outside circuit (Rs 90.00 - Rs 110.00)')
+
+        self.assertEqual(context.check_price('NICA', Decimal('100')), 'Circuit limits unavailable for this stock yet.')
+
+    @override_settings(ORDER_TICK_SIZE='0.10')
+    def test_tick_size(self):
+        context = order_validation.get_context()
+        self.assertIsNone(context.check_price('NABIL', Decimal('100.10')))
+        self.assertEqual(context.check_price('NABIL', Decimal('100.15')), 'Price must be a multiple of Rs 0.10.')
+
+    def test_a_new_tick_rebuilds_the_context(self):
+        self.assertTrue(order_validation.get_context().market_open)
+        NEPSEPrice.objects.all().delete()    # the feed stops: the session closes
+
+        self.assertTrue(order_validation.get_context().market_open)
+        order_validation.invalidate()
+        self.assertEqual(order_validation.get_context().check_price('NABIL', Decimal('100')), 'Market is currently CLOSED.')
+
+    def test_reservation_is_one_conditional_update(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(order_validation.reserve(self.order('BUY', 6, '100')))
+        with self.assertNumQueries(1):
+            self.assertEqual(order_validation.reserve(self.order('BUY', 5, '100')), 'Insufficient balance.')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.virtual_balance, Decimal('400'))
+
+        self.assertEqual(order_validation.reserve(self.order('SELL', 11, '100')), 'You do not have enough shares to sell.')
+
+    def test_sells_reserve_their_shares_until_cancelled(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(order_validation.reserve(self.order('SELL', 6, '100')))
+        # The same shares can't back a second SELL
+        self.assertEqual(order_validation.reserve(self.order('SELL', 6, '100')), 'You do not have enough shares to sell.')
+        self.assertIsNone(order_validation.reserve(self.order('SELL', 4, '100')))
+
+        resting = self.order('SELL', 6, '100')
+        resting.save()
+        self.assertTrue(matching_service.run_cancel(resting.id)['success'])
+        self.assertEqual(Portfolio.objects.get(user=self.user).reserved_qty, 4)
+        self.assertIsNone(order_validation.reserve(self.order('SELL', 6, '100')))
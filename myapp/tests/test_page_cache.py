@@ -0,0 +1,64 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from myapp.models import CustomUser, NEPSEPrice, Order, Stock, TradeExecution, PlatformCounter
+from myapp.services import platform_stats
+from myapp.services.market_feed import MARKET_SNAPSHOT_KEY
+
+
+def publish(ts):
+    cache.set(MARKET_SNAPSHOT_KEY, {'timestamp': ts.isoformat(), 'quotes': {}})
+
+
+class PlatformCounterTestCase(TestCase):
+    def test_signals_keep_counters_equal_to_aggregates(self):
+        buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw')
+        seller = CustomUser.objects.create_user(username='s', email='s@test.com', password='pw')
+        Stock.objects.create(symbol='NABIL', company_name='Nabil Bank')
+        buy = Order.objects.create(user=buyer, symbol='NABIL', side='BUY', qty=10, price=Decimal('500'))
+        sell = Order.objects.create(user=seller, symbol='NABIL', side='SELL', qty=10, price=Decimal('500'))
+        TradeExecution.objects.create(buy_order=buy, sell_order=sell, symbol='NABIL',
+                                      executed_qty=10, executed_price=Decimal('500'))
+        TradeExecution.objects.create(buy_order=buy, sell_order=sell, symbol='NABIL',
+                                      executed_qty=2, executed_price=Decimal('510.50'))
+
+        counters = platform_stats.get_counters()
+        self.assertEqual(counters[platform_stats.TRADE_VOLUME], Decimal('6021.00'))
+
+        seller.delete()  # cascades to the orders and executions
+        counters = platform_stats.get_counters()
+        self.assertEqual(counters, platform_stats.recount())
+        self.assertEqual((counters['traders'], counters['trade_volume'], counters['listed_stocks']), (1, 0, 1))
+        self.assertEqual(PlatformCounter.objects.count(), 3)
+
+
+class LandingPageCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ts = timezone.now()
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=self.ts, ltp=500, change_pct=1.5)
+        publish(self.ts)
+
+    def test_anonymous_page_is_cached_per_tick(self):
+        first = self.client.get('/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/').content, first.content)
+
+        CustomUser.objects.create_user(username='new', email='new@test.com', password='pw')
+        self.assertEqual(self.client.get('/').content, first.content)
+        publish(timezone.now())  # next tick re-renders with the new counter
+        self.assertIn(b'<h3>1</h3>', self.client.get('/').content)
+
+    def test_logged_in_pages_share_the_widget_fragment(self):
+        CustomUser.objects.create_user(username='u', email='u@test.com', password='pw')
+        self.client.login(email='u@test.com', password='pw')
+        self.assertEqual(self.client.get('/dashboard/').context['market_stats']['gainers'], 1)
+
+        ts = timezone.now()
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=ts, ltp=505, change_pct=2.5)
+        NEPSEPrice.objects.create(symbol='NICA', timestamp=ts, ltp=300, change_pct=2.0)
+        self.assertEqual(self.client.get('/dashboard/').context['market_stats']['gainers'], 1)
+        publish(ts)
+        self.assertEqual(self.client.get('/market/').context['market_stats']['total_symbols'], 2)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from myapp.models import CustomUser, Order, TradeExecution, Trade
+from myapp.services.pagination import encode_cursor, decode_cursor, InvalidCursor
+
+
+class CursorTestCase(SimpleTestCase):
+    def test_round_trip(self):
+        ts = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(ts, 42, 1)), (ts, 42, 1))
+        self.assertIsNone(decode_cursor(''))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+
+
+class ActivityPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='me', email='me@test.com', password='pw', virtual_balance=Decimal('0')
+        )
+        other = CustomUser.objects.create_user(
+            username='other', email='other@test.com', password='pw', virtual_balance=Decimal('0')
+        )
+        buy = Order.objects.create(user=self.user, symbol='NABIL', side='BUY', qty=100, price=Decimal('500'))
+        sell = Order.objects.create(user=other, symbol='NABIL', side='SELL', qty=100, price=Decimal('500'))
+        my_sell = Order.objects.create(user=self.user, symbol='NABIL', side='SELL', qty=100, price=Decimal('510'))
+        other_buy = Order.objects.create(user=other, symbol='NABIL', side='BUY', qty=100, price=Decimal('510'))
+
+        base = timezone.now() - timedelta(hours=1)
+        for i in range(4):
+            TradeExecution.objects.create(buy_order=buy, sell_order=sell, symbol='NABIL',
+                                          executed_qty=i + 1, executed_price=Decimal('500'))
+            TradeExecution.objects.create(buy_order=other_buy, sell_order=my_sell, symbol='NABIL',
+                                          executed_qty=10 + i, executed_price=Decimal('510'))
+            Trade.objects.create(user=self.user, symbol='NICA', side='BUY', qty=20 + i, price=300)
+        # Same timestamp everywhere: ordering must fall back to (kind, id)
+        TradeExecution.objects.update(executed_at=base)
+        Trade.objects.update(created_at=base)
+        self.client.login(email='me@test.com', password='pw')
+
+    def walk(self, url):
+        seen, cursor = [], None
+        while True:
+            body = self.client.get(url + (f'&cursor={cursor}' if cursor else '')).json()
+            seen.extend(body['data'])
+            cursor = body['pagination']['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_activity_pages_cover_every_source_once(self):
+        seen = self.walk('/api/portfolio/activity/?limit=5')
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(sorted(a['quantity'] for a in seen), [1, 2, 3, 4, 10, 11, 12, 13, 20, 21, 22, 23])
+        self.assertEqual({a['side'] for a in seen if a['quantity'] >= 10 and a['quantity'] < 20}, {'SELL'})
+
+    def test_executions_record_owners_and_page(self):
+        self.assertFalse(TradeExecution.objects.filter(buyer__isnull=True).exists())
+        seen = self.walk('/api/trade/executions/?limit=3')
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(sum(1 for e in seen if e['side'] == 'BUY'), 4)
+
+    def test_invalid_cursor_is_400(self):
+        self.assertEqual(self.client.get('/api/trade/orders/?cursor=zzz').status_code, 400)
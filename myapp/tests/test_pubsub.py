@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from myapp.models import NEPSEPrice
+from myapp.services import market_feed
+from myapp.services.pubsub import InProcessBroker, quote_topic, orders_topic, TOPIC_MARKET, TOPIC_INDEX
+from myapp.services.market_feed import diff_snapshot
+from myapp.stream_api import parse_topics, format_event
+
+
+class _User:
+    def __init__(self, user_id=None):
+        self.id = user_id
+        self.is_authenticated = user_id is not None
+
+
+class InProcessBrokerTestCase(SimpleTestCase):
+    def test_fan_out_to_every_subscriber(self):
+        """One publish reaches every subscriber of the topic and nobody else"""
+        async def scenario():
+            broker = InProcessBroker()
+            a = broker.subscribe([TOPIC_MARKET])
+            b = broker.subscribe([TOPIC_MARKET, TOPIC_INDEX])
+            c = broker.subscribe([quote_topic('nabil')])
+
+            delivered = broker.publish(TOPIC_MARKET, {'x': 1})
+            self.assertEqual(delivered, 2)
+            self.assertEqual(await a.get(timeout=1), (TOPIC_MARKET, '{"x":1}'))
+            self.assertEqual(await b.get(timeout=1), (TOPIC_MARKET, '{"x":1}'))
+            self.assertTrue(c.queue.empty())
+
+            c.close()
+            self.assertEqual(broker.subscriber_count(quote_topic('NABIL')), 0)
+        asyncio.run(scenario())
+
+    def test_publish_from_worker_thread(self):
+        """Sync publishers (scraper / order views) run off the event loop"""
+        async def scenario():
+            broker = InProcessBroker()
+            sub = broker.subscribe([orders_topic(7)])
+            t = threading.Thread(target=broker.publish, args=(orders_topic(7), {'id': 1}))
+            t.start()
+            t.join()
+            topic, data = await sub.get(timeout=1)
+            self.assertEqual(topic, 'orders:7')
+            self.assertEqual(data, '{"id":1}')
+        asyncio.run(scenario())
+
+
+class MarketFeedTestCase(SimpleTestCase):
+    def test_diff_only_changed_quotes(self):
+        prev = {'NABIL': {'symbol': 'NABIL', 'ltp': 500}, 'NICA': {'symbol': 'NICA', 'ltp': 300}}
+        curr = {'NABIL': {'symbol': 'NABIL', 'ltp': 505}, 'NICA': {'symbol': 'NICA', 'ltp': 300},
+                'ADBL': {'symbol': 'ADBL', 'ltp': 250}}
+        changed = diff_snapshot(prev, curr)
+        self.assertEqual([r['symbol'] for r in changed], ['ADBL', 'NABIL'])
+
+    def test_parse_topics(self):
+        topics = parse_topics('market,index,quote:nabil,orders,bogus', _User(5))
+        self.assertEqual(topics, ['market', 'index', 'quote:NABIL', 'orders:5'])
+        # Anonymous users can't subscribe to order updates
+        self.assertEqual(parse_topics('orders', _User()), [])
+
+    def test_format_event(self):
+        self.assertEqual(format_event('quote:NABIL', '{}'), 'event: quote\ndata: {}\n\n')
+
+
+class LatestQuotesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=timezone.now(), ltp=500)
+
+    def test_cold_cache_fallback_is_retained_for_one_tick(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.assertEqual(market_feed.latest_quotes()['NABIL']['ltp'], 500)
+        self.assertEqual(add.call_args[0][2], market_feed.FALLBACK_SNAPSHOT_TTL)
+        with self.assertNumQueries(0):
+            market_feed.latest_quotes()
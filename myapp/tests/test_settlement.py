@@ -0,0 +1,91 @@
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from myapp.models import CustomUser, Order, Portfolio, TradeExecution
+from myapp.services import matching_service, order_book, platform_stats, settlement
+from myapp.services.matching_engine import MatchingEngine
+
+
+class SettlementTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('0'))
+        Portfolio.objects.create(user=self.buyer, symbol='NABIL', quantity=10, avg_price=Decimal('400'))
+        self.sellers = [
+            CustomUser.objects.create_user(username=f's{i}', email=f's{i}@test.com', password='pw',
+                                           virtual_balance=Decimal('0'))
+            for i in range(5)
+        ]
+        for s in self.sellers:
+            Portfolio.objects.create(user=s, symbol='NABIL', quantity=100, avg_price=Decimal('450'))
+        platform_stats.recount()
+
+    def rest_asks(self, n):
+        for i in range(n):
+            Order.objects.create(user=self.sellers[i % 5], symbol='NABIL', side='SELL', qty=2,
+                                 price=Decimal('500') + i % 3)
+
+    def sweep(self, qty):
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=qty, price=Decimal('505'))
+        order_book.get_book('NABIL').reload(exclude_id=order.id)
+        with CaptureQueriesContext(connection) as ctx:
+            executions = MatchingEngine.match_order(order)
+        return order, executions, len(ctx.captured_queries)
+
+    def test_round_trips_do_not_grow_with_fills(self):
+        self.rest_asks(1)
+        _, one, single = self.sweep(2)
+        self.rest_asks(50)
+        _, many, sweep = self.sweep(100)
+        self.assertEqual((len(one), len(many)), (1, 50))
+        self.assertEqual(single, sweep)
+
+    def test_balances_holdings_and_orders(self):
+        self.rest_asks(6)  # 2 each at 500, 501, 502 (two sellers per price)
+        order, executions, _ = self.sweep(10)
+
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.filled_qty), ('FILLED', 10))
+        self.assertEqual(Order.objects.filter(side='SELL', status='FILLED').count(), 5)
+        self.assertEqual(Order.objects.get(side='SELL', status='OPEN').price, Decimal('502'))
+
+        # Reserve was 505 a share: refund (505 - p) per share, nothing else moves
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.virtual_balance, Decimal('5') * 4 + Decimal('4') * 4 + Decimal('3') * 2)
+        self.sellers[0].refresh_from_db()
+        self.assertEqual(self.sellers[0].virtual_balance, Decimal('1000'))  # 2 @ 500
+
+        holding = Portfolio.objects.get(user=self.buyer, symbol='NABIL')
+        self.assertEqual(holding.quantity, 20)
+        self.assertEqual(holding.avg_price, Decimal('450.40'))  # (4000 + 5008) / 20
+        self.assertEqual(Portfolio.objects.get(user=self.sellers[0], symbol='NABIL').quantity, 98)
+
+        self.assertFalse(TradeExecution.objects.filter(buyer__isnull=True).exists())
+        self.assertEqual(platform_stats.get_counters()[platform_stats.TRADE_VOLUME], Decimal('5008'))
+
+    def test_short_sellers_roll_the_batch_back(self):
+        Portfolio.objects.filter(user=self.sellers[1]).update(quantity=1)   # sold down elsewhere
+        self.rest_asks(2)
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=4, price=Decimal('505'))
+        book = order_book.get_book('NABIL')
+        book.sync(exclude_id=order.id)
+        with self.assertRaises(settlement.InsufficientHoldings) as raised:
+            MatchingEngine.persist_fills(order, book.plan('BUY', order.price, 4))
+        self.assertEqual(raised.exception.order_ids, {Order.objects.get(user=self.sellers[1]).id})
+        self.assertFalse(TradeExecution.objects.exists())
+        self.assertEqual(Order.objects.filter(filled_qty__gt=0).count(), 0)
+        self.sellers[0].refresh_from_db()
+        self.assertEqual(self.sellers[0].virtual_balance, Decimal('0'))
+
+    def test_uncovered_resting_sells_are_cancelled_and_matching_goes_on(self):
+        self.rest_asks(2)
+        Portfolio.objects.filter(user=self.sellers[0]).delete()
+        order = Order.objects.create(user=self.buyer, symbol='NABIL', side='BUY', qty=2, price=Decimal('505'))
+
+        reply = matching_service.run_match(order.id)
+
+        self.assertEqual((reply['status'], reply['filled_qty']), ('FILLED', 2))
+        self.assertEqual(Order.objects.get(user=self.sellers[0]).status, 'CANCELLED')
+        self.assertEqual(TradeExecution.objects.get().seller, self.sellers[1])
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase
+from django.utils import timezone
+from myapp.models import Stock, Sector, NEPSEPrice
+from myapp.services import symbol_index
+from myapp.services.symbol_index import SymbolIndex
+
+
+def _entry(symbol, name, sector_id=None):
+    return {'symbol': symbol, 'company_name': name, 'sector_id': sector_id, 'sector_name': 'Others'}
+
+
+class SymbolIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.index = SymbolIndex([
+            _entry('NABIL', 'Nabil Bank Limited'),
+            _entry('NABBC', 'Narayani Development Bank'),
+            _entry('NICA', 'NIC Asia Bank'),
+            _entry('UPPER', 'Upper Tamakoshi Hydropower'),
+        ])
+
+    def symbols(self, q, **kwargs):
+        return [e['symbol'] for e in self.index.search(q, **kwargs)]
+
+    def test_ranking(self):
+        """Exact symbol, then symbol prefix, then company-word prefix, then substring"""
+        self.assertEqual(self.symbols('nab', fuzzy=False), ['NABBC', 'NABIL'])
+        self.assertEqual(self.symbols('NABIL', fuzzy=False), ['NABIL'])
+        self.assertEqual(self.symbols('hydro', fuzzy=False), ['UPPER'])
+        self.assertEqual(self.symbols('BIL', fuzzy=False), ['NABIL'])
+        self.assertEqual(self.symbols('bank', fuzzy=False), ['NABBC', 'NABIL', 'NICA'])
+
+    def test_fuzzy_fills_remaining_slots(self):
+        self.assertEqual(self.symbols('NABL', fuzzy=False), [])
+        self.assertIn('NABIL', self.symbols('NABL'))
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('bank', limit=2)), 2)
+
+
+class SymbolIndexLifecycleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        symbol_index.invalidate()
+        sector = Sector.objects.create(name='Commercial Banks')
+        self.stock = Stock.objects.create(symbol='NABIL', company_name='Nabil Bank', sector=sector)
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=timezone.now(), ltp=500, change_pct=1.0)
+
+    def test_search_is_served_from_memory(self):
+        symbol_index.search_with_quotes('NAB')  # warm index + quote snapshot
+        with self.assertNumQueries(0):
+            results = symbol_index.search_with_quotes('NAB')
+        self.assertEqual(results[0]['ltp'], 500)
+        self.assertEqual(results[0]['sector_name'], 'Commercial Banks')
+
+    def test_rebuild_only_on_searchable_changes(self):
+        index = symbol_index.get_index()
+
+        # Price-only saves (the scraper, every minute) keep the index
+        self.stock.last_price = 510
+        self.stock.save()
+        self.assertIs(symbol_index.get_index(), index)
+
+        self.stock.company_name = 'Nabil Bank Limited'
+        self.stock.save()
+        self.assertEqual(symbol_index.search('limited')[0]['symbol'], 'NABIL')
+
+    def test_api_search_symbol(self):
+        res = self.client.get('/api/search/?q=nab')
+        self.assertEqual(res.json()['data'], [
+            {'symbol': 'NABIL', 'company_name': 'Nabil Bank', 'ltp': 500.0, 'change_pct': 1.0}
+        ])
@@ -0,0 +1,77 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from myapp.models import NEPSEPrice, DailyBar, SymbolStats, CustomUser
+from myapp.services import symbol_stats
+
+
+class SymbolStatsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        # 60 closed sessions: close = 100 + i, high = close + 5, low = close - 5
+        for i in range(60):
+            day = self.today - timedelta(days=60 - i)
+            DailyBar.objects.create(symbol='NABIL', date=day, open=100 + i, high=105 + i,
+                                    low=95 + i, close=100 + i, volume=1000 + i)
+        # An old bar outside the stats window still counts for the all-time range
+        DailyBar.objects.create(symbol='NABIL', date=self.today - timedelta(days=900),
+                                high=400, low=20, close=300, volume=10)
+
+    def test_refresh_from_daily_bars(self):
+        self.assertEqual(symbol_stats.refresh_stats(), 1)
+        s = SymbolStats.objects.get(symbol='NABIL')
+        self.assertEqual((s.last_close, s.prev_close), (159, 158))
+        self.assertEqual((s.high_52, s.low_52), (164, 95))
+        self.assertEqual((s.all_time_high, s.all_time_low), (400, 20))
+        self.assertEqual(s.sma_20, sum(range(140, 160)) / 20)
+        self.assertEqual(s.sma_50, sum(range(110, 160)) / 50)
+        self.assertIsNone(s.sma_200)
+        self.assertEqual(s.ref_close_1w, 152)
+        self.assertIsNone(s.ref_close_1y)
+
+    def test_close_day_rolls_ticks_into_a_bar(self):
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=timezone.now() - timedelta(hours=1),
+                                  ltp=170, high=172, low=150, volume=500)
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=timezone.now(),
+                                  ltp=171, high=175, low=150, volume=900)
+        symbol_stats.close_day(self.today)
+        bar = DailyBar.objects.get(symbol='NABIL', date=self.today)
+        self.assertEqual((bar.close, bar.high, bar.volume), (171, 175, 900))
+        self.assertEqual(symbol_stats.get_stats('nabil')['as_of'], self.today)
+
+    def test_quote_is_a_cache_lookup_with_live_day_folded_in(self):
+        symbol_stats.refresh_stats()
+        CustomUser.objects.create_user(username='u', email='u@test.com', password='pw', virtual_balance=Decimal('0'))
+        self.client.login(email='u@test.com', password='pw')
+        NEPSEPrice.objects.create(symbol='NABIL', timestamp=timezone.now(), ltp=175.9,
+                                  change_pct=10.0, open=160, high=180, low=158, volume=42)
+        self.client.get('/api/stock-quote/NABIL/')  # warm the market snapshot
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/stock-quote/NABIL/').json()['data']
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('"nepse_prices"."symbol"', tables)  # no per-symbol history scans
+        self.assertNotIn('symbol_stats', tables)
+        self.assertEqual((data['prev_close'], data['high_52'], data['low_52']), (159, 180, 95))
+        self.assertEqual(data['returns']['1d'], 10.63)
+        self.assertEqual(data['returns']['1w'], round((175.9 - 152) / 152 * 100, 2))
+        self.assertEqual(data['all_time_high'], 400)
+
+    def test_quote_the_day_after_close_keeps_the_sessions_prev_close(self):
+        yesterday = self.today - timedelta(days=1)
+        CustomUser.objects.create_user(username='u', email='u@test.com', password='pw', virtual_balance=Decimal('0'))
+        self.client.login(email='u@test.com', password='pw')
+        NEPSEPrice.objects.create(symbol='NABIL', ltp=170, change_pct=7.59, open=160, high=172, low=158, volume=42,
+                                  timestamp=timezone.make_aware(datetime.combine(yesterday, time(14, 30))))
+        symbol_stats.close_day(yesterday)
+
+        # No tick today (weekend, holiday or before the open): the snapshot is still yesterday's
+        data = self.client.get('/api/stock-quote/NABIL/').json()['data']
+        self.assertEqual(data['prev_close'], 158)
+        self.assertEqual(data['returns']['1d'], round((170 - 158) / 158 * 100, 2))
+        self.assertEqual(data['stats_as_of'], yesterday.isoformat())
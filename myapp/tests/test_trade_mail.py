@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from myapp.models import CustomUser, Portfolio, TradeEmail
+from myapp.services import order_book, trade_mail
+from myapp.tests.helpers import place
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP down')
+
+
+@override_settings(EMAIL_BACKEND='myapp.tests.test_trade_mail.CountingBackend')
+class TradeMailTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        CountingBackend.opened = 0
+        self.buyer = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                    virtual_balance=Decimal('10000'))
+        self.sellers = [
+            CustomUser.objects.create_user(username=f's{i}', email=f's{i}@test.com', password='pw',
+                                           buy_sell_notifications=(i == 0))
+            for i in range(2)
+        ]
+        for seller in self.sellers:
+            Portfolio.objects.create(user=seller, symbol='NABIL', quantity=100, avg_price=Decimal('90'))
+
+    def sweep(self):
+        # s0 rests two asks, s1 one; the buyer takes all three in one order
+        place(self.sellers[0], 'SELL', 10, '100')
+        place(self.sellers[0], 'SELL', 10, '101')
+        place(self.sellers[1], 'SELL', 10, '102')
+        return place(self.buyer, 'BUY', 30, '102')
+
+    def test_fills_are_queued_with_the_trade_and_coalesced_per_order(self):
+        buy = self.sweep()
+
+        self.assertEqual(TradeEmail.objects.filter(status='PENDING').count(), 4)   # the buy order's three fills are one row
+        self.assertEqual(len(mail.outbox), 0)
+
+        # Claim (lock + flip), users + holdings, outcome (recheck + update): no transaction spans the send
+        with self.assertNumQueries(10):
+            self.assertEqual(trade_mail.drain(), 4)
+
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(sorted(m.subject for m in mail.outbox), [
+            'Trade Confirmed: BUY 30 NABIL', 'Trade Confirmed: SELL 10 NABIL', 'Trade Confirmed: SELL 10 NABIL',
+        ])
+        buyer_mail = next(m for m in mail.outbox if m.to == ['b@test.com'])
+        self.assertIn('101.00', buyer_mail.body)    # average of 100 / 101 / 102
+        self.assertIn(str(buy.id), buyer_mail.body)
+        self.assertEqual(dict(TradeEmail.objects.values_list('user_id', 'status').distinct()),
+                         {self.buyer.id: 'SENT', self.sellers[0].id: 'SENT', self.sellers[1].id: 'SKIPPED'})
+        self.assertEqual(trade_mail.drain(), 0)
+
+    def test_drain_is_kicked_when_the_fill_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sweep()
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(TradeEmail.objects.filter(status='PENDING').exists())
+
+    @override_settings(EMAIL_BACKEND='myapp.tests.test_trade_mail.FailingBackend', TRADE_EMAIL_MAX_ATTEMPTS=2)
+    def test_failed_emails_are_retried_then_given_up(self):
+        self.sweep()
+
+        trade_mail.drain()
+        self.assertEqual(set(TradeEmail.objects.exclude(status='SKIPPED').values_list('status', 'attempts')), {('PENDING', 1)})
+        trade_mail.drain()
+        self.assertEqual(set(TradeEmail.objects.exclude(status='SKIPPED').values_list('status', 'attempts')), {('FAILED', 2)})
+
+    def test_claims_of_a_dead_worker_are_taken_over_after_the_timeout(self):
+        self.sweep()
+        TradeEmail.objects.update(status='SENDING', claimed_at=timezone.now())   # another worker is sending
+        self.assertEqual(trade_mail.drain(), 0)
+
+        TradeEmail.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(trade_mail.drain(), 4)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(TradeEmail.objects.filter(status__in=['PENDING', 'SENDING']).exists())
@@ -0,0 +1,150 @@
+import json
+import uuid
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from myapp.models import (
+    ConditionalOrder, CustomUser, MarketSession, NEPSEPrice, Order, Portfolio, Stock, StockRecommendation,
+    TradeExecution,
+)
+from myapp.services import order_book, order_validation, trigger_engine
+from myapp.services.market_session import get_nepal_time
+from myapp.services.trigger_engine import TriggerBook
+
+
+def open_market():
+    order_validation.invalidate()
+    MarketSession.objects.create(session_date=get_nepal_time().date(), status='CONTINUOUS', is_active=True, is_manual=True)
+    NEPSEPrice.objects.create(symbol='HIDCL', timestamp=timezone.now(), ltp=200)   # the live feed is running
+    Stock.objects.create(symbol='NABIL', last_price=100)   # circuit 90 - 110
+
+
+def quotes(**ltps):
+    return {symbol: {'symbol': symbol, 'ltp': ltp} for symbol, ltp in ltps.items()}
+
+
+class TriggerBookTestCase(TestCase):
+    def test_bisect_pops_only_crossed_triggers(self):
+        book = TriggerBook()
+        for cond_id, direction, trigger in [(1, 'BELOW', 90), (2, 'BELOW', 95), (3, 'BELOW', 80),
+                                            (4, 'ABOVE', 110), (5, 'ABOVE', 120), (6, 'ABOVE', 105)]:
+            book.add(cond_id, direction, Decimal(trigger))
+
+        self.assertEqual(book.pop_triggered(Decimal('100')), [])
+        self.assertEqual(sorted(book.pop_triggered(Decimal('90'))), [1, 2])
+        self.assertEqual(sorted(book.pop_triggered(Decimal('110'))), [4, 6])
+        self.assertEqual(len(book), 2)
+
+
+class TriggerEngineTestCase(TestCase):
+    def setUp(self):
+        order_book.reset()
+        trigger_engine.reset()
+        open_market()
+        self.holder = CustomUser.objects.create_user(username='h', email='h@test.com', password='pw')
+        Portfolio.objects.create(user=self.holder, symbol='NABIL', quantity=10, avg_price=Decimal('100'))
+        self.bidder = CustomUser.objects.create_user(username='b', email='b@test.com', password='pw',
+                                                     virtual_balance=Decimal('5000'))
+
+    def conditional(self, user, side, kind, trigger, qty=10, group=None):
+        return ConditionalOrder.objects.create(
+            user=user, symbol='NABIL', side=side, kind=kind, qty=qty, oco_group=group,
+            direction=ConditionalOrder.direction_for(kind, side),
+            trigger_price=Decimal(trigger), limit_price=Decimal(trigger),
+        )
+
+    def test_stop_loss_fires_matches_and_cancels_its_oco_partner(self):
+        group = uuid.uuid4()
+        stop = self.conditional(self.holder, 'SELL', 'STOP_LOSS', '90', group=group)
+        target = self.conditional(self.holder, 'SELL', 'TAKE_PROFIT', '120', group=group)
+        Order.objects.create(user=self.bidder, symbol='NABIL', side='BUY', qty=10, price=Decimal('91'))
+
+        self.assertEqual(trigger_engine.on_tick(quotes(NABIL=95)), [])
+        placed = trigger_engine.on_tick(quotes(NABIL=89.5))
+
+        self.assertEqual([(o.side, o.order_type, o.qty, o.price) for o in placed], [('SELL', 'STOP_LOSS', 10, Decimal('90'))])
+        stop.refresh_from_db()
+        target.refresh_from_db()
+        self.assertEqual((stop.status, stop.order_id, target.status), ('TRIGGERED', placed[0].id, 'CANCELLED'))
+        # Handed to the shard, where it matched the resting bid
+        self.assertEqual(list(TradeExecution.objects.values_list('executed_qty', 'executed_price')), [(10, Decimal('91.00'))])
+
+        self.assertEqual(trigger_engine.on_tick(quotes(NABIL=125)), [])
+
+    def test_buy_trigger_reserves_funds_or_is_rejected(self):
+        ok = self.conditional(self.bidder, 'BUY', 'STOP_LOSS', '105', qty=30)        # 3150
+        short = self.conditional(self.bidder, 'BUY', 'STOP_LOSS', '106', qty=30)     # 3180 more: not enough left
+
+        placed = trigger_engine.on_tick(quotes(NABIL=107))
+
+        self.assertEqual([o.price for o in placed], [Decimal('105')])
+        self.bidder.refresh_from_db()
+        self.assertEqual(self.bidder.virtual_balance, Decimal('1850'))
+        short.refresh_from_db()
+        self.assertEqual((short.status, short.reject_reason), ('REJECTED', 'Insufficient balance.'))
+        ok.refresh_from_db()
+        self.assertEqual(ok.status, 'TRIGGERED')
+
+    def test_fired_limit_outside_the_circuit_is_rejected(self):
+        cond = self.conditional(self.bidder, 'BUY', 'STOP_LOSS', '112', qty=1)
+
+        self.assertEqual(trigger_engine.on_tick(quotes(NABIL=113)), [])
+        cond.refresh_from_db()
+        self.assertEqual((cond.status, cond.reject_reason), ('REJECTED', 'Price outside circuit (Rs 90.00 - Rs 110.00)'))
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_quiet_tick_costs_one_query_however_many_are_pending(self):
+        for i in range(200):
+            self.conditional(self.holder, 'SELL', 'STOP_LOSS', str(50 + i % 30), qty=1)
+        trigger_engine.on_tick(quotes(NABIL=100))   # loads the index
+
+        with self.assertNumQueries(1):
+            self.assertEqual(trigger_engine.on_tick(quotes(NABIL=99, NICA=500)), [])
+
+    def test_index_picks_up_cancels_from_other_processes(self):
+        stop = self.conditional(self.holder, 'SELL', 'STOP_LOSS', '90')
+        trigger_engine.on_tick(quotes(NABIL=100))
+        ConditionalOrder.objects.filter(id=stop.id).update(status='CANCELLED')
+
+        self.assertEqual(trigger_engine.on_tick(quotes(NABIL=80)), [])
+
+
+class ConditionalOrderApiTestCase(TestCase):
+    def setUp(self):
+        open_market()
+        self.user = CustomUser.objects.create_user(username='u', email='u@test.com', password='pw')
+        Portfolio.objects.create(user=self.user, symbol='NABIL', quantity=10, avg_price=Decimal('100'))
+        self.client.force_login(self.user)
+
+    def post(self, url, payload=None):
+        return self.client.post(url, json.dumps(payload or {}), content_type='application/json').json()
+
+    def test_oco_from_a_recommendation_and_cancel_both_legs(self):
+        rec = StockRecommendation.objects.create(symbol='NABIL', current_price=100, predicted_next_close=104,
+                                                 recommendation=1, stop_loss=92.5, target_price=118)
+        body = self.post('/api/trade/conditional/place/', {'recommendation_id': rec.id, 'side': 'SELL', 'qty': 10})
+        self.assertTrue(body['success'], body)
+
+        legs = ConditionalOrder.objects.order_by('id')
+        self.assertEqual([(c.kind, c.direction, c.trigger_price) for c in legs],
+                         [('STOP_LOSS', 'BELOW', Decimal('92.50')), ('TAKE_PROFIT', 'ABOVE', Decimal('118.00'))])
+        self.assertEqual(legs[0].oco_group, legs[1].oco_group)
+        self.assertEqual(len(self.client.get('/api/trade/conditional/').json()['data']), 2)
+
+        self.assertTrue(self.post(f'/api/trade/conditional/cancel/{legs[0].id}/')['success'])
+        self.assertEqual(set(ConditionalOrder.objects.values_list('status', flat=True)), {'CANCELLED'})
+
+    def test_sell_needs_holdings(self):
+        body = self.post('/api/trade/conditional/place/', {'symbol': 'NABIL', 'side': 'SELL', 'qty': 11, 'stop_loss': 90})
+        self.assertFalse(body['success'])
+
+    def test_limit_price_is_validated_at_placement(self):
+        order = {'symbol': 'NABIL', 'side': 'SELL', 'qty': 10, 'stop_loss': 95}
+        body = self.post('/api/trade/conditional/place/', {**order, 'limit_price': 94.005})
+        self.assertEqual((body['success'], body['message']), (False, 'Price must be a multiple of Rs 0.01.'))
+        body = self.post('/api/trade/conditional/place/', {**order, 'limit_price': 85})
+        self.assertEqual(body['message'], 'Price outside circuit (Rs 90.00 - Rs 110.00)')
+
+        self.assertTrue(self.post('/api/trade/conditional/place/', {**order, 'limit_price': 94})['success'])
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from myapp.models import CustomUser, NEPSEPrice, Order, Portfolio, PortfolioSnapshot
+from myapp.services import settlement, valuation
+
+
+class ValueTestCase(SimpleTestCase):
+    def test_positions_are_priced_and_summed_per_user(self):
+        positions = [
+            (7, 'NABIL', 10, Decimal('500')),
+            (3, 'NICA', 5, Decimal('300')),
+            (7, 'HIDCL', 100, Decimal('200')),    # no price in the tick
+        ]
+        users, totals = valuation.value(positions, {'NABIL': 550.0, 'NICA': 310.0}, {'NABIL': 540.0})
+        self.assertEqual(users.tolist(), [3, 7])
+        self.assertEqual(totals['market_value'].tolist(), [1550.0, 25500.0])
+        self.assertEqual(totals['cost_basis'].tolist(), [1500.0, 25000.0])
+        self.assertEqual(totals['prev_value'].tolist(), [1550.0, 25400.0])   # NICA/HIDCL: no day change
+        self.assertEqual(totals['holdings_count'].tolist(), [1, 2])
+
+
+class ValuationTestCase(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        for symbol, ltp, close in (('NABIL', 550, 540), ('NICA', 310, 300)):
+            NEPSEPrice.objects.create(symbol=symbol, timestamp=self.now - timedelta(days=1), ltp=close, close=close)
+            NEPSEPrice.objects.create(symbol=symbol, timestamp=self.now, ltp=ltp)
+        self.users = [self.holder(i) for i in range(3)]
+
+    def holder(self, i):
+        user = CustomUser.objects.create_user(username=f'u{i}', email=f'u{i}@test.com', password='pw')
+        Portfolio.objects.create(user=user, symbol='NABIL', quantity=10, avg_price=Decimal('500'))
+        Portfolio.objects.create(user=user, symbol='NICA', quantity=5 * (i + 1), avg_price=Decimal('300'))
+        return user
+
+    def test_every_portfolio_is_written_in_one_pass(self):
+        self.assertEqual(valuation.revalue(), 3)
+
+        self.assertEqual(list(CustomUser.objects.order_by('id').values_list('portfolio_value', flat=True)),
+                         [Decimal('7050.00'), Decimal('8600.00'), Decimal('10150.00')])
+        snap = PortfolioSnapshot.objects.get(user=self.users[1])
+        self.assertEqual((snap.market_value, snap.cost_basis, snap.prev_value, snap.holdings_count),
+                         (Decimal('8600.00'), Decimal('8000.00'), Decimal('8400.00'), 2))
+
+        # Same tick again: the snapshots are replaced, not duplicated
+        valuation.revalue()
+        self.assertEqual(PortfolioSnapshot.objects.count(), 3)
+
+    def test_cost_does_not_grow_with_the_number_of_users(self):
+        def queries():
+            with CaptureQueriesContext(connection) as ctx:
+                valuation.revalue(self.now)
+            return len(ctx.captured_queries)
+
+        few = queries()
+        for i in range(3, 30):
+            self.holder(i)
+        self.assertEqual(queries(), few)
+
+    def test_sold_out_users_are_written_down_to_zero(self):
+        valuation.revalue()
+        Portfolio.objects.filter(user=self.users[0]).update(quantity=0)
+        valuation.revalue()
+
+        self.assertEqual(CustomUser.objects.get(id=self.users[0].id).portfolio_value, Decimal('0.00'))
+        self.assertEqual(valuation.latest(self.users[0]).market_value, Decimal('0.00'))
+
+    def test_dashboards_read_the_snapshot(self):
+        valuation.revalue()
+        self.client.force_login(self.users[0])
+
+        with CaptureQueriesContext(connection) as ctx:
+            summary = self.client.get('/api/dashboard/summary/').json()['data']
+            analytics = self.client.get('/api/portfolio/analytics/').json()['data']
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "users"')])
+
+        self.assertEqual((summary['portfolio_value'], summary['today_profit']), (7050.0, 150.0))
+        self.assertEqual(summary['rank'], 3)
+        self.assertEqual((analytics['total_value'], analytics['overall_pl'], analytics['holdings_count']),
+                         (7050.0, 550.0, 2))
+
+    def test_users_not_valued_yet_are_valued_on_read(self):
+        snap = valuation.latest(self.users[2])
+        self.assertIsNone(snap.pk)
+        self.assertEqual(snap.market_value, Decimal('10150.00'))
+
+    def test_traders_are_revalued_when_their_fills_commit(self):
+        valuation.revalue()
+        buyer, seller = self.users[:2]
+        buy = Order.objects.create(user=buyer, symbol='NABIL', side='BUY', qty=10, price=Decimal('550'))
+        sell = Order.objects.create(user=seller, symbol='NABIL', side='SELL', qty=10, price=Decimal('550'))
+        with self.captureOnCommitCallbacks(execute=True):
+            settlement.settle([(buy, sell, 10, Decimal('550'))])
+
+        self.assertEqual(valuation.latest(buyer).market_value, Decimal('12550.00'))    # 20 NABIL + 5 NICA
+        self.assertEqual(valuation.latest(seller).market_value, Decimal('3100.00'))    # 10 NICA
+        self.assertEqual(valuation.latest(self.users[2]).market_value, Decimal('10150.00'))
+
+    def test_snapshots_follow_the_playback_clock(self):
+        earlier = self.now - timedelta(minutes=5)
+        for symbol, ltp in (('NABIL', 500), ('NICA', 300)):
+            NEPSEPrice.objects.create(symbol=symbol, timestamp=earlier, ltp=ltp)
+        valuation.revalue()   # the latest scrape
+
+        replay = {'is_playback': True, 'timestamp': earlier}
+        with mock.patch('myapp.services.valuation.get_playback_state', return_value=replay):
+            self.assertEqual(valuation.latest(self.users[0]).market_value, Decimal('6500.00'))   # valued at the replay tick
+            valuation.revalue()
+        self.assertEqual(valuation.latest(self.users[0], earlier).timestamp, earlier)
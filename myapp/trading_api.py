@@ -2,59 +2,42 @@
 Trading Engine API Endpoints
 Handles order placement, book tracking, and playback simulation logic.
 """
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponseNotModified
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods, require_GET
-from django.db.models import Sum, Q
-from django.core.cache import cache
+from django.db.models import Q, F, Value, CharField
 from django.db import transaction
 from decimal import Decimal
 import json
 
 from myapp.models import Order, TradeExecution, Portfolio, CustomUser, NEPSEPrice
 from myapp.services.matching_engine import MatchingEngine
+from myapp.services import matching_service, order_depth
 from myapp.services.market_session import (
     is_market_open, get_market_status, get_nepal_time
 )
 from myapp.services.playback_engine import get_playback_state
+from myapp.services.market_feed import publish_order_update
+from myapp.services.pagination import (
+    InvalidCursor, parse_page_params, keyset_page, merged_page, page_info
+)
 
 @require_GET
 def api_orderbook(request, symbol):
     """
     GET /api/orderbook/<symbol>/
-    Returns aggregated Top 5 Bid and Top 5 Ask levels.
+    Returns aggregated Top 5 Bid and Top 5 Ask levels, as last published by
+    the symbol's matching shard. The depth version is the ETag, so polling
+    with If-None-Match gets a 304 until the book changes.
     """
-    symbol = symbol.upper().strip()
-    
-    # Cache key (1 second TTL for real-time feel)
-    cache_key = f'orderbook_{symbol}'
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return JsonResponse(cached_data)
-    
-    # Get open and partial orders for this symbol
-    buy_orders = Order.objects.filter(
-        symbol=symbol, side='BUY', status__in=['OPEN', 'PARTIAL']
-    ).values('price').annotate(
-        total_qty=Sum('qty') - Sum('filled_qty')
-    ).order_by('-price')[:5]
-    
-    sell_orders = Order.objects.filter(
-        symbol=symbol, side='SELL', status__in=['OPEN', 'PARTIAL']
-    ).values('price').annotate(
-        total_qty=Sum('qty') - Sum('filled_qty')
-    ).order_by('price')[:5]
-    
-    response_data = {
-        'success': True,
-        'symbol': symbol,
-        'bids': [{'price': float(o['price']), 'qty': int(o['total_qty'])} for o in buy_orders],
-        'asks': [{'price': float(o['price']), 'qty': int(o['total_qty'])} for o in sell_orders],
-        'last_updated': get_nepal_time().isoformat()
-    }
-    
-    cache.set(cache_key, response_data, 1)
-    return JsonResponse(response_data)
+    depth = order_depth.snapshot(symbol.upper().strip())
+    etag = f'"{depth["version"]}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({'success': True, **depth})
+    response['ETag'] = etag
+    return response
 
 
 @require_GET
@@ -81,7 +64,7 @@ from django.utils import timezone  # Ensure this is imported at the top
 @login_required
 def api_user_orders(request):
     """
-    GET /api/trade/orders/
+    GET /api/trade/orders/?cursor=<next_cursor>&limit=100
     Returns current user's open and partial orders.
     """
     symbol = request.GET.get('symbol', '').strip().upper()
@@ -90,6 +73,12 @@ def api_user_orders(request):
     if symbol:
         qs = qs.filter(symbol=symbol)
     
+    try:
+        cursor, limit = parse_page_params(request, default_limit=100)
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    page, next_cursor = keyset_page(qs, cursor, limit, 'created_at')
+    
     data = [{
         'id': o.id,
         'symbol': o.symbol,
@@ -101,9 +90,9 @@ def api_user_orders(request):
         'status': o.status,
         # Updated to use local timezone based on settings.py (Asia/Kathmandu)
         'created_at': timezone.localtime(o.created_at).strftime('%Y-%m-%d %H:%M:%S'),
-    } for o in qs.order_by('-created_at')[:100]]
+    } for o in page]
     
-    return JsonResponse({'success': True, 'data': data})
+    return JsonResponse({'success': True, 'data': data, 'pagination': page_info(cursor, next_cursor, limit)})
 
 @require_http_methods(['POST'])
 @login_required
@@ -118,16 +107,12 @@ def api_cancel_order(request, order_id):
         if order.status not in ['OPEN', 'PARTIAL']:
             return JsonResponse({'success': False, 'message': 'Order already filled or cancelled.'})
         
-        with transaction.atomic():
-            if order.side == 'BUY':
-                refund = Decimal(str(order.remaining_qty)) * order.price
-                request.user.virtual_balance += refund
-                request.user.save()
-            
-            order.status = 'CANCELLED'
-            order.save()
-        
-        return JsonResponse({'success': True, 'message': 'Order successfully cancelled.'})
+        # Cancels go through the symbol's matching shard so they can't race a match
+        success, message = matching_service.submit_cancel(order)
+        if success:
+            order.refresh_from_db()
+            publish_order_update(order)
+        return JsonResponse({'success': success, 'message': message})
         
     except Order.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Order not found.'}, status=404)
@@ -138,11 +123,10 @@ def api_cancel_order(request, order_id):
 def api_place_order_new(request):
     """
     POST /api/trade/place-new/
-    Main order matching logic. Notifies BOTH the Taker and the Maker(s) via email.
+    Main order matching logic. Both the Taker and the Maker(s) get a confirmation
+    email through the trade email outbox.
     """
-    from .utils import send_trade_confirmation_email
-    from myapp.models import CustomUser, Portfolio
-    from django.db import transaction
+    from myapp.services import order_validation
 
     try:
         data = json.loads(request.body)
@@ -156,95 +140,39 @@ def api_place_order_new(request):
         except (ValueError, TypeError):
             return JsonResponse({'success': False, 'message': 'Invalid quantity or price format.'})
         
-        # 1. Check Market / Playback Status
-        state = get_playback_state()
-        if not is_market_open() and not state['is_playback']:
+        # 1. Session, playback and circuit limits from the per-tick validation context
+        context = order_validation.get_context()
+        if not context.market_open:
             return JsonResponse({'success': False, 'message': 'Market is closed.'})
-        
-        # 2. Create and Validate Order
-        order = Order(user=request.user, symbol=symbol, side=side, order_type=order_type, qty=qty, price=price, status='OPEN')
-        is_valid, error_msg = MatchingEngine.validate_order(order)
-        if not is_valid:
+        error_msg = context.check_price(symbol, price)
+        if error_msg:
             return JsonResponse({'success': False, 'message': error_msg})
         
-        # 3. Deduct Funds for BUY (locking capital)
-        if side == 'BUY':
-            total_cost = Decimal(str(qty)) * price
-            request.user.virtual_balance -= total_cost
-            request.user.save()
-        
-        order.save()
-        
-        # 4. Run Matching Engine
-        executions = MatchingEngine.match_order(order)
+        # 2. Reserve Funds for BUY (one conditional UPDATE) and save the order together
+        order = Order(user=request.user, symbol=symbol, side=side, order_type=order_type, qty=qty, price=price, status='OPEN')
+        with transaction.atomic():
+            error_msg = order_validation.reserve(order)
+            if error_msg:
+                return JsonResponse({'success': False, 'message': error_msg})
+            order.save()
         
-        # 5. DEMO MAGIC: Playback Auto-Execution Bot
-        if state['is_playback'] and not executions:
-            pb_price_obj = NEPSEPrice.objects.filter(symbol=symbol, timestamp=state['timestamp']).first()
-            if pb_price_obj and pb_price_obj.ltp:
-                pb_ltp = float(pb_price_obj.ltp)
-                if (side == 'BUY' and pb_ltp <= float(price)) or (side == 'SELL' and pb_ltp >= float(price)):
-                    mm_user, _ = CustomUser.objects.get_or_create(
-                        username='marketbot', 
-                        email='bot@nepse.com', 
-                        defaults={'virtual_balance': 999999999}
-                    )
-                    bot_side = 'SELL' if side == 'BUY' else 'BUY'
-                    with transaction.atomic():
-                        if bot_side == 'SELL':
-                            Portfolio.objects.update_or_create(user=mm_user, symbol=symbol, defaults={'quantity': 999999, 'avg_price': 100})
-                        bot_order = Order.objects.create(user=mm_user, symbol=symbol, side=bot_side, order_type='LIMIT', qty=order.remaining_qty, price=Decimal(str(pb_ltp)), status='OPEN')
-                        execution = MatchingEngine.execute_trade(buy_order=order if side == 'BUY' else bot_order, sell_order=bot_order if side == 'BUY' else order, qty=order.remaining_qty, price=Decimal(str(pb_ltp)))
-                        executions.append(execution)
+        # 3. Hand the order to its symbol's matching shard and wait for the fills
+        #    (in playback, the shard also fills against the replayed ticks)
+        executions = matching_service.submit_order(order, context.playback_timestamp)
+        if executions is None:
+            return JsonResponse({'success': True, 'message': 'Order accepted. Matching is in progress.', 'executions': 0})
         
-        # 6. EMAIL NOTIFICATION LOGIC (The Fix)
+        # 4. Push order state to the owners' streams (taker + every maker)
+        publish_order_update(order)
+        for e in executions:
+            maker_order = e.sell_order if side == 'BUY' else e.buy_order
+            if maker_order is not None:
+                publish_order_update(maker_order)
+
+        # 5. Confirmation emails for the taker and every maker were queued in the
+        #    outbox with the fills; the mail worker sends them
         if executions:
-            # --- A. Notify the person who just placed the order (The Taker) ---
-            request.user.refresh_from_db()
             taker_qty = sum(e.executed_qty for e in executions)
-            taker_avg_p = sum(e.executed_qty * float(e.executed_price) for e in executions) / taker_qty
-            
-            send_trade_confirmation_email(
-                user=request.user, 
-                symbol=symbol, 
-                side=side, 
-                qty=taker_qty, 
-                price=taker_avg_p, 
-                order_id=order.id, 
-                order_type=order_type
-            )
-
-            # --- B. Notify the counter-parties (The Makers) ---
-            for e in executions:
-                # Determine who the counter-party is for this specific execution
-                if side == 'BUY':
-                    # Current user is Buyer, so counter-party is the Seller
-                    maker_user = e.sell_order.user
-                    maker_side = 'SELL'
-                    maker_order_id = e.sell_order.id
-                else:
-                    # Current user is Seller, so counter-party is the Buyer
-                    maker_user = e.buy_order.user
-                    maker_side = 'BUY'
-                    maker_order_id = e.buy_order.id
-
-                # Don't send emails to the Market Bot
-                if maker_user.username == 'marketbot':
-                    continue
-
-                # Refresh maker's data so the email shows updated balance/shares
-                maker_user.refresh_from_db()
-
-                send_trade_confirmation_email(
-                    user=maker_user,
-                    symbol=symbol,
-                    side=maker_side,
-                    qty=e.executed_qty,
-                    price=float(e.executed_price),
-                    order_id=maker_order_id,
-                    order_type='LIMIT'
-                )
-
             message = f'Trade success! {taker_qty} shares filled.'
         else:
             message = f'Order placed successfully! Waiting for match.'
@@ -258,25 +186,175 @@ def api_place_order_new(request):
 @login_required
 def api_trade_executions(request):
     """
-    GET /api/trade/executions/
+    GET /api/trade/executions/?cursor=<next_cursor>&limit=200
     Returns history of filled trades for the current user.
     """
     symbol = request.GET.get('symbol', '').strip().upper()
     
-    qs = TradeExecution.objects.filter(
-        Q(buy_order__user=request.user) | Q(sell_order__user=request.user)
-    ).select_related('buy_order', 'sell_order')
+    try:
+        cursor, limit = parse_page_params(request, default_limit=200)
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
+    # Buy and sell fills merged in SQL, each side an index range on (user, executed_at, id)
+    columns = {'ts': F('executed_at'), 'e_qty': F('executed_qty'), 'e_price': F('executed_price')}
+    buys = TradeExecution.objects.filter(buyer=request.user)
+    sells = TradeExecution.objects.filter(seller=request.user)
     if symbol:
-        qs = qs.filter(symbol=symbol)
+        buys, sells = buys.filter(symbol=symbol), sells.filter(symbol=symbol)
+    
+    rows, next_cursor = merged_page([
+        (0, buys.annotate(e_side=Value('BUY', output_field=CharField()), **columns)),
+        (1, sells.annotate(e_side=Value('SELL', output_field=CharField()), **columns)),
+    ], cursor, limit, ('symbol', 'e_side', 'e_qty', 'e_price'))
     
     data = [{
-        'executed_at': timezone.localtime(e.executed_at).strftime('%Y-%m-%d %H:%M:%S'),
-        'symbol': e.symbol,
-        'side': 'BUY' if e.buy_order.user == request.user else 'SELL',
-        'qty': e.executed_qty,
-        'price': float(e.executed_price),
+        'executed_at': timezone.localtime(r['ts']).strftime('%Y-%m-%d %H:%M:%S'),
+        'symbol': r['symbol'],
+        'side': r['e_side'],
+        'qty': r['e_qty'],
+        'price': float(r['e_price']),
         'status': 'FILLED'
-    } for e in qs.order_by('-executed_at')[:200]]
+    } for r in rows]
     
-    return JsonResponse({'success': True, 'data': data})
\ No newline at end of file
+    return JsonResponse({'success': True, 'data': data, 'pagination': page_info(cursor, next_cursor, limit)})
+
+@require_http_methods(['POST'])
+@login_required
+def api_place_conditional(request):
+    """
+    POST /api/trade/conditional/place/
+    Stop-loss and/or take-profit for {symbol, side, qty}. Both legs together
+    form an OCO pair. `recommendation_id` pre-fills the levels from a
+    StockRecommendation; `limit_price` (single leg only) defaults to the trigger.
+    """
+    import uuid
+    from myapp.models import ConditionalOrder, StockRecommendation
+    from myapp.services import order_validation
+
+    try:
+        data = json.loads(request.body)
+        symbol = (data.get('symbol') or '').strip().upper()
+        side = (data.get('side') or 'SELL').strip().upper()
+        stop_loss, take_profit = data.get('stop_loss'), data.get('take_profit')
+
+        if data.get('recommendation_id'):
+            rec = StockRecommendation.objects.filter(id=data['recommendation_id']).first()
+            if not rec:
+                return JsonResponse({'success': False, 'message': 'Recommendation not found.'}, status=404)
+            symbol = rec.symbol
+            stop_loss = stop_loss if stop_loss is not None else rec.stop_loss
+            take_profit = take_profit if take_profit is not None else rec.target_price
+
+        try:
+            qty = int(data.get('qty', 0))
+            legs = [(kind, Decimal(str(price)).quantize(Decimal('0.01')))
+                    for kind, price in (('STOP_LOSS', stop_loss), ('TAKE_PROFIT', take_profit)) if price is not None]
+            limit_price = Decimal(str(data['limit_price'])) if data.get('limit_price') is not None else None
+        except (ValueError, TypeError, ArithmeticError):
+            return JsonResponse({'success': False, 'message': 'Invalid quantity or price format.'})
+
+        if not symbol or side not in ['BUY', 'SELL'] or qty <= 0 or not legs or any(p <= 0 for _, p in legs):
+            return JsonResponse({'success': False, 'message': 'Invalid conditional order details provided.'})
+        if limit_price is not None and len(legs) > 1:
+            return JsonResponse({'success': False, 'message': 'limit_price applies to a single leg only.'})
+        if limit_price is not None:
+            # Same session, circuit and tick checks a LIMIT order gets; the fired order is checked again
+            error = order_validation.get_context().check_price(symbol, limit_price)
+            if error:
+                return JsonResponse({'success': False, 'message': error})
+
+        # Same holdings/funds check a LIMIT order gets; re-checked when it fires
+        if side == 'SELL':
+            held = Portfolio.objects.filter(user=request.user, symbol=symbol).values_list('quantity', flat=True).first() or 0
+            if held < qty:
+                return JsonResponse({'success': False, 'message': 'You do not have enough shares to sell.'})
+        elif request.user.virtual_balance < qty * max(limit_price or p for _, p in legs):
+            return JsonResponse({'success': False, 'message': 'Insufficient balance.'})
+
+        group = uuid.uuid4() if len(legs) > 1 else None
+        conds = ConditionalOrder.objects.bulk_create([
+            ConditionalOrder(
+                user=request.user, symbol=symbol, side=side, kind=kind, qty=qty,
+                direction=ConditionalOrder.direction_for(kind, side),
+                trigger_price=trigger, limit_price=limit_price or trigger, oco_group=group,
+            )
+            for kind, trigger in legs
+        ])
+        return JsonResponse({'success': True, 'message': 'Conditional order placed.', 'ids': [c.id for c in conds]})
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f"Error: {str(e)}"})
+
+
+@require_GET
+@login_required
+def api_conditional_orders(request):
+    """
+    GET /api/trade/conditional/
+    Returns the current user's pending conditional orders.
+    """
+    from myapp.models import ConditionalOrder
+
+    rows = ConditionalOrder.objects.filter(user=request.user, status='PENDING').order_by('-created_at')
+    data = [{
+        'id': c.id,
+        'symbol': c.symbol,
+        'side': c.side,
+        'kind': c.kind,
+        'qty': c.qty,
+        'trigger_price': float(c.trigger_price),
+        'limit_price': float(c.limit_price),
+        'oco_group': str(c.oco_group) if c.oco_group else None,
+        'created_at': timezone.localtime(c.created_at).strftime('%Y-%m-%d %H:%M:%S'),
+    } for c in rows]
+    return JsonResponse({'success': True, 'data': data})
+
+
+@require_http_methods(['POST'])
+@login_required
+def api_cancel_conditional(request, cond_id):
+    """
+    POST /api/trade/conditional/cancel/<cond_id>/
+    Cancel a pending conditional order (and its OCO partner).
+    """
+    from myapp.models import ConditionalOrder
+
+    cond = ConditionalOrder.objects.filter(id=cond_id, user=request.user).first()
+    if not cond:
+        return JsonResponse({'success': False, 'message': 'Conditional order not found.'}, status=404)
+    legs = Q(id=cond.id) | Q(oco_group=cond.oco_group) if cond.oco_group else Q(id=cond.id)
+    cancelled = ConditionalOrder.objects.filter(legs, user=request.user, status='PENDING').update(status='CANCELLED')
+    if not cancelled:
+        return JsonResponse({'success': False, 'message': 'Conditional order already triggered or cancelled.'})
+    return JsonResponse({'success': True, 'message': 'Conditional order cancelled.'})
+
+
+@require_http_methods(['POST'])
+@login_required
+def api_trade_batch(request):
+    """
+    POST /api/trade/batch/
+    Up to TRADE_BATCH_MAX place/cancel instructions in one request:
+    {"atomic": bool, "instructions": [{"op": "place", "symbol", "side", "qty", "price", "order_type"?},
+                                      {"op": "cancel", "order_id"}]}
+    Validated against one balance/holdings/circuit snapshot and applied in one
+    transaction; atomic batches apply nothing if any instruction fails.
+    Returns one result per instruction, in order.
+    """
+    from myapp.services import order_batch
+
+    try:
+        data = json.loads(request.body)
+        applied, results = order_batch.execute(request.user, data.get('instructions'), atomic=bool(data.get('atomic')))
+    except (ValueError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Invalid JSON body.'}, status=400)
+    except order_batch.BatchError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    ok = sum(1 for r in results if r['success'])
+    return JsonResponse({
+        'success': applied,
+        'message': f"{ok} of {len(results)} instructions applied.",
+        'results': results,
+    })
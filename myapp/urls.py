@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import trading_api
+from . import stream_api
 from django.contrib.auth import views as auth_views
 from .forms import CustomPasswordResetForm
 
@@ -30,11 +31,13 @@ urlpatterns = [
     path('api/gainers/', views.api_top_gainers, name='api_gainers'),
     path('api/losers/', views.api_top_losers, name='api_losers'),
     path('api/stats/', views.api_market_stats, name='api_stats'),
+    path('api/market/breadth/', views.api_market_breadth, name='api_market_breadth'),
     path('api/history/', views.api_symbol_history, name='api_history'),
     path('api/search/', views.api_search_symbol, name='api_search'),
     path('api/nepse-index/', views.api_nepse_index, name='api_nepse_index'),
     path('api/market-summary/', views.api_market_summary, name='api_market_summary'),
     path('api/sector-indices/', views.api_sector_indices, name='api_sector_indices'),
+    path('api/ticker-bar/', views.api_ticker_bar, name='api_ticker_bar'),
     path('api/market-data/', views.api_market_data_by_date, name='api_market_data_by_date'),
     path('api/sectors/', views.api_sectors, name='api_sectors'),
     path('api/stocks/', views.api_stocks, name='api_stocks'),
@@ -49,6 +52,13 @@ urlpatterns = [
     path('api/trade/cancel/<int:order_id>/', trading_api.api_cancel_order, name='api_cancel_order'),
     path('api/trade/place-new/', trading_api.api_place_order_new, name='api_place_order_new'),
     path('api/trade/executions/', trading_api.api_trade_executions, name='api_trade_executions'),
+    path('api/trade/batch/', trading_api.api_trade_batch, name='api_trade_batch'),
+    path('api/trade/conditional/', trading_api.api_conditional_orders, name='api_conditional_orders'),
+    path('api/trade/conditional/place/', trading_api.api_place_conditional, name='api_place_conditional'),
+    path('api/trade/conditional/cancel/<int:cond_id>/', trading_api.api_cancel_conditional, name='api_cancel_conditional'),
+
+    # Push (SSE) stream - replaces polling when served over ASGI
+    path('api/stream/', stream_api.api_stream, name='api_stream'),
     
     # Legacy / Compatibility APIs
     path('api/trade/history/', views.api_trade_history, name='api_trade_history'),
@@ -68,6 +78,7 @@ urlpatterns = [
     path('api/portfolio/performance/', views.api_portfolio_performance, name='api_portfolio_performance'),
     path('api/portfolio/activity/', views.api_portfolio_activity, name='api_portfolio_activity'),
     path('api/dashboard/summary/', views.api_dashboard_summary, name='api_dashboard_summary'),
+    path('api/dashboard/bundle/', views.api_dashboard_bundle, name='api_dashboard_bundle'),
     path('api/nepse-index/performance/', views.api_nepse_index_performance, name='api_nepse_index_performance'),
 
     # ==========================================
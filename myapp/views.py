@@ -4,9 +4,10 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
-from django.db.models import Max, Q, Avg, Count, Min
+from django.db.models import Max, Q, Avg, Count, Min, F, Value, CharField, FloatField
+from django.db.models.functions import Cast
 from django.db import transaction
 from decimal import Decimal
 from datetime import timedelta, datetime
@@ -16,6 +17,7 @@ from .forms import RegistrationForm
 import uuid
 import json
 import requests
+import numpy as np
 from django.conf import settings
 from .models import (
     NEPSEPrice, NEPSEIndex, MarketIndex, MarketSummary, Order, TradeExecution, 
@@ -26,6 +28,14 @@ from .models import (
 from .decorators import subscription_required, premium_required, gold_required
 from myapp.services.matching_engine import MatchingEngine
 from myapp.services.playback_engine import get_playback_state
+from myapp.services.market_context import get_market_context, parse_field_selection, select_fields
+from myapp.services.fast_response import FastJsonResponse, wants_columns, to_columns
+from myapp.services import symbol_index, history_cache, page_cache, platform_stats, matching_service, valuation
+from myapp.services.market_breadth import get_breadth
+from myapp.services.downsample import sql_buckets, lttb, parse_max_points
+from myapp.services.pagination import (
+    InvalidCursor, parse_page_params, keyset_page, merged_page, page_info
+)
 
 User = get_user_model()
 
@@ -75,6 +85,11 @@ def get_latest_nepse_index_with_change():
 
 # ========== HELPER FUNCTIONS ==========
 def get_nepse_context():
+    """Market widget context shared by the public and dashboard pages (cached per tick)"""
+    return page_cache.cached_fragment('nepse_context', build_nepse_context, lambda c: c.get('has_data'))
+
+
+def build_nepse_context():
     try:
         from django.db.models import Max
         state = get_playback_state()
@@ -82,12 +97,13 @@ def get_nepse_context():
         
         if not latest_time: return {'has_data': False}
 
-        # FETCH ALL DATA RELATIVE TO PLAYBACK MINUTE
-        latest_prices = NEPSEPrice.objects.filter(timestamp=latest_time, ltp__gt=0)
+        # FETCH ALL DATA RELATIVE TO PLAYBACK MINUTE (one pre-aggregated row)
+        breadth = get_breadth(latest_time)
+        if not breadth: return {'has_data': False}
         
         # --- ROBUST TURNOVER LOGIC ---
         # 1. Try to get turnover from the current 'latest_time'
-        top_turnover = list(latest_prices.filter(turnover__gt=0).order_by('-turnover')[:5].values('symbol', 'turnover'))
+        top_turnover = [{'symbol': r['symbol'], 'turnover': r['turnover']} for r in breadth.top_turnover[:5]]
 
         # 2. FALLBACK: If current data has 0 turnover (market closed or scraper off), find the last active one
         if not top_turnover:
@@ -106,12 +122,12 @@ def get_nepse_context():
             'has_data': True,
             'is_playback': state['is_playback'],
             'market_stats': {
-                'total_symbols': latest_prices.count(), 
-                'gainers': latest_prices.filter(change_pct__gt=0).count(), 
-                'losers': latest_prices.filter(change_pct__lt=0).count()
+                'total_symbols': breadth.total, 
+                'gainers': breadth.advances, 
+                'losers': breadth.declines
             },
-            'top_gainers': list(latest_prices.order_by('-change_pct')[:5].values('symbol', 'ltp', 'change_pct')),
-            'top_losers': list(latest_prices.order_by('change_pct')[:5].values('symbol', 'ltp', 'change_pct')),
+            'top_gainers': breadth.top_gainers[:5],
+            'top_losers': breadth.top_losers[:5],
             'top_turnover': top_turnover, # Now uses the robust fallback
             'last_update': latest_time,
             'nepse_index': nepse_index, 
@@ -131,18 +147,24 @@ from .models import Testimonial
 
 def landing_page(request):
     """Landing page with NEPSE data and dynamic platform stats"""
+    # Anonymous visitors all see the same page: serve it whole until the next tick
+    version = page_cache.tick_version() if not request.user.is_authenticated else None
+    if version:
+        content = page_cache.get_page('landing', version)
+        if content is not None:
+            return HttpResponse(content)
+
     context = get_nepse_context()
+    counters = platform_stats.get_counters()
 
-    # 1. Calculate Active Traders
-    total_traders = CustomUser.objects.count()
+    # 1. Active Traders
+    total_traders = int(counters[platform_stats.TRADERS])
     
-    # 2. Calculate Total Virtual Trade Volume
-    total_volume_raw = TradeExecution.objects.aggregate(
-        total=Sum(F('executed_qty') * F('executed_price'))
-    )['total'] or 0
+    # 2. Total Virtual Trade Volume
+    total_volume_raw = counters[platform_stats.TRADE_VOLUME]
 
-    # 3. Calculate Total Listed Stocks (DYNAMIC REPLACEMENT FOR RATING)
-    total_listed_stocks = Stock.objects.count()
+    # 3. Total Listed Stocks (DYNAMIC REPLACEMENT FOR RATING)
+    total_listed_stocks = int(counters[platform_stats.LISTED_STOCKS])
 
     # --- Formatting Logic ---
     
@@ -169,7 +191,10 @@ def landing_page(request):
         'testimonials': testimonials,
     })
 
-    return render(request, 'landing.html', context)
+    response = render(request, 'landing.html', context)
+    if version:
+        page_cache.set_page('landing', version, response.content)
+    return response
 
 
 def login_view(request):
@@ -727,35 +752,48 @@ def logout_view(request):
 
 # ========== NEPSE API ENDPOINTS ==========
 
+LATEST_FIELDS = ('symbol', 'open', 'high', 'low', 'close', 'ltp', 'change_pct', 'volume', 'turnover')
+
+def latest_nepse_payload(ctx):
+    """Latest tick for all symbols at the context's reference time"""
+    latest_time = ctx['ref_time']
+    if not latest_time:
+        return {'success': True, 'data': [], 'message': 'No data available'}
+    
+    data = list(NEPSEPrice.objects.filter(timestamp=latest_time).values(
+        *LATEST_FIELDS
+    ).order_by('symbol'))
+    
+    return {
+        'success': True,
+        'is_playback': ctx['is_playback'], # Let frontend know
+        'data': data,
+        'count': len(data),
+        'timestamp': latest_time.isoformat()
+    }
+
+
 @require_http_methods(["GET"])
 def api_latest_nepse(request):
-    """Get latest NEPSE prices for all symbols"""
+    """
+    Get latest NEPSE prices for all symbols
+    ?shape=columns returns `data` as {field: [values...]}
+    """
     try:
-        state = get_playback_state()
-        if state['is_playback'] and state['timestamp']:
-            latest_time = state['timestamp']
-        else:
-            latest_time = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
-        
-        if not latest_time:
-            return JsonResponse({'success': True, 'data': [], 'message': 'No data available'})
-        
-        data = list(NEPSEPrice.objects.filter(timestamp=latest_time).values(
-            'symbol', 'open', 'high', 'low', 'close', 'ltp', 
-            'change_pct', 'volume', 'turnover'
-        ).order_by('symbol'))
-        
-        return JsonResponse({
-            'success': True,
-            'is_playback': state['is_playback'], # Let frontend know
-            'data': data,
-            'count': len(data),
-            'timestamp': latest_time.isoformat()
-        })
+        payload = latest_nepse_payload(get_market_context())
+        if wants_columns(request):
+            payload['data'] = to_columns(payload['data'], LATEST_FIELDS)
+            payload['shape'] = 'columns'
+        return FastJsonResponse(payload, request=request)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+def leader_rows(leaders):
+    """Stored leaderboard entries in the api_top_gainers/losers row shape"""
+    return [{k: r[k] for k in ('symbol', 'ltp', 'change_pct', 'volume')} for r in leaders]
+
+
 @require_http_methods(["GET"])
 def api_top_gainers(request):
     """Get top 10 gainer stocks"""
@@ -766,7 +804,8 @@ def api_top_gainers(request):
         if not latest_time:
             return JsonResponse({'data': []})
         
-        data = list(NEPSEPrice.objects.filter(timestamp=latest_time).values('symbol', 'ltp', 'change_pct', 'volume').order_by('-change_pct')[:10])
+        breadth = get_breadth(latest_time)
+        data = leader_rows(breadth.top_gainers) if breadth else []
         return JsonResponse({'data': data, 'count': len(data)})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -782,7 +821,8 @@ def api_top_losers(request):
         if not latest_time:
             return JsonResponse({'data': []})
         
-        data = list(NEPSEPrice.objects.filter(timestamp=latest_time).values('symbol', 'ltp', 'change_pct', 'volume').order_by('change_pct')[:10])
+        breadth = get_breadth(latest_time)
+        data = leader_rows(breadth.top_losers) if breadth else []
         return JsonResponse({'data': data, 'count': len(data)})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -797,17 +837,52 @@ def api_market_stats(request):
         if not latest_time:
             return JsonResponse({'gainers': 0, 'losers': 0, 'unchanged': 0, 'total': 0})
         
-        latest_prices = NEPSEPrice.objects.filter(timestamp=latest_time)
+        breadth = get_breadth(latest_time)
+        if not breadth:
+            return JsonResponse({'gainers': 0, 'losers': 0, 'unchanged': 0, 'total': 0})
         return JsonResponse({
-            'gainers': latest_prices.filter(change_pct__gt=0).count(),
-            'losers': latest_prices.filter(change_pct__lt=0).count(),
-            'unchanged': latest_prices.filter(change_pct=0).count(),
-            'total': latest_prices.count(),
+            'gainers': breadth.advances,
+            'losers': breadth.declines,
+            'unchanged': breadth.unchanged,
+            'total': breadth.total,
             'timestamp': latest_time.isoformat()
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+
+@require_http_methods(["GET"])
+def api_market_breadth(request):
+    """
+    Breadth, leaders and sector heatmap for the current tick (one stored row)
+    GET /api/market/breadth/
+    """
+    try:
+        ctx = get_market_context()
+        breadth = get_breadth(ctx['ref_time'])
+        if not breadth:
+            return JsonResponse({'success': True, 'data': None, 'message': 'No data available'})
+        return JsonResponse({
+            'success': True,
+            'is_playback': ctx['is_playback'],
+            'data': {
+                'timestamp': breadth.timestamp.isoformat(),
+                'advances': breadth.advances,
+                'declines': breadth.declines,
+                'unchanged': breadth.unchanged,
+                'total': breadth.total,
+                'total_turnover': breadth.total_turnover,
+                'total_volume': breadth.total_volume,
+                'top_gainers': breadth.top_gainers,
+                'top_losers': breadth.top_losers,
+                'top_turnover': breadth.top_turnover,
+                'volume_leaders': breadth.volume_leaders,
+                'sectors': breadth.sectors,
+            }
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @require_http_methods(["GET"])
 def api_symbol_history(request):
     """Get price history for a symbol"""
@@ -834,24 +909,18 @@ def api_symbol_history(request):
 
 @require_http_methods(["GET"])
 def api_search_symbol(request):
-    """Search for a symbol"""
+    """Typeahead symbol search (in-memory index, no DB hit)"""
     try:
         query = request.GET.get('q', '').upper()
         
         if not query:
             return JsonResponse({'data': []})
         
-        latest_time = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
-        
-        if not latest_time:
-            return JsonResponse({'data': []})
-        
-        symbols = list(NEPSEPrice.objects.filter(
-            timestamp=latest_time,
-            symbol__icontains=query
-        ).values(
-            'symbol', 'ltp', 'change_pct'
-        )[:10])
+        symbols = [
+            {'symbol': r['symbol'], 'company_name': r['company_name'], 'ltp': r['ltp'], 'change_pct': r['change_pct']}
+            for r in symbol_index.search_with_quotes(query, limit=10)
+            if r['ltp'] is not None
+        ]
         
         return JsonResponse({'data': symbols})
     except Exception as e:
@@ -940,6 +1009,27 @@ def api_sector_indices(request):
         return JsonResponse({'success': True, 'data': found_data})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def api_ticker_bar(request):
+    """
+    GET /api/ticker-bar/
+    Navbar bundle: NEPSE index + SENSITIVE/FLOAT + turnover summary + session,
+    resolved against ONE playback state instead of three separate requests.
+    """
+    try:
+        from myapp.services.market_feed import build_index_bar
+        ctx = get_market_context()
+        ref_time = ctx['ref_time'] if ctx['is_playback'] else timezone.now()
+        data = build_index_bar(ref_time)
+        data['session'] = ctx['session']
+        data['is_playback'] = ctx['is_playback']
+        return JsonResponse({'success': True, 'data': data})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
 @login_required
 def stocks(request):
     # just render page; it will load data using /api/latest/
@@ -955,7 +1045,7 @@ from .models import Trade  # make sure this matches your model name
 @login_required
 def api_trade_history(request):
     """
-    GET /api/trade/history/?symbol=NBL
+    GET /api/trade/history/?symbol=NBL&cursor=<next_cursor>&limit=200
     Returns ONLY the logged-in user's BUY/SELL history.
     """
     symbol = (request.GET.get('symbol') or '').strip().upper()
@@ -969,7 +1059,11 @@ def api_trade_history(request):
     if side in ['BUY', 'SELL']:
         qs = qs.filter(side=side)
 
-    qs = qs.order_by('-created_at')[:200]
+    try:
+        cursor, limit = parse_page_params(request, default_limit=200)
+    except InvalidCursor as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    page, next_cursor = keyset_page(qs, cursor, limit, 'created_at')
 
     data = [{
         "created_at": t.created_at.strftime("%Y-%m-%d %H:%M:%S"),
@@ -978,9 +1072,9 @@ def api_trade_history(request):
         "qty": t.qty,
         "price": t.price,
         "status": t.status,
-    } for t in qs]
+    } for t in page]
 
-    return JsonResponse({"success": True, "data": data})
+    return JsonResponse({"success": True, "data": data, "pagination": page_info(cursor, next_cursor, limit)})
 
 
 
@@ -991,8 +1085,7 @@ def api_place_order(request):
     try:
         import json
         from decimal import Decimal, InvalidOperation
-        # Import the email function here
-        from .utils import send_trade_confirmation_email 
+        from myapp.services import order_validation
         
         data = json.loads(request.body)
         symbol = (data.get('symbol') or '').strip().upper()
@@ -1017,44 +1110,35 @@ def api_place_order(request):
         # Create Order instance
         order = Order(user=request.user, symbol=symbol, side=side, qty=qty, price=price, status='OPEN')
 
-        # 1. Validate (Circuit limits + Funds)
-        is_valid, err = MatchingEngine.validate_order(order)
-        if not is_valid: 
+        # 1. Validate (session + circuit limits from the per-tick context)
+        err = order_validation.get_context().check_price(symbol, price)
+        if err:
             return JsonResponse({'success': False, 'message': err})
 
+        # 2. Reserve funds with one conditional UPDATE and save the order together
         with transaction.atomic():
-            user = request.user.__class__.objects.select_for_update().get(pk=request.user.pk)
-            
-            if side == 'BUY':
-                total_cost = Decimal(str(qty)) * price
-                if user.virtual_balance < total_cost:
-                    return JsonResponse({'success': False, 'message': 'Insufficient balance.'})
-                user.virtual_balance -= total_cost
-                user.save()
-
-            order.user = user
+            err = order_validation.reserve(order)
+            if err:
+                return JsonResponse({'success': False, 'message': err})
             order.save()
-            matches = MatchingEngine.match_order(order)
 
-        # === ADDED EMAIL NOTIFICATION LOGIC HERE ===
-        if matches:
-            # Refresh user data to get updated virtual_balance and portfolio_value
-            request.user.refresh_from_db()
+        # Matching happens on the symbol's shard; the order is committed before it is enqueued
+        matches = matching_service.submit_order(order)
+        if matches is None:
+            return JsonResponse({'success': True, 'message': 'Order accepted. Matching is in progress.'})
 
-            # Trigger the professional email
-            send_trade_confirmation_email(
-                user=request.user,
-                symbol=symbol,
-                side=side,
-                qty=qty,
-                price=price,
-                order_id=order.id,
-                order_type="LIMIT" # Legacy orders are usually LIMIT
-            )
+        from myapp.services.market_feed import publish_order_update
+        publish_order_update(order)
+        for m in matches:
+            maker_order = m.sell_order if side == 'BUY' else m.buy_order
+            if maker_order is not None:
+                publish_order_update(maker_order)
+
+        # Confirmation emails were queued in the outbox with the fills
+        if matches:
             msg = "✅ Order matched!"
         else:
             msg = "Order placed in Market Depth. Waiting for counter-party."
-        # ===========================================
 
         return JsonResponse({'success': True, 'message': msg})
         
@@ -1112,39 +1196,44 @@ def api_stocks(request):
     GET /api/stocks/?sector=<id> → filtered by sector id
     GET /api/stocks/?search=<q>  → filtered by symbol or company_name
     """
-    from myapp.models import Stock
-    qs = Stock.objects.select_related('sector').order_by('symbol')
-
     sector_id = request.GET.get('sector', '').strip()
     if sector_id:
         try:
-            qs = qs.filter(sector_id=int(sector_id))
+            sector_id = int(sector_id)
         except (ValueError, TypeError):
             return JsonResponse({'success': False, 'error': 'Invalid sector id'}, status=400)
 
+    # Served from the symbol index; search keeps icontains semantics (no fuzzy hits)
+    index = symbol_index.get_index()
     search = request.GET.get('search', '').strip()
     if search:
-        from django.db.models import Q
-        qs = qs.filter(
-            Q(symbol__icontains=search) | Q(company_name__icontains=search)
-        )
+        entries = sorted(index.search(search, limit=None, fuzzy=False), key=lambda e: e['symbol'])
+    else:
+        entries = index.entries
 
     data = [
         {
-            'symbol': s.symbol,
-            'company_name': s.company_name or s.symbol,
-            'sector_id': s.sector_id,
-            'sector_name': s.sector.name if s.sector else 'Others',
+            'symbol': e['symbol'],
+            'company_name': e['company_name'],
+            'sector_id': e['sector_id'],
+            'sector_name': e['sector_name'],
         }
-        for s in qs
+        for e in entries
+        if not sector_id or e['sector_id'] == sector_id
     ]
     return JsonResponse({'success': True, 'stocks': data, 'count': len(data)})
 
+MARKET_DATA_FIELDS = LATEST_FIELDS + ('timestamp', 'sector', 'company_name')
+
+
 @require_http_methods(["GET"])
 @login_required
 def api_market_data_by_date(request):
+    """
+    GET /api/market-data/?date=YYYY-MM-DD&sector=...&search=...
+    ?shape=columns returns `stocks` as {field: [values...]}
+    """
     try:
-        from django.db.models import Max
         date_str = request.GET.get('date') # This is what JS sends
         sector_filter = request.GET.get('sector')
         search_query = request.GET.get('search', '').strip().upper()
@@ -1156,12 +1245,8 @@ def api_market_data_by_date(request):
             except ValueError:
                 target_date = timezone.now().date()
 
-            # Find the LATEST record ID for each stock on that specific day
-            latest_ids = NEPSEPrice.objects.filter(
-                timestamp__date=target_date
-            ).values('symbol').annotate(max_id=Max('id')).values_list('max_id', flat=True)
-            
-            qs = NEPSEPrice.objects.filter(id__in=latest_ids)
+            # Final quote per stock that day (cached once the day has closed)
+            rows = history_cache.market_day_rows(target_date)
             is_pb = False # It's historical, not playback
             filter_date_display = target_date
         else:
@@ -1177,33 +1262,37 @@ def api_market_data_by_date(request):
                 qs = NEPSEPrice.objects.filter(timestamp=latest_entry.timestamp)
                 filter_date_display = latest_entry.timestamp.date()
                 is_pb = False
+            rows = list(qs.values(*history_cache.DAY_FIELDS).order_by('symbol'))
 
-        # Apply frontend filters (Sector/Search)
-        if sector_filter and sector_filter not in ['All Sectors', '']:
-            relevant_symbols = list(Stock.objects.filter(sector__name__iexact=sector_filter).values_list('symbol', flat=True))
-            qs = qs.filter(symbol__in=relevant_symbols)
-        if search_query:
-            qs = qs.filter(symbol__icontains=search_query)
-
-        # Optimization: Build results
-        all_prices = qs.values('symbol', 'open', 'high', 'low', 'close', 'ltp', 'change_pct', 'volume', 'turnover', 'timestamp').order_by('symbol')
-        
-        # Attach Metadata
-        stock_map = {s.symbol.upper(): s for s in Stock.objects.all().select_related('sector')}
+        # Attach Metadata from the in-memory symbol index, then apply frontend filters (Sector/Search)
+        meta = symbol_index.get_index()
+        sector_filter = sector_filter.lower() if sector_filter and sector_filter not in ['All Sectors', ''] else None
         stocks_data = []
-        for item in all_prices:
-            sym = item['symbol'].upper()
-            meta = stock_map.get(sym)
-            item['sector'] = meta.sector.name if (meta and meta.sector) else 'Others'
-            item['company_name'] = meta.company_name if meta else sym
-            stocks_data.append(item)
+        for row in rows:
+            sym = row['symbol'].upper()
+            if search_query and search_query not in sym:
+                continue
+            pos = meta.by_symbol.get(sym)
+            entry = meta.entries[pos] if pos is not None else None
+            sector = entry['sector_name'] if entry else 'Others'
+            if sector_filter and (not entry or sector.lower() != sector_filter):
+                continue
+            stocks_data.append({
+                **row,
+                'sector': sector,
+                'company_name': entry['company_name'] if entry else sym,
+            })
 
-        return JsonResponse({
+        payload = {
             'success': True, 
             'is_playback': is_pb,
             'stocks': stocks_data,
             'date': str(filter_date_display),
-        })
+        }
+        if wants_columns(request):
+            payload['stocks'] = to_columns(stocks_data, MARKET_DATA_FIELDS)
+            payload['shape'] = 'columns'
+        return FastJsonResponse(payload, request=request)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
     
@@ -1214,10 +1303,8 @@ def api_available_dates(request):
     GET /api/available-dates/
     """
     try:
-        # Get distinct dates from NEPSEPrice model
-        dates = NEPSEPrice.objects.dates('timestamp', 'day', order='DESC')
-        
-        date_list = [date.strftime('%Y-%m-%d') for date in dates]
+        # Closed days come from the history cache; only today is checked live
+        date_list = history_cache.available_dates()
         
         return JsonResponse({
             'success': True,
@@ -1233,12 +1320,37 @@ def api_available_dates(request):
         }, status=500)
 
 
+HISTORY_FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'ltp', 'volume', 'turnover', 'change_pct')
+HISTORY_MAX_POINTS = 500
+
+
+def downsampled_history_rows(history_qs, first, last, max_points):
+    """
+    One HISTORY_FIELDS row per SQL time bucket: open from the bucket's first
+    tick, high/low over the whole bucket, everything else from its last tick.
+    """
+    buckets = sql_buckets(history_qs, first, last, max_points, {
+        'bucket_high': Max('high'),
+        'bucket_low': Min('low'),
+    })
+    edges = {b['first_ts'] for b in buckets} | {b['last_ts'] for b in buckets}
+    edge_rows = {row[0]: row for row in history_qs.filter(timestamp__in=edges).values_list(*HISTORY_FIELDS)}
+
+    rows = []
+    for b in buckets:
+        opening, closing = edge_rows[b['first_ts']], edge_rows[b['last_ts']]
+        rows.append((b['last_ts'], opening[1], b['bucket_high'], b['bucket_low'], *closing[4:]))
+    return rows
+
+
 @require_http_methods(["GET"])
 def api_stock_history_range(request, symbol):
     """
     Get historical data for a specific stock
     GET /api/stock-history/NABIL/?days=30
     GET /api/stock-history/NABIL/?start_date=2025-01-01&end_date=2025-01-31
+    ?shape=columns returns `history` as {field: [values...]}
+    ?max_points=N caps the number of points (default 500, 0 = every tick)
     """
     try:
         symbol = symbol.upper()
@@ -1255,42 +1367,56 @@ def api_stock_history_range(request, symbol):
             end_date = timezone.now()
             start_date = end_date - timedelta(days=days)
         
+        max_points = parse_max_points(request, HISTORY_MAX_POINTS)
+        
         # Get history for date range
-        history = NEPSEPrice.objects.filter(
+        history_qs = NEPSEPrice.objects.filter(
             symbol=symbol,
             timestamp__gte=start_date,
             timestamp__lte=end_date
-        ).order_by('timestamp')
+        )
+        stats = history_qs.aggregate(n=Count('id'), first=Min('timestamp'), last=Max('timestamp'))
         
-        if not history.exists():
+        if not stats['n']:
             return JsonResponse({
                 'success': False,
                 'error': f'No data found for symbol {symbol}'
             }, status=404)
         
-        return JsonResponse({
+        # Long ranges are bucketed in SQL so the payload tracks chart width
+        downsampled = bool(max_points) and stats['n'] > max_points
+        if downsampled:
+            rows = downsampled_history_rows(history_qs, stats['first'], stats['last'], max_points)
+        else:
+            rows = list(history_qs.order_by('timestamp').values_list(*HISTORY_FIELDS))
+        
+        payload = {
             'success': True,
             'symbol': symbol,
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d'),
-            'data_points': history.count(),
-            'history': [
-                {
-                    'date': h.timestamp.strftime('%Y-%m-%d'),
-                    'time': h.timestamp.strftime('%H:%M:%S'),
-                    'timestamp': h.timestamp.isoformat(),
-                    'open': float(h.open or 0),
-                    'high': float(h.high or 0),
-                    'low': float(h.low or 0),
-                    'close': float(h.close or 0),
-                    'ltp': float(h.ltp or 0),
-                    'volume': float(h.volume or 0),
-                    'turnover': float(h.turnover or 0),
-                    'change_pct': float(h.change_pct or 0)
-                }
-                for h in history
-            ]
-        })
+            'data_points': len(rows),
+            'raw_points': stats['n'],
+            'downsampled': downsampled,
+        }
+        if wants_columns(request):
+            # Numbers only; clients derive date/time from the ISO timestamp
+            columns = list(zip(*rows))
+            payload['history'] = {
+                'timestamp': [ts.isoformat() for ts in columns[0]],
+                **{f: [v or 0 for v in col] for f, col in zip(HISTORY_FIELDS[1:], columns[1:])},
+            }
+            payload['shape'] = 'columns'
+        else:
+            history = []
+            for ts, *values in rows:
+                iso = ts.isoformat()
+                point = {'date': iso[:10], 'time': iso[11:19], 'timestamp': iso}
+                for f, v in zip(HISTORY_FIELDS[1:], values):
+                    point[f] = v or 0
+                history.append(point)
+            payload['history'] = history
+        return FastJsonResponse(payload, request=request)
     except ValueError:
         return JsonResponse({
             'success': False,
@@ -1322,39 +1448,16 @@ def api_date_range_summary(request):
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
         
-        # Get all dates with data in range
-        dates_with_data = NEPSEPrice.objects.filter(
-            timestamp__date__gte=start_date.date(),
-            timestamp__date__lte=end_date.date()
-        ).dates('timestamp', 'day')
-        
-        # Get NEPSE index values for the range
-        nepse_indices = NEPSEIndex.objects.filter(
-            timestamp__date__gte=start_date.date(),
-            timestamp__date__lte=end_date.date()
-        ).order_by('timestamp')
-        
-        first_index = nepse_indices.first()
-        last_index = nepse_indices.last()
-        
-        index_change = None
-        index_change_pct = None
-        if first_index and last_index:
-            index_change = float(last_index.index_value - first_index.index_value)
-            index_change_pct = (index_change / first_index.index_value) * 100
+        # Immutable once end_date has closed, so served from the history cache
+        summary = history_cache.date_range_summary(start_date.date(), end_date.date())
         
         return JsonResponse({
             'success': True,
             'start_date': start_date_str,
             'end_date': end_date_str,
-            'trading_days': len(dates_with_data),
-            'dates': [d.strftime('%Y-%m-%d') for d in dates_with_data],
-            'nepse_index_summary': {
-                'first_value': float(first_index.index_value) if first_index else None,
-                'last_value': float(last_index.index_value) if last_index else None,
-                'change': index_change,
-                'change_pct': index_change_pct
-            } if first_index and last_index else None
+            'trading_days': len(summary['dates']),
+            'dates': summary['dates'],
+            'nepse_index_summary': summary['nepse_index_summary'],
         })
         
     except ValueError:
@@ -1371,40 +1474,41 @@ def api_date_range_summary(request):
 
 # ========== WATCHLIST & RECOMMENDATION API ==========
 
+def watchlist_payload(user, ctx):
+    """User's watchlist priced at the context's reference tick"""
+    latest_time = ctx['ref_time']
+
+    watchlist_symbols = list(Watchlist.objects.filter(user=user).values_list('symbol', flat=True))
+    if not watchlist_symbols:
+        return {'success': True, 'data': []}
+
+    stocks_meta = {s.symbol: s.company_name for s in Stock.objects.filter(symbol__in=watchlist_symbols)}
+    
+    prices_map = {}
+    if latest_time:
+        prices_qs = NEPSEPrice.objects.filter(symbol__in=watchlist_symbols, timestamp=latest_time)
+        for p in prices_qs:
+            prices_map[p.symbol] = {'ltp': p.ltp, 'change_pct': p.change_pct}
+            
+    data = []
+    for sym in watchlist_symbols:
+        price_info = prices_map.get(sym, {'ltp': 0, 'change_pct': 0})
+        data.append({
+            'symbol': sym,
+            'name': stocks_meta.get(sym, 'N/A'),
+            'price': float(price_info['ltp'] or 0),
+            'change': float(price_info['change_pct'] or 0)
+        })
+        
+    return {'success': True, 'data': data, 'is_playback': ctx['is_playback']}
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_get_watchlist(request):
     """Get user's watchlist synced with Playback Engine"""
     try:
-        state = get_playback_state()
-        if state['is_playback'] and state['timestamp']:
-            latest_time = state['timestamp']
-        else:
-            latest_time = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
-
-        watchlist_symbols = Watchlist.objects.filter(user=request.user).values_list('symbol', flat=True)
-        if not watchlist_symbols:
-            return JsonResponse({'success': True, 'data': []})
-
-        stocks_meta = {s.symbol: s.company_name for s in Stock.objects.filter(symbol__in=watchlist_symbols)}
-        
-        prices_map = {}
-        if latest_time:
-            prices_qs = NEPSEPrice.objects.filter(symbol__in=watchlist_symbols, timestamp=latest_time)
-            for p in prices_qs:
-                prices_map[p.symbol] = {'ltp': p.ltp, 'change_pct': p.change_pct}
-                
-        data = []
-        for sym in watchlist_symbols:
-            price_info = prices_map.get(sym, {'ltp': 0, 'change_pct': 0})
-            data.append({
-                'symbol': sym,
-                'name': stocks_meta.get(sym, 'N/A'),
-                'price': float(price_info['ltp'] or 0),
-                'change': float(price_info['change_pct'] or 0)
-            })
-            
-        return JsonResponse({'success': True, 'data': data, 'is_playback': state['is_playback']})
+        return JsonResponse(watchlist_payload(request.user, get_market_context()))
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
@@ -1753,203 +1857,111 @@ def api_refresh_all_recommendations(request):
 
 # ========== PORTFOLIO ANALYTICS API ==========
 
+def dashboard_summary_payload(user, ctx):
+    """
+    Get high-level summary for the dashboard.
+    Reads the user's latest valuation snapshot (see services/valuation.py);
+    Today's Profit is measured against the last trading day's close.
+    """
+    from django.db.models import F
+    from decimal import Decimal
+
+    snapshot = valuation.latest(user, ctx['ref_time'])
+    portfolio_value = snapshot.market_value if snapshot else Decimal('0.00')
+    yesterday_portfolio_value = snapshot.prev_value if snapshot else Decimal('0.00')
+
+    # Calculate True Today's Profit
+    today_profit = portfolio_value - yesterday_portfolio_value
+    today_profit_pct = (today_profit / yesterday_portfolio_value * 100) if yesterday_portfolio_value > 0 else Decimal('0.00')
+
+    # Calculate Wealth & Rank
+    wealth = float(user.virtual_balance) + float(portfolio_value)
+    user_total = user.virtual_balance + user.portfolio_value
+    rank = User.objects.annotate(
+        calculated_wealth=F('virtual_balance') + F('portfolio_value')
+    ).filter(calculated_wealth__gt=user_total).count() + 1
+
+    return {
+        'success': True,
+        'data': {
+            'rank': rank,
+            'total_users': User.objects.count(),
+            'portfolio_value': float(portfolio_value),
+            'virtual_balance': float(user.virtual_balance),
+            'total_wealth': wealth,
+            'today_profit': float(today_profit),
+            'today_profit_pct': float(today_profit_pct),
+            'username': user.first_name or user.username
+        }
+    }
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_dashboard_summary(request):
-    """
-    Get high-level summary for the dashboard. 
-    Force-syncs the database to 0 if no holdings are found.
-    Calculates TRUE Today's Profit and safely handles missing data.
-    """
+    """Dashboard summary card (wealth, rank, today's profit)"""
     try:
-        from django.db.models import F, Max
-        from decimal import Decimal
-        from .models import Portfolio, NEPSEPrice 
-        from django.contrib.auth import get_user_model
-        
-        User = get_user_model()
-        user = request.user
-        
-        holdings = Portfolio.objects.filter(user=user, quantity__gt=0)
-        
-        real_portfolio_value = Decimal('0.00')
-        total_cost_basis = Decimal('0.00')
-        yesterday_portfolio_value = Decimal('0.00') # Added for TRUE Today's Profit
-        
-        if holdings.exists():
-            latest_time = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
-            symbols = [h.symbol.strip().upper() for h in holdings]
-            
-            price_map = {}
-            prev_price_map = {}
-            
-            if latest_time:
-                # 1. Get Today's Live Prices
-                latest_prices = NEPSEPrice.objects.filter(symbol__in=symbols, timestamp=latest_time)
-                price_map = {p.symbol.upper(): Decimal(str(p.ltp or 0)) for p in latest_prices}
-                
-                # 2. Get Yesterday's Closing Prices (The Safe Way, skipping weekends)
-                prev_date_record = NEPSEPrice.objects.filter(
-                    timestamp__date__lt=latest_time.date()
-                ).order_by('-timestamp').first()
-                
-                if prev_date_record:
-                    prev_prices = NEPSEPrice.objects.filter(
-                        symbol__in=symbols, 
-                        timestamp__date=prev_date_record.timestamp.date()
-                    ).order_by('symbol', '-timestamp').distinct('symbol')
-                    
-                    prev_price_map = {
-                        p.symbol.upper(): Decimal(str(p.close if p.close else (p.ltp or 0))) 
-                        for p in prev_prices
-                    }
-            
-            for h in holdings:
-                sym = h.symbol.strip().upper()
-                qty = Decimal(str(h.quantity or 0))
-                
-                # SAFELY handle missing avg_price
-                safe_avg_price = Decimal(str(h.avg_price or 0))
-                
-                # Current Value Math
-                current_price = price_map.get(sym, safe_avg_price)
-                real_portfolio_value += (qty * current_price)
-                total_cost_basis += (qty * safe_avg_price)
-                
-                # Yesterday's Value Math (If no data for yesterday, fallback to current price so profit is 0)
-                prev_price = prev_price_map.get(sym, current_price)
-                yesterday_portfolio_value += (qty * prev_price)
-        
-        # FORCE SYNC DB
-        if user.portfolio_value != real_portfolio_value:
-            User.objects.filter(id=user.id).update(portfolio_value=real_portfolio_value)
-            user.portfolio_value = real_portfolio_value
-
-        # Calculate True Today's Profit
-        today_profit = real_portfolio_value - yesterday_portfolio_value
-        today_profit_pct = (today_profit / yesterday_portfolio_value * 100) if yesterday_portfolio_value > 0 else Decimal('0.00')
-        
-        # Calculate Wealth & Rank
-        wealth = float(user.virtual_balance) + float(real_portfolio_value)
-        user_total = user.virtual_balance + user.portfolio_value
-        rank = User.objects.annotate(
-            calculated_wealth=F('virtual_balance') + F('portfolio_value')
-        ).filter(calculated_wealth__gt=user_total).count() + 1
-        
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'rank': rank,
-                'total_users': User.objects.count(),
-                'portfolio_value': float(real_portfolio_value),
-                'virtual_balance': float(user.virtual_balance),
-                'total_wealth': wealth,
-                'today_profit': float(today_profit),          # <-- Now calculates correctly!
-                'today_profit_pct': float(today_profit_pct),  # <-- Now calculates correctly!
-                'username': user.first_name or user.username
-            }
-        })
+        return JsonResponse(dashboard_summary_payload(request.user, get_market_context()))
     except Exception as e:
         import traceback
         print(traceback.format_exc()) # This prints the exact error to your terminal
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+def portfolio_analytics_payload(user, ctx):
+    """Value and P/L from the user's latest valuation snapshot (Today's P/L vs the last trading day's close)"""
+    # 1. The snapshot of the last valuation pass
+    snapshot = valuation.latest(user, ctx['ref_time'])
+    if snapshot is None:
+        return {'success': False, 'error': 'No market data'}
+
+    if not snapshot.holdings_count:
+        return {
+            'success': True,
+            'data': {
+                'total_value': 0,
+                'holdings_count': 0,
+                'today_pl': 0,
+                'today_pl_pct': 0,
+                'overall_pl': 0,
+                'overall_pl_pct': 0,
+                'cost_basis': 0,
+                'timestamp': timezone.now().isoformat()
+            }
+        }
+
+    total_value = snapshot.market_value
+    total_cost_basis = snapshot.cost_basis
+    total_prev_value = snapshot.prev_value
+
+    # 2. Final Math
+    today_pl = total_value - total_prev_value
+    today_pl_pct = (today_pl / total_prev_value * 100) if total_prev_value > 0 else 0
+    overall_pl = total_value - total_cost_basis
+    overall_pl_pct = (overall_pl / total_cost_basis * 100) if total_cost_basis > 0 else 0
+
+    # 3. Return Full Data Payload
+    return {
+        'success': True,
+        'data': {
+            'total_value': float(total_value),
+            'holdings_count': snapshot.holdings_count,
+            'today_pl': float(today_pl),
+            'today_pl_pct': float(today_pl_pct),
+            'overall_pl': float(overall_pl),
+            'overall_pl_pct': float(overall_pl_pct),
+            'cost_basis': float(total_cost_basis),
+            'timestamp': snapshot.timestamp.isoformat(),
+            'is_playback': ctx['is_playback']
+        }
+    }
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_portfolio_analytics(request):
-    """Calculates TRUE Today's Profit by comparing against the last trading day's close"""
+    """Portfolio analytics card (value, today's and overall P/L)"""
     try:
-        from decimal import Decimal
-        from myapp.services.playback_engine import get_playback_state
-        user = request.user
-        
-        # 1. Get user's portfolio holdings
-        holdings = Portfolio.objects.filter(user=user, quantity__gt=0)
-        
-        # Determine the number of unique scrips (Fixes the "0 holdings" bug)
-        holdings_count = holdings.count()
-
-        if not holdings.exists():
-            return JsonResponse({
-                'success': True,
-                'data': {
-                    'total_value': 0,
-                    'holdings_count': 0,
-                    'today_pl': 0,
-                    'today_pl_pct': 0,
-                    'overall_pl': 0,
-                    'overall_pl_pct': 0,
-                    'cost_basis': 0,
-                    'timestamp': timezone.now().isoformat()
-                }
-            })
-        
-        # 2. Get latest market time (Handle Playback/Live)
-        state = get_playback_state()
-        if state['is_playback'] and state['timestamp']:
-            latest_time = state['timestamp']
-        else:
-            latest_time = NEPSEPrice.objects.aggregate(Max('timestamp'))['timestamp__max']
-            
-        if not latest_time:
-            return JsonResponse({'success': False, 'error': 'No market data'}, status=404)
-
-        # 3. Find actual PREVIOUS trading day (Fixes weekend/holiday bugs)
-        prev_date_record = NEPSEPrice.objects.filter(
-            timestamp__date__lt=latest_time.date()
-        ).order_by('-timestamp').first()
-        previous_day = prev_date_record.timestamp.date() if prev_date_record else latest_time.date()
-        
-        symbols = [h.symbol.upper() for h in holdings]
-        
-        # 4. Batch Fetch prices
-        latest_prices = {p.symbol.upper(): p for p in NEPSEPrice.objects.filter(symbol__in=symbols, timestamp=latest_time)}
-        prev_prices_qs = NEPSEPrice.objects.filter(
-            symbol__in=symbols, 
-            timestamp__date=previous_day
-        ).order_by('symbol', '-timestamp').distinct('symbol')
-        prev_prices = {p.symbol.upper(): p for p in prev_prices_qs}
-
-        total_value = Decimal('0')
-        total_cost_basis = Decimal('0')
-        total_prev_value = Decimal('0')
-        
-        # 5. Calculation Loop
-        for h in holdings:
-            sym = h.symbol.upper()
-            qty = Decimal(str(h.quantity))
-            avg_p = Decimal(str(h.avg_price or 0))
-            
-            curr_p_obj = latest_prices.get(sym)
-            curr_ltp = Decimal(str(curr_p_obj.ltp)) if curr_p_obj else avg_p
-            
-            prev_p_obj = prev_prices.get(sym)
-            prev_ltp = Decimal(str(prev_p_obj.close or prev_p_obj.ltp)) if prev_p_obj else curr_ltp
-            
-            total_value += (qty * curr_ltp)
-            total_cost_basis += (qty * avg_p)
-            total_prev_value += (qty * prev_ltp)
-        
-        # 6. Final Math
-        today_pl = total_value - total_prev_value
-        today_pl_pct = (today_pl / total_prev_value * 100) if total_prev_value > 0 else 0
-        overall_pl = total_value - total_cost_basis
-        overall_pl_pct = (overall_pl / total_cost_basis * 100) if total_cost_basis > 0 else 0
-        
-        # 7. Return Full Data Payload
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'total_value': float(total_value),
-                'holdings_count': holdings_count,  # <-- ADDED THIS
-                'today_pl': float(today_pl),
-                'today_pl_pct': float(today_pl_pct),
-                'overall_pl': float(overall_pl),
-                'overall_pl_pct': float(overall_pl_pct),
-                'cost_basis': float(total_cost_basis), # <-- ADDED THIS
-                'timestamp': latest_time.isoformat(),
-                'is_playback': state['is_playback']    # <-- ADDED THIS
-            }
-        })
+        payload = portfolio_analytics_payload(request.user, get_market_context())
+        return JsonResponse(payload, status=200 if payload['success'] else 404)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -2037,6 +2049,10 @@ def api_portfolio_holdings(request):
 
 
 
+PERFORMANCE_MAX_POINTS = 50
+INDEX_MAX_POINTS = 100
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_portfolio_performance(request):
@@ -2055,7 +2071,7 @@ def api_portfolio_performance(request):
             start_time = now - timedelta(days=30)
         
         # 2. Get User Holdings and Cash
-        holdings = Portfolio.objects.filter(user=user, quantity__gt=0)
+        holdings = list(Portfolio.objects.filter(user=user, quantity__gt=0))
         symbols = [h.symbol for h in holdings]
         current_cash = float(user.virtual_balance)
 
@@ -2071,35 +2087,38 @@ def api_portfolio_performance(request):
         else:
             timestamps = list(timestamps_qs)
 
-        # Sampling (Limit to 50 points for performance)
-        if len(timestamps) > 50:
-            step = len(timestamps) // 50
-            timestamps = timestamps[::step]
-        
-        labels = []
-        values = []
-
-        # 4. Calculate Net Worth for every historical point
-        for ts in timestamps:
-            stock_value = 0
-            if symbols:
-                prices = NEPSEPrice.objects.filter(timestamp=ts, symbol__in=symbols).values('symbol', 'ltp')
-                price_map = {p['symbol']: float(p['ltp'] or 0) for p in prices}
-                for h in holdings:
-                    price = price_map.get(h.symbol, 0)
-                    stock_value += (h.quantity * price)
-            
-            labels.append(ts.isoformat())
-            values.append(stock_value + current_cash)
+        # 4. Net worth at every timestamp from ONE price query (forward-filled per symbol)
+        values = [current_cash] * len(timestamps)
+        if symbols and timestamps:
+            ts_pos = {ts: i for i, ts in enumerate(timestamps)}
+            sym_pos = {sym: j for j, sym in enumerate(symbols)}
+            prices = np.full((len(timestamps), len(symbols)), np.nan)
+            for ts, sym, ltp in NEPSEPrice.objects.filter(
+                symbol__in=symbols, timestamp__gte=timestamps[0], timestamp__lte=timestamps[-1]
+            ).values_list('timestamp', 'symbol', 'ltp'):
+                i = ts_pos.get(ts)
+                if i is not None and ltp is not None:
+                    prices[i, sym_pos[sym]] = ltp
+
+            # Carry the last known price forward instead of dropping to 0
+            rows = np.where(~np.isnan(prices), np.arange(len(timestamps))[:, None], 0)
+            np.maximum.accumulate(rows, axis=0, out=rows)
+            prices = np.nan_to_num(prices[rows, np.arange(len(symbols))])
+
+            quantities = np.array([h.quantity for h in holdings], dtype=float)
+            values = (prices @ quantities + current_cash).tolist()
+
+        # Downsample with LTTB so peaks/dips survive (default 50 points)
+        timestamps, values = lttb(timestamps, values, parse_max_points(request, PERFORMANCE_MAX_POINTS))
+        labels = [ts.isoformat() for ts in timestamps]
 
         # 5. INJECT LIVE POINT (Right Now)
         # This fixes the blank chart for new buyers
+        last_prices = dict(Stock.objects.filter(symbol__in=symbols).values_list('symbol', 'last_price'))
         live_stock_value = 0
         for h in holdings:
             # Look at the last known price in the Stock metadata
-            s_obj = Stock.objects.filter(symbol=h.symbol).first()
-            if s_obj:
-                live_stock_value += (h.quantity * float(s_obj.last_price or 0))
+            live_stock_value += (h.quantity * float(last_prices.get(h.symbol) or 0))
         
         labels.append(now.isoformat())
         values.append(live_stock_value + current_cash)
@@ -2127,180 +2146,198 @@ def api_portfolio_performance(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
     
-@login_required
-@require_http_methods(["GET"])
-def api_nepse_index_performance(request):
+def nepse_index_performance_payload(range_param, ctx, max_points=INDEX_MAX_POINTS):
     """
     Get historical NEPSE Index data for dashboard charts.
     Strictly synchronized with the Playback Engine so the line 'grows' over time.
     """
-    try:
-        from myapp.services.playback_engine import get_playback_state
-        state = get_playback_state()
+    if ctx['is_playback'] and ctx['ref_time']:
+        # PLAYBACK MODE: Fetch data ONLY up to the current replay minute!
+        target_date = ctx['ref_time'].date()
+        target_time = ctx['ref_time']
+        
+        # The __lte (less than or equal) ensures the chart doesn't show the future
+        indices = NEPSEIndex.objects.filter(
+            timestamp__date=target_date,
+            timestamp__lte=target_time  
+        ).order_by('timestamp')
         
-        if state['is_playback'] and state['timestamp']:
-            # PLAYBACK MODE: Fetch data ONLY up to the current replay minute!
-            target_date = state['timestamp'].date()
-            target_time = state['timestamp']
-            
-            # The __lte (less than or equal) ensures the chart doesn't show the future
-            indices = NEPSEIndex.objects.filter(
-                timestamp__date=target_date,
-                timestamp__lte=target_time  
-            ).order_by('timestamp')
-            
-        else:
-            # LIVE MODE: Normal range filtering
-            range_param = request.GET.get('range', '1D').upper()
-            now = timezone.now()
-            
-            if range_param == '1D': start_time = now - timedelta(days=1)
-            elif range_param == '1W': start_time = now - timedelta(weeks=1)
-            elif range_param == '1M': start_time = now - timedelta(days=30)
-            else: start_time = now - timedelta(days=1)
-
-            # Filter for trading hours to keep the live chart clean
-            indices = NEPSEIndex.objects.filter(
-                timestamp__gte=start_time,
-                timestamp__hour__gte=11, 
-                timestamp__hour__lt=16
-            ).order_by('timestamp')
-            
-        # 3. Fallback and List Conversion
-        if not indices.exists():
-            indices = NEPSEIndex.objects.all().order_by('-timestamp')[:50]
-            data_list = list(indices)[::-1]
-        else:
-            data_list = list(indices)
+    else:
+        # LIVE MODE: Normal range filtering
+        range_param = (range_param or '1D').upper()
+        now = timezone.now()
+        
+        if range_param == '1D': start_time = now - timedelta(days=1)
+        elif range_param == '1W': start_time = now - timedelta(weeks=1)
+        elif range_param == '1M': start_time = now - timedelta(days=30)
+        else: start_time = now - timedelta(days=1)
 
-        # 4. Sampling (Prevents the chart from becoming a dense blob of ink)
-        if len(data_list) > 100:
-            step = len(data_list) // 100
-            data_list = data_list[::step]
+        # Filter for trading hours to keep the live chart clean
+        indices = NEPSEIndex.objects.filter(
+            timestamp__gte=start_time,
+            timestamp__hour__gte=11, 
+            timestamp__hour__lt=16
+        ).order_by('timestamp')
+        
+    # 3. Fallback and List Conversion
+    points = list(indices.values_list('timestamp', 'index_value'))
+    if not points:
+        points = list(NEPSEIndex.objects.order_by('-timestamp').values_list('timestamp', 'index_value')[:50])[::-1]
 
-        # 5. Format labels directly to Local Time (e.g., "11:05 AM")
-        labels = [timezone.localtime(idx.timestamp).strftime('%I:%M %p') for idx in data_list]
-        values = [float(idx.index_value) for idx in data_list]
+    # 4. LTTB sampling (keeps the intraday highs/lows a [::step] skip would drop)
+    timestamps, values = lttb([p[0] for p in points], [float(p[1]) for p in points], max_points)
 
-        # Basic performance stats
-        performance = {'1d': 0, '1w': 0, '1m': 0}
-        if len(values) >= 2:
-            performance['1d'] = ((values[-1] - values[0]) / values[0] * 100) if values[0] > 0 else 0
+    # 5. Format labels directly to Local Time (e.g., "11:05 AM")
+    labels = [timezone.localtime(ts).strftime('%I:%M %p') for ts in timestamps]
 
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'labels': labels,
-                'values': values,
-                'performance': performance
-            }
-        })
+    # Basic performance stats
+    performance = {'1d': 0, '1w': 0, '1m': 0}
+    if len(values) >= 2:
+        performance['1d'] = ((values[-1] - values[0]) / values[0] * 100) if values[0] > 0 else 0
+
+    return {
+        'success': True,
+        'data': {
+            'labels': labels,
+            'values': values,
+            'performance': performance
+        }
+    }
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_nepse_index_performance(request):
+    """NEPSE index chart series for the dashboard"""
+    try:
+        payload = nepse_index_performance_payload(
+            request.GET.get('range', '1D'), get_market_context(), parse_max_points(request, INDEX_MAX_POINTS)
+        )
+        return JsonResponse(payload)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
     
+ACTIVITY_PAGE_SIZE = 3
+ACTIVITY_COLUMNS = ('symbol', 'act_side', 'act_qty', 'act_price')
+
+
+def portfolio_activity_payload(user, cursor=None, limit=ACTIVITY_PAGE_SIZE):
+    """
+    Get recent trading activity for the logged-in user.
+    Buy fills, sell fills and legacy trades are merged and paged in SQL.
+    """
+    fill_columns = {
+        'ts': F('executed_at'),
+        'act_qty': F('executed_qty'),
+        'act_price': Cast('executed_price', FloatField()),
+    }
+    sources = [
+        # 1. Matching Engine trades (one row per side the user was on)
+        (0, TradeExecution.objects.filter(buyer=user).annotate(
+            act_side=Value('BUY', output_field=CharField()), **fill_columns)),
+        (1, TradeExecution.objects.filter(seller=user).annotate(
+            act_side=Value('SELL', output_field=CharField()), **fill_columns)),
+        # 2. Manual Trade records (Direct trades)
+        (2, Trade.objects.filter(user=user, status='COMPLETED').annotate(
+            ts=F('created_at'), act_side=F('side'), act_qty=F('qty'),
+            act_price=Cast('price', FloatField()))),
+    ]
+    rows, next_cursor = merged_page(sources, cursor, limit, ACTIVITY_COLUMNS)
+    
+    final_data = []
+    for item in rows:
+        # Convert to local Kathmandu time
+        timestamp = timezone.localtime(item['ts'])
+        
+        # Formatted absolute date and time
+        # Example: Jan 26, 2026
+        formatted_date = timestamp.strftime('%b %d, %Y')
+        # Example: 03:14 PM
+        formatted_time = timestamp.strftime('%I:%M %p')
+        
+        final_data.append({
+            'symbol': item['symbol'],
+            'side': item['act_side'],
+            'quantity': item['act_qty'],
+            'price': item['act_price'] or 0,
+            'executed_at': timestamp.isoformat(),
+            'formatted_date': formatted_date,
+            'formatted_time': formatted_time,
+        })
+    
+    return {
+        'success': True,
+        'data': final_data,
+        'pagination': page_info(cursor, next_cursor, limit),
+    }
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_portfolio_activity(request):
     """
-    Get recent trading activity for the logged-in user.
-    Returns: last 10 trade executions
+    Activity feed (executions + legacy trades), newest first
+    GET /api/portfolio/activity/?cursor=<next_cursor>&limit=3
     """
     try:
-        user = request.user
-        
-        # 1. Get recent trade executions (Matching Engine trades)
-        buy_executions = TradeExecution.objects.filter(
-            buy_order__user=user
-        ).select_related('buy_order', 'sell_order')
-        
-        sell_executions = TradeExecution.objects.filter(
-            sell_order__user=user
-        ).select_related('buy_order', 'sell_order')
-        
-        activity_data = []
-        
-        # Add TradeExecutions
-        for execution in list(buy_executions) + list(sell_executions):
-            side = 'BUY' if execution.buy_order.user == user else 'SELL'
-            activity_data.append({
-                'symbol': execution.symbol,
-                'side': side,
-                'quantity': execution.executed_qty,
-                'price': float(execution.executed_price),
-                'timestamp': execution.executed_at,
-            })
-            
-        # 2. Get manual Trade records (Direct trades)
-        manual_trades = Trade.objects.filter(user=user, status='COMPLETED')
-        for trade in manual_trades:
-            activity_data.append({
-                'symbol': trade.symbol,
-                'side': trade.side,
-                'quantity': trade.qty,
-                'price': float(trade.price) if trade.price else 0,
-                'timestamp': trade.created_at,
-            })
-            
-        # Sort all by timestamp
-        activity_data.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        # Pagination logic
         try:
-            page = int(request.GET.get('page', 1))
-        except (ValueError, TypeError):
-            page = 1
-            
-        limit = 3
-        total_items = len(activity_data)
-        total_pages = (total_items + limit - 1) // limit if total_items > 0 else 1
-        
-        # Clamp page number
-        if page < 1: page = 1
-        if page > total_pages: page = total_pages
-        
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        
-        paginated_activity = activity_data[start_idx:end_idx]
-        
-        final_data = []
-        for item in paginated_activity:
-            # Convert to local Kathmandu time
-            timestamp = timezone.localtime(item['timestamp'])
-            
-            # Formatted absolute date and time
-            # Example: Jan 26, 2026
-            formatted_date = timestamp.strftime('%b %d, %Y')
-            # Example: 03:14 PM
-            formatted_time = timestamp.strftime('%I:%M %p')
-            
-            final_data.append({
-                'symbol': item['symbol'],
-                'side': item['side'],
-                'quantity': item['quantity'],
-                'price': item['price'],
-                'executed_at': timestamp.isoformat(),
-                'formatted_date': formatted_date,
-                'formatted_time': formatted_time,
-            })
-        
-        return JsonResponse({
-            'success': True,
-            'data': final_data,
-            'pagination': {
-                'current_page': page,
-                'total_pages': total_pages,
-                'total_items': total_items,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
-        })
-        
+            cursor, limit = parse_page_params(request, ACTIVITY_PAGE_SIZE, 50)
+        except InvalidCursor as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        return JsonResponse(portfolio_activity_payload(request.user, cursor, limit))
     except Exception as e:
         import traceback
         print(f"Error in api_portfolio_activity: {e}")
         print(traceback.format_exc())
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# Sections served by /api/dashboard/bundle/ -> builder(request, ctx).
+# Each returns the same payload as its standalone endpoint.
+DASHBOARD_SECTIONS = {
+    'latest': lambda request, ctx: latest_nepse_payload(ctx),
+    'summary': lambda request, ctx: dashboard_summary_payload(request.user, ctx),
+    'analytics': lambda request, ctx: portfolio_analytics_payload(request.user, ctx),
+    'performance': lambda request, ctx: nepse_index_performance_payload(request.GET.get('range', '1D'), ctx),
+    'activity': lambda request, ctx: portfolio_activity_payload(request.user),
+    'watchlist': lambda request, ctx: watchlist_payload(request.user, ctx),
+}
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_dashboard_bundle(request):
+    """
+    GET /api/dashboard/bundle/?sections=latest,summary,watchlist&fields.latest=symbol,ltp
+    All dashboard widgets in one response. Playback state, reference tick and
+    session are resolved once and shared by every section. A failing section
+    reports its own error without failing the bundle.
+    """
+    try:
+        requested = [x.strip() for x in request.GET.get('sections', '').split(',') if x.strip()]
+        sections = [x for x in requested if x in DASHBOARD_SECTIONS] or list(DASHBOARD_SECTIONS)
+        fields = parse_field_selection(request.GET, sections)
+
+        ctx = get_market_context()
+        results = {}
+        for name in sections:
+            try:
+                payload = DASHBOARD_SECTIONS[name](request, ctx)
+            except Exception as e:
+                payload = {'success': False, 'error': str(e)}
+            if name in fields and 'data' in payload:
+                payload['data'] = select_fields(payload['data'], fields[name])
+            results[name] = payload
+
+        return JsonResponse({
+            'success': True,
+            'is_playback': ctx['is_playback'],
+            'timestamp': ctx['ref_time'].isoformat() if ctx['ref_time'] else None,
+            'session': ctx['session'],
+            'sections': results,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
 # Removed api_check_payment_status
 
 @login_required
@@ -2412,7 +2449,20 @@ def api_stock_quote(request, symbol):
         
         # Get the "Time Machine" state
         state = get_playback_state()
-        
+
+        # Live: current tick from the market snapshot + stats as of the last close
+        if not state['is_playback']:
+            from myapp.services import symbol_stats
+            from myapp.services.market_feed import latest_quote
+            quote = latest_quote(symbol)
+            stats = symbol_stats.get_stats(symbol) if quote else None
+            if stats:
+                return JsonResponse({
+                    'success': True,
+                    'data': symbol_stats.quote_payload(quote, stats),
+                    'is_playback': False
+                })
+
         # 1. Determine the reference timestamp
         if state['is_playback'] and state['timestamp']:
             latest_time = state['timestamp']
@@ -3,38 +3,13 @@
  * Handles dynamic rendering of Rank, Profit, Activity, Performance, and Watchlist
  */
 
-document.addEventListener('DOMContentLoaded', () => {
-    console.log('Dashboard initialized - loading dynamic components...');
-
-    // Initial Load
-    refreshDashboardData();
-
-    // Setup 30s Auto Refresh
-    setInterval(refreshDashboardData, 30000);
-});
-
-/**
- * Main orchestrator for dashboard updates
- */
-async function refreshDashboardData() {
-    initTicker(); // Keep the ticker updated (from core script.js or shared)
-
-    // Core dynamic components
-    loadDashboardSummary();
-    loadPortfolioAnalytics();
-    loadDashboardPerformance('1D'); // Default 1D
-    loadDashboardActivity();
-    loadDashboardWatchlist();
-}
-
 /**
  * 1. Dashboard Summary: Handles Wealth, Rank, and Today's Profit
  */
-async function loadDashboardSummary() {
+async function loadDashboardSummary(preloaded) {
     try {
         // We call the summary API which already calculates profit math
-        const res = await fetch('/api/dashboard/summary/?t=' + Date.now());
-        const json = await res.json();
+        const json = preloaded || await (await fetch('/api/dashboard/summary/?t=' + Date.now())).json();
 
         if (json.success) {
             const d = json.data;
@@ -81,10 +56,9 @@ async function loadDashboardSummary() {
 /**
  * 2. Portfolio Analytics: Today's Profit
  */
-async function loadPortfolioAnalytics() {
+async function loadPortfolioAnalytics(preloaded) {
     try {
-        const res = await fetch('/api/portfolio/analytics/');
-        const json = await res.json();
+        const json = preloaded || await (await fetch('/api/portfolio/analytics/')).json();
 
         if (json.success) {
             const d = json.data;
@@ -115,7 +89,7 @@ async function loadPortfolioAnalytics() {
  */
 let dashboardChart = null;
 
-async function loadDashboardPerformance(range = '1D') {
+async function loadDashboardPerformance(range = '1D', preloaded) {
     const canvas = document.getElementById('portfolioChart');
     if (!canvas) return;
 
@@ -125,8 +99,7 @@ async function loadDashboardPerformance(range = '1D') {
     });
 
     try {
-        const res = await fetch(`/api/nepse-index/performance/?range=${range}`);
-        const json = await res.json();
+        const json = preloaded || await (await fetch(`/api/nepse-index/performance/?range=${range}`)).json();
 
         if (json.success) {
             const d = json.data;
@@ -226,13 +199,12 @@ function updatePerfLabel(id, val) {
 /**
  * 4. Recent Activity (Professional View)
  */
-async function loadDashboardActivity() {
+async function loadDashboardActivity(preloaded) {
     const container = document.getElementById('dashboardRecentActivity');
     if (!container) return;
 
     try {
-        const res = await fetch('/api/portfolio/activity/?page=1');
-        const json = await res.json();
+        const json = preloaded || await (await fetch('/api/portfolio/activity/')).json();
 
         if (json.success) {
             const list = json.data;
@@ -278,13 +250,12 @@ async function loadDashboardActivity() {
 /**
  * 5. Watchlist
  */
-async function loadDashboardWatchlist() {
+async function loadDashboardWatchlist(preloaded) {
     const tbody = document.getElementById('dashboardWatchlistTbody');
     if (!tbody) return;
 
     try {
-        const res = await fetch('/api/watchlist/');
-        const json = await res.json();
+        const json = preloaded || await (await fetch('/api/watchlist/')).json();
 
         if (json.success) {
             const list = json.data;
@@ -334,13 +305,12 @@ async function loadDashboardWatchlist() {
 /**
  * Fetches latest market data, sorts by Turnover, and updates the Top Active card
  */
-async function loadTopTurnover() {
+async function loadTopTurnover(preloaded) {
     const container = document.getElementById('topActiveContainer');
     if (!container) return;
 
     try {
-        const res = await fetch('/api/latest/?t=' + Date.now());
-        const json = await res.json();
+        const json = preloaded || await (await fetch('/api/latest/?t=' + Date.now())).json();
 
         if (json.success && Array.isArray(json.data)) {
             // Filter scrips that have real turnover
@@ -390,7 +360,7 @@ async function loadTopTurnover() {
  * Update the Ticker Marquee and handle the Playback/Live mode badge.
  * Synchronized with the Playback Engine to show minute-by-minute movement.
  */
-async function initTicker() {
+async function initTicker(preloaded) {
     const tickerContent = document.getElementById('tickerContent');
     const tickerAsOf = document.getElementById('tickerAsOf');
     const activeStocksEl = document.getElementById('activeStocks');
@@ -400,8 +370,7 @@ async function initTicker() {
 
     try {
         // We add ?t= to the URL to force the browser to get the NEW minute from the server
-        const res = await fetch('/api/latest/?t=' + Date.now());
-        const json = await res.json();
+        const json = preloaded || await (await fetch('/api/latest/?t=' + Date.now())).json();
 
         if (json.success && json.data) {
             const ts = new Date(json.timestamp);
@@ -468,17 +437,92 @@ async function initTicker() {
 document.addEventListener('DOMContentLoaded', () => {
     refreshDashboardData();
 
-    setInterval(() => {
+    // Server push keeps the page current; the 60s full refresh only runs
+    // while the stream is unavailable.
+    const startPolling = () => setInterval(() => {
         console.log("Sync Tick: Loading next minute of data...");
         refreshDashboardData();
     }, 60000); // 60 seconds
+    const stream = openMarketStream(['market', 'orders'], {
+        market: applyMarketPush,
+        orders: () => scheduleDashboardSections(['summary', 'activity'])
+    }, startPolling);
+    if (!stream) startPolling();
 });
 
+// One bundled request per refresh instead of six; each loader falls back to
+// its own endpoint if the bundle is unavailable.
+const DASHBOARD_BUNDLE_URL = '/api/dashboard/bundle/?sections=latest,summary,performance,activity,watchlist'
+    + '&fields.latest=symbol,ltp,change_pct,turnover&range=1D';
+
+const DASHBOARD_LOADERS = {
+    summary: (data) => loadDashboardSummary(data),
+    performance: (data) => loadDashboardPerformance('1D', data),
+    activity: (data) => loadDashboardActivity(data),
+    watchlist: (data) => loadDashboardWatchlist(data),
+};
+
+// {symbol: quote} behind the ticker and Top Active, seeded by the bundle and
+// kept current by 'market' pushes
+let dashboardQuotes = null;
+let dashboardPlayback = false;
+
 async function refreshDashboardData() {
-    await initTicker(); 
-    loadDashboardSummary();
-    loadDashboardPerformance('1D');
-    loadDashboardActivity();
-    loadDashboardWatchlist();
-    loadTopTurnover(); 
-}
\ No newline at end of file
+    let sections = {};
+    try {
+        const res = await fetch(DASHBOARD_BUNDLE_URL + '&t=' + Date.now());
+        const bundle = await res.json();
+        if (bundle.success) sections = bundle.sections;
+    } catch (err) {
+        console.error("Dashboard bundle error:", err);
+    }
+
+    if (sections.latest?.success && Array.isArray(sections.latest.data)) {
+        dashboardQuotes = Object.fromEntries(sections.latest.data.map(q => [q.symbol, q]));
+        dashboardPlayback = !!sections.latest.is_playback;
+    }
+    await initTicker(sections.latest); 
+    loadTopTurnover(sections.latest);
+    Object.keys(DASHBOARD_LOADERS).forEach(name => DASHBOARD_LOADERS[name](sections[name]));
+}
+
+/**
+ * A pushed tick re-renders the ticker and Top Active from the quotes it
+ * carries; the sections the server values off that tick are re-fetched.
+ */
+function applyMarketPush(msg) {
+    if (!dashboardQuotes) return; // the first bundle has not landed yet
+    if (msg.type === 'snapshot') dashboardQuotes = {};
+    msg.quotes.forEach(q => { dashboardQuotes[q.symbol] = q; });
+
+    const latest = { success: true, data: Object.values(dashboardQuotes), timestamp: msg.timestamp, is_playback: dashboardPlayback };
+    initTicker(latest);
+    loadTopTurnover(latest);
+    // The snapshot sent on (re)connect is the tick the bundle already showed
+    if (msg.type === 'diff') scheduleDashboardSections(['summary', 'performance', 'watchlist']);
+}
+
+// Pushes arrive in bursts (a tick, or an order filling in parts): collect the
+// sections they touch and re-fetch them in one bundle request.
+const pendingDashboardSections = new Set();
+let dashboardSectionsTimer = null;
+
+function scheduleDashboardSections(names) {
+    names.forEach(name => pendingDashboardSections.add(name));
+    clearTimeout(dashboardSectionsTimer);
+    dashboardSectionsTimer = setTimeout(refreshDashboardSections, 1000);
+}
+
+async function refreshDashboardSections() {
+    const names = [...pendingDashboardSections];
+    pendingDashboardSections.clear();
+    let sections = {};
+    try {
+        const res = await fetch(`/api/dashboard/bundle/?sections=${names.join(',')}&range=1D&t=${Date.now()}`);
+        const bundle = await res.json();
+        if (bundle.success) sections = bundle.sections;
+    } catch (err) {
+        console.error("Dashboard bundle error:", err);
+    }
+    names.forEach(name => DASHBOARD_LOADERS[name](sections[name]));
+}
@@ -59,16 +59,35 @@ async function initMarketPage() {
     setupPagination();
     await fetchMarketData();
 
-    // --- ADD THIS BLOCK HERE ---
-    // Auto-refresh the market table every 60 seconds
-    setInterval(() => {
+    // Live/playback view follows the 'market' push stream. The 60s refresh
+    // only runs while the stream is unavailable.
+    const startPolling = () => setInterval(() => {
         // Logic: Only refresh if the user is NOT looking at a specific 
         // historical date manually (dateInput.value will be empty for the live/playback view)
         if (!dateInput || !dateInput.value) {
             fetchMarketData();
         }
-    }, 60000); 
-    // ----------------------------
+    }, 60000);
+    const stream = openMarketStream(['market'], { market: applyMarketPush }, startPolling);
+    if (!stream) startPolling();
+}
+
+/**
+ * Merge pushed quotes (a snapshot on connect, then per-tick diffs) into the
+ * rows on screen. Rows are updated in place, so the filters and the current
+ * page are kept; a historical date ignores the stream.
+ */
+function applyMarketPush(msg) {
+    const dateInput = document.getElementById('marketDate');
+    if (dateInput && dateInput.value) return;
+
+    const rows = new Map(allMarketData_global.map(function (item) { return [item.symbol, item]; }));
+    let changed = false;
+    msg.quotes.forEach(function (quote) {
+        const row = rows.get(quote.symbol);
+        if (row) { Object.assign(row, quote); changed = true; }
+    });
+    if (changed) renderTable();
 }
 
 /**
@@ -12,6 +12,15 @@ class NepsePortfolioPage {
         this.allocationChart = null;
 
         this.range = '1W'; // default view
+
+        // Last holdings + prices; quote pushes update the prices in place
+        this.holdings = [];
+        this.priceMap = new Map();
+        this.stream = null;
+        this.streamTopics = '';
+        this.polling = null;
+        this.refreshTimer = null;
+
         this.init();
     }
 
@@ -20,7 +29,48 @@ class NepsePortfolioPage {
         this.bindRangeButtons();
 
         this.loadAll();
-        setInterval(() => this.loadAll(), this.updateInterval);
+    }
+
+    // ---------- Push ----------
+    // Quotes for the held symbols and the user's own order updates arrive over
+    // the push stream, reopened when the held symbols change. The interval
+    // reload only runs while the stream is unavailable.
+    watchHoldings() {
+        if (this.polling) return;
+        const topics = ['orders', ...quoteTopics(this.holdings.map(h => h.symbol))];
+        if (topics.join(',') === this.streamTopics) return;
+        this.streamTopics = topics.join(',');
+        if (this.stream) this.stream.close();
+        this.stream = openMarketStream(topics, {
+            quote: (quote) => this.applyQuotes([quote]),
+            market: (msg) => this.applyQuotes(msg.quotes),
+            orders: () => this.loadHoldingsAndSummary()
+        }, () => this.startPolling());
+        if (!this.stream) this.startPolling();
+    }
+
+    startPolling() {
+        if (this.stream) this.stream.close();
+        this.stream = null;
+        if (!this.polling) this.polling = setInterval(() => this.loadAll(), this.updateInterval);
+    }
+
+    applyQuotes(quotes) {
+        let changed = false;
+        for (const quote of quotes) {
+            const sym = String(quote.symbol);
+            if (!this.holdings.some(h => String(h.symbol) === sym)) continue;
+            if (Number(this.priceMap.get(sym)?.ltp) === Number(quote.ltp)) continue;
+            this.priceMap.set(sym, quote);
+            changed = true;
+        }
+        if (!changed) return;
+        this.renderHoldings();
+        this.setText('portfolioAsOf', new Date().toLocaleString());
+
+        // The value series is valued server-side off the same tick: reload it once per burst
+        clearTimeout(this.refreshTimer);
+        this.refreshTimer = setTimeout(() => this.loadPortfolioSeries(), 1000);
     }
 
     // ---------- Helpers ----------
@@ -142,67 +192,77 @@ class NepsePortfolioPage {
             const lJson = await lRes.json();
             const latest = Array.isArray(lJson?.data) ? lJson.data : [];
 
-            const priceMap = new Map(latest.map(x => [String(x.symbol), x]));
-
-            if (!holdings.length) {
-                // fallback demo if no holdings endpoint yet
-                tbody.innerHTML = `
-                    <tr>
-                        <td colspan="6" class="text-center text-muted p-4">
-                            No holdings data yet. Create <code>/api/portfolio/holdings/</code> to show real portfolio.
-                        </td>
-                    </tr>
-                `;
-
-                this.updateSummary([], priceMap);
-                this.updateAllocation([], priceMap);
-                return;
-            }
-
-            // Render holdings rows
-            let totalValue = 0;
-            let totalPL = 0;
-
-            const rows = holdings.map(h => {
-                const sym = String(h.symbol);
-                const qty = Number(h.qty || 0);
-                const avg = Number(h.avg_buy || 0);
-
-                const live = priceMap.get(sym);
-                const ltp = Number(live?.ltp || 0);
-
-                const value = qty * ltp;
-                const pl = (ltp - avg) * qty;
-
-                totalValue += value;
-                totalPL += pl;
-
-                const plCls = pl >= 0 ? 'text-success' : 'text-danger';
-                const plSign = pl >= 0 ? '+' : '';
-
-                return `
-                    <tr>
-                        <td class="ps-3"><span class="symbol-pill">${sym}</span></td>
-                        <td>${this.fmtInt(qty)}</td>
-                        <td>Rs ${this.fmtNumber(avg, 2)}</td>
-                        <td>Rs ${ltp ? this.fmtNumber(ltp, 2) : '—'}</td>
-                        <td>Rs ${this.fmtNumber(value, 2)}</td>
-                        <td class="text-end pe-3 ${plCls}">${plSign}Rs ${this.fmtNumber(pl, 2)}</td>
-                    </tr>
-                `;
-            }).join('');
-
-            tbody.innerHTML = rows;
-
-            // Summary + allocation
-            this.updateSummary(holdings, priceMap);
-            this.updateAllocation(holdings, priceMap);
+            this.holdings = holdings;
+            this.priceMap = new Map(latest.map(x => [String(x.symbol), x]));
+            this.renderHoldings();
+            this.watchHoldings();
         } catch (e) {
             console.error('Portfolio holdings load error:', e);
             tbody.innerHTML = `<tr><td colspan="6" class="text-center text-muted p-4">Error loading portfolio.</td></tr>`;
         }
     }
 
+    renderHoldings() {
+        const tbody = document.getElementById('holdingsTbody');
+        if (!tbody) return;
+        const holdings = this.holdings;
+        const priceMap = this.priceMap;
+
+        if (!holdings.length) {
+            // fallback demo if no holdings endpoint yet
+            tbody.innerHTML = `
+                <tr>
+                    <td colspan="6" class="text-center text-muted p-4">
+                        No holdings data yet. Create <code>/api/portfolio/holdings/</code> to show real portfolio.
+                    </td>
+                </tr>
+            `;
+
+            this.updateSummary([], priceMap);
+            this.updateAllocation([], priceMap);
+            return;
+        }
+
+        // Render holdings rows
+        let totalValue = 0;
+        let totalPL = 0;
+
+        const rows = holdings.map(h => {
+            const sym = String(h.symbol);
+            const qty = Number(h.qty || 0);
+            const avg = Number(h.avg_buy || 0);
+
+            const live = priceMap.get(sym);
+            const ltp = Number(live?.ltp || 0);
+
+            const value = qty * ltp;
+            const pl = (ltp - avg) * qty;
+
+            totalValue += value;
+            totalPL += pl;
+
+            const plCls = pl >= 0 ? 'text-success' : 'text-danger';
+            const plSign = pl >= 0 ? '+' : '';
+
+            return `
+                <tr>
+                    <td class="ps-3"><span class="symbol-pill">${sym}</span></td>
+                    <td>${this.fmtInt(qty)}</td>
+                    <td>Rs ${this.fmtNumber(avg, 2)}</td>
+                    <td>Rs ${ltp ? this.fmtNumber(ltp, 2) : '—'}</td>
+                    <td>Rs ${this.fmtNumber(value, 2)}</td>
+                    <td class="text-end pe-3 ${plCls}">${plSign}Rs ${this.fmtNumber(pl, 2)}</td>
+                </tr>
+            `;
+        }).join('');
+
+        tbody.innerHTML = rows;
+
+        // Summary + allocation
+        this.updateSummary(holdings, priceMap);
+        this.updateAllocation(holdings, priceMap);
+    }
+
     updateSummary(holdings, priceMap) {
         const n = holdings.length;
 
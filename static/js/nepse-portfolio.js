@@ -8,6 +8,7 @@ let portfolioValueChart = null;
 let allocationChart = null;
 let currentRange = '1D';
 let currentActivityPage = 1;
+let activityCursors = [null];   // cursor that loads each visited page (index = page - 1)
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function () {
@@ -21,15 +22,82 @@ document.addEventListener('DOMContentLoaded', function () {
 
     // Setup event listeners for time range buttons
     setupTimeRangeButtons();
+});
 
-    // Auto-refresh every 30 seconds
-    setInterval(() => {
+/**
+ * Live updates: quotes for the held symbols reprice the holdings table in
+ * place, and the caller's order updates reload holdings and activity. The
+ * stream is (re)opened whenever the set of held symbols changes; the old
+ * 60s refresh only runs while it is unavailable.
+ */
+let holdingsData = [];
+let portfolioStream = null;
+let portfolioStreamTopics = '';
+let portfolioPolling = null;
+
+function startPortfolioPolling() {
+    if (portfolioStream) portfolioStream.close();
+    portfolioStream = null;
+    if (portfolioPolling) return;
+    portfolioPolling = setInterval(() => {
         loadPortfolioAnalytics();
         loadPortfolioHoldings();
         loadPortfolioPerformance(currentRange);
         loadRecentActivity(currentActivityPage);
     }, 60000);
-});
+}
+
+function watchPortfolio(holdings) {
+    if (portfolioPolling) return;
+    const topics = ['orders', ...quoteTopics(holdings.map(h => h.symbol))];
+    if (topics.join(',') === portfolioStreamTopics) return;
+    portfolioStreamTopics = topics.join(',');
+    if (portfolioStream) portfolioStream.close();
+    portfolioStream = openMarketStream(topics, {
+        quote: (quote) => applyHoldingQuotes([quote]),
+        market: (msg) => applyHoldingQuotes(msg.quotes),
+        orders: () => schedulePortfolioRefresh(true)
+    }, startPortfolioPolling);
+    if (!portfolioStream) startPortfolioPolling();
+}
+
+function applyHoldingQuotes(quotes) {
+    let changed = false;
+    quotes.forEach(quote => {
+        const holding = holdingsData.find(h => h.symbol === quote.symbol);
+        const ltp = Number(quote.ltp || 0);
+        if (!holding || !ltp || ltp === holding.current_ltp) return;
+        const costBasis = holding.quantity * holding.avg_price;
+        holding.current_ltp = ltp;
+        holding.market_value = holding.quantity * ltp;
+        holding.pl = holding.market_value - costBasis;
+        holding.pl_pct = costBasis > 0 ? holding.pl / costBasis * 100 : 0;
+        changed = true;
+    });
+    if (!changed) return;
+    renderHoldings(holdingsData);
+    schedulePortfolioRefresh(false);
+}
+
+// Pushes arrive in bursts (a tick, or an order filling in parts); the
+// server-side figures (analytics cards, performance chart) are re-fetched
+// once per burst, and holdings/activity too when an order changed.
+let portfolioRefreshTimer = null;
+let portfolioRefreshOrders = false;
+
+function schedulePortfolioRefresh(orders) {
+    portfolioRefreshOrders = portfolioRefreshOrders || orders;
+    clearTimeout(portfolioRefreshTimer);
+    portfolioRefreshTimer = setTimeout(() => {
+        loadPortfolioAnalytics();
+        loadPortfolioPerformance(currentRange);
+        if (portfolioRefreshOrders) {
+            loadPortfolioHoldings();
+            loadRecentActivity(currentActivityPage);
+        }
+        portfolioRefreshOrders = false;
+    }, 1000);
+}
 
 /**
  * Load portfolio analytics summary (cards at top)
@@ -106,51 +174,9 @@ async function loadPortfolioHoldings() {
         const result = await response.json();
 
         if (result.success) {
-            const holdings = result.data;
-            const tbody = document.getElementById('holdingsTbody');
-
-            if (holdings.length === 0) {
-                tbody.innerHTML = `
-                    <tr>
-                        <td colspan="6" class="text-center text-muted p-4">
-                            No holdings yet. <a href="/trade/" class="text-primary">Start trading</a> to build your portfolio.
-                        </td>
-                    </tr>
-                `;
-
-                // Also update allocation chart for empty state
-                updateAllocationChart([]);
-                return;
-            }
-
-            // Build table rows
-            let html = '';
-            holdings.forEach(holding => {
-                const plClass = holding.pl >= 0 ? 'text-success' : 'text-danger';
-                const plSign = holding.pl >= 0 ? '+' : '';
-
-                html += `
-                    <tr>
-                        <td class="ps-3">
-                            <span class="symbol-pill badge bg-primary">${holding.symbol}</span>
-                        </td>
-                        <td>${formatNumber(holding.quantity, 0)}</td>
-                        <td>Rs ${formatNumber(holding.avg_price)}</td>
-                        <td>Rs ${formatNumber(holding.current_ltp)}</td>
-                        <td>Rs ${formatNumber(holding.market_value)}</td>
-                        <td class="text-end pe-3 ${plClass}" style="font-weight:900;">
-                            ${plSign}Rs ${formatNumber(Math.abs(holding.pl))}
-                            <br>
-                            <small>(${plSign}${holding.pl_pct.toFixed(2)}%)</small>
-                        </td>
-                    </tr>
-                `;
-            });
-
-            tbody.innerHTML = html;
-
-            // Update allocation chart
-            updateAllocationChart(holdings);
+            holdingsData = result.data;
+            renderHoldings(holdingsData);
+            watchPortfolio(holdingsData);
         } else {
             console.error('Failed to load holdings:', result.error);
         }
@@ -159,6 +185,56 @@ async function loadPortfolioHoldings() {
     }
 }
 
+/**
+ * Render the holdings table and allocation chart
+ */
+function renderHoldings(holdings) {
+    const tbody = document.getElementById('holdingsTbody');
+
+    if (holdings.length === 0) {
+        tbody.innerHTML = `
+            <tr>
+                <td colspan="6" class="text-center text-muted p-4">
+                    No holdings yet. <a href="/trade/" class="text-primary">Start trading</a> to build your portfolio.
+                </td>
+            </tr>
+        `;
+
+        // Also update allocation chart for empty state
+        updateAllocationChart([]);
+        return;
+    }
+
+    // Build table rows
+    let html = '';
+    holdings.forEach(holding => {
+        const plClass = holding.pl >= 0 ? 'text-success' : 'text-danger';
+        const plSign = holding.pl >= 0 ? '+' : '';
+
+        html += `
+            <tr>
+                <td class="ps-3">
+                    <span class="symbol-pill badge bg-primary">${holding.symbol}</span>
+                </td>
+                <td>${formatNumber(holding.quantity, 0)}</td>
+                <td>Rs ${formatNumber(holding.avg_price)}</td>
+                <td>Rs ${formatNumber(holding.current_ltp)}</td>
+                <td>Rs ${formatNumber(holding.market_value)}</td>
+                <td class="text-end pe-3 ${plClass}" style="font-weight:900;">
+                    ${plSign}Rs ${formatNumber(Math.abs(holding.pl))}
+                    <br>
+                    <small>(${plSign}${holding.pl_pct.toFixed(2)}%)</small>
+                </td>
+            </tr>
+        `;
+    });
+
+    tbody.innerHTML = html;
+
+    // Update allocation chart
+    updateAllocationChart(holdings);
+}
+
 /**
  * Load portfolio performance chart
  */
@@ -197,12 +273,17 @@ async function loadRecentActivity(page = 1) {
     try {
         console.log(`Loading activity page ${page}...`);
         currentActivityPage = page;
-        const response = await fetch(`/api/portfolio/activity/?page=${page}`);
+        const cursor = activityCursors[page - 1];
+        const url = cursor ? `/api/portfolio/activity/?cursor=${encodeURIComponent(cursor)}` : '/api/portfolio/activity/';
+        const response = await fetch(url);
         const result = await response.json();
 
         if (result.success) {
             const activities = result.data;
             const pagination = result.pagination;
+            // Remember how to reach the next page (keyset cursors only go forward)
+            activityCursors.length = page;
+            if (pagination && pagination.next_cursor) activityCursors.push(pagination.next_cursor);
             const container = document.getElementById('recentActivity');
 
             if (!container) return;
@@ -245,19 +326,16 @@ async function loadRecentActivity(page = 1) {
             html += '</div>';
 
             // Add pagination controls
-            if (pagination && pagination.total_items > 0) {
+            if (pagination && (pagination.has_next || page > 1)) {
                 html += `
                     <div class="d-flex justify-content-between align-items-center mt-4">
-                        <button class="btn btn-pg shadow-sm ${!pagination.has_prev ? 'disabled' : ''}" 
-                                onclick="window.loadRecentActivity(${page - 1})" ${!pagination.has_prev ? 'disabled' : ''}>
+                        <button class="btn btn-pg shadow-sm ${page <= 1 ? 'disabled' : ''}" 
+                                onclick="window.loadRecentActivity(${page - 1})" ${page <= 1 ? 'disabled' : ''}>
                             <i class="fas fa-arrow-left"></i>
                         </button>
                         
                         <div class="text-center">
-                            <span class="pg-indicator">Page ${pagination.current_page} of ${pagination.total_pages}</span>
-                            <div class="text-muted mt-2" style="font-size: 0.7rem; font-weight: 700; letter-spacing: 0.5px; text-transform: uppercase;">
-                                ${pagination.total_items} transactions
-                            </div>
+                            <span class="pg-indicator">Page ${page}</span>
                         </div>
                         
                         <button class="btn btn-pg shadow-sm ${!pagination.has_next ? 'disabled' : ''}" 
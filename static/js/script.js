@@ -29,87 +29,123 @@ document.addEventListener('DOMContentLoaded', function () {
 
     window.safeText = function (el, text) { if (el) el.textContent = text; };
 
+    // Push Stream (SSE). Returns null when the browser has no EventSource,
+    // so callers can keep their polling fallback.
+    window.openMarketStream = function (topics, handlers, onFail) {
+        if (!window.EventSource) return null;
+        const es = new EventSource(`/api/stream/?topics=${encodeURIComponent(topics.join(','))}`);
+        Object.keys(handlers).forEach(evt => {
+            es.addEventListener(evt, (e) => {
+                try { handlers[evt](JSON.parse(e.data)); } catch (err) { console.error(err); }
+            });
+        });
+        let failures = 0;
+        es.addEventListener('open', () => { failures = 0; });
+        es.addEventListener('error', () => {
+            // EventSource retries on its own; give up after repeated failures
+            if (++failures >= 3) {
+                es.close();
+                if (onFail) onFail();
+            }
+        });
+        return es;
+    };
+
+    // Stream topics for a set of symbols: one 'quote:SYM' each, or the whole
+    // 'market' feed past the server's per-stream quote budget (MAX_QUOTE_TOPICS).
+    window.quoteTopics = function (symbols) {
+        const unique = [...new Set(symbols.map(s => String(s).toUpperCase()))];
+        return unique.length <= 20 ? unique.map(s => `quote:${s}`) : ['market'];
+    };
+
     // Navbar Market Summary
-    async function updateNavbarBar() {
+    function renderNavbarBar(nepse, indices, summary) {
         const barIndices = document.getElementById('barIndices');
-        if (!barIndices) return; // Only run if bar exists
+        if (!barIndices) return;
 
-        try {
-            const [nepseRes, sectorRes, summaryRes] = await Promise.all([
-                fetch('/api/nepse-index/'),
-                fetch('/api/sector-indices/'),
-                fetch('/api/market-summary/')
-            ]);
-
-            const nepseJson = await nepseRes.json();
-            const sectorJson = await sectorRes.json();
-            const summaryJson = await summaryRes.json();
-
-            let nepseVal = null, nepseChg = null;
-            if (nepseJson?.success) { nepseVal = nepseJson.data.value; nepseChg = nepseJson.data.change_pct; }
-
-            let sensitive = null, floatIdx = null;
-            if (sectorJson?.success && Array.isArray(sectorJson.data)) {
-                sensitive = sectorJson.data.find(x => (x.name || '').toLowerCase().includes('sensitive'));
-                floatIdx = sectorJson.data.find(x => (x.name || '').toLowerCase().includes('float'));
-            }
+        const nepseVal = nepse ? nepse.value : null;
+        const nepseChg = nepse ? nepse.change_pct : null;
 
-            const parts = [];
+        let sensitive = null, floatIdx = null;
+        if (Array.isArray(indices)) {
+            sensitive = indices.find(x => (x.name || '').toLowerCase().includes('sensitive'));
+            floatIdx = indices.find(x => (x.name || '').toLowerCase().includes('float'));
+        }
+
+        const parts = [];
+        parts.push(`
+            <div class="nav-index-item">
+                <span class="nav-index-name">NEPSE</span>
+                <span class="nav-index-value">${nepseVal !== null ? fmtNumber(nepseVal, 2) : '—'}</span>
+                <span class="nav-index-change ${nepseChg !== null && nepseChg >= 0 ? 'text-success' : 'text-danger'}">
+                    ${nepseChg !== null ? (nepseChg >= 0 ? '+' : '') + fmtNumber(nepseChg, 2) + '%' : '—'}
+                </span>
+            </div>
+        `);
+
+        if (sensitive) {
             parts.push(`
                 <div class="nav-index-item">
-                    <span class="nav-index-name">NEPSE</span>
-                    <span class="nav-index-value">${nepseVal !== null ? fmtNumber(nepseVal, 2) : '—'}</span>
-                    <span class="nav-index-change ${nepseChg !== null && nepseChg >= 0 ? 'text-success' : 'text-danger'}">
-                        ${nepseChg !== null ? (nepseChg >= 0 ? '+' : '') + fmtNumber(nepseChg, 2) + '%' : '—'}
+                    <span class="nav-index-name">SENSITIVE</span>
+                    <span class="nav-index-value">${fmtNumber(sensitive.value, 2)}</span>
+                    <span class="nav-index-change ${Number(sensitive.change_pct) >= 0 ? 'text-success' : 'text-danger'}">
+                        ${(Number(sensitive.change_pct) >= 0 ? '+' : '') + fmtNumber(sensitive.change_pct, 2)}%
                     </span>
                 </div>
             `);
+        }
 
-            if (sensitive) {
-                parts.push(`
-                    <div class="nav-index-item">
-                        <span class="nav-index-name">SENSITIVE</span>
-                        <span class="nav-index-value">${fmtNumber(sensitive.value, 2)}</span>
-                        <span class="nav-index-change ${Number(sensitive.change_pct) >= 0 ? 'text-success' : 'text-danger'}">
-                            ${(Number(sensitive.change_pct) >= 0 ? '+' : '') + fmtNumber(sensitive.change_pct, 2)}%
-                        </span>
-                    </div>
-                `);
-            }
+        if (floatIdx) {
+            parts.push(`
+                <div class="nav-index-item">
+                    <span class="nav-index-name">FLOAT</span>
+                    <span class="nav-index-value">${fmtNumber(floatIdx.value, 2)}</span>
+                    <span class="nav-index-change ${Number(floatIdx.change_pct) >= 0 ? 'text-success' : 'text-danger'}">
+                        ${(Number(floatIdx.change_pct) >= 0 ? '+' : '') + fmtNumber(floatIdx.change_pct, 2)}%
+                    </span>
+                </div>
+            `);
+        }
 
-            if (floatIdx) {
-                parts.push(`
-                    <div class="nav-index-item">
-                        <span class="nav-index-name">FLOAT</span>
-                        <span class="nav-index-value">${fmtNumber(floatIdx.value, 2)}</span>
-                        <span class="nav-index-change ${Number(floatIdx.change_pct) >= 0 ? 'text-success' : 'text-danger'}">
-                            ${(Number(floatIdx.change_pct) >= 0 ? '+' : '') + fmtNumber(floatIdx.change_pct, 2)}%
-                        </span>
-                    </div>
-                `);
-            }
+        barIndices.innerHTML = parts.join('');
 
-            barIndices.innerHTML = parts.join('');
+        const turnoverEl = document.getElementById('barTotalTurnover');
+        const volumeEl = document.getElementById('barTotalVolume');
+        const statusEl = document.getElementById('barSessionStatus');
 
-            const turnoverEl = document.getElementById('barTotalTurnover');
-            const volumeEl = document.getElementById('barTotalVolume');
-            const statusEl = document.getElementById('barSessionStatus');
+        if (summary) {
+            if (turnoverEl) turnoverEl.textContent = `Turnover: ${fmtNumber(summary.total_turnover, 2)}`;
+            if (volumeEl) volumeEl.textContent = `Volume: ${fmtInt(summary.total_traded_shares)}`;
+            if (statusEl) statusEl.textContent = isMarketActive(summary.timestamp, 5) ? 'CONTINUOUS' : 'NO ACTIVE SESSIONS';
+        }
+    }
 
-            if (summaryJson?.success) {
-                const d = summaryJson.data;
-                if (turnoverEl) turnoverEl.textContent = `Turnover: ${fmtNumber(d.total_turnover, 2)}`;
-                if (volumeEl) volumeEl.textContent = `Volume: ${fmtInt(d.total_traded_shares)}`;
-                if (statusEl) statusEl.textContent = isMarketActive(d.timestamp, 5) ? 'CONTINUOUS' : 'NO ACTIVE SESSIONS';
+    async function updateNavbarBar() {
+        const barIndices = document.getElementById('barIndices');
+        if (!barIndices) return; // Only run if bar exists
+
+        try {
+            // One bundled request (index + sector indices + summary share one playback lookup)
+            const res = await fetch('/api/ticker-bar/');
+            const json = await res.json();
+            if (json?.success) {
+                const d = json.data;
+                renderNavbarBar(d.nepse, d.indices, d.summary);
             }
         } catch (e) {
             console.error(e);
         }
     }
 
-    // Run Navbar Update if element exists
+    // Run Navbar Update if element exists: one fetch, then server push.
+    // Falls back to the old 30s polling if the stream is unavailable.
     if (document.getElementById('barIndices')) {
         updateNavbarBar();
-        setInterval(updateNavbarBar, 30000); // Global 30s update for navbar
+        const startPolling = () => setInterval(updateNavbarBar, 30000);
+        const stream = openMarketStream(['index'], {
+            index: (d) => renderNavbarBar(d.nepse, d.indices, d.summary)
+        }, startPolling);
+        if (!stream) startPolling();
     }
 
     // Navbar Search Logic
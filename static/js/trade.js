@@ -351,15 +351,39 @@ function updateMarketStatusUI() {
 }
 
 // Market Depth Functions
+// The depth is pushed on 'depth:<SYMBOL>' when the book changes; fetches are
+// conditional on the last version seen, so an unchanged book costs a 304.
+let depthSymbol = null;
+let depthVersion = null;
+let depthStream = null;
+
+function applyMarketDepth(depth) {
+    if (depth.symbol !== depthSymbol) return;
+    if (depthVersion !== null && depth.version <= depthVersion) return;
+    depthVersion = depth.version;
+    renderMarketDepth(depth.bids, depth.asks);
+}
+
+function watchMarketDepth(symbol) {
+    if (symbol === depthSymbol) return;
+    depthSymbol = symbol;
+    depthVersion = null;
+    if (depthStream) depthStream.close();
+    depthStream = openMarketStream([`depth:${symbol}`], { depth: applyMarketDepth });
+}
+
 async function fetchMarketDepth(symbol) {
     if (!symbol) return;
+    watchMarketDepth(symbol);
 
     try {
-        const res = await fetch(`/api/orderbook/${encodeURIComponent(symbol)}/`);
+        const headers = depthVersion !== null ? { 'If-None-Match': `"${depthVersion}"` } : {};
+        const res = await fetch(`/api/orderbook/${encodeURIComponent(symbol)}/`, { headers });
+        if (res.status === 304) return;
         const json = await res.json();
 
         if (json.success) {
-            renderMarketDepth(json.bids, json.asks);
+            applyMarketDepth(json);
         }
     } catch (e) {
         console.error('Error fetching market depth:', e);